@@ -1,7 +1,8 @@
 """AD7998 - device access class for the AD7998 12-bit I2C ADC.
 
 This class implements support for the AD7998 I2C ADC device, providing simple
-methods to convert and read in input channel.
+methods to convert and read in input channel, and to convert and read multiple channels
+in a single bulk sequence-mode transfer.
 
 James Hogge, STFC Application Engineering Group.
 """
@@ -18,6 +19,17 @@ class AD7998(I2CDevice):
 
     NUM_ADC_CHANNELS = 8
 
+    # Register addresses and command mode address pointer values
+    CONVERSION_REG = 0x00
+    CONFIG_REG = 0x02
+    CYCLE_REG = 0x03
+    CMD_CONVERT_SEQUENCE = 0x70
+    CMD_CONVERT_SINGLE = 0x80
+
+    # Default configuration register flags (filtering on) and channel selection field offset
+    CONFIG_DEFAULT = 0x0008
+    CONFIG_CHANNEL_SHIFT = 4
+
     def __init__(self, address=0x20, **kwargs):
         """Initialise the AD7998 device.
 
@@ -28,13 +40,17 @@ class AD7998(I2CDevice):
         I2CDevice.__init__(self, address, **kwargs)
 
         # Set cycle register to fastest conversion mode
-        self.write8(3, 1)
+        self.write8(self.CYCLE_REG, 1)
+
+        # Channel selection mask currently programmed into the configuration register
+        self.__channel_mask = None
 
     def read_input_raw(self, channel):
         """Convert and read a raw ADC value on a channel.
 
         This method triggers a conversion on the specified channel and
-        reads back the raw 16-bit value from the device
+        reads back the raw 16-bit value from the device in a single combined
+        transaction
 
         :param channel: channel to convert
         :return raw conversion result
@@ -43,16 +59,14 @@ class AD7998(I2CDevice):
         if channel < 0 or channel >= self.NUM_ADC_CHANNELS:
             raise I2CException("Illegal channel {} requested".format(channel))
 
-        # Trigger a conversion on channel, setting upper 4 bits of address pointer
-        self.write8(0x70 + ((channel + 1) << 4), 0)
+        # Trigger a conversion on channel, setting upper 4 bits of address pointer, and read
+        # back the conversion register it points to, MSB first, after a repeated start
+        data = self.write_read([self.CMD_CONVERT_SINGLE + (channel << 4)], 2)
 
-        # Read conversion register
-        data = self.readU16(0)
+        if not isinstance(data, list) or len(data) < 2:
+            return self.ERROR
 
-        # Swap bytes to correct order
-        data = ((data & 0xff) << 8) + ((data & 0xff00) >> 8)
-
-        return data
+        return (data[0] << 8) + data[1]
 
     def read_input_scaled(self, channel):
         """Convert and read a scaled valye on a channel.
@@ -72,3 +86,76 @@ class AD7998(I2CDevice):
 
         # Return scaled value
         return data / 4095.0
+
+    def read_inputs_raw(self, channels):
+        """Convert and read raw ADC values on multiple channels.
+
+        This method converts and reads back the raw 16-bit values for a list of channels in a
+        single bulk transfer. The requested channels are programmed into the channel selection
+        field of the configuration register (only when they differ from the current selection)
+        and a sequence conversion command is issued, reading back the results of all selected
+        channels in one block read.
+
+        :param channels: iterable of channels to convert
+        :return list of raw conversion results, in the order of the requested channels
+        """
+        channels = list(channels)
+
+        # Check legal channels requested
+        for channel in channels:
+            if channel < 0 or channel >= self.NUM_ADC_CHANNELS:
+                raise I2CException("Illegal channel {} requested".format(channel))
+
+        # Build the channel selection mask and program the configuration register if necessary
+        channel_mask = 0
+        for channel in channels:
+            channel_mask |= 1 << channel
+
+        if not channel_mask:
+            return []
+
+        if channel_mask != self.__channel_mask:
+            config = self.CONFIG_DEFAULT | (channel_mask << self.CONFIG_CHANNEL_SHIFT)
+            # Swap bytes to correct order, since the device expects the MSB first
+            config = ((config & 0xff) << 8) + ((config & 0xff00) >> 8)
+            if self.write16(self.CONFIG_REG, config) == self.ERROR:
+                return [self.ERROR] * len(channels)
+            self.__channel_mask = channel_mask
+
+        # Trigger a sequence conversion of the selected channels and read back the results,
+        # which are returned in ascending channel order, two bytes per channel, MSB first
+        num_selected = bin(channel_mask).count('1')
+        data = self.readList(self.CMD_CONVERT_SEQUENCE, num_selected * 2)
+
+        if not isinstance(data, list) or len(data) < num_selected * 2:
+            return [self.ERROR] * len(channels)
+
+        # Map the results to channels using the channel identifier in bits 12-14 of each result
+        results = {}
+        for idx in range(num_selected):
+            value = (data[idx * 2] << 8) + data[idx * 2 + 1]
+            results[(value >> 12) & 0x7] = value
+
+        return [results.get(channel, self.ERROR) for channel in channels]
+
+    def read_inputs_codes(self, channels):
+        """Convert and read 12-bit conversion codes on multiple channels.
+
+        This method converts and reads multiple channels in a single bulk transfer, returning
+        the 12-bit conversion codes with the channel identifiers masked off.
+
+        :param channels: iterable of channels to convert
+        :return list of conversion codes, in the order of the requested channels
+        """
+        return [data & 0xfff for data in self.read_inputs_raw(channels)]
+
+    def read_inputs_scaled(self, channels):
+        """Convert and read scaled values on multiple channels.
+
+        This method converts and reads multiple channels in a single bulk transfer, returning
+        the values as a fraction of the full scale, i.e. between values of 0.0 and 1.0.
+
+        :param channels: iterable of channels to convert
+        :return list of scaled conversion results, in the order of the requested channels
+        """
+        return [code / 4095.0 for code in self.read_inputs_codes(channels)]
@@ -5,9 +5,15 @@ This module implements the LPDPowerAdapter API adapter plugin for the ODIN serve
 James Hogge, STFC Application Engineering Group.
 """
 from odin.adapters.adapter import ApiAdapter, ApiAdapterResponse, request_types, response_types
-from tornado.escape import json_decode
-from tornado.ioloop import IOLoop
+from tornado.escape import json_decode, to_unicode
 from lpdpower.pscu_data import PSCUData, PSCUDataError
+from lpdpower.poller import PSCUPoller
+from lpdpower.i2c_device import I2CDevice
+from lpdpower.i2c_simulator import PSCUSimulator
+from lpdpower.pscu import PSCU
+from lpdpower.stream import PSCUStream
+from lpdpower.history import PSCUHistory
+from lpdpower.conversion import parse_calibration
 
 
 class LPDPowerAdapter(ApiAdapter):
@@ -24,8 +30,8 @@ class LPDPowerAdapter(ApiAdapter):
 
         This constructor initialises the adapter instance, extracting the appropriate
         configuration options passed in by the server, creating a PSCUData object to
-        interact with the PSCU hardware and starting a period update loop within
-        the tornado IOLoop instance to handle background update tasks.
+        interact with the PSCU hardware and starting a background poller thread to handle
+        periodic update tasks without blocking the tornado IOLoop.
 
         :param kwargs: keyword argument list supplied by the calling server
         """
@@ -37,15 +43,97 @@ class LPDPowerAdapter(ApiAdapter):
         self.update_interval = float(self.options.get('update_interval', 0.05))
         pscu_data_options = {
             'quad_enable_interval': float(self.options.get('quad_enable_interval', 1.0)),
+            'quad_enable_budget': float(self.options.get('quad_enable_budget', 0.0)) or None,
+            'quad_enable_inrush': float(self.options.get('quad_enable_inrush', 0.0)) or None,
             'detector_position_offset': float(self.options.get('detector_position_offset', 0.0)),
             'i2c_bus_number': int(self.options.get('i2c_bus_number', 1)),
+            'poll_intervals': {},
+            'poll_priorities': {},
+            'calibrations': {},
+            'interlock_interrupt_pin': self.options.get('interlock_interrupt_pin', None),
+            'history_interval': float(
+                self.options.get('history_interval', PSCUHistory.DEFAULT_INTERVAL)
+            ),
+            'history_capacity': int(
+                self.options.get('history_capacity', PSCUHistory.DEFAULT_CAPACITY)
+            ),
         }
 
+        # Retrieve any sensor poll group interval and priority overrides, specified as e.g.
+        # poll_interval_temperature = 2.0
+        for group in PSCU.DEFAULT_POLL_INTERVALS:
+            if 'poll_interval_' + group in self.options:
+                pscu_data_options['poll_intervals'][group] = float(
+                    self.options['poll_interval_' + group]
+                )
+            if 'poll_priority_' + group in self.options:
+                pscu_data_options['poll_priorities'][group] = int(
+                    self.options['poll_priority_' + group]
+                )
+
+        # Retrieve any sensor channel calibrations, specified by converter path and channel as
+        # gain, offset and optional curve coefficients, e.g.
+        # calibration_temperature_3 = 1.02, -0.5
+        for (option, value) in self.options.items():
+            if option.startswith('calibration_'):
+                pscu_data_options['calibrations'][option[len('calibration_'):]] = (
+                    parse_calibration(value)
+                )
+
+        # Select the I2C bus backend, either the hardware smbus or smbus2 interface, the latter
+        # supporting combined write-then-read transactions, or a simulator of the PSCU devices
+        # for running off-target
+        self.i2c_backend = self.options.get('i2c_backend', 'smbus')
+        self.simulator = None
+        if self.i2c_backend == 'simulator':
+            self.simulator = PSCUSimulator(
+                pscu_data_options['i2c_bus_number'],
+                latency=float(self.options.get('sim_latency', 0.0)),
+                byte_time=float(self.options.get('sim_byte_time', 0.0)),
+                fault_rate=float(self.options.get('sim_fault_rate', 0.0)),
+            )
+            I2CDevice.set_bus_factory(self.simulator.bus_factory)
+        elif self.i2c_backend == 'smbus':
+            I2CDevice.set_bus_factory(None)
+        elif self.i2c_backend == 'smbus2':
+            I2CDevice.set_bus_factory(I2CDevice.create_smbus2_bus)
+        else:
+            raise ValueError('Unknown I2C backend {} specified'.format(self.i2c_backend))
+
         # Create a PSCUData instance
         self.pscuData = PSCUData(**pscu_data_options)
 
-        # Start the update loop
-        self.update_loop()
+        # Create and start the background poller thread
+        self.poller = PSCUPoller(self.pscuData.pscu, self.update_interval)
+        self.pscuData.pscu.set_interrupt_callback(self.poller.wake)
+        self.poller.add_update_callback(self.pscuData.history.update)
+
+        # If a stream port is specified, start the WebSocket server pushing deltas of the PSCU
+        # state to clients after each poller update. Connections are accepted from pages served
+        # by the same host and any other allowed origins, over TLS if a certificate is given.
+        self.stream = None
+        stream_port = int(self.options.get('stream_port', 0))
+        if stream_port:
+            allowed_origins = [
+                origin.strip() for origin in self.options.get('stream_origins', '').split(',')
+                if origin.strip()
+            ]
+            ssl_options = None
+            if 'stream_certfile' in self.options:
+                ssl_options = {
+                    'certfile': self.options['stream_certfile'],
+                    'keyfile': self.options.get('stream_keyfile'),
+                }
+            self.stream = PSCUStream(self.pscuData, allowed_origins)
+            self.stream.listen(stream_port, ssl_options=ssl_options)
+            self.pscuData.stream_port = stream_port
+            self.poller.add_update_callback(self.stream.update)
+
+        self.poller.start()
+
+        # Start the timer thread of the deferred executor, so that deferred PSCU commands, e.g.
+        # sequenced quad enables, execute at their deadlines rather than on poller updates
+        self.pscuData.pscu.deferred_executor.start()
 
     @request_types('application/json')
     @response_types('application/json')
@@ -54,19 +142,40 @@ class LPDPowerAdapter(ApiAdapter):
 
         This method handles an HTTP GET request routed to the adapter. This passes
         the path of the request to the underlying PSCUData instance, where it is interpreted
-        and returned as a dictionary containing the appropriate parameter tree.
+        and returned as a pre-encoded JSON response containing the appropriate parameter tree.
+        If the request has a since=N query argument, only the parameters changed since poll
+        generation N are returned, together with the current generation. Requests for the
+        history data subtree may specify start and end timestamps, a decimation interval and a
+        resolution as query arguments.
 
         :param path: URI path of request
         :param request: HTTP request object
         :return: an ApiAdapterResponse object containing the appropriate response from the PSCU
         """
         try:
-            response = self.pscuData.get(path)
+            args = request.query_arguments
+            if self.pscuData.is_history_path(path):
+                response = self.pscuData.get_history(
+                    path,
+                    start=float(args['start'][-1]) if 'start' in args else None,
+                    end=float(args['end'][-1]) if 'end' in args else None,
+                    decimation=int(args['decimation'][-1]) if 'decimation' in args else 1,
+                    resolution=to_unicode(args['resolution'][-1]) if 'resolution' in args else None,
+                )
+            elif 'since' in args:
+                response = self.pscuData.get(path, since=int(args['since'][-1]))
+            else:
+                response = self.pscuData.get_encoded(path)
             status_code = 200
         except PSCUDataError as e:
             response = {'error': str(e)}
             status_code = 400
-        return ApiAdapterResponse(response, status_code=status_code)
+        except ValueError as e:
+            response = {'error': 'Invalid query argument: {}'.format(str(e))}
+            status_code = 400
+        return ApiAdapterResponse(
+            response, content_type='application/json', status_code=status_code
+        )
 
     @request_types('application/json')
     @response_types('application/json')
@@ -95,26 +204,16 @@ class LPDPowerAdapter(ApiAdapter):
             status_code = 400
         return ApiAdapterResponse(response, status_code=status_code)
 
-    def update_loop(self):
-        """Handle background update loop tasks.
-
-        This method handles background update tasks executed periodically in the tornado
-        IOLoop instance. This included handling deferred PSCU commands, updating the front-panel
-        LCD and polling all sensors.
-        """
-        # Handle background tasks
-        self.pscuData.pscu.handle_deferred()
-        self.pscuData.pscu.update_lcd()
-        self.pscuData.pscu.poll_all_sensors()
-
-        # Schedule the update loop to run in the IOLoop instance again after appropriate
-        # interval
-        IOLoop.instance().call_later(self.update_interval, self.update_loop)
-
     def cleanup(self):
         """Clean up the state of the adapter at shutdown.
 
         This method is called by the ODIN server at shutdown to allow the adapter to
-        clean up its internal state and that of any connected hardware.
+        clean up its internal state and that of any connected hardware. The background
+        poller and deferred executor threads are stopped first so that no further hardware
+        accesses are made.
         """
+        self.poller.stop()
+        self.pscuData.pscu.deferred_executor.stop()
+        if self.stream is not None:
+            self.stream.stop()
         self.pscuData.pscu.cleanup()
@@ -0,0 +1,355 @@
+"""benchmark - benchmark harness for the LpdPower poll and serve paths.
+
+This module implements a benchmark harness for the hot paths of the LpdPower adapter: polling
+of the PSCU and Quad sensors, rendering of the PSCUData parameter tree and the adapter GET
+and PUT request handlers. The benchmark runs off-target against the simulated PSCU I2C bus,
+with configurable bus latency, and reports bus transactions per poll, poll cycle wall time,
+request latency percentiles under a number of concurrent clients and memory allocation per
+poll cycle. Run with:
+
+    python -m lpdpower.benchmark --help
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+from lpdpower.adapter import LPDPowerAdapter
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Calculate summary statistics and percentiles of a list of samples.
+
+    Percentiles are calculated with the nearest-rank method.
+
+    :param samples: list of sample values
+    :param points: percentile points to calculate
+    :returns: dictionary of mean, min, max and percentile values, e.g. p50, p99
+    """
+    if not samples:
+        return {}
+
+    ordered = sorted(samples)
+    stats = {
+        'mean': sum(ordered) / float(len(ordered)),
+        'min': ordered[0],
+        'max': ordered[-1],
+    }
+    for point in points:
+        rank = int(math.ceil(point / 100.0 * len(ordered)))
+        stats['p{}'.format(point)] = ordered[min(max(rank, 1), len(ordered)) - 1]
+
+    return stats
+
+
+class BenchmarkRequest(object):
+    """Minimal HTTP request stand-in passed to the adapter request handlers."""
+
+    def __init__(self, body=''):
+        """Initialise the request with JSON headers and the specified body."""
+        self.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
+        self.body = body
+        self.query_arguments = {}
+
+
+class PSCUBenchmark(object):
+    """PSCUBenchmark - benchmark harness for the LpdPower adapter.
+
+    This class creates an LPDPowerAdapter instance using the simulated I2C bus backend and
+    implements benchmarks of the sensor poll and request handling paths.
+    """
+
+    def __init__(self, latency=0.0, byte_time=0.0, fault_rate=0.0, update_interval=0.05):
+        """Initialise the benchmark harness.
+
+        The adapter background poller is stopped after creation so that poll benchmarks have
+        exclusive access to the bus; it is restarted for the request benchmarks to reproduce
+        the contention of a running system.
+
+        :param latency: simulated bus latency per transaction in seconds
+        :param byte_time: simulated bus latency per byte transferred in seconds
+        :param fault_rate: simulated bus fault injection rate
+        :param update_interval: adapter background poller update interval in seconds
+        """
+        self.adapter = LPDPowerAdapter(
+            i2c_backend='simulator', sim_latency=latency, sim_byte_time=byte_time,
+            sim_fault_rate=fault_rate, update_interval=update_interval,
+        )
+        self.adapter.poller.stop()
+
+        self.bus = self.adapter.simulator.bus
+        self.pscu_data = self.adapter.pscuData
+        self.pscu = self.pscu_data.pscu
+
+    def bench_poll(self, poll_func, cycles):
+        """Benchmark a poll function.
+
+        :param poll_func: poll function to call, e.g. PSCU.poll_all_sensors
+        :param cycles: number of poll cycles to run
+        :returns: dictionary of bus transactions and bytes per poll and wall time statistics
+        """
+        self.bus.reset_stats()
+        switch_count = self.pscu.tca.switch_count
+        durations = []
+        for _ in range(cycles):
+            start_time = time.time()
+            poll_func()
+            durations.append(time.time() - start_time)
+
+        return {
+            'cycles': cycles,
+            'transactions_per_poll': self.bus.transaction_count / float(cycles),
+            'bytes_per_poll': self.bus.byte_count / float(cycles),
+            'mux_switches_per_poll': (self.pscu.tca.switch_count - switch_count) / float(cycles),
+            'faults': self.bus.fault_count,
+            'wall_time': percentiles(durations),
+        }
+
+    def bench_allocations(self, poll_func, cycles):
+        """Benchmark the memory allocated by a poll function.
+
+        This method uses tracemalloc to measure the number of memory blocks remaining allocated
+        and the peak memory traced during each poll cycle.
+
+        :param poll_func: poll function to call
+        :param cycles: number of poll cycles to run
+        :returns: dictionary of allocation statistics, or None if tracemalloc is not available
+        """
+        if tracemalloc is None:
+            return None
+
+        # Run one cycle first so that one-off allocations, e.g. of caches, are excluded
+        poll_func()
+
+        tracemalloc.start()
+        try:
+            blocks = []
+            peaks = []
+            for _ in range(cycles):
+                before = tracemalloc.take_snapshot()
+                current, _ = tracemalloc.get_traced_memory()
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+                poll_func()
+                _, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot()
+                blocks.append(sum(
+                    stat.count_diff for stat in after.compare_to(before, 'filename')
+                ))
+                peaks.append(max(peak - current, 0))
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'net_blocks_per_poll': percentiles(blocks),
+            'peak_bytes_per_poll': percentiles(peaks),
+        }
+
+    def bench_requests(self, method, path, clients, requests, body=None):
+        """Benchmark adapter request handling with a number of concurrent clients.
+
+        :param method: name of the adapter request method, i.e. 'get' or 'put'
+        :param path: request path
+        :param clients: number of concurrent client threads
+        :param requests: number of requests made by each client
+        :param body: optional dictionary to encode as the request body
+        :returns: dictionary of request latency statistics and throughput
+        """
+        handler = getattr(self.adapter, method)
+        request = BenchmarkRequest(json.dumps(body) if body is not None else '')
+
+        latencies = [[] for _ in range(clients)]
+        errors = [0] * clients
+
+        def client(idx):
+            for _ in range(requests):
+                start_time = time.time()
+                response = handler(path, request)
+                latencies[idx].append(time.time() - start_time)
+                if response.status_code != 200:
+                    errors[idx] += 1
+
+        threads = [threading.Thread(target=client, args=(idx,)) for idx in range(clients)]
+
+        start_time = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start_time
+
+        samples = [latency for client_latencies in latencies for latency in client_latencies]
+        return {
+            'clients': clients,
+            'requests': len(samples),
+            'errors': sum(errors),
+            'throughput': len(samples) / elapsed if elapsed > 0 else 0.0,
+            'latency': percentiles(samples),
+        }
+
+    def bench_render(self, path, requests):
+        """Benchmark rendering of the PSCUData parameter tree without response caching.
+
+        :param path: parameter tree path to render
+        :param requests: number of renders
+        :returns: dictionary of render time statistics
+        """
+        durations = []
+        for _ in range(requests):
+            start_time = time.time()
+            self.pscu_data.get(path)
+            durations.append(time.time() - start_time)
+
+        return {'requests': requests, 'latency': percentiles(durations)}
+
+    def run(self, cycles=100, clients=4, requests=100, path=''):
+        """Run all benchmarks.
+
+        :param cycles: number of poll cycles for poll and allocation benchmarks
+        :param clients: number of concurrent clients for request benchmarks
+        :param requests: number of requests per client for request benchmarks
+        :param path: parameter tree path for GET request benchmarks
+        :returns: dictionary of results of all benchmarks
+        """
+        results = {
+            'pscu_poll': self.bench_poll(self.pscu.poll_all_sensors, cycles),
+            'quad_poll': self.bench_poll(self.pscu.quad[0].poll_all_sensors, cycles),
+            'pscu_poll_allocations': self.bench_allocations(self.pscu.poll_all_sensors, cycles),
+            'pscu_data_get': self.bench_render(path, requests),
+        }
+
+        # Run the request benchmarks with the background poller running, measuring the bus
+        # transaction rate of the scheduled sensor polls over the same period
+        self.bus.reset_stats()
+        update_count = self.adapter.poller.update_count
+        start_time = time.time()
+        self.adapter.poller.start()
+        try:
+            results['adapter_get'] = self.bench_requests('get', path, clients, requests)
+            results['adapter_put'] = self.bench_requests(
+                'put', 'fan', 1, requests, {'target': self.pscu.get_fan_target()}
+            )
+        finally:
+            self.adapter.poller.stop()
+        elapsed = time.time() - start_time
+
+        results['poller'] = {
+            'updates': self.adapter.poller.update_count - update_count,
+            'elapsed': elapsed,
+            'transactions_per_second': self.bus.transaction_count / elapsed if elapsed else 0.0,
+            'groups': self.pscu.get_poll_status(),
+        }
+        return results
+
+    def cleanup(self):
+        """Clean up the adapter used for benchmarking."""
+        self.adapter.cleanup()
+
+
+def format_stats(stats, scale=1.0, units=''):
+    """Format a dictionary of summary statistics as a single line.
+
+    :param stats: dictionary of statistics as returned by percentiles()
+    :param scale: scale factor to apply to values
+    :param units: units of the scaled values
+    :returns: formatted string
+    """
+    keys = ['mean', 'min'] + sorted(k for k in stats if k.startswith('p')) + ['max']
+    return ' '.join('{}={:.3f}{}'.format(k, stats[k] * scale, units) for k in keys if k in stats)
+
+
+def print_report(results, stream=sys.stdout):
+    """Print a human-readable report of benchmark results.
+
+    :param results: dictionary of results as returned by PSCUBenchmark.run()
+    :param stream: stream to write the report to
+    """
+    for name in ('pscu_poll', 'quad_poll'):
+        result = results[name]
+        stream.write(
+            '{}: {} cycles, {:.1f} transactions/poll, {:.1f} bytes/poll, '
+            '{:.1f} mux switches/poll, {} faults\n'.format(
+                name, result['cycles'], result['transactions_per_poll'],
+                result['bytes_per_poll'], result['mux_switches_per_poll'], result['faults']))
+        stream.write('  wall time   {}\n'.format(format_stats(result['wall_time'], 1e3, 'ms')))
+
+    allocations = results['pscu_poll_allocations']
+    if allocations is not None:
+        stream.write('pscu_poll_allocations:\n')
+        stream.write('  net blocks  {}\n'.format(format_stats(allocations['net_blocks_per_poll'])))
+        stream.write('  peak        {}\n'.format(
+            format_stats(allocations['peak_bytes_per_poll'], 1.0 / 1024, 'KiB')))
+    else:
+        stream.write('pscu_poll_allocations: tracemalloc not available\n')
+
+    result = results['pscu_data_get']
+    stream.write('pscu_data_get: {} renders\n'.format(result['requests']))
+    stream.write('  latency     {}\n'.format(format_stats(result['latency'], 1e3, 'ms')))
+
+    for name in ('adapter_get', 'adapter_put'):
+        result = results[name]
+        stream.write('{}: {} clients, {} requests, {} errors, {:.1f} requests/s\n'.format(
+            name, result['clients'], result['requests'], result['errors'], result['throughput']))
+        stream.write('  latency     {}\n'.format(format_stats(result['latency'], 1e3, 'ms')))
+
+    result = results['poller']
+    stream.write('poller: {} updates in {:.3f}s, {:.1f} bus transactions/s\n'.format(
+        result['updates'], result['elapsed'], result['transactions_per_second']))
+    for (name, status) in sorted(result['groups'].items()):
+        stream.write('  {:<12}interval={:.3f}s polls={} last={:.3f}ms\n'.format(
+            name, status['interval'], status['poll_count'], status['last_duration'] * 1e3))
+
+
+def main(argv=None):
+    """Run the benchmark from the command line.
+
+    :param argv: optional list of command line arguments
+    :returns: exit status
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the LpdPower poll and serve paths')
+    parser.add_argument('--cycles', type=int, default=100,
+                        help='number of poll cycles to benchmark')
+    parser.add_argument('--clients', type=int, default=4,
+                        help='number of concurrent GET clients')
+    parser.add_argument('--requests', type=int, default=100,
+                        help='number of requests per client')
+    parser.add_argument('--path', default='',
+                        help='parameter tree path for GET requests')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='simulated bus latency per transaction in seconds')
+    parser.add_argument('--byte-time', type=float, default=0.0,
+                        help='simulated bus latency per byte in seconds')
+    parser.add_argument('--fault-rate', type=float, default=0.0,
+                        help='simulated bus fault injection rate')
+    parser.add_argument('--update-interval', type=float, default=0.05,
+                        help='background poller update interval in seconds')
+    parser.add_argument('--json', action='store_true',
+                        help='output results as JSON')
+    args = parser.parse_args(argv)
+
+    benchmark = PSCUBenchmark(args.latency, args.byte_time, args.fault_rate, args.update_interval)
+    try:
+        results = benchmark.run(args.cycles, args.clients, args.requests, args.path)
+    finally:
+        benchmark.cleanup()
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        print_report(results)
+
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
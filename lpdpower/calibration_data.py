@@ -0,0 +1,52 @@
+"""calibration_data - sensor calibration data container class.
+
+This module implements the CalibrationData class used to represent the calibrations of the
+ADC sensor channels of the LPD power supply control unit and its Quads, allowing the gain,
+offset and curve of each channel to be read and adjusted at runtime.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+from functools import partial
+
+from odin.adapters.parameter_tree import ParameterTree
+
+
+class CalibrationData(object):
+    """Data container for the calibrations of the PSCU sensor channels.
+
+    This class implements a data container and parameter tree for the calibrations of a set of
+    ChannelConverter instances, keyed by path, e.g. temperature or quad/0/channel_voltage. The
+    tree has a node for each path, containing the gain, offset and curve parameters of each
+    channel, indexed by channel. Setting a parameter recomputes the conversion lookup table of
+    that channel.
+    """
+
+    def __init__(self, converters):
+        """Initialise the calibration data container.
+
+        :param converters: dictionary of path: ChannelConverter instance
+        """
+        self.converters = converters
+
+        tree = {}
+        for (path, converter) in converters.items():
+            node = tree
+            for element in path.split('/'):
+                node = node.setdefault(element, {})
+            for channel in range(converter.num_channels):
+                node[str(channel)] = {
+                    'gain': (
+                        partial(converter.get_gain, channel),
+                        partial(converter.set_gain, channel),
+                    ),
+                    'offset': (
+                        partial(converter.get_offset, channel),
+                        partial(converter.set_offset, channel),
+                    ),
+                    'curve': (
+                        partial(converter.get_curve, channel),
+                        partial(converter.set_curve, channel),
+                    ),
+                }
+
+        self.param_tree = ParameterTree(tree)
@@ -0,0 +1,185 @@
+"""conversion.py - batched conversion of ADC readings to engineering units.
+
+This module implements the LinearConversion and ChannelConverter classes used to convert the
+12-bit conversion codes read from the AD7998 ADCs on the PSCU and Quads into engineering
+units. The unit conversion of each channel is combined with a per-channel calibration into a
+lookup table of the value of every code, so that a whole ADC read is converted in one pass of
+table lookups, rather than calling a conversion function for each value.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+from array import array
+
+# Full-scale code of the 12-bit AD7998 ADCs
+ADC_FULL_SCALE = 4095.0
+
+
+def scale_codes(codes):
+    """Convert ADC codes to fractions of the full-scale reading.
+
+    :param codes: sequence of 12-bit ADC codes
+    :returns: list of readings as fractions of full scale, between 0.0 and 1.0
+    """
+    return [code / ADC_FULL_SCALE for code in codes]
+
+
+class LinearConversion(object):
+    """LinearConversion - linear conversion of ADC readings to engineering units.
+
+    This class implements a conversion of a scaled ADC reading, i.e. as a fraction of full
+    scale, to an engineering value of gain * reading + offset.
+    """
+
+    def __init__(self, gain, offset=0.0):
+        """Initialise the LinearConversion instance.
+
+        :param gain: engineering value per unit of scaled reading
+        :param offset: engineering value of a zero reading
+        """
+        self.gain = gain
+        self.offset = offset
+
+    def convert(self, scaled_value):
+        """Convert a scaled ADC reading to an engineering value.
+
+        :param scaled_value: ADC reading as a fraction of full scale
+        :returns: engineering value
+        """
+        return scaled_value * self.gain + self.offset
+
+
+class ChannelConverter(object):
+    """ChannelConverter - batched conversion of ADC codes for a set of sensor channels.
+
+    This class converts the ADC codes of a set of channels sharing a LinearConversion into
+    engineering values, applying a calibration for each channel to the converted value. The
+    calibration of a channel comprises a gain and offset and an optional curve, specified as
+    the coefficients, in increasing order of power, of a polynomial applied to the linearly
+    calibrated value. Since the ADCs produce only 4096 codes, a lookup table of the calibrated
+    value of every code is precomputed for each channel, so conversion is a table index. The
+    table of a channel is recomputed only when its calibration is changed.
+    """
+
+    NUM_CODES = int(ADC_FULL_SCALE) + 1
+
+    def __init__(self, conversion, num_channels):
+        """Initialise the ChannelConverter instance.
+
+        :param conversion: LinearConversion of the channels
+        :param num_channels: number of channels
+        """
+        self.conversion = conversion
+        self.num_channels = num_channels
+
+        self.gains = [1.0] * num_channels
+        self.offsets = [0.0] * num_channels
+        self.curves = [[] for _ in range(num_channels)]
+
+        self.__tables = [self.__build_table(channel) for channel in range(num_channels)]
+
+    def set_calibration(self, channel, gain=1.0, offset=0.0, curve=None):
+        """Set the calibration of a channel.
+
+        The calibrated value of the channel is the curve polynomial evaluated at gain *
+        converted value + offset, or that value if the curve is empty.
+
+        :param channel: channel index
+        :param gain: calibration gain
+        :param offset: calibration offset in engineering units
+        :param curve: optional list of calibration curve polynomial coefficients
+        """
+        self.__check_channel(channel)
+
+        self.gains[channel] = float(gain)
+        self.offsets[channel] = float(offset)
+        self.curves[channel] = [float(coeff) for coeff in curve] if curve else []
+        self.__tables[channel] = self.__build_table(channel)
+
+    def get_calibration(self, channel):
+        """Get the calibration of a channel.
+
+        :param channel: channel index
+        :returns: tuple of calibration gain, offset and curve coefficients
+        """
+        self.__check_channel(channel)
+        return (self.gains[channel], self.offsets[channel], list(self.curves[channel]))
+
+    def get_gain(self, channel):
+        """Get the calibration gain of a channel."""
+        return self.get_calibration(channel)[0]
+
+    def set_gain(self, channel, gain):
+        """Set the calibration gain of a channel."""
+        (_, offset, curve) = self.get_calibration(channel)
+        self.set_calibration(channel, gain, offset, curve)
+
+    def get_offset(self, channel):
+        """Get the calibration offset of a channel."""
+        return self.get_calibration(channel)[1]
+
+    def set_offset(self, channel, offset):
+        """Set the calibration offset of a channel."""
+        (gain, _, curve) = self.get_calibration(channel)
+        self.set_calibration(channel, gain, offset, curve)
+
+    def get_curve(self, channel):
+        """Get the calibration curve coefficients of a channel."""
+        return self.get_calibration(channel)[2]
+
+    def set_curve(self, channel, curve):
+        """Set the calibration curve coefficients of a channel."""
+        (gain, offset, _) = self.get_calibration(channel)
+        self.set_calibration(channel, gain, offset, curve)
+
+    def convert_codes(self, codes):
+        """Convert the ADC codes of the channels to engineering values.
+
+        :param codes: sequence of 12-bit ADC codes, in channel order
+        :returns: list of engineering values, in channel order
+        """
+        return [table[code] for (table, code) in zip(self.__tables, codes)]
+
+    def __check_channel(self, channel):
+        """Check that a channel index is legal.
+
+        :param channel: channel index
+        """
+        if channel < 0 or channel >= self.num_channels:
+            raise ValueError('Illegal channel index {} specified'.format(channel))
+
+    def __build_table(self, channel):
+        """Build the lookup table of calibrated values of every ADC code for a channel.
+
+        :param channel: channel index
+        :returns: array of calibrated values indexed by code
+        """
+        code_gain = (self.conversion.gain * self.gains[channel]) / ADC_FULL_SCALE
+        code_offset = self.conversion.offset * self.gains[channel] + self.offsets[channel]
+
+        values = [code * code_gain + code_offset for code in range(self.NUM_CODES)]
+
+        curve = self.curves[channel]
+        if curve:
+            values = [
+                sum(coeff * (value ** power) for (power, coeff) in enumerate(curve))
+                for value in values
+            ]
+
+        return array('d', values)
+
+
+def parse_calibration(value):
+    """Parse a channel calibration from a configuration option.
+
+    The option is a comma-separated list of the gain and offset of the channel, optionally
+    followed by the coefficients of a calibration curve, e.g. "1.02, -0.5" or
+    "1.0, 0.0, 0.0, 1.0, 0.002".
+
+    :param value: calibration option string
+    :returns: tuple of calibration gain, offset and list of curve coefficients
+    """
+    fields = [float(field) for field in value.split(',')]
+    if len(fields) < 2:
+        raise ValueError('Calibration {} must specify a gain and offset'.format(value))
+
+    return (fields[0], fields[1], fields[2:])
@@ -3,13 +3,26 @@ deferred_executor.py - deferred executor class for ODIN adapters.
 
 This module provides a deferred executor class that allows command execution to
 be deferred by a programmable delay (e.g. to sequence turn-on of elements of a system).
+Commands are held in a heap ordered by their absolute deadline, so that every command that is
+due is executed each time the queue is processed, and the timing of a sequence of commands
+does not drift. The queue may be processed periodically by an update loop, or by a timer
+thread of the executor which wakes at the next deadline. The executor is thread-safe, allowing
+commands to be enqueued, cancelled or cleared by one thread while the queue is processed by
+another.
 
 Tim Nicholls, STFC Application Engineering Group
 """
 
+import heapq
+import itertools
+import logging
 import time
+import threading
 from functools import partial
 
+# Clock used for command deadlines, using the monotonic clock if available
+_clock = getattr(time, 'monotonic', time.time)
+
 
 class DeferredCommand(object):
     """Provides a simple container for a deferred executor."""
@@ -18,9 +31,13 @@ class DeferredCommand(object):
         """Initialise a deferred command.
 
         Builds a function partial for the command and its arguments and stores the delay value.
+        The deadline is set when the command is scheduled by an executor.
         """
         self.partial = partial(command, *args, **kwargs)
         self.delay = delay
+        self.deadline = None
+        self.cancelled = False
+        self.executed = False
 
     def execute(self):
         """Execute the deferred command by calling the partial."""
@@ -30,43 +47,229 @@ class DeferredCommand(object):
 class DeferredExecutor(object):
     """Implements a deferred command executor."""
 
+    # Clock used for command deadlines
+    clock = staticmethod(_clock)
+
     def __init__(self):
         """Initialise the DeferredExecutor object."""
         self.execution_queue = []
         self.last_executed = 0.0
+        self._lock = threading.RLock()
+        self._condition = threading.Condition(self._lock)
+        self._stopping = False
+        self._thread = None
+
+        self.__sequence = itertools.count()
+        self.__num_pending = 0
+        self.__last_deadline = 0.0
+        self.__tail_deadline = 0.0
+
+        self.execute_count = 0
+        self.last_jitter = 0.0
+        self.max_jitter = 0.0
+        self.__total_jitter = 0.0
+
+    @property
+    def lock(self):
+        """Return the executor lock.
+
+        The lock is held while commands execute, so that holding it waits for any command in
+        progress to complete and prevents further commands executing until it is released.
+        """
+        return self._lock
 
     def enqueue(self, command, delay, *args, **kwargs):
         """Enqueue a command for execution.
 
         This method enqueues a command for execution by the executor with a delay. Note that the
         delay is relative to the previous command in the queue, not absolute with respect to the
-        time at which this function is called.
+        time at which this function is called. A command enqueued after the previous command has
+        executed is due immediately if the delay has already elapsed since then.
         :param command: command to execute
         :param delay: delay in seconds between queued commands
         :param args: positional argument list to pass to command
         :param kwarg: keyword argument list to pass to command
+        :returns: DeferredCommand handle, which may be used to cancel the command
+        """
+        with self._lock:
+            deadline = max(self.__tail_deadline + delay, _clock())
+            self.__tail_deadline = deadline
+            return self.__schedule(DeferredCommand(command, delay, *args, **kwargs), deadline)
+
+    def schedule_at(self, deadline, command, *args, **kwargs):
+        """Schedule a command for execution at an absolute deadline.
+
+        :param deadline: time at which to execute the command, on the executor clock()
+        :param command: command to execute
+        :param args: positional argument list to pass to command
+        :param kwarg: keyword argument list to pass to command
+        :returns: DeferredCommand handle, which may be used to cancel the command
+        """
+        with self._lock:
+            return self.__schedule(DeferredCommand(command, 0.0, *args, **kwargs), deadline)
+
+    def __schedule(self, command, deadline):
+        """Add a command to the execution queue with a deadline, with the lock held.
+
+        :param command: DeferredCommand to add
+        :param deadline: time at which to execute the command
+        :returns: the DeferredCommand
+        """
+        command.deadline = deadline
+        heapq.heappush(self.execution_queue, (deadline, next(self.__sequence), command))
+        self.__num_pending += 1
+        self._condition.notify()
+        return command
+
+    def cancel(self, command):
+        """Cancel a pending command.
+
+        :param command: DeferredCommand handle returned when the command was scheduled
+        :returns: True if the command was pending and has been cancelled
         """
-        self.execution_queue.append(DeferredCommand(command, delay, *args, **kwargs))
+        with self._lock:
+            if command.cancelled or command.executed:
+                return False
+            command.cancelled = True
+            self.__num_pending -= 1
+            return True
 
     def pending(self):
         """Return number of pending commands on execution queue."""
-        return len(self.execution_queue)
+        with self._lock:
+            return self.__num_pending
 
-    def process(self):
+    def process(self, now=None):
         """Process the execution queue.
 
-        This method should be called to process the execution queue. If any commands are currently
-        queued, the first on the queue will be executed if the appropriate delay since the last
-        command has been exceeded.
+        This method should be called to process the execution queue, unless the timer thread
+        of the executor is running. All commands whose deadline has been reached are executed,
+        in deadline order, and the delay of each execution after its deadline recorded as the
+        scheduling jitter. Any exception raised by a command is logged rather than propagated,
+        so that it does not prevent later commands executing. The executor lock is held while
+        the commands execute, so that a concurrent clear() waits for an in-progress command
+        to complete.
+
+        :param now: optional current executor clock time, defaulting to the current time
+        :returns: number of commands executed
         """
-        if len(self.execution_queue) > 0:
-            now = time.time()
-            next_command = self.execution_queue[0]
-            if now >= (self.last_executed + next_command.delay):
-                next_command.execute()
-                self.execution_queue.pop(0)
+        with self._lock:
+            if now is None:
+                now = _clock()
+
+            executed = 0
+            while self.execution_queue and self.execution_queue[0][0] <= now:
+                (deadline, _, command) = heapq.heappop(self.execution_queue)
+                if command.cancelled:
+                    continue
+
+                self.__record_jitter(_clock() - deadline)
+                command.executed = True
+                self.__num_pending -= 1
+                try:
+                    command.execute()
+                except Exception as e:
+                    logging.error("Deferred command failed: {}".format(e))
+
                 self.last_executed = now
+                self.__last_deadline = deadline
+                executed += 1
+
+            return executed
+
+    def __record_jitter(self, jitter):
+        """Record the scheduling jitter of an executed command, with the lock held.
+
+        :param jitter: delay in seconds of the execution after the command deadline
+        """
+        self.execute_count += 1
+        self.last_jitter = jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.__total_jitter += jitter
+
+    def time_to_next(self, now=None):
+        """Return the time until the next pending command is due.
+
+        :param now: optional current executor clock time, defaulting to the current time
+        :returns: time in seconds until the next command is due, or None if none are pending
+        """
+        with self._lock:
+            while self.execution_queue and self.execution_queue[0][2].cancelled:
+                heapq.heappop(self.execution_queue)
+
+            if not self.execution_queue:
+                return None
+
+            if now is None:
+                now = _clock()
+
+            return max(self.execution_queue[0][0] - now, 0.0)
 
     def clear(self):
         """Clear any pending commands off the execution queue."""
-        del self.execution_queue[:]
+        with self._lock:
+            for (_, _, command) in self.execution_queue:
+                command.cancelled = True
+            del self.execution_queue[:]
+            self.__num_pending = 0
+            self.__tail_deadline = self.__last_deadline
+
+    def get_status(self):
+        """Return the status of the executor.
+
+        :returns: dictionary of number of pending and executed commands and scheduling jitter
+        statistics in seconds
+        """
+        with self._lock:
+            return {
+                'pending': self.__num_pending,
+                'executed': self.execute_count,
+                'last_jitter': self.last_jitter,
+                'max_jitter': self.max_jitter,
+                'mean_jitter': (
+                    self.__total_jitter / self.execute_count if self.execute_count else 0.0
+                ),
+            }
+
+    def start(self):
+        """Start the timer thread of the executor.
+
+        When the timer thread is running, commands are executed at their deadlines without
+        needing process() to be called. This method starts the thread if it is not already
+        running.
+        """
+        if self.is_running():
+            return
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='DeferredExecutor')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the timer thread of the executor.
+
+        :param timeout: maximum time in seconds to wait for the thread to terminate
+        """
+        with self._lock:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        """Return True if the timer thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        """Run the timer loop of the executor.
+
+        This internal method is the target of the timer thread. It processes the queue, then
+        waits until the next command is due or a new command is scheduled, until the thread is
+        stopped.
+        """
+        with self._lock:
+            while not self._stopping:
+                self.process()
+                self._condition.wait(self.time_to_next())
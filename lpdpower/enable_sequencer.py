@@ -0,0 +1,221 @@
+"""enable_sequencer.py - inrush-limited sequencing of Quad output channel enables.
+
+This module implements the EnableSequencer class, which enables a sequence of Quad output
+channels in groups, subject to a total inrush current budget. A channel is considered to be
+drawing inrush current until successive polls of its output current agree, or the PSCU quad
+enable interval has elapsed since it was enabled. The next group of channels is started as
+soon as the current drawn by the channels still settling leaves enough of the budget, so that
+the detector is powered up as quickly as the supply allows, but never more slowly than by
+enabling one channel per enable interval.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import logging
+import time
+
+
+class SettlingChannel(object):
+    """Provides a simple container for the state of a channel drawing inrush current."""
+
+    def __init__(self, enabled_at, generation):
+        """Initialise the settling channel state.
+
+        :param enabled_at: executor clock time at which the channel was enabled
+        :param generation: last generation of the quad sensor state not reflecting the current
+        of the channel since it was enabled
+        """
+        self.enabled_at = enabled_at
+        self.generation = generation
+        self.current = None
+
+
+class EnableSequencer(object):
+    """EnableSequencer - inrush-limited sequencing of Quad output channel enables.
+
+    This class enables a list of (quad, channel) pairs in groups, each step of the sequence
+    being run by the deferred executor of the PSCU. At each step, the channels enabled by
+    previous steps which have settled are retired, and as many of the remaining channels as the
+    inrush budget allows are enabled together. The current of a settling channel is taken as
+    its most recent polled current, or the expected inrush current if it has not yet been polled.
+    The sequence is started and cancelled with the deferred executor lock held, so that a step
+    running in the executor thread completes before the sequence state is changed.
+    """
+
+    # Default expected inrush current of a channel in amps
+    DEFAULT_INRUSH = 10.0
+
+    # Default current change in amps between successive polls of a settled channel
+    DEFAULT_SETTLE_TOLERANCE = 0.5
+
+    # Default interval in seconds between steps of the sequence while channels are settling
+    DEFAULT_CHECK_INTERVAL = 0.1
+
+    def __init__(self, pscu, budget=None, inrush=None,
+                 settle_tolerance=DEFAULT_SETTLE_TOLERANCE, check_interval=DEFAULT_CHECK_INTERVAL):
+        """Initialise the EnableSequencer instance.
+
+        :param pscu: PSCU instance whose quads, deferred executor and enable interval are used
+        :param budget: total inrush current budget in amps, defaulting to the inrush of one
+        channel, i.e. enabling channels one at a time
+        :param inrush: expected inrush current of a channel in amps
+        :param settle_tolerance: current change in amps between polls of a settled channel
+        :param check_interval: interval in seconds between steps while channels are settling
+        """
+        self.pscu = pscu
+        self.inrush = float(inrush) if inrush else self.DEFAULT_INRUSH
+        self.budget = float(budget) if budget else self.inrush
+        self.settle_tolerance = settle_tolerance
+        self.check_interval = check_interval
+
+        self.queued = []
+        self.settling = {}
+        self.__step_command = None
+
+        self.group_count = 0
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self, channels):
+        """Start a sequence of channel enables, cancelling any sequence in progress.
+
+        :param channels: list of (quad index, channel index) pairs to enable, in order
+        """
+        with self.pscu.deferred_executor.lock:
+            self.cancel()
+
+            logging.debug("Starting sequenced enable of {} quad channels with {}A budget".format(
+                len(channels), self.budget
+            ))
+            self.queued = list(channels)
+            self.group_count = 0
+            self.started_at = time.time()
+            self.duration = 0.0
+            self.__schedule_step(self.pscu.deferred_executor.clock())
+
+    def cancel(self):
+        """Cancel any sequence in progress, leaving already enabled channels enabled.
+
+        This method waits for any step of the sequence running in the executor thread to
+        complete, so that no further channels are enabled once it returns.
+        """
+        with self.pscu.deferred_executor.lock:
+            if self.__step_command is not None:
+                self.pscu.deferred_executor.cancel(self.__step_command)
+                self.__step_command = None
+
+            if self.queued:
+                logging.debug("Cancelling sequenced enable of {} quad channels".format(
+                    len(self.queued)
+                ))
+
+            self.queued = []
+            self.settling = {}
+
+    def is_active(self):
+        """Return True if a sequence is in progress."""
+        return bool(self.queued or self.settling)
+
+    def get_status(self):
+        """Return the status of the sequencer.
+
+        :returns: dictionary of sequence state, number of queued and settling channels, groups
+        started and duration in seconds of the current or most recent sequence
+        """
+        return {
+            'active': self.is_active(),
+            'queued': len(self.queued),
+            'settling': len(self.settling),
+            'groups': self.group_count,
+            'duration': self.duration,
+            'budget': self.budget,
+        }
+
+    def step(self):
+        """Run a step of the sequence.
+
+        This method is run by the deferred executor. It retires settled channels, enables the
+        next group of queued channels that fits the remaining budget and schedules the next
+        step if the sequence is not complete. A group of at least one channel is always enabled
+        if no channels are settling, so that the sequence progresses even if the budget is less
+        than the inrush of a single channel. A step run after the sequence has been cancelled
+        does nothing.
+        """
+        self.__step_command = None
+        if not self.is_active():
+            return
+
+        now = self.pscu.deferred_executor.clock()
+
+        self.__retire_settled(now)
+
+        load = sum(
+            self.inrush if channel.current is None else channel.current
+            for channel in self.settling.values()
+        )
+        group_size = int((self.budget - load) / self.inrush + 1e-9)
+        if not self.settling:
+            group_size = max(group_size, 1)
+
+        group = self.queued[:max(group_size, 0)]
+        if group:
+            del self.queued[:len(group)]
+            self.__enable_group(group, now)
+
+        self.duration = time.time() - self.started_at
+        if self.is_active():
+            self.__schedule_step(now)
+
+    def __retire_settled(self, now):
+        """Retire settling channels whose current has settled or whose enable interval elapsed.
+
+        :param now: current executor clock time
+        """
+        for ((quad_idx, channel_idx), channel) in list(self.settling.items()):
+            settled = now - channel.enabled_at >= self.pscu.quad_enable_interval
+
+            state = self.pscu.quad[quad_idx].get_state()
+            if state.generation > channel.generation:
+                current = state.channel_current[channel_idx]
+                if channel.current is not None:
+                    settled |= abs(current - channel.current) <= self.settle_tolerance
+                channel.current = current
+                channel.generation = state.generation
+
+            if settled:
+                del self.settling[(quad_idx, channel_idx)]
+
+    def __enable_group(self, group, now):
+        """Enable a group of channels, with a single enable command per quad.
+
+        :param group: list of (quad index, channel index) pairs to enable
+        :param now: current executor clock time
+        """
+        self.group_count += 1
+        logging.debug("Enabling quad channel group {}: {}".format(self.group_count, group))
+
+        # A poll of a quad in progress when the channels are enabled may have read the currents
+        # beforehand, so only polls from the generation after next are used
+        for (quad_idx, channel_idx) in group:
+            generation = self.pscu.quad[quad_idx].get_state().generation + 1
+            self.settling[(quad_idx, channel_idx)] = SettlingChannel(now, generation)
+
+        self.pscu.set_quad_enables(group, True)
+
+    def __schedule_step(self, now):
+        """Schedule the next step of the sequence.
+
+        The step is scheduled immediately if channels are queued and none are settling,
+        otherwise after the check interval, or when the enable interval of the earliest settling
+        channel elapses, if sooner.
+
+        :param now: current executor clock time
+        """
+        deadline = now
+        if self.settling:
+            deadline = min(
+                now + self.check_interval,
+                min(channel.enabled_at for channel in self.settling.values()) +
+                self.pscu.quad_enable_interval
+            )
+
+        self.__step_command = self.pscu.deferred_executor.schedule_at(deadline, self.step)
@@ -0,0 +1,443 @@
+"""history.py - in-process history of PSCU sensor values.
+
+This module implements the HistoryBuffer, HistoryRollup and PSCUHistory classes, which record
+the values of the PSCU and Quad sensor channels in fixed-size ring buffers, allowing trends to
+be retrieved without an external time-series database. Recent values are held at full
+resolution, and the minimum, maximum and mean of each channel are aggregated incrementally
+into tiers of rollups over longer periods. Values are stored in preallocated arrays of doubles,
+so the memory used is fixed by the capacities and number of channels, regardless of how long
+the history has been running. Samples are ordered and aggregated by the monotonic clock, so
+that a step of the wall clock does not disorder the history, the wall clock time of each sample
+being kept as its timestamp label.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import operator
+import threading
+import time
+from array import array
+
+# Clock used to order and aggregate samples, using the monotonic clock if available
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class HistoryBuffer(object):
+    """HistoryBuffer - fixed-capacity ring buffer of timestamped channel values.
+
+    This class implements a ring buffer of samples, each comprising a timestamp and a value
+    for each of a set of named channels. If field names are specified, each channel value is
+    instead a tuple of values of those fields, e.g. the minimum, maximum and mean of the
+    channel over a period. Once the buffer is full, each new sample overwrites the oldest.
+    Samples must be recorded in order of increasing timestamp. Each sample may also have a
+    label, e.g. its wall clock time, which is returned in place of its timestamp.
+    """
+
+    def __init__(self, channels, capacity, fields=None):
+        """Initialise the HistoryBuffer instance.
+
+        :param channels: list of channel names
+        :param capacity: maximum number of samples to hold
+        :param fields: optional list of names of the fields of each channel value
+        """
+        if capacity < 1:
+            raise ValueError('Illegal history capacity {} specified'.format(capacity))
+
+        self.channels = list(channels)
+        self.capacity = capacity
+        self.fields = tuple(fields) if fields is not None else None
+
+        width = len(self.fields) if self.fields is not None else 1
+        self.timestamps = array('d', [0.0]) * capacity
+        self.labels = array('d', [0.0]) * capacity
+        self.values = [
+            [array('d', [0.0]) * capacity for _ in range(width)] for _ in self.channels
+        ]
+        self.count = 0
+
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of samples currently held in the buffer."""
+        return min(self.count, self.capacity)
+
+    def get_oldest(self):
+        """Return the timestamp of the oldest sample in the buffer, or None if it is empty."""
+        with self.__lock:
+            if not self.count:
+                return None
+            return self.timestamps[(self.count - len(self)) % self.capacity]
+
+    def record(self, timestamp, values, label=None):
+        """Record a sample in the buffer.
+
+        :param timestamp: time of the sample
+        :param values: sequence of sample values, in the order of the buffer channels, each
+        value being a sequence of field values if the buffer has fields
+        :param label: optional label of the sample, defaulting to its timestamp
+        """
+        if len(values) != len(self.channels):
+            raise ValueError('Sample has {} values for {} channels'.format(
+                len(values), len(self.channels)
+            ))
+
+        with self.__lock:
+            idx = self.count % self.capacity
+            self.timestamps[idx] = timestamp
+            self.labels[idx] = label if label is not None else timestamp
+            if self.fields is None:
+                for (channel_values, value) in zip(self.values, values):
+                    channel_values[0][idx] = value
+            else:
+                for (channel_values, value) in zip(self.values, values):
+                    for (field_values, field_value) in zip(channel_values, value):
+                        field_values[idx] = field_value
+            self.count += 1
+
+    def get(self, channels=None, start=None, end=None, decimation=1):
+        """Get samples from the buffer.
+
+        This method returns the samples with timestamps in the range start to end inclusive,
+        optionally decimated by returning only every Nth sample in the range. The samples are
+        located by bisection, so the cost is proportional to the number of samples returned.
+
+        :param channels: list of names of channels to return, defaulting to all channels
+        :param start: optional earliest timestamp to return
+        :param end: optional latest timestamp to return
+        :param decimation: interval between returned samples
+        :returns: dictionary of the list of sample labels and a dictionary of channel name:
+        value list, or if the buffer has fields, of channel name: dictionary of field name:
+        value list
+        """
+        if decimation < 1:
+            raise ValueError('Illegal decimation {} specified'.format(decimation))
+
+        if channels is None:
+            channels = self.channels
+        indices = [self.channels.index(channel) for channel in channels]
+
+        with self.__lock:
+            length = len(self)
+            first = self.count - length
+
+            lower = self.__search(first, length, start, False) if start is not None else 0
+            upper = self.__search(first, length, end, True) if end is not None else length
+
+            positions = [(first + i) % self.capacity for i in range(lower, upper, decimation)]
+
+            timestamps = [self.labels[pos] for pos in positions]
+            if self.fields is None:
+                values = {
+                    channel: [self.values[idx][0][pos] for pos in positions]
+                    for (channel, idx) in zip(channels, indices)
+                }
+            else:
+                values = {
+                    channel: {
+                        field: [field_values[pos] for pos in positions]
+                        for (field, field_values) in zip(self.fields, self.values[idx])
+                    }
+                    for (channel, idx) in zip(channels, indices)
+                }
+
+        return {'timestamp': timestamps, 'values': values}
+
+    def __search(self, first, length, timestamp, inclusive):
+        """Find the position of a timestamp in the buffer.
+
+        This internal method bisects the samples in the buffer, in order from oldest to newest,
+        to find the index of the first sample later than or equal to, or if inclusive, later
+        than, the specified timestamp. It must be called with the buffer lock held.
+
+        :param first: total count of the oldest sample in the buffer
+        :param length: number of samples in the buffer
+        :param timestamp: timestamp to search for
+        :param inclusive: include samples equal to the timestamp below the returned index
+        :returns: index of sample from the oldest in the buffer
+        """
+        (lower, upper) = (0, length)
+        while lower < upper:
+            mid = (lower + upper) // 2
+            sample_time = self.timestamps[(first + mid) % self.capacity]
+            if sample_time < timestamp or (inclusive and sample_time == timestamp):
+                lower = mid + 1
+            else:
+                upper = mid
+        return lower
+
+
+class HistoryRollup(object):
+    """HistoryRollup - incremental aggregation of channel values over fixed periods.
+
+    This class aggregates samples into periods of fixed length, aligned to multiples of the
+    period, maintaining the running minimum, maximum, sum and count of each channel in the
+    current period as samples are added. When a sample is added in a later period, the
+    minimum, maximum and mean of each channel over the completed period are recorded in a
+    HistoryBuffer. Completed periods are returned so that they can be added in turn to a
+    rollup with a longer period, allowing tiers of rollups to be maintained in cascade. Each
+    period is labelled with its start time offset by the difference between the label and the
+    timestamp of its first sample, e.g. the wall clock time of a period timed by the monotonic
+    clock.
+    """
+
+    FIELDS = ('min', 'max', 'mean')
+
+    def __init__(self, channels, period, capacity):
+        """Initialise the HistoryRollup instance.
+
+        :param channels: list of channel names
+        :param period: length of the aggregation period in seconds
+        :param capacity: maximum number of completed periods to hold
+        """
+        self.period = period
+        self.buffer = HistoryBuffer(channels, capacity, self.FIELDS)
+
+        self.bucket = None
+        self.label_offset = 0.0
+        self.mins = None
+        self.maxs = None
+        self.sums = None
+        self.count = 0
+
+    def add(self, timestamp, mins, maxs, sums, count, label=None):
+        """Add a sample, or an aggregate of samples, to the rollup.
+
+        A single sample is added by passing its values as the minimums, maximums and sums, with
+        a count of one.
+
+        :param timestamp: time of the sample, or start time of the aggregate
+        :param mins: list of channel minimum values
+        :param maxs: list of channel maximum values
+        :param sums: list of sums of channel values
+        :param count: number of samples aggregated
+        :param label: optional label of the sample, defaulting to its timestamp
+        :returns: tuple of start time, minimums, maximums, sums, count and label of the period
+        completed by adding the sample, or None if no period was completed
+        """
+        bucket = int(timestamp // self.period)
+
+        if bucket == self.bucket:
+            self.mins = list(map(min, self.mins, mins))
+            self.maxs = list(map(max, self.maxs, maxs))
+            self.sums = list(map(operator.add, self.sums, sums))
+            self.count += count
+            return None
+
+        completed = self.__complete() if self.bucket is not None else None
+
+        self.bucket = bucket
+        self.label_offset = label - timestamp if label is not None else 0.0
+        self.mins = list(mins)
+        self.maxs = list(maxs)
+        self.sums = list(sums)
+        self.count = count
+
+        return completed
+
+    def __complete(self):
+        """Record the aggregate of the current period in the buffer.
+
+        :returns: tuple of start time, minimums, maximums, sums, count and label of the period
+        """
+        timestamp = self.bucket * self.period
+        label = timestamp + self.label_offset
+        means = [float(total) / self.count for total in self.sums]
+        self.buffer.record(timestamp, list(zip(self.mins, self.maxs, means)), label)
+
+        return (timestamp, self.mins, self.maxs, self.sums, self.count, label)
+
+
+class PSCUHistory(object):
+    """PSCUHistory - history of the sensor values of a PSCU and its Quads.
+
+    This class records the temperature, humidity, leak, fan, pump and position sensor values
+    of a PSCU, and the output voltage, current and supply voltage of each channel of its Quads.
+    The update() method is intended to be called from the background poller thread after each
+    update. Each new poll generation is added to tiers of rollups holding the minimum, maximum
+    and mean of each channel over successively longer periods, while raw samples are recorded
+    at most once per recording interval. Short recent trends can therefore be read at full
+    resolution and long trends from the rollups, without holding every poll in memory. Samples
+    are timed by the monotonic clock and labelled with the wall clock time, which is used for
+    the time ranges of requests.
+    """
+
+    DEFAULT_INTERVAL = 0.1
+    DEFAULT_CAPACITY = 6000
+
+    RAW_RESOLUTION = 'raw'
+
+    # Name, period in seconds and capacity of each rollup tier, in order of increasing period
+    ROLLUPS = (
+        ('1s', 1.0, 1800),
+        ('1m', 60.0, 1440),
+        ('1h', 3600.0, 720),
+    )
+
+    def __init__(self, pscu, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY):
+        """Initialise the PSCUHistory instance.
+
+        :param pscu: PSCU instance to record the sensor values of
+        :param interval: minimum interval between recorded raw samples in seconds
+        :param capacity: maximum number of raw samples to hold
+        """
+        self.pscu = pscu
+        self.interval = interval
+
+        channels = []
+        channels.extend('temperature/{}'.format(i) for i in range(pscu.num_temperatures))
+        channels.extend('humidity/{}'.format(i) for i in range(pscu.num_humidities))
+        channels.extend('leak/{}'.format(i) for i in range(pscu.num_leak_sensors))
+        channels.extend(['fan/currentspeed', 'pump/flow', 'position'])
+        for (quad_idx, quad) in enumerate(pscu.quad):
+            for channel in range(quad.num_channels):
+                channels.append('quad/{}/channel/{}/voltage'.format(quad_idx, channel))
+                channels.append('quad/{}/channel/{}/current'.format(quad_idx, channel))
+            channels.append('quad/{}/supply'.format(quad_idx))
+
+        self.buffer = HistoryBuffer(channels, capacity)
+        self.rollups = [
+            (name, HistoryRollup(channels, period, rollup_capacity))
+            for (name, period, rollup_capacity) in self.ROLLUPS
+        ]
+
+        self.generation = None
+        self.last_record_time = None
+
+    def update(self):
+        """Add the current sensor values to the history if a new poll generation is available.
+
+        The values are added to the rollup tiers, cascading each completed period to the tier
+        above, and recorded as a raw sample if the recording interval has elapsed.
+
+        :returns: True if a raw sample was recorded
+        """
+        state = self.pscu.get_state()
+        if state.generation == self.generation:
+            return False
+        self.generation = state.generation
+
+        values = []
+        values.extend(state.temperature_values)
+        values.extend(state.humidity_values)
+        values.extend(state.leak_values)
+        values.extend([state.fan_speed, state.pump_flow, state.position])
+        for quad in self.pscu.quad:
+            quad_state = quad.get_state()
+            for channel in range(quad.num_channels):
+                values.append(quad_state.channel_voltage[channel])
+                values.append(quad_state.channel_current[channel])
+            values.append(quad_state.supply_voltage)
+
+        now = _clock()
+        wall_time = time.time()
+
+        aggregate = (now, values, values, values, 1, wall_time)
+        for (_, rollup) in self.rollups:
+            aggregate = rollup.add(*aggregate)
+            if aggregate is None:
+                break
+
+        if self.last_record_time is not None and now - self.last_record_time < self.interval:
+            return False
+
+        self.buffer.record(now, values, wall_time)
+        self.last_record_time = now
+        return True
+
+    def get(self, path='', start=None, end=None, decimation=1, resolution=None):
+        """Get the recorded history of the sensor channels at or below a path.
+
+        This method returns the history of the specified channels at the specified resolution,
+        either raw or the name of a rollup tier. If no resolution is specified, the finest
+        resolution holding samples as old as the start time is used, so that long-range
+        queries are served from the rollups. The start and end times are wall clock times,
+        converted to the monotonic clock ordering the samples at the current offset between the
+        clocks.
+
+        :param path: path of the channels to return, e.g. quad/0, or empty for all channels
+        :param start: optional earliest wall clock timestamp to return
+        :param end: optional latest wall clock timestamp to return
+        :param decimation: interval between returned samples
+        :param resolution: optional resolution of the history to return
+        :returns: dictionary of resolution, timestamp list and a dictionary of channel name:
+        value list, or for rollups, channel name: dictionary of min, max and mean value lists
+        """
+        path = path.strip('/')
+        channels = [
+            channel for channel in self.buffer.channels
+            if not path or channel == path or channel.startswith(path + '/')
+        ]
+        if not channels:
+            raise ValueError('Invalid history path: {}'.format(path))
+
+        clock_offset = time.time() - _clock()
+        if start is not None:
+            start -= clock_offset
+        if end is not None:
+            end -= clock_offset
+
+        (resolution, buffer) = self.__select_buffer(resolution, start)
+
+        history = buffer.get(channels, start, end, decimation)
+        history['resolution'] = resolution
+        return history
+
+    def __select_buffer(self, resolution, start):
+        """Select the buffer to serve a history request from.
+
+        :param resolution: resolution requested, or None to select by start time
+        :param start: earliest monotonic clock timestamp requested, or None
+        :returns: tuple of resolution name and buffer
+        """
+        buffers = [(self.RAW_RESOLUTION, self.buffer)]
+        buffers.extend((name, rollup.buffer) for (name, rollup) in self.rollups)
+
+        if resolution is not None:
+            for (name, buffer) in buffers:
+                if name == resolution:
+                    return (name, buffer)
+            raise ValueError('Invalid history resolution: {}'.format(resolution))
+
+        if start is None:
+            return buffers[0]
+
+        for (name, buffer) in buffers:
+            oldest = buffer.get_oldest()
+            if oldest is not None and oldest <= start:
+                return (name, buffer)
+
+        # No buffer reaches back to the start time, so use the one reaching back furthest
+        for (name, buffer) in reversed(buffers):
+            if len(buffer):
+                return (name, buffer)
+
+        return buffers[0]
+
+    def get_interval(self):
+        """Return the minimum interval between recorded raw samples in seconds."""
+        return self.interval
+
+    def get_capacity(self):
+        """Return the maximum number of raw samples held in the history."""
+        return self.buffer.capacity
+
+    def get_samples(self):
+        """Return the number of raw samples currently held in the history."""
+        return len(self.buffer)
+
+    def get_channels(self):
+        """Return the list of paths of the channels recorded in the history."""
+        return list(self.buffer.channels)
+
+    def get_rollups(self):
+        """Return the period, capacity and number of completed periods held of each rollup.
+
+        :returns: dictionary of rollup name: dictionary of period, capacity and samples
+        """
+        return {
+            name: {
+                'period': rollup.period,
+                'capacity': rollup.buffer.capacity,
+                'samples': len(rollup.buffer),
+            }
+            for (name, rollup) in self.rollups
+        }
@@ -0,0 +1,285 @@
+"""I2CBusManager - shared I2C bus handle and priority arbiter.
+
+This module implements the I2CBusManager class, which owns the single bus handle shared by all
+I2CDevice instances on an I2C bus and arbitrates access to the bus between threads. The manager
+acts as a reentrant lock, held by I2CDevice across each access and its pre-access call, which
+is granted to waiting threads in order of priority class rather than arrival, so that e.g. a
+safety write such as disabling the quad outputs is never queued behind a poll cycle. Accesses
+may also be submitted for asynchronous execution by a worker thread of the manager, returning
+a concurrent.futures.Future, which may be yielded by a tornado coroutine or wrapped with
+asyncio.wrap_future() to be awaited on an event loop.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+try:
+    from concurrent.futures import Future
+except ImportError:  # pragma: no cover
+    Future = None
+
+# Clock used to measure bus wait times, using the monotonic clock if available
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class I2CBusManager(object):
+    """I2CBusManager class.
+
+    This class owns the shared handle of an I2C bus and serialises accesses to it. Threads
+    waiting for the bus are granted it in order of priority class and then of arrival. The
+    priority of an access is that passed to acquire(), or otherwise the priority set for the
+    calling thread, allowing e.g. the poller thread to mark all its accesses as polling.
+    """
+
+    # Priority classes of bus accesses, lower values being granted the bus first
+    PRIORITY_SAFETY = 0
+    PRIORITY_CONTROL = 1
+    PRIORITY_POLL = 2
+
+    PRIORITY_NAMES = ('safety', 'control', 'poll')
+
+    # Per-thread state holding the default priority of bus accesses by each thread
+    _thread_state = threading.local()
+
+    def __init__(self, busnum):
+        """Initialise the I2CBusManager instance.
+
+        :param busnum: number of the I2C bus managed
+        """
+        self.busnum = busnum
+        self.bus = None
+        self.__bus_key = None
+
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self.__owner = None
+        self.__count = 0
+        self.__waiters = []
+        self.__sequence = itertools.count()
+
+        self.__queue = []
+        self._stopping = False
+        self._thread = None
+
+        num_priorities = len(self.PRIORITY_NAMES)
+        self.grants = [0] * num_priorities
+        self.contended = [0] * num_priorities
+        self.max_wait = [0.0] * num_priorities
+
+    @classmethod
+    def get_thread_priority(cls):
+        """Return the default priority of bus accesses by the calling thread.
+
+        :returns: priority class, PRIORITY_CONTROL unless set for the thread
+        """
+        return getattr(cls._thread_state, 'priority', cls.PRIORITY_CONTROL)
+
+    @classmethod
+    def set_thread_priority(cls, priority):
+        """Set the default priority of bus accesses by the calling thread.
+
+        :param priority: priority class
+        :returns: the previous priority of the thread, allowing it to be restored
+        """
+        previous = cls.get_thread_priority()
+        cls._thread_state.priority = priority
+        return previous
+
+    def get_bus(self, key, create):
+        """Get the shared bus handle, creating it if necessary.
+
+        The handle is created again if the key identifying the bus backend has changed since
+        it was created, e.g. if a different bus factory has been set, so that devices created
+        subsequently use the new backend.
+
+        :param key: object identifying the bus backend
+        :param create: callable returning a new bus handle
+        :returns: shared bus handle
+        """
+        with self._lock:
+            if self.bus is None or self.__bus_key is not key:
+                logging.debug("Creating shared handle for I2C bus {}".format(self.busnum))
+                self.bus = create()
+                self.__bus_key = key
+            return self.bus
+
+    def acquire(self, priority=None):
+        """Acquire the bus, blocking until it is granted.
+
+        The bus is granted immediately if it is free and no other thread is waiting, or if it
+        is already held by the calling thread, otherwise when it is released and no waiting
+        thread has a higher priority or has waited longer at the same priority.
+
+        :param priority: priority class of the access, defaulting to that of the thread
+        :returns: True, for compatibility with the threading lock interface
+        """
+        if priority is None:
+            priority = self.get_thread_priority()
+        thread = threading.current_thread()
+
+        with self._lock:
+            if self.__owner is thread:
+                self.__count += 1
+                return True
+
+            if self.__owner is not None or self.__waiters:
+                waiter = (priority, next(self.__sequence), thread)
+                heapq.heappush(self.__waiters, waiter)
+                start_time = _clock()
+                while self.__owner is not None or self.__waiters[0] is not waiter:
+                    self._condition.wait()
+                heapq.heappop(self.__waiters)
+                self.contended[priority] += 1
+                self.max_wait[priority] = max(self.max_wait[priority], _clock() - start_time)
+
+            self.__owner = thread
+            self.__count = 1
+            self.grants[priority] += 1
+            return True
+
+    def release(self):
+        """Release the bus, granting it to the highest priority waiting thread, if any."""
+        with self._lock:
+            if self.__owner is not threading.current_thread():
+                raise RuntimeError("Cannot release I2C bus {} not held by thread".format(
+                    self.busnum
+                ))
+            self.__count -= 1
+            if self.__count == 0:
+                self.__owner = None
+                self._condition.notify_all()
+
+    def __enter__(self):
+        """Acquire the bus at the priority of the calling thread on entering a context."""
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Release the bus on leaving a context."""
+        self.release()
+        return False
+
+    @contextmanager
+    def hold(self, priority):
+        """Hold the bus at a priority for the duration of a context.
+
+        This allows a sequence of accesses, e.g. a safety write across several devices, to be
+        made without being interleaved with accesses from other threads. The accesses within
+        the context are made at the specified priority.
+
+        :param priority: priority class of the accesses
+        """
+        previous = self.set_thread_priority(priority)
+        self.acquire(priority)
+        try:
+            yield self
+        finally:
+            self.release()
+            self.set_thread_priority(previous)
+
+    def submit(self, priority, access, *args, **kwargs):
+        """Submit an access for asynchronous execution.
+
+        The access is executed by the worker thread of the manager, holding the bus at the
+        specified priority. Submitted accesses are executed in priority order. The worker
+        thread is started when the first access is submitted.
+
+        :param priority: priority class of the access
+        :param access: callable making the access, e.g. a bound I2CDevice access method
+        :param args: positional argument list to pass to the access
+        :param kwargs: keyword argument list to pass to the access
+        :returns: Future resolving to the result of the access
+        """
+        if Future is None:
+            raise RuntimeError(
+                "Unable to submit I2C bus access: concurrent.futures module not available"
+            )
+
+        future = Future()
+        with self._lock:
+            heapq.heappush(
+                self.__queue,
+                (priority, next(self.__sequence), future, partial(access, *args, **kwargs))
+            )
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(
+                    target=self._run, name='I2CBusManager-{}'.format(self.busnum)
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+        return future
+
+    def stop(self, timeout=None):
+        """Stop the worker thread, cancelling any submitted accesses not yet executed.
+
+        :param timeout: maximum time in seconds to wait for the thread to terminate
+        """
+        with self._lock:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout)
+
+    def is_running(self):
+        """Return True if the worker thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_status(self):
+        """Return the status of the bus manager.
+
+        :returns: dictionary of the number of queued asynchronous accesses and, for each
+        priority class, the number of bus grants, the number of grants made after waiting and
+        the maximum wait in seconds
+        """
+        with self._lock:
+            return {
+                'queued': len(self.__queue),
+                'priorities': {
+                    name: {
+                        'grants': self.grants[priority],
+                        'contended': self.contended[priority],
+                        'max_wait': self.max_wait[priority],
+                    }
+                    for (priority, name) in enumerate(self.PRIORITY_NAMES)
+                },
+            }
+
+    def _run(self):
+        """Run the worker loop of the manager.
+
+        This internal method is the target of the worker thread. It executes submitted
+        accesses in priority order, setting the result or exception of each future, until the
+        thread is stopped, when any accesses remaining are cancelled.
+        """
+        while True:
+            with self._lock:
+                while not self.__queue and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    for (_, _, future, _) in self.__queue:
+                        future.cancel()
+                    del self.__queue[:]
+                    return
+                (priority, _, future, access) = heapq.heappop(self.__queue)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                with self.hold(priority):
+                    result = access()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
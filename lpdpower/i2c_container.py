@@ -60,6 +60,22 @@ class I2CContainer(object):
         device.pre_access = self._device_callback
         return device
 
+    def get_devices(self):
+        """Get all I2C devices in the container.
+
+        This method returns a list of all I2CDevice instances attached to the container,
+        including those attached to any nested containers.
+
+        :return: list of I2CDevice instances
+        """
+        devices = []
+        for device in self._attached_devices:
+            if isinstance(device, I2CContainer):
+                devices.extend(device.get_devices())
+            else:
+                devices.append(device)
+        return devices
+
     def remove_device(self, device):
         """Remove an I2C device from the container.
 
@@ -5,13 +5,46 @@ available at:
 https://github.com/adafruit/adafruit-beaglebone-io-python/blob/master/Adafruit_I2C.py
 
 but refactored to allow pre-access callbacks to be called for each access and to suppress
-error print calls and replace with proper exception raising.
+error print calls and replace with proper exception raising. All devices on a bus share a
+single bus handle, owned by a per-bus I2CBusManager, which serialises accesses to the bus in
+order of priority class, allowing devices to be safely accessed from multiple threads. The bus
+backend is pluggable via a bus factory, allowing e.g. a simulated bus to be used in
+place of the smbus module on hosts without I2C hardware. Combined write-then-read
+transactions are made in a single kernel round trip with the I2C_RDWR ioctl where the bus
+supports it, i.e. with the smbus2 backend, falling back to the equivalent smbus calls
+otherwise. Transaction counts, bytes, errors and latencies are recorded for each device.
 
 James Hogge, Tim Nicholls, STFC Application Engineering Group.
 """
 
-import smbus
 import logging
+import threading
+import time
+from functools import partial
+
+try:
+    import smbus
+except ImportError:  # pragma: no cover
+    smbus = None
+
+try:
+    import smbus2
+    from smbus2 import i2c_msg
+except ImportError:  # pragma: no cover
+    smbus2 = None
+    i2c_msg = None
+
+from lpdpower.i2c_bus_manager import I2CBusManager
+from lpdpower.i2c_stats import I2CStats
+
+# Timer used to measure transaction latencies, using the high-resolution counter if available
+_timer = getattr(time, 'perf_counter', time.time)
+
+# Number of bytes transferred after the address byte by fixed-length access methods
+_TRANSFER_BYTES = {
+    'write8': 2, 'readU8': 2, 'readS8': 2,
+    'write16': 3, 'readU16': 3, 'readS16': 3,
+}
 
 
 class I2CException(Exception):
@@ -20,15 +53,46 @@ class I2CException(Exception):
     pass
 
 
+def transfer_bytes(access_name, args, kwargs):
+    """Return the number of bytes transferred by an I2CDevice access.
+
+    :param access_name: name of the access method
+    :param args: positional arguments of the access method
+    :param kwargs: keyword arguments of the access method
+    :return: number of register and data bytes transferred after the address byte
+    """
+    if access_name in _TRANSFER_BYTES:
+        return _TRANSFER_BYTES[access_name]
+    if access_name == 'writeList':
+        return 1 + len(args[1] if len(args) > 1 else kwargs.get('list', []))
+    if access_name == 'readList':
+        return 1 + (args[1] if len(args) > 1 else kwargs.get('length', 0))
+    if access_name == 'write_read':
+        return (len(args[0] if args else kwargs.get('data', [])) +
+                (args[1] if len(args) > 1 else kwargs.get('length', 0)))
+    return 0
+
+
 def call_pre_access(func):
     """Call pre-access decorator for I2CDevice access methods.
 
-    Allows pre-access attribute to be called if defined on I2C device accessors.
+    Allows pre-access attribute to be called if defined on I2C device accessors. The bus
+    is held across both the pre-access call and the access itself, so that e.g. a multiplexer
+    channel selection and the subsequent device access cannot be interleaved with accesses
+    from another thread. The access, excluding the pre-access call, is timed and recorded in
+    the statistics of the device.
     """
     def wrapper(_self, *args, **kwargs):
-        if _self.pre_access is not None and callable(_self.pre_access):
-            _self.pre_access(_self)
-        return func(_self, *args, **kwargs)
+        with _self.bus_manager:
+            if _self.pre_access is not None and callable(_self.pre_access):
+                _self.pre_access(_self)
+            start_time = _timer()
+            try:
+                return func(_self, *args, **kwargs)
+            finally:
+                _self.stats.record(
+                    transfer_bytes(func.__name__, args, kwargs), _timer() - start_time
+                )
     return wrapper
 
 
@@ -44,6 +108,11 @@ class I2CDevice(object):
     _enable_exceptions = False
     _default_i2c_bus = 1
 
+    _bus_factory = None
+
+    _bus_managers = {}
+    _bus_managers_lock = threading.Lock()
+
     ERROR = -1
 
     @classmethod
@@ -63,6 +132,95 @@ class I2CDevice(object):
         logging.debug("Setting default I2C bus to %d", busnum)
         cls._default_i2c_bus = busnum
 
+    @classmethod
+    def set_bus_factory(cls, factory):
+        """Set the factory used to create I2C bus instances.
+
+        This method sets a callable factory, which is passed the bus number and must return
+        an object providing the smbus.SMBus access interface, used by all subsequently created
+        devices. Setting the factory to None restores the default smbus backend.
+
+        :param factory: bus factory callable, or None for the default smbus backend
+        """
+        logging.debug("Setting I2C bus factory to %s", factory)
+        cls._bus_factory = staticmethod(factory) if factory is not None else None
+
+    @classmethod
+    def create_bus(cls, busnum):
+        """Create an I2C bus instance.
+
+        This method creates an I2C bus instance for the specified bus number, using the
+        bus factory if one has been set, or the smbus module otherwise.
+
+        :param busnum: number of the I2C bus
+        :return: I2C bus instance
+        """
+        if cls._bus_factory is not None:
+            return cls._bus_factory(busnum)
+
+        if smbus is None:
+            raise I2CException('Unable to create I2C bus {}: smbus module not available'.format(
+                busnum))
+
+        return smbus.SMBus(busnum)
+
+    @staticmethod
+    def create_smbus2_bus(busnum):
+        """Create an I2C bus instance with the smbus2 module.
+
+        This method can be set as the bus factory to use the smbus2 backend, which supports
+        combined write-then-read transactions with the I2C_RDWR ioctl.
+
+        :param busnum: number of the I2C bus
+        :return: smbus2 I2C bus instance
+        """
+        if smbus2 is None:
+            raise I2CException('Unable to create I2C bus {}: smbus2 module not available'.format(
+                busnum))
+
+        return smbus2.SMBus(busnum)
+
+    @classmethod
+    def get_bus_manager(cls, busnum):
+        """Get the manager of an I2C bus.
+
+        This method returns the bus manager shared by all devices on the specified bus,
+        creating it if necessary.
+
+        :param busnum: number of the I2C bus
+        :return: I2CBusManager instance for the bus
+        """
+        with cls._bus_managers_lock:
+            if busnum not in cls._bus_managers:
+                cls._bus_managers[busnum] = I2CBusManager(busnum)
+            return cls._bus_managers[busnum]
+
+    @classmethod
+    def get_bus_lock(cls, busnum):
+        """Get the lock used to serialise accesses to an I2C bus.
+
+        This method returns the bus manager of the specified bus, which acts as a reentrant
+        lock granted in priority order.
+
+        :param busnum: number of the I2C bus
+        :return: lock for the bus
+        """
+        return cls.get_bus_manager(busnum)
+
+    @classmethod
+    def get_bus(cls, busnum):
+        """Get the I2C bus instance shared by all devices on a bus.
+
+        This method returns the bus handle owned by the manager of the specified bus, creating
+        it if necessary, or if the bus backend has changed since it was created.
+
+        :param busnum: number of the I2C bus
+        :return: shared I2C bus instance
+        """
+        backend = cls._bus_factory if cls._bus_factory is not None else getattr(
+            smbus, 'SMBus', None)
+        return cls.get_bus_manager(busnum).get_bus(backend, partial(cls.create_bus, busnum))
+
     def __init__(self, address, busnum=None, debug=False):
         """Initialise the I2CDevice object.
 
@@ -72,9 +230,25 @@ class I2CDevice(object):
         """
         self.address = address
         self.busnum = busnum if busnum else self._default_i2c_bus
-        self.bus = smbus.SMBus(self.busnum)
+        self.bus_manager = self.get_bus_manager(self.busnum)
+        self.bus = self.get_bus(self.busnum)
         self.debug = debug
         self.pre_access = None
+        self.stats = I2CStats()
+
+    def submit(self, priority, access_name, *args, **kwargs):
+        """Submit an access to the device for asynchronous execution.
+
+        The access is executed by the worker thread of the bus manager, in order of priority
+        class, as described in I2CBusManager.submit().
+
+        :param priority: priority class of the access, e.g. I2CBusManager.PRIORITY_POLL
+        :param access_name: name of the access method, e.g. 'readU8'
+        :param args: positional argument list to pass to the access method
+        :param kwargs: keyword argument list to pass to the access method
+        :return: Future resolving to the result of the access
+        """
+        return self.bus_manager.submit(priority, getattr(self, access_name), *args, **kwargs)
 
     def handle_error(self, access_name, register, error):
         """Handle exception condition for I2CDevice.
@@ -86,6 +260,8 @@ class I2CDevice(object):
              access_name, self.address, register, error
         )
 
+        self.stats.record_error()
+
         if self._enable_exceptions:
             raise I2CException(err_msg)
 
@@ -139,6 +315,44 @@ class I2CDevice(object):
         except IOError as err:
             return self.handle_error('readList', reg, err)
 
+    def supports_rdwr(self):
+        """Return True if the bus supports combined transactions with the I2C_RDWR ioctl.
+
+        This requires the smbus2 module, providing the I2C_RDWR message class, and a bus
+        providing the i2c_rdwr method, e.g. an smbus2.SMBus instance.
+        """
+        return i2c_msg is not None and callable(getattr(type(self.bus), 'i2c_rdwr', None))
+
+    @call_pre_access
+    def write_read(self, data, length):
+        """Write bytes to and then read bytes from the I2C device in a combined transaction.
+
+        If the bus supports the I2C_RDWR ioctl, the write and read messages are sent in a
+        single kernel round trip, joined by a repeated start. Otherwise, a single byte write is
+        made as an I2C block read, which also writes the byte before a repeated start, and a
+        longer write as a block write followed by a byte read for each byte to read.
+        """
+        data = list(data)
+        try:
+            if self.supports_rdwr():
+                write = i2c_msg.write(self.address, data)
+                read = i2c_msg.read(self.address, length)
+                self.bus.i2c_rdwr(write, read)
+                results = list(read)
+            elif len(data) == 1:
+                results = self.bus.read_i2c_block_data(self.address, data[0], length)
+            else:
+                if data:
+                    self.bus.write_i2c_block_data(self.address, data[0], data[1:])
+                results = [self.bus.read_byte(self.address) for _ in range(length)]
+            if self.debug:
+                logging.debug("I2C: Device 0x%02X returned the following after writing %s:" %
+                              (self.address, data))
+                logging.debug(results)
+            return results
+        except IOError as err:
+            return self.handle_error('write_read', data[0] if data else 0, err)
+
     @call_pre_access
     def readU8(self, reg):
         """Read an unsigned byte from the I2C device."""
@@ -0,0 +1,565 @@
+"""i2c_simulator - register-level simulator of the PSCU I2C bus and devices.
+
+This module implements a simulated I2C bus, providing the same access interface as the
+smbus.SMBus class, together with register-level models of the TCA9548 bus multiplexer,
+AD7998 ADC, MCP23008 GPIO extender and AD5321 DAC devices used in the PSCU and Quads. The
+simulated bus supports configurable per-transaction latency and fault injection, allowing
+the full PSCU and Quad device stack to be exercised on a host without I2C hardware, e.g. to
+measure poll cycle throughput and API latency. The bus is selected as the I2CDevice backend
+with the I2CDevice.set_bus_factory() method.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import errno
+import random
+import threading
+import time
+
+# Error number raised by smbus when a device does not acknowledge an access
+ENODEV_ACK = getattr(errno, 'EREMOTEIO', errno.EIO)
+
+
+class SimulatedDevice(object):
+    """Base class for simulated I2C devices.
+
+    Simulated devices model accesses at the level of the bytes transferred on the bus. A write
+    transaction passes the first (register or command) byte and any subsequent data bytes, a
+    read transaction passes the register byte written before the repeated start and the number
+    of bytes to read. The default implementation is a simple auto-incrementing byte register
+    file.
+    """
+
+    NUM_REGISTERS = 256
+
+    def __init__(self, address):
+        """Initialise the simulated device.
+
+        :param address: address of the device on the I2C bus
+        """
+        self.address = address
+        self.registers = [0] * self.NUM_REGISTERS
+
+    def write_bytes(self, reg, data):
+        """Handle a write transaction to the device.
+
+        :param reg: register (first) byte of the transaction
+        :param data: list of data bytes following the register byte
+        """
+        for idx, value in enumerate(data):
+            self.registers[(reg + idx) % self.NUM_REGISTERS] = value & 0xff
+
+    def read_bytes(self, reg, length):
+        """Handle a read transaction from the device.
+
+        :param reg: register byte written before the read
+        :param length: number of bytes to read
+        :return: list of bytes read
+        """
+        return [self.registers[(reg + idx) % self.NUM_REGISTERS] for idx in range(length)]
+
+
+class SimTCA9548(SimulatedDevice):
+    """Simulated TCA9548 I2C bus multiplexer.
+
+    The TCA9548 has a single control register, each bit of which enables the corresponding
+    downstream channel. Every byte written to the device updates the control register.
+    """
+
+    def __init__(self, address=0x70):
+        """Initialise the simulated TCA9548 with all channels disabled.
+
+        :param address: address of the device on the I2C bus
+        """
+        super(SimTCA9548, self).__init__(address)
+        self.control = 0
+
+    def write_bytes(self, reg, data):
+        """Handle a write transaction, updating the control register with the last byte."""
+        self.control = ([reg] + list(data))[-1] & 0xff
+
+    def read_bytes(self, reg, length):
+        """Handle a read transaction, returning the control register."""
+        return [self.control] * length
+
+    def enabled_channels(self):
+        """Return a list of the currently enabled downstream channels."""
+        return [channel for channel in range(8) if self.control & (1 << channel)]
+
+
+class SimAD7998(SimulatedDevice):
+    """Simulated AD7998 12-bit ADC.
+
+    This class models the address pointer register of the AD7998, where the lower nibble
+    selects a register and the upper nibble a conversion command: 0x7 converts the channels
+    selected in the configuration register in sequence, 0x8-0xF convert a single channel.
+    Conversion results are returned MSB first with the channel identifier in bits 12-14.
+    """
+
+    NUM_CHANNELS = 8
+
+    CONVERSION_REG = 0x00
+    CONFIG_REG = 0x02
+    CYCLE_REG = 0x03
+
+    CMD_SEQUENCE = 0x7
+    CMD_SINGLE = 0x8
+
+    def __init__(self, address=0x20, inputs=None):
+        """Initialise the simulated AD7998.
+
+        :param address: address of the device on the I2C bus
+        :param inputs: optional list of raw 12-bit input values for each channel
+        """
+        super(SimAD7998, self).__init__(address)
+        self.inputs = list(inputs) if inputs is not None else [0] * self.NUM_CHANNELS
+        self.config = 0x0008
+        self.cycle = 0
+        self.conversion = 0
+
+    def set_input(self, channel, value):
+        """Set the raw 12-bit value presented on an input channel."""
+        self.inputs[channel] = int(value) & 0xfff
+
+    def set_input_scaled(self, channel, value):
+        """Set the value presented on an input channel as a fraction of full scale."""
+        self.set_input(channel, int(round(min(max(value, 0.0), 1.0) * 4095)))
+
+    def channel_mask(self):
+        """Return the channel selection mask programmed into the configuration register."""
+        return (self.config >> 4) & 0xff
+
+    def _convert(self, channel):
+        """Convert a channel, latching and returning the result with the channel identifier."""
+        self.conversion = (channel << 12) | (self.inputs[channel] & 0xfff)
+        return self.conversion
+
+    def _convert_command(self, command):
+        """Carry out the conversions for a command, returning a list of results."""
+        if command == self.CMD_SEQUENCE:
+            return [
+                self._convert(channel) for channel in range(self.NUM_CHANNELS)
+                if self.channel_mask() & (1 << channel)
+            ]
+        if command >= self.CMD_SINGLE:
+            return [self._convert(command - self.CMD_SINGLE)]
+        return []
+
+    def write_bytes(self, reg, data):
+        """Handle a write transaction, triggering conversions and updating registers."""
+        self._convert_command(reg >> 4)
+
+        reg &= 0x0f
+        if reg == self.CONFIG_REG and len(data) >= 2:
+            self.config = ((data[0] << 8) | data[1]) & 0x0fff
+        elif reg == self.CYCLE_REG and len(data) >= 1:
+            self.cycle = data[0]
+
+    def read_bytes(self, reg, length):
+        """Handle a read transaction, returning conversion results or register contents."""
+        results = self._convert_command(reg >> 4)
+
+        reg &= 0x0f
+        if not results:
+            if reg == self.CONVERSION_REG:
+                results = [self.conversion]
+            elif reg == self.CONFIG_REG:
+                results = [self.config]
+            elif reg == self.CYCLE_REG:
+                return [self.cycle] * length
+            else:
+                results = [0]
+
+        data = []
+        while len(data) < length:
+            for value in results:
+                data.extend([(value >> 8) & 0xff, value & 0xff])
+        return data[:length]
+
+
+class SimMCP23008(SimulatedDevice):
+    """Simulated MCP23008 GPIO extender.
+
+    This class models the register file of the MCP23008, including sequential register
+    access, input polarity, output latch and interrupt-on-change capture. The state of the
+    input pins is set with set_inputs(). An optional output_callback is called with the
+    device, previous and new output latch values whenever the latch is written.
+    """
+
+    NUM_REGISTERS = 11
+
+    IODIR = 0x00
+    IPOL = 0x01
+    GPINTEN = 0x02
+    DEFVAL = 0x03
+    INTCON = 0x04
+    IOCON = 0x05
+    GPPU = 0x06
+    INTF = 0x07
+    INTCAP = 0x08
+    GPIO = 0x09
+    OLAT = 0x0a
+
+    def __init__(self, address=0x20, inputs=0x00, output_callback=None):
+        """Initialise the simulated MCP23008 in its reset state.
+
+        :param address: address of the device on the I2C bus
+        :param inputs: initial state of the input pins as a bit mask
+        :param output_callback: optional callable called when the output latch is written
+        """
+        super(SimMCP23008, self).__init__(address)
+        self.registers[self.IODIR] = 0xff
+        self.pins = inputs & 0xff
+        self.output_callback = output_callback
+
+    def _gpio_value(self):
+        """Return the value of the GPIO register, combining inputs and output latch."""
+        iodir = self.registers[self.IODIR]
+        inputs = (self.pins ^ self.registers[self.IPOL]) & iodir
+        return (inputs | (self.registers[self.OLAT] & ~iodir)) & 0xff
+
+    def set_inputs(self, pins):
+        """Set the state of the input pins, capturing any enabled interrupt-on-change.
+
+        :param pins: state of the input pins as a bit mask
+        """
+        previous = self.pins
+        self.pins = pins & 0xff
+
+        compare = self.registers[self.DEFVAL]
+        changed = (self.pins ^ compare) & self.registers[self.INTCON]
+        changed |= (self.pins ^ previous) & ~self.registers[self.INTCON]
+        changed &= self.registers[self.GPINTEN] & self.registers[self.IODIR]
+
+        if changed and not self.registers[self.INTF]:
+            self.registers[self.INTF] = changed & 0xff
+            self.registers[self.INTCAP] = self._gpio_value()
+
+    def set_input(self, pin, value):
+        """Set the state of a single input pin."""
+        if value:
+            self.set_inputs(self.pins | (1 << pin))
+        else:
+            self.set_inputs(self.pins & ~(1 << pin))
+
+    def interrupt_pending(self):
+        """Return True if an interrupt is pending on the device."""
+        return bool(self.registers[self.INTF])
+
+    def write_bytes(self, reg, data):
+        """Handle a write transaction to sequential registers."""
+        for value in data:
+            reg = reg % self.NUM_REGISTERS
+            if reg == self.GPIO or reg == self.OLAT:
+                self._write_olat(value & 0xff)
+            elif reg not in (self.INTF, self.INTCAP):
+                self.registers[reg] = value & 0xff
+            reg += 1
+
+    def _write_olat(self, value):
+        """Write the output latch, calling the output callback if set."""
+        previous = self.registers[self.OLAT]
+        self.registers[self.OLAT] = value
+        if self.output_callback is not None:
+            self.output_callback(self, previous, value)
+
+    def read_bytes(self, reg, length):
+        """Handle a read transaction from sequential registers."""
+        data = []
+        for _ in range(length):
+            reg = reg % self.NUM_REGISTERS
+            if reg == self.GPIO:
+                data.append(self._gpio_value())
+                self.registers[self.INTF] = 0
+            elif reg == self.INTCAP:
+                data.append(self.registers[self.INTCAP])
+                self.registers[self.INTF] = 0
+            else:
+                data.append(self.registers[reg])
+            reg += 1
+        return data
+
+
+class SimAD5321(SimulatedDevice):
+    """Simulated AD5321 12-bit DAC.
+
+    The DAC value is written and read back as two bytes, MSB first, with the power-down mode
+    in bits 12-13 of the first byte.
+    """
+
+    def __init__(self, address=0x0c):
+        """Initialise the simulated AD5321 with a zero output value.
+
+        :param address: address of the device on the I2C bus
+        """
+        super(SimAD5321, self).__init__(address)
+        self.value = 0
+        self.power_down = 0
+
+    def write_bytes(self, reg, data):
+        """Handle a write transaction, setting the DAC value."""
+        if data:
+            self.power_down = (reg >> 4) & 0x3
+            self.value = ((reg & 0x0f) << 8) | (data[0] & 0xff)
+
+    def read_bytes(self, reg, length):
+        """Handle a read transaction, returning the DAC value."""
+        data = [((self.power_down << 4) | (self.value >> 8)) & 0xff, self.value & 0xff]
+        return (data * length)[:length]
+
+    def get_output_scaled(self):
+        """Return the DAC output value as a fraction of full scale."""
+        return self.value / 4096.0
+
+
+class SimulatedBus(object):
+    """Simulated I2C bus.
+
+    This class implements a simulated I2C bus providing the smbus.SMBus access interface.
+    Devices are added either directly on the bus or on a channel of a TCA9548 multiplexer on
+    the bus, and each access is routed to the device responding at the address given the
+    current multiplexer channel selection. Each transaction can be delayed by a fixed latency
+    plus a time per byte transferred, and faults can be injected at a random rate across the
+    bus or for specific device addresses.
+    """
+
+    def __init__(self, busnum=1, latency=0.0, byte_time=0.0, fault_rate=0.0, seed=None):
+        """Initialise the simulated bus.
+
+        :param busnum: number of the bus
+        :param latency: fixed latency of each transaction in seconds
+        :param byte_time: additional latency per byte transferred in seconds
+        :param fault_rate: probability of a fault being injected into any transaction
+        :param seed: optional seed for the fault injection random number generator
+        """
+        self.busnum = busnum
+        self.latency = latency
+        self.byte_time = byte_time
+        self.fault_rate = fault_rate
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self._devices = {}
+        self._channel_devices = {}
+        self._mux = None
+        self._address_fault_rates = {}
+
+        self.reset_stats()
+
+    def add_device(self, device, channel=None):
+        """Add a simulated device to the bus.
+
+        :param device: simulated device to add
+        :param channel: multiplexer channel the device is on, or None if directly on the bus
+        :return: the device added
+        """
+        if channel is None:
+            self._devices[device.address] = device
+            if isinstance(device, SimTCA9548):
+                self._mux = device
+        else:
+            self._channel_devices[(channel, device.address)] = device
+        return device
+
+    def set_fault_rate(self, address, rate):
+        """Set the fault injection rate for a specific device address.
+
+        :param address: device address to inject faults for
+        :param rate: probability of a fault on each transaction, or None to clear
+        """
+        if rate is None:
+            self._address_fault_rates.pop(address, None)
+        else:
+            self._address_fault_rates[address] = rate
+
+    def reset_stats(self):
+        """Reset the bus transaction statistics."""
+        self.transaction_count = 0
+        self.byte_count = 0
+        self.fault_count = 0
+
+    def _resolve(self, address):
+        """Resolve the device responding at an address given the multiplexer selection."""
+        responding = []
+        if address in self._devices:
+            responding.append(self._devices[address])
+
+        if self._mux is not None:
+            for channel in self._mux.enabled_channels():
+                if (channel, address) in self._channel_devices:
+                    responding.append(self._channel_devices[(channel, address)])
+
+        if len(responding) != 1:
+            reason = 'no device' if not responding else 'address conflict'
+            raise IOError(ENODEV_ACK, 'Simulated I2C {} at address {:#x}'.format(
+                reason, address))
+
+        return responding[0]
+
+    def _transaction(self, address, num_bytes, access):
+        """Carry out a simulated transaction.
+
+        This method resolves the device at the address, applies latency and fault injection
+        and calls the access function on the device under the bus lock.
+
+        :param address: device address
+        :param num_bytes: number of bytes transferred after the address byte
+        :param access: callable taking the device as argument, carrying out the access
+        :return: result of the access
+        """
+        with self._lock:
+            self.transaction_count += 1
+            self.byte_count += num_bytes + 1
+
+            delay = self.latency + self.byte_time * (num_bytes + 1)
+            if delay > 0.0:
+                time.sleep(delay)
+
+            fault_rate = self._address_fault_rates.get(address, self.fault_rate)
+            if fault_rate and self._random.random() < fault_rate:
+                self.fault_count += 1
+                raise IOError(errno.EIO, 'Simulated I2C fault at address {:#x}'.format(address))
+
+            return access(self._resolve(address))
+
+    def write_byte(self, address, value):
+        """Write a single byte to a device."""
+        self._transaction(address, 1, lambda dev: dev.write_bytes(value & 0xff, []))
+
+    def read_byte(self, address):
+        """Read a single byte from a device."""
+        return self._transaction(address, 1, lambda dev: dev.read_bytes(0, 1)[0])
+
+    def write_byte_data(self, address, reg, value):
+        """Write a byte to a device register."""
+        self._transaction(address, 2, lambda dev: dev.write_bytes(reg, [value & 0xff]))
+
+    def read_byte_data(self, address, reg):
+        """Read a byte from a device register."""
+        return self._transaction(address, 2, lambda dev: dev.read_bytes(reg, 1)[0])
+
+    def write_word_data(self, address, reg, value):
+        """Write a word to a device register, LSB first."""
+        data = [value & 0xff, (value >> 8) & 0xff]
+        self._transaction(address, 3, lambda dev: dev.write_bytes(reg, data))
+
+    def read_word_data(self, address, reg):
+        """Read a word from a device register, LSB first."""
+        data = self._transaction(address, 3, lambda dev: dev.read_bytes(reg, 2))
+        return data[0] | (data[1] << 8)
+
+    def write_i2c_block_data(self, address, reg, data):
+        """Write a block of bytes to a device register."""
+        data = list(data)
+        self._transaction(address, 1 + len(data), lambda dev: dev.write_bytes(reg, data))
+
+    def read_i2c_block_data(self, address, reg, length=32):
+        """Read a block of bytes from a device register."""
+        return self._transaction(address, 1 + length, lambda dev: dev.read_bytes(reg, length))
+
+    def close(self):
+        """Close the bus (no action for the simulated bus)."""
+        pass
+
+
+class PSCUSimulator(object):
+    """Simulator of the complete PSCU and Quad I2C device topology.
+
+    This class builds a simulated bus populated with all the devices of the PSCU and its
+    attached Quads, on the appropriate TCA9548 channels and addresses, with input values
+    representing a healthy system at room temperature. Quad output enables and the PSCU
+    interlock arm/disarm outputs are modelled, so that enabling a Quad channel raises its
+    output voltage and current, and arming the interlock sets the armed status input.
+    """
+
+    NUM_QUADS = 4
+
+    # Nominal simulated Quad supply voltage and output current per channel
+    QUAD_SUPPLY_VOLTS = 48.0
+    QUAD_CHANNEL_AMPS = 2.0
+
+    def __init__(self, busnum=1, **kwargs):
+        """Initialise the PSCU simulator.
+
+        :param busnum: number of the simulated bus
+        :param kwargs: keyword arguments passed to the SimulatedBus, e.g. latency, fault_rate
+        """
+        self.bus = SimulatedBus(busnum, **kwargs)
+        self.tca = self.bus.add_device(SimTCA9548(0x70))
+
+        # Quad devices on TCA channels 0-3
+        self.quad_mcp = []
+        self.quad_adc_power = []
+        self.quad_adc_fuse = []
+        for quad in range(self.NUM_QUADS):
+            adc_power = self.bus.add_device(SimAD7998(0x22), quad)
+            adc_fuse = self.bus.add_device(SimAD7998(0x21), quad)
+            for channel in range(4):
+                adc_fuse.set_input_scaled(channel, self.QUAD_SUPPLY_VOLTS / 80.0)
+            adc_fuse.set_input_scaled(4, self.QUAD_SUPPLY_VOLTS / 80.0)
+            mcp = self.bus.add_device(SimMCP23008(0x20, output_callback=self._quad_output), quad)
+            self.quad_adc_power.append(adc_power)
+            self.quad_adc_fuse.append(adc_fuse)
+            self.quad_mcp.append(mcp)
+
+        # Temperature monitor devices on TCA channel 4: set points of 35C (over-temperature)
+        # and 10C (under-temperature) with all sensors reading 25C and trip inputs inactive
+        self.adc_temp_mon = [self.bus.add_device(SimAD7998(addr), 4) for addr in (0x21, 0x22, 0x23)]
+        for channel in range(8):
+            self.adc_temp_mon[0].set_input_scaled(channel, self.temperature_scaled(35.0))
+            self.adc_temp_mon[1].set_input_scaled(channel, self.temperature_scaled(25.0))
+        for channel in range(4):
+            self.adc_temp_mon[2].set_input_scaled(channel, self.temperature_scaled(25.0))
+        for channel in range(4, 7):
+            self.adc_temp_mon[2].set_input_scaled(channel, self.temperature_scaled(10.0))
+
+        self.mcp_temp_mon = [
+            self.bus.add_device(SimMCP23008(addr, inputs), 4)
+            for (addr, inputs) in ((0x24, 0x80), (0x25, 0xff), (0x26, 0x00), (0x27, 0x07))
+        ]
+
+        # Miscellaneous devices on TCA channel 5: fan, leak, humidity, pump and position sensors
+        self.adc_misc = [self.bus.add_device(SimAD7998(addr), 5) for addr in (0x21, 0x22)]
+        for (channel, set_point, value) in ((0, 0.3, 0.6), (1, 0.1, 0.3), (2, 0.53, 0.35),
+                                            (3, 0.1, 0.25), (4, 0.5, 0.5)):
+            self.adc_misc[0].set_input_scaled(channel, set_point)
+            self.adc_misc[1].set_input_scaled(channel, value)
+
+        self.mcp_misc = [
+            self.bus.add_device(SimMCP23008(addr, inputs), 5)
+            for (addr, inputs) in ((0x24, 0xf8), (0x25, 0xff), (0x26, 0x00), (0x27, 0x00))
+        ]
+        self.mcp_misc[0].output_callback = self._arm_output
+
+        self.fan_speed_dac = self.bus.add_device(SimAD5321(0x0c), 5)
+
+    @staticmethod
+    def temperature_scaled(celsius):
+        """Return the scaled ADC input value corresponding to a temperature in Celsius."""
+        return ((celsius + 273.15) * 0.005) / 3.0
+
+    def bus_factory(self, busnum):
+        """Bus factory method returning the simulated bus, for use with I2CDevice."""
+        return self.bus
+
+    def _quad_output(self, mcp, previous, olat):
+        """Model the Quad output enable toggle on a low-high transition of an output pin."""
+        quad = self.quad_mcp.index(mcp)
+        rising = olat & ~previous
+        for channel in range(4):
+            if rising & (1 << channel):
+                mcp.set_input(channel + 4, not (mcp.pins & (1 << (channel + 4))))
+                enabled = bool(mcp.pins & (1 << (channel + 4)))
+                supply = self.quad_adc_fuse[quad].inputs[4] if enabled else 0
+                self.quad_adc_power[quad].set_input(channel, supply)
+                self.quad_adc_power[quad].set_input_scaled(
+                    channel + 4, (self.QUAD_CHANNEL_AMPS / 20.0) if enabled else 0.0
+                )
+
+    def _arm_output(self, mcp, previous, olat):
+        """Model the interlock arm (pin 0) and disarm (pin 1) outputs setting the armed input."""
+        rising = olat & ~previous
+        if rising & 0x1:
+            mcp.set_input(2, True)
+        elif rising & 0x2:
+            mcp.set_input(2, False)
@@ -0,0 +1,94 @@
+"""I2CStats - I2C transaction statistics class.
+
+This class implements lightweight accumulation of I2C transaction statistics, i.e. counts of
+transactions, bytes transferred and errors, together with a histogram of transaction
+latencies in fixed buckets. Recording a transaction costs only a few integer updates, allowing
+statistics to be left enabled on all devices in production.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+from bisect import bisect_left
+
+
+class I2CStats(object):
+    """I2CStats class.
+
+    This class accumulates statistics for I2C transactions, either for a single device or
+    combined across a number of devices.
+    """
+
+    # Upper bounds of the latency histogram buckets in seconds. A final bucket counts all
+    # transactions exceeding the last bound.
+    LATENCY_BOUNDS = (50e-6, 100e-6, 200e-6, 500e-6, 1e-3, 2e-3, 5e-3, 10e-3)
+
+    def __init__(self):
+        """Initialise the I2CStats instance with all statistics cleared."""
+        self.reset()
+
+    def reset(self):
+        """Reset all statistics."""
+        self.transactions = 0
+        self.bytes = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(self.LATENCY_BOUNDS) + 1)
+
+    def record(self, num_bytes, duration):
+        """Record a transaction.
+
+        :param num_bytes: number of bytes transferred in the transaction
+        :param duration: duration of the transaction in seconds
+        """
+        self.transactions += 1
+        self.bytes += num_bytes
+        self.total_time += duration
+        if duration > self.max_time:
+            self.max_time = duration
+        self.histogram[bisect_left(self.LATENCY_BOUNDS, duration)] += 1
+
+    def record_error(self):
+        """Record a transaction error."""
+        self.errors += 1
+
+    def merge(self, other):
+        """Merge the statistics of another instance into this one.
+
+        :param other: I2CStats instance to merge
+        :returns: this instance, to allow calls to be chained
+        """
+        self.transactions += other.transactions
+        self.bytes += other.bytes
+        self.errors += other.errors
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.histogram = [a + b for (a, b) in zip(self.histogram, other.histogram)]
+        return self
+
+    @classmethod
+    def combine(cls, stats_list):
+        """Combine the statistics of a number of instances.
+
+        :param stats_list: iterable of I2CStats instances to combine
+        :returns: new I2CStats instance containing the combined statistics
+        """
+        combined = cls()
+        for stats in stats_list:
+            combined.merge(stats)
+        return combined
+
+    def as_dict(self):
+        """Return the statistics as a dictionary, with latencies in microseconds.
+
+        :returns: dictionary of statistics
+        """
+        mean_time = self.total_time / self.transactions if self.transactions else 0.0
+        return {
+            'transactions': self.transactions,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'mean_latency_us': mean_time * 1e6,
+            'max_latency_us': self.max_time * 1e6,
+            'latency_bounds_us': [int(round(bound * 1e6)) for bound in self.LATENCY_BOUNDS],
+            'latency_histogram': list(self.histogram),
+        }
@@ -10,6 +10,8 @@ Tim Nicholls, STFC Application Engineering Group.
 """
 
 from lpdpower.usblcd import UsbLcd
+from lpdpower.lcd_writer import LcdWriter
+from lpdpower.sensor_state import QuadState
 
 from functools import partial
 import time
@@ -34,18 +36,23 @@ class LcdDisplay(object):
     BLUE = UsbLcd.BLUE
     WHITE = UsbLcd.WHITE
 
-    def __init__(self, pscu, serial_dev, baud=57600, rows=4, cols=20):
+    # PSCU sensor state fields of the interlock status shown on sensor pages
+    STATUS_FIELDS = ('sensor_states', 'latched_states')
+
+    def __init__(self, pscu, serial_dev, baud=57600, rows=4, cols=20, background=True):
         """Initialise the LcdDisplay device.
 
         This initialises the LcdDisplay object, opening the USB device and
         creating a list of registered pages, which are methods that return the
-        text of display pages to render.
+        text of display pages to render, with the sensor state each depends on. Content is
+        written to the display by an LcdWriter, from a background thread unless disabled.
 
         :param pscu: PSCU device to retrieve data from.
         :param serial_dev: serial device for the USB interface, e.g. dev/ttyUSB0
         :param baud: baud rate for the USB serial device
         :oaram rows: number of LCD rows
         :param cols: number of LCD columns
+        :param background: write to the LCD from a background thread
         """
         # Store the PSCU object for subsequent access
         self.pscu = pscu
@@ -59,38 +66,71 @@ class LcdDisplay(object):
         # Clear the display
         self.lcd.clear()
 
-        # Set up list of registered pages and append appopriate methods
+        # Create the writer for the display content, starting its background thread if required
+        self.writer = LcdWriter(self.lcd, rows, cols)
+        if background:
+            self.writer.start()
+
+        # Set up list of registered pages and append appopriate methods, together with the
+        # sensor state fields and quads each page depends on
         self.current_page = 0
         self.registered_pages = []
+        self.page_dependencies = []
 
-        self.registered_pages.append(self.overview_page)
+        self.register_page(self.overview_page, ('healthy', 'latched_states', 'armed'))
 
         self.temps_per_page = 2
         self.num_temp_pages = int(round(float(self.pscu.num_temperatures) / self.temps_per_page))
 
         for page in range(self.num_temp_pages):
-            self.registered_pages.append(partial(self.temperature_page, page))
-
-        self.registered_pages.append(self.humidity_leak_page)
-        self.registered_pages.append(self.fan_page)
-        self.registered_pages.append(self.pump_page)
-        self.registered_pages.append(self.position_page)
-        self.registered_pages.append(self.trace_page)
+            self.register_page(
+                partial(self.temperature_page, page),
+                ('temperature_values', 'temperature_trips', 'temperature_disabled') +
+                self.STATUS_FIELDS
+            )
+
+        self.register_page(
+            self.humidity_leak_page,
+            ('humidity_values', 'humidity_trips', 'humidity_disabled',
+             'leak_values', 'leak_trips', 'leak_disabled') + self.STATUS_FIELDS
+        )
+        self.register_page(self.fan_page, ('fan_speed',) + self.STATUS_FIELDS)
+        self.register_page(self.pump_page, ('pump_flow',) + self.STATUS_FIELDS)
+        self.register_page(self.position_page, ('position',))
+        self.register_page(
+            self.trace_page,
+            ('temperature_traces', 'humidity_traces', 'quad_traces') + self.STATUS_FIELDS
+        )
 
-        self.registered_pages.append(self.quad_supply_page)
+        self.register_page(self.quad_supply_page, quads=range(4))
 
         for quad in range(4):
             for chan in range(2):
-                self.registered_pages.append(partial(self.quad_page, quad, chan*2))
+                self.register_page(partial(self.quad_page, quad, chan*2), quads=(quad,))
 
-        # self.registered_pages.append(self.system_page)
+        # self.register_page(self.system_page)
 
-        # Set up LCD display buffer, colour, time format
+        # Set up LCD display buffer, colour, time format and the key of the rendered page
         self.lcd_buffer = ""
         self.lcd_colour = 0
+        self.render_key = None
+        self.render_count = 0
 
         self.time_format = '%H:%M:%S'   # %d-%b-%y'
 
+    def register_page(self, render, fields=(), quads=()):
+        """Register a display page.
+
+        This method appends a page to the list of registered pages, together with the data the
+        page depends on, so that the page is only re-rendered when that data changes.
+
+        :param render: method returning the rendered text of the page
+        :param fields: names of the PSCU sensor state fields the page depends on
+        :param quads: indices of the quads whose sensor state the page depends on
+        """
+        self.registered_pages.append(render)
+        self.page_dependencies.append((tuple(fields), tuple(quads)))
+
     def set_colour(self, colour):
         """Set the backlight colour of the LCD.
 
@@ -101,7 +141,7 @@ class LcdDisplay(object):
         :param colour; byte-width RGB tuple of colour, e.g. LcdDisplay.RED
         """
         if colour != self.lcd_colour:
-            self.lcd.set_backlight_colour(colour)
+            self.writer.set_colour(colour)
             self.lcd_colour = colour
 
     def next_page(self):
@@ -127,22 +167,58 @@ class LcdDisplay(object):
     def update(self):
         """Update the displayed content on the LCD.
 
-        This method updates the display with the content from the current registered page.
+        This method updates the display with the content from the current registered page. The
+        page is only rendered if its key, i.e. the page shown, the current time to the second
+        and the values of the sensor state it depends on, has changed since it was last
+        rendered. Any other data shown, e.g. the fan target, is refreshed with the clock.
         """
-        content = self.registered_pages[self.current_page]()
-        self.set_content(content)
+        key = self.page_key()
+        if key != self.render_key:
+            self.render_key = key
+            self.render_count += 1
+            content = self.registered_pages[self.current_page]()
+            self.set_content(content)
+
+    def page_key(self):
+        """Build the render key of the current page.
+
+        The key is built from the immutable sensor state snapshots of the PSCU and quads, so is
+        a cheap comparison of the values the page depends on, without any formatting.
+
+        :return: render key of the current page as a tuple
+        """
+        (fields, quads) = self.page_dependencies[self.current_page]
+        key = [self.current_page, int(time.time())]
+
+        state = self.pscu.get_state()
+        key.extend(getattr(state, field) for field in fields)
+
+        for quad in quads:
+            quad_state = self.pscu.quad[quad].get_state()
+            key.extend(getattr(quad_state, field) for field in QuadState.FIELDS)
+
+        return tuple(key)
 
     def set_content(self, content):
         """Set the displayed content on the LCD.
 
         This method sets the displayed content on the LCD. The content is compared with the
         internal buffer and the display only updated on change to avoid excessive updates or
-        display flicker.
+        display flicker. The content is passed to the writer, which only writes the characters
+        that differ from those currently displayed.
         """
         if content != self.lcd_buffer:
             self.lcd_buffer = content
-            self.lcd.home()
-            self.lcd.write(self.lcd_buffer)
+            self.writer.submit(self.lcd_buffer)
+
+    def close(self):
+        """Close the LCD display.
+
+        This method stops the writer, once any pending content has been written, and closes the
+        connection to the display.
+        """
+        self.writer.stop()
+        self.lcd.close()
 
     def page_header(self):
         """Render the page header in a standard format.
@@ -0,0 +1,237 @@
+"""lcd_writer.py - background writer thread for the PSCU front-panel LCD.
+
+This module implements the LcdWriter class, which writes frames of content to a UsbLcd
+display from a dedicated background thread. Each frame is rendered onto the character grid
+of the display and compared with the frame currently displayed, so that only runs of changed
+characters are sent, each preceded by a cursor positioning command. This keeps the slow
+serial writes to the display out of the PSCU update loop.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import threading
+import logging
+
+
+def render_frame(content, rows, cols):
+    """Render display content onto a character grid.
+
+    Text fills each row of the grid in turn, wrapping onto the next row at the end of a row.
+    A carriage return character ends the current row, leaving the remainder blank. Any text
+    beyond the end of the last row is discarded.
+
+    :param content: display content as a string
+    :param rows: number of display rows
+    :param cols: number of display columns
+    :returns: list of characters of the grid, in row order
+    """
+    frame = [' '] * (rows * cols)
+    (row, col) = (0, 0)
+
+    for char in content:
+        if row >= rows:
+            break
+        if char == '\r':
+            (row, col) = (row + 1, 0)
+            continue
+        frame[row * cols + col] = char
+        col += 1
+        if col >= cols:
+            (row, col) = (row + 1, 0)
+
+    return frame
+
+
+def diff_frames(old_frame, new_frame, rows, cols, max_gap=4):
+    """Determine the runs of changed characters between two rendered frames.
+
+    Changed characters in the same row separated by no more than max_gap unchanged characters
+    are merged into a single run, since resending a few unchanged characters is cheaper than
+    the cursor positioning command needed to skip them.
+
+    :param old_frame: currently displayed frame
+    :param new_frame: new frame to display
+    :param rows: number of display rows
+    :param cols: number of display columns
+    :param max_gap: maximum number of unchanged characters to merge into a run
+    :returns: list of (row, col, text) tuples of changed runs
+    """
+    runs = []
+
+    for row in range(rows):
+        start = None
+        end = None
+        for col in range(cols):
+            idx = row * cols + col
+            if old_frame[idx] == new_frame[idx]:
+                continue
+            if start is not None and col - end > max_gap:
+                runs.append((row, start, ''.join(new_frame[row * cols + start:row * cols + end])))
+                start = None
+            if start is None:
+                start = col
+            end = col + 1
+        if start is not None:
+            runs.append((row, start, ''.join(new_frame[row * cols + start:row * cols + end])))
+
+    return runs
+
+
+class LcdWriter(object):
+    """LcdWriter - background writer for a UsbLcd display.
+
+    This class writes content and backlight colour changes to a UsbLcd display. When the
+    writer thread is running, submitted frames are queued and written in the background;
+    only the most recently submitted frame is kept, so that a slow display drops intermediate
+    frames rather than falling behind. If the thread is not running, frames are written
+    immediately by the caller.
+    """
+
+    def __init__(self, lcd, rows, cols):
+        """Initialise the LcdWriter instance.
+
+        The display is assumed to be blank, i.e. cleared, at initialisation.
+
+        :param lcd: UsbLcd instance to write to
+        :param rows: number of display rows
+        :param cols: number of display columns
+        """
+        self.lcd = lcd
+        self.rows = rows
+        self.cols = cols
+
+        self.displayed = [' '] * (rows * cols)
+
+        self._pending_frame = None
+        self._pending_colour = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        self.frames_written = 0
+        self.chars_written = 0
+
+    def start(self):
+        """Start the background writer thread.
+
+        This method starts the background thread if it is not already running.
+        """
+        if self.is_running():
+            return
+
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='LcdWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background writer thread.
+
+        This method signals the background thread to stop once any pending frame has been
+        written and waits for it to terminate.
+
+        :param timeout: maximum time in seconds to wait for the thread to terminate
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        """Return True if the background writer thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, content):
+        """Submit content to be written to the display.
+
+        The content is rendered into a frame, which replaces any pending frame not yet written.
+
+        :param content: display content as a string
+        """
+        frame = render_frame(content, self.rows, self.cols)
+        with self._condition:
+            self._pending_frame = frame
+            self._condition.notify()
+
+        if not self.is_running():
+            self.flush()
+
+    def set_colour(self, colour):
+        """Submit a backlight colour to be set on the display.
+
+        :param colour: byte-wide RGB tuple of colour
+        """
+        with self._condition:
+            self._pending_colour = colour
+            self._condition.notify()
+
+        if not self.is_running():
+            self.flush()
+
+    def flush(self):
+        """Write any pending backlight colour and frame to the display.
+
+        This method is called by the writer thread, or directly by submit() and set_colour()
+        if the thread is not running. The colour and frame updates are buffered by the display
+        and sent in a single serial write. The buffer is always discarded once written, so that
+        a partial frame interrupted by an error is not sent with the next. Any exception raised
+        by the display is logged rather than propagated, and the whole display rewritten with
+        the next frame, since the displayed content is then unknown.
+        """
+        with self._condition:
+            (colour, self._pending_colour) = (self._pending_colour, None)
+            (frame, self._pending_frame) = (self._pending_frame, None)
+
+        if colour is None and frame is None:
+            return
+
+        try:
+            self.lcd.begin_buffer()
+            try:
+                if colour is not None:
+                    self.lcd.set_backlight_colour(colour)
+                if frame is not None:
+                    self.write_frame(frame)
+                self.lcd.flush()
+            finally:
+                self.lcd.discard_buffer()
+        except Exception as e:
+            logging.error("LCD write failed: {}".format(e))
+            self.displayed = [None] * (self.rows * self.cols)
+
+    def write_frame(self, frame):
+        """Write the changed characters of a rendered frame to the display.
+
+        :param frame: rendered frame, as returned by render_frame()
+        """
+        for (row, col, text) in diff_frames(self.displayed, frame, self.rows, self.cols):
+            self.lcd.set_cursor(col + 1, row + 1)
+            self.lcd.write(text)
+            start = row * self.cols + col
+            self.displayed[start:start + len(text)] = list(text)
+            self.chars_written += len(text)
+
+        self.frames_written += 1
+
+    def __has_pending(self):
+        """Return True if a frame or colour is pending, with the condition lock held."""
+        return self._pending_frame is not None or self._pending_colour is not None
+
+    def _run(self):
+        """Run the background writer loop.
+
+        This internal method is the target of the background thread. It waits for a frame or
+        colour to be submitted and writes it to the display, until the thread is stopped.
+        """
+        logging.debug("LCD writer thread started")
+
+        while True:
+            with self._condition:
+                while not self.__has_pending() and not self._stopping:
+                    self._condition.wait()
+                if not self.__has_pending():
+                    break
+            self.flush()
+
+        logging.debug("LCD writer thread stopped")
@@ -6,12 +6,12 @@ the Adafruit implementation available at:
 https://raw.githubusercontent.com/adafruit/Adafruit_Python_GPIO/master/Adafruit_GPIO/MCP230xx.py
 
 This class allows the MCP23008 IO functionality to be operated, including reading/writing all input
-pins, setting IO direction and enabling pullups.
+pins, setting IO direction, enabling pullups and configuring interrupt-on-change.
 
 James Hogge, STFC Application Engineering Group.
 """
 
-from lpdpower.i2c_device import I2CDevice
+from lpdpower.i2c_device import I2CDevice, I2CException
 
 
 class MCP23008(I2CDevice):
@@ -20,9 +20,15 @@ class MCP23008(I2CDevice):
     This class implements support for the MCP23008 I2C GPIO extender device.
     """
 
-    # Addresses of MCP23008 registers for IO direction, pullups and r/w operations
+    # Addresses of MCP23008 registers for IO direction, interrupts, pullups and r/w operations
     IODIR = 0x00
+    GPINTEN = 0x02
+    DEFVAL = 0x03
+    INTCON = 0x04
+    IOCON = 0x05
     GPPU = 0x06
+    INTF = 0x07
+    INTCAP = 0x08
     GPIO = 0x09
 
     # Definition of input and output modes
@@ -33,6 +39,10 @@ class MCP23008(I2CDevice):
     LOW = 0
     HIGH = 1
 
+    # IOCON register bits controlling the interrupt output driver and polarity
+    IOCON_ODR = 1 << 2
+    IOCON_INTPOL = 1 << 1
+
     def __init__(self, address=0x20, **kwargs):
         """Initialise the MCP23008 device.
 
@@ -46,6 +56,9 @@ class MCP23008(I2CDevice):
         self.__iodir = self.readU8(self.IODIR)
         self.__gppu = self.readU8(self.GPPU)
         self.__gpio = self.readU8(self.GPIO)
+        self.__gpinten = self.readU8(self.GPINTEN)
+        self.__defval = self.readU8(self.DEFVAL)
+        self.__intcon = self.readU8(self.INTCON)
 
     def setup(self, pin, direction):
         """Set the IO direction state of a pin.
@@ -85,6 +98,62 @@ class MCP23008(I2CDevice):
         # Write the GPPU register on the device
         self.write8(self.GPPU, self.__gppu)
 
+    def setup_interrupts(self, pins, enabled=True, default=None):
+        """Set the interrupt-on-change state of a list of pins.
+
+        This method enables or disables interrupt-on-change for the specified pins. If no default
+        value is given, an interrupt is generated whenever an enabled pin changes state, otherwise
+        an interrupt is generated whenever an enabled pin differs from the default value.
+
+        :param pins: list of pins to set interrupt state for
+        :param enabled: interrupt enable state to set
+        :param default: optional default pin value (MCP23008.LOW or MCP23008.HIGH) to compare
+        against, rather than the previous pin value
+        """
+        # Set interrupt enable, control and default values in the register buffer values
+        for pin in pins:
+            if enabled:
+                self.__gpinten |= 1 << pin
+            else:
+                self.__gpinten &= ~(1 << pin)
+
+            if default is None:
+                self.__intcon &= ~(1 << pin)
+            else:
+                self.__intcon |= 1 << pin
+                if default:
+                    self.__defval |= 1 << pin
+                else:
+                    self.__defval &= ~(1 << pin)
+
+        # Write the control and default value registers before enabling the interrupts
+        self.write8(self.DEFVAL, self.__defval)
+        self.write8(self.INTCON, self.__intcon)
+        self.write8(self.GPINTEN, self.__gpinten)
+
+    def configure_interrupt_output(self, open_drain=False, active_high=False):
+        """Configure the interrupt output pin of the device.
+
+        This method configures the INT output driver and polarity. An open-drain output allows the
+        INT outputs of several devices to be wired together onto a single host input. The other
+        IOCON bits, e.g. SEQOP, are read back from the device and left unchanged.
+
+        :param open_drain: configure the INT output as open-drain, overriding active_high
+        :param active_high: configure the INT output as active-high rather than active-low
+        """
+        iocon = self.readU8(self.IOCON)
+        if iocon == self.ERROR:
+            raise I2CException('Unable to read IOCON register of MCP23008 at address 0x{:02x}'
+                               .format(self.address))
+
+        iocon &= ~(self.IOCON_ODR | self.IOCON_INTPOL) & 0xFF
+        if open_drain:
+            iocon |= self.IOCON_ODR
+        elif active_high:
+            iocon |= self.IOCON_INTPOL
+
+        self.write8(self.IOCON, iocon)
+
     def input(self, pin):
         """Get the input value on a pin.
 
@@ -109,6 +178,48 @@ class MCP23008(I2CDevice):
         # Buils and return a list of input states for the requested pins
         return [bool(buff & (1 << pin)) for pin in pins]
 
+    def read_gpio(self):
+        """Read the input state of all pins as a bitmask.
+
+        This method reads the GPIO register in a single access, returning the state of all pins
+        packed into an integer bitmask, with bit N set if pin N is high. This avoids building a
+        list of pin states when the caller can decode the states it needs directly.
+
+        :return: GPIO register bitmask, or I2CDevice.ERROR if the access failed
+        """
+        return self.readU8(self.GPIO)
+
+    def read_interrupt_state(self):
+        """Read the interrupt flag, interrupt capture and input state of all pins as bitmasks.
+
+        This method reads the adjacent INTF, INTCAP and GPIO registers in a single sequential
+        block transfer. Reading the INTCAP and GPIO registers clears any pending interrupt.
+
+        :return: tuple of (INTF, INTCAP, GPIO) register bitmasks, each I2CDevice.ERROR if the
+        access failed
+        """
+        data = self.readList(self.INTF, 3)
+        if not isinstance(data, list) or len(data) < 3:
+            return (self.ERROR,) * 3
+
+        return tuple(data[:3])
+
+    def read_captured_gpio(self):
+        """Read the input state of all pins as a bitmask, including captured interrupt states.
+
+        This method reads the interrupt state of the device, returning the GPIO register bitmask
+        with the state of any pins which caused an interrupt replaced by their state captured at
+        the time of the interrupt. This ensures that a transient change on an interrupt-enabled
+        pin is seen, even if the pin has returned to its previous state since.
+
+        :return: input state bitmask, or I2CDevice.ERROR if the access failed
+        """
+        (intf, intcap, gpio) = self.read_interrupt_state()
+        if gpio == self.ERROR:
+            return self.ERROR
+
+        return (gpio & ~intf) | (intcap & intf)
+
     def output(self, pin, value):
         """Set the output state of a pin.
 
@@ -143,3 +254,18 @@ class MCP23008(I2CDevice):
         """
         self.__gpio = 0
         self.write8(self.GPIO, self.__gpio)
+
+    def pulse_outputs(self, pins):
+        """Pulse a set of output pins high and then low.
+
+        This method drives the specified output pins through a low-high-low transition, leaving
+        all outputs low. Since the outputs are left low by each pulse, the leading write setting
+        them low is skipped if the buffered output state is already low, so that a pulse normally
+        takes two register writes, one for each edge.
+
+        :param pins: iterable of pins to pulse
+        """
+        if self.__gpio:
+            self.disable_outputs()
+        self.output_pins({pin: True for pin in pins})
+        self.disable_outputs()
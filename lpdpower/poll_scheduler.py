@@ -0,0 +1,235 @@
+"""poll_scheduler - scheduler for polling groups of sensors at individual rates.
+
+This module implements the PollScheduler class, which allows groups of sensors to be polled
+at individual intervals and priorities. Each group is described by a PollGroup, associating a
+poll function with its interval and priority. When called periodically, e.g. from an update
+loop, the scheduler polls each group that is due, in priority order, so that fast-changing
+or safety-relevant sensors can be polled frequently while slowly varying sensors are polled
+less often, reducing the load on the bus.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import logging
+import math
+import time
+
+# Clock used for scheduling, using the monotonic clock if available
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class PollGroup(object):
+    """PollGroup - a group of sensors polled at a common interval.
+
+    This class associates a poll function with an interval and priority, and tracks when the
+    group is next due to be polled, together with statistics of the polls made.
+    """
+
+    def __init__(self, name, poll_func, interval, priority=0, next_due=0.0):
+        """Initialise the PollGroup instance.
+
+        :param name: name of the group
+        :param poll_func: function to call to poll the group
+        :param interval: interval between polls in seconds
+        :param priority: priority of the group, lower values being polled first
+        :param next_due: time at which the group is next due to be polled
+        """
+        self.name = name
+        self.poll_func = poll_func
+        self.interval = interval
+        self.priority = priority
+        self.next_due = next_due
+        self.due_pending = False
+
+        self.generation = 0
+        self.poll_count = 0
+        self.error_count = 0
+        self.last_duration = 0.0
+
+    def poll(self, now):
+        """Poll the group and schedule the next poll.
+
+        This method calls the poll function of the group, logging rather than propagating any
+        exception raised, so that an error polling one group does not prevent others being
+        polled. The generation of the group is incremented on each successful poll. The next
+        poll is scheduled one interval after the previous due time, or one interval from now
+        if polls have been missed, so that the polling rate does not drift.
+
+        :param now: current scheduler clock time
+        """
+        self.due_pending = False
+        start_time = _clock()
+        try:
+            self.poll_func()
+            self.generation += 1
+        except Exception as e:
+            self.error_count += 1
+            logging.error("Polling sensor group {} failed: {}".format(self.name, e))
+
+        self.poll_count += 1
+        self.last_duration = _clock() - start_time
+
+        self.mark_polled(now)
+
+    def mark_due(self, now):
+        """Mark the group as due to be polled, e.g. in response to an interrupt.
+
+        The group remains due if it is being polled when marked, since the poll may already
+        have read the sensors before the event causing the interrupt.
+
+        :param now: current scheduler clock time
+        """
+        self.due_pending = True
+        self.next_due = min(self.next_due, now)
+
+    def mark_polled(self, now):
+        """Schedule the next poll of the group after it has been polled.
+
+        The group is kept due if it was marked due since the poll started.
+
+        :param now: current scheduler clock time
+        """
+        if self.due_pending:
+            self.due_pending = False
+            self.next_due = now
+            return
+
+        self.next_due += self.interval
+        if self.next_due <= now:
+            self.next_due = now + self.interval
+
+    def get_status(self):
+        """Return the status of the group.
+
+        :returns: dictionary of group interval, priority and poll statistics
+        """
+        return {
+            'interval': self.interval,
+            'priority': self.priority,
+            'generation': self.generation,
+            'poll_count': self.poll_count,
+            'error_count': self.error_count,
+            'last_duration': self.last_duration,
+        }
+
+
+class PollScheduler(object):
+    """PollScheduler - scheduler for polling sensor groups at individual rates.
+
+    This class maintains a list of poll groups and polls those that are due each time the
+    poll_due() method is called. The effective interval of each group is therefore quantised
+    to the interval at which poll_due() is called.
+    """
+
+    def __init__(self):
+        """Initialise the PollScheduler with no groups."""
+        self.groups = []
+        self._groups_by_name = {}
+
+    def add_group(self, name, poll_func, interval, priority=0, offset=0.0):
+        """Add a poll group to the scheduler.
+
+        :param name: unique name of the group
+        :param poll_func: function to call to poll the group
+        :param interval: interval between polls in seconds
+        :param priority: priority of the group, lower values being polled first
+        :param offset: delay before the first poll, allowing polls of groups at the same
+        interval to be staggered
+        :returns: the PollGroup added
+        """
+        if name in self._groups_by_name:
+            raise ValueError("Poll group {} already exists".format(name))
+
+        group = PollGroup(name, poll_func, interval, priority, _clock() + offset)
+        self.groups.append(group)
+        self.groups.sort(key=lambda group: group.priority)
+        self._groups_by_name[name] = group
+
+        return group
+
+    def get_group(self, name):
+        """Return the poll group with the specified name.
+
+        :param name: name of the group
+        :returns: the PollGroup
+        """
+        try:
+            return self._groups_by_name[name]
+        except KeyError:
+            raise ValueError("Poll group {} does not exist".format(name))
+
+    def set_interval(self, name, interval):
+        """Set the poll interval of a group.
+
+        :param name: name of the group
+        :param interval: new interval between polls in seconds
+        """
+        group = self.get_group(name)
+        group.next_due += interval - group.interval
+        group.interval = interval
+
+    def mark_due(self, name):
+        """Mark a group as due to be polled, e.g. in response to an interrupt.
+
+        :param name: name of the group
+        """
+        self.get_group(name).mark_due(_clock())
+
+    def poll_due(self, now=None):
+        """Poll all groups that are due, in priority order.
+
+        :param now: optional current scheduler clock time, defaulting to the current time
+        :returns: list of names of the groups polled
+        """
+        if now is None:
+            now = _clock()
+
+        polled = []
+        for group in self.groups:
+            if group.next_due <= now:
+                group.poll(now)
+                polled.append(group.name)
+
+        return polled
+
+    def mark_all_polled(self, now=None):
+        """Mark all groups as polled, e.g. after all sensors have been polled together.
+
+        This method increments the generation of all groups and schedules their next polls
+        at least one interval from now, unless marked due since. Each group keeps the phase of
+        its schedule, so that the polls of groups staggered at the same interval remain
+        staggered.
+
+        :param now: optional current scheduler clock time, defaulting to the current time
+        """
+        if now is None:
+            now = _clock()
+
+        for group in self.groups:
+            group.generation += 1
+            if group.due_pending:
+                group.mark_polled(now)
+                continue
+            intervals = math.ceil((now + group.interval - group.next_due) / group.interval - 1e-9)
+            if intervals > 0:
+                group.next_due += intervals * group.interval
+
+    def time_to_next_poll(self, now=None):
+        """Return the time until the next group is due to be polled.
+
+        :param now: optional current scheduler clock time, defaulting to the current time
+        :returns: time in seconds until the next poll is due, or None if there are no groups
+        """
+        if not self.groups:
+            return None
+
+        if now is None:
+            now = _clock()
+
+        return max(min(group.next_due for group in self.groups) - now, 0.0)
+
+    def get_status(self):
+        """Return the status of all groups.
+
+        :returns: dictionary of group name: status dictionary
+        """
+        return {group.name: group.get_status() for group in self.groups}
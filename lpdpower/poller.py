@@ -0,0 +1,134 @@
+"""poller.py - background update thread for the LpdPower adapter.
+
+This module implements the PSCUPoller class, which runs the periodic PSCU update tasks
+(handling deferred commands, updating the front-panel LCD and polling sensors) in a
+dedicated background thread. This keeps all blocking I2C and serial transactions off the
+tornado IOLoop, so that API requests are serviced from the buffered PSCU state without
+waiting for the hardware.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import threading
+import time
+import logging
+
+from lpdpower.i2c_bus_manager import I2CBusManager
+
+
+class PSCUPoller(object):
+    """PSCUPoller - background update thread for a PSCU.
+
+    This class implements a background thread which periodically calls the update tasks of
+    a PSCU instance at a specified interval until stopped.
+    """
+
+    def __init__(self, pscu, update_interval):
+        """Initialise the PSCUPoller instance.
+
+        :param pscu: PSCU instance to run update tasks on
+        :param update_interval: interval between successive updates in seconds
+        """
+        self.pscu = pscu
+        self.update_interval = update_interval
+
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+        self.update_callbacks = []
+
+        self.update_count = 0
+        self.last_update_duration = 0.0
+
+    def start(self):
+        """Start the background update thread.
+
+        This method starts the background thread if it is not already running.
+        """
+        if self.is_running():
+            return
+
+        self._stop_event.clear()
+        self._wake_event.clear()
+        self._thread = threading.Thread(target=self._run, name='PSCUPoller')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background update thread.
+
+        This method signals the background thread to stop and waits for it to terminate.
+
+        :param timeout: maximum time in seconds to wait for the thread to terminate
+        """
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add_update_callback(self, callback):
+        """Add a callback to be called at the end of each update.
+
+        This allows e.g. the updated PSCU state to be published to clients once per update,
+        from the background thread.
+
+        :param callback: callable taking no arguments
+        """
+        self.update_callbacks.append(callback)
+
+    def wake(self):
+        """Wake the background update thread to run the update tasks immediately.
+
+        This method may be called from any thread, e.g. from an interrupt callback, to run the
+        update tasks without waiting for the remainder of the update interval.
+        """
+        self._wake_event.set()
+
+    def is_running(self):
+        """Return True if the background update thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def update(self):
+        """Run a single iteration of the PSCU update tasks.
+
+        This method handles deferred PSCU commands, updates the front-panel LCD, polls the
+        sensor groups that are due and calls any update callbacks. Any exception raised by the
+        update tasks is logged rather than propagated, so that a transient error does not
+        terminate the update thread. Exceptions raised by each callback are logged separately,
+        so that a failing callback does not prevent the others being called.
+        """
+        start_time = time.time()
+        try:
+            self.pscu.handle_deferred()
+            self.pscu.update_lcd()
+            self.pscu.poll_sensors()
+        except Exception as e:
+            logging.error("PSCU update failed: {}".format(e))
+
+        for callback in self.update_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logging.error("PSCU update callback {} failed: {}".format(callback, e))
+
+        self.update_count += 1
+        self.last_update_duration = time.time() - start_time
+
+    def _run(self):
+        """Run the background update loop.
+
+        This internal method is the target of the background thread. It runs the update tasks
+        repeatedly, waiting for the remainder of the update interval after each iteration, or
+        until woken, until the thread is stopped. The I2C accesses of the thread are made at
+        polling priority, so that they yield the bus to safety and control accesses.
+        """
+        I2CBusManager.set_thread_priority(I2CBusManager.PRIORITY_POLL)
+        logging.debug("PSCU poller thread started with interval {}s".format(self.update_interval))
+
+        while not self._stop_event.is_set():
+            self.update()
+            self._wake_event.wait(max(self.update_interval - self.last_update_duration, 0.0))
+            self._wake_event.clear()
+
+        logging.debug("PSCU poller thread stopped")
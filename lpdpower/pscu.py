@@ -8,8 +8,10 @@ page up/down buttons on the front panel.
 James Hogge, STFC Application Engineering Group.
 """
 from math import sqrt
+from functools import partial
 
 from lpdpower.i2c_device import I2CDevice, I2CException
+from lpdpower.i2c_bus_manager import I2CBusManager
 from lpdpower.i2c_container import I2CContainer
 from lpdpower.tca9548 import TCA9548
 from lpdpower.ad7998 import AD7998
@@ -18,9 +20,19 @@ from lpdpower.mcp23008 import MCP23008
 from lpdpower.quad import Quad
 from lpdpower.lcd_display import LcdDisplay, LcdDisplayError
 from lpdpower.deferred_executor import DeferredExecutor
+from lpdpower.enable_sequencer import EnableSequencer
+from lpdpower.sensor_state import PSCUState
+from lpdpower.poll_scheduler import PollScheduler
+from lpdpower.transaction_planner import TransactionPlanner
+from lpdpower.conversion import LinearConversion, ChannelConverter, scale_codes
+
+try:
+    import Adafruit_BBIO.GPIO as GPIO
+except ImportError:  # pragma: no cover
+    GPIO = None
 
-import Adafruit_BBIO.GPIO as GPIO
 import logging
+import time
 
 
 class PSCU(I2CContainer):
@@ -40,6 +52,26 @@ class PSCU(I2CContainer):
     PUMP_VREF = 5.0
     POSITION_VREF = 5.0
 
+    # Linear conversions of scaled AD7998 readings to temperature in Celsius, humidity in
+    # percent, leak impedance in megaohms, fan speed in RPM and pump flow in litres/min, and
+    # the scale of readings to transverse detector position in mm
+    TEMP_CONVERSION = LinearConversion(TEMP_VREF / 0.005, -273.15)
+    HUMIDITY_CONVERSION = LinearConversion(HUMIDITY_VREF / 0.031, -0.8 / 0.031)
+    LEAK_CONVERSION = LinearConversion(-(LEAK_VREF / 2.5) / 150e-9 / 1.0e6, 2.5 / 150e-9 / 1.0e6)
+    FAN_CONVERSION = LinearConversion((FAN_VREF / 4.5) * 3000.0)
+    PUMP_CONVERSION = LinearConversion((PUMP_VREF / 4.32) * 35.0)
+    POSITION_SCALE = (2.0 * (POSITION_VREF / 0.1)) / sqrt(2.0)
+
+    # Default poll intervals (in seconds) and priorities (lower values polled first) of the
+    # sensor poll groups: interlock MCP trip, trace and latch states; each quad; miscellaneous
+    # (humidity, leak, fan, pump and position) ADCs; temperature ADCs
+    DEFAULT_POLL_INTERVALS = {'interlock': 0.05, 'quad': 0.1, 'misc': 0.5, 'temperature': 1.0}
+    DEFAULT_POLL_PRIORITIES = {'interlock': 0, 'quad': 1, 'misc': 2, 'temperature': 3}
+
+    # Default poll interval of the interlock group when interlock MCP interrupts are enabled,
+    # since changes are then detected by interrupt rather than by polling
+    DEFAULT_INTERRUPT_INTERLOCK_POLL_INTERVAL = 0.5
+
     TEMP_SENSOR_NAMES = [
         'Vent 1',
         'Vent 2',
@@ -64,14 +96,25 @@ class PSCU(I2CContainer):
 
     def __init__(self, quad_enable_interval=DEFAULT_QUAD_ENABLE_INTERVAL,
                  detector_position_offset=DEFAULT_DETECTOR_POSITION_OFFSET,
-                 i2c_bus_number=DEFAULT_I2C_BUS_NUMBER):
+                 i2c_bus_number=DEFAULT_I2C_BUS_NUMBER,
+                 poll_intervals=None, poll_priorities=None, interlock_interrupt_pin=None,
+                 calibrations=None, quad_enable_budget=None, quad_enable_inrush=None):
         """Initialise the PSCU instance.
 
         The constructor initialises the PSCU instance, setting up all the I2C
-        devices on the PSCU, intialising and attached the quads, and setting up the
-        front panel display and buttons.
-
-        :param quad_enable_interval: time interval between quad enable commands
+        devices on the PSCU, intialising and attached the quads, setting up the
+        front panel display and buttons, and scheduling the sensor poll groups.
+
+        :param quad_enable_interval: maximum time interval between quad enable commands
+        :param poll_intervals: optional dictionary of poll group type: poll interval overrides
+        :param poll_priorities: optional dictionary of poll group type: priority overrides
+        :param interlock_interrupt_pin: optional GPIO pin, e.g. "P9_15", connected to the wired
+        interrupt outputs of the interlock MCPs, enabling interrupt-driven trip detection
+        :param calibrations: optional dictionary of sensor channel calibrations, as described in
+        set_calibrations()
+        :param quad_enable_budget: optional total inrush current budget in amps for sequenced
+        quad enables, defaulting to the inrush of a single channel
+        :param quad_enable_inrush: optional expected inrush current in amps of a quad channel
         """
         # Set up the quad enable interval, detector position offset and I2C bus number
         # with the specified values
@@ -85,6 +128,10 @@ class PSCU(I2CContainer):
         # Turn off exception raising in the I2C device class
         I2CDevice.disable_exceptions()
 
+        # Get the manager arbitrating accesses to the I2C bus, used to give safety writes
+        # priority over polling
+        self.bus_manager = I2CDevice.get_bus_manager(self.i2c_bus_number)
+
         # Create the TCA I2C bus multiplexer instance
         self.tca = TCA9548(0x70)
 
@@ -143,75 +190,99 @@ class PSCU(I2CContainer):
         # Attach the fan speed DAC device
         self.fan_speed_dac = self.tca.attach_device(5, AD5321, 0x0c)
 
-        # Create internal buffer variables for all sensor parameters
+        # Set up the static parameters for all sensors
         # Temperature
         self.num_temperatures = 11
-        self.__temperature_values = [0.0] * self.num_temperatures
-        self.__temperature_values_raw = [0.0] * self.num_temperatures
-        self.__temperature_set_points = [0.0] * self.num_temperatures
-        self.__temperature_set_points_raw = [0.0] * self.num_temperatures
-        self.__temperature_trips = [False] * self.num_temperatures
-        self.__temperature_traces = [False] * self.num_temperatures
-        self.__temperature_disabled = [False] * self.num_temperatures
         self.__temperature_mode = ['Over'] * 8 + ['Under'] * 3
 
-        # Humidity
+        # Humidity. The trip and trace offsets are the pin numbers of the first sensor on the
+        # misc MCPs, i.e. the humidity trace is on pin 2 and the leak trace on pin 1 of misc MCP 2
         self.num_humidities = 1
         self.__humidity_adc_chan_offset = 2
         self.__humidity_trip_chan_offset = 2
-        self.__humidity_trace_chan_offset = 1
-        self.__humidity_values = [0.0] * self.num_humidities
-        self.__humidity_values_raw = [0.0] * self.num_humidities
-        self.__humidity_set_points = [0.0] * self.num_humidities
-        self.__humidity_set_points_raw = [0.0] * self.num_humidities
-        self.__humidity_trips = [False] * self.num_humidities
-        self.__humidity_traces = [False] * self.num_humidities
-        self.__humidity_disabled = [False] * self.num_humidities
+        self.__humidity_trace_chan_offset = 2
         self.__humidity_mode = ['Over'] * self.num_humidities
 
         # Leak detection sensors
         self.num_leak_sensors = 1
         self.__leak_adc_chan_offset = 1
         self.__leak_trip_chan_offset = 1
-        self.__leak_trace_chan_offset = 0
-        self.__leak_values = [0.0] * self.num_leak_sensors
-        self.__leak_values_raw = [0.0] * self.num_leak_sensors
-        self.__leak_set_points = [0.0] * self.num_leak_sensors
-        self.__leak_set_points_raw = [0.0] * self.num_leak_sensors
-        self.__leak_trips = [False] * self.num_leak_sensors
-        self.__leak_traces = [False] * self.num_leak_sensors
-        self.__leak_disabled = [False] * self.num_leak_sensors
+        self.__leak_trace_chan_offset = 1
         self.__leak_mode = ['Under'] * self.num_leak_sensors
 
         # Pump
-        self.__pump_flow = 0.0
-        self.__pump_flow_raw = 0.0
-        self.__pump_set_point = 0.0
-        self.__pump_set_point_raw = 0.0
-        self.__pump_trip = False
         self.__pump_mode = 'Under'
 
         # Fan
-        self.__fan_speed = 0.0
-        self.__fan_speed_raw = 0.0
         self.__fan_target = 100.0
-        self.__fan_set_point = 0.0
-        self.__fan_set_point_raw = 0.0
-        self.__fan_trip = False
         self.__fan_mode = 'Under'
 
-        # Position
-        self.__position = 0.0
-        self.__position_raw = 0.0
-
-        # Quad traces
-        self.__quad_traces = [False] * self.num_quads
-
-        # Overall
-        self.__armed = False
-        self.__healthy = False
-        self.__sensor_states = [False] * 5  # Tmp, F, P, H, T
-        self.__latched_states = [False] * 5  # Tmp, F, P, T, H
+        # Create the batched converters of ADC codes to engineering values, with per-channel
+        # calibrations, for the values and setpoints of each type of sensor
+        self.position_conversion = LinearConversion(
+            PSCU.POSITION_SCALE, -self.detector_position_offset
+        )
+        self.converters = {
+            'temperature': ChannelConverter(PSCU.TEMP_CONVERSION, self.num_temperatures),
+            'temperature_set_point': ChannelConverter(
+                PSCU.TEMP_CONVERSION, self.num_temperatures
+            ),
+            'humidity': ChannelConverter(PSCU.HUMIDITY_CONVERSION, self.num_humidities),
+            'humidity_set_point': ChannelConverter(
+                PSCU.HUMIDITY_CONVERSION, self.num_humidities
+            ),
+            'leak': ChannelConverter(PSCU.LEAK_CONVERSION, self.num_leak_sensors),
+            'leak_set_point': ChannelConverter(PSCU.LEAK_CONVERSION, self.num_leak_sensors),
+            'fan': ChannelConverter(PSCU.FAN_CONVERSION, 1),
+            'fan_set_point': ChannelConverter(PSCU.FAN_CONVERSION, 1),
+            'pump': ChannelConverter(PSCU.PUMP_CONVERSION, 1),
+            'pump_set_point': ChannelConverter(PSCU.PUMP_CONVERSION, 1),
+            'position': ChannelConverter(self.position_conversion, 1),
+        }
+        if calibrations:
+            self.set_calibrations(calibrations)
+
+        # Create the initial sensor state snapshot, which is replaced on each poll of all sensors
+        self.__state = PSCUState(
+            temperature_values=[0.0] * self.num_temperatures,
+            temperature_values_raw=[0.0] * self.num_temperatures,
+            temperature_set_points=[0.0] * self.num_temperatures,
+            temperature_set_points_raw=[0.0] * self.num_temperatures,
+            temperature_trips=[False] * self.num_temperatures,
+            temperature_traces=[False] * self.num_temperatures,
+            temperature_disabled=[False] * self.num_temperatures,
+            humidity_values=[0.0] * self.num_humidities,
+            humidity_values_raw=[0.0] * self.num_humidities,
+            humidity_set_points=[0.0] * self.num_humidities,
+            humidity_set_points_raw=[0.0] * self.num_humidities,
+            humidity_trips=[False] * self.num_humidities,
+            humidity_traces=[False] * self.num_humidities,
+            humidity_disabled=[False] * self.num_humidities,
+            leak_values=[0.0] * self.num_leak_sensors,
+            leak_values_raw=[0.0] * self.num_leak_sensors,
+            leak_set_points=[0.0] * self.num_leak_sensors,
+            leak_set_points_raw=[0.0] * self.num_leak_sensors,
+            leak_trips=[False] * self.num_leak_sensors,
+            leak_traces=[False] * self.num_leak_sensors,
+            leak_disabled=[False] * self.num_leak_sensors,
+            pump_flow=0.0,
+            pump_flow_raw=0.0,
+            pump_set_point=0.0,
+            pump_set_point_raw=0.0,
+            pump_trip=False,
+            fan_speed=0.0,
+            fan_speed_raw=0.0,
+            fan_set_point=0.0,
+            fan_set_point_raw=0.0,
+            fan_trip=False,
+            position=0.0,
+            position_raw=0.0,
+            quad_traces=[False] * self.num_quads,
+            armed=False,
+            healthy=False,
+            sensor_states=[False] * 5,  # Tmp, F, P, H, T
+            latched_states=[False] * 5,  # Tmp, F, P, T, H
+        )
 
         # Initialise the front panel LCD
         try:
@@ -221,26 +292,129 @@ class PSCU(I2CContainer):
             logging.warning(e)
             self.lcd_display_error = True
 
-        # Intialise the front panel push buttons on GPIO pins and enable rising edge detection
-        GPIO.setup("P9_11", GPIO.IN)
-        GPIO.setup("P9_12", GPIO.IN)
-        GPIO.add_event_detect("P9_11", GPIO.RISING)
-        GPIO.add_event_detect("P9_12", GPIO.RISING)
+        # Intialise the front panel push buttons on GPIO pins and enable rising edge detection,
+        # if GPIO support is available on the host
+        if GPIO is not None:
+            GPIO.setup("P9_11", GPIO.IN)
+            GPIO.setup("P9_12", GPIO.IN)
+            GPIO.add_event_detect("P9_11", GPIO.RISING)
+            GPIO.add_event_detect("P9_12", GPIO.RISING)
+        else:
+            logging.warning("GPIO support not available, front-panel buttons disabled")
+
+        # Interlock interrupts require GPIO support to detect the interrupt pin edge
+        if interlock_interrupt_pin is not None and GPIO is None:
+            logging.warning("GPIO support not available, interlock interrupts disabled")
+            interlock_interrupt_pin = None
+
+        self.interlock_interrupt_pin = interlock_interrupt_pin
+        self.interlock_interrupt_count = 0
+        self.__interrupt_callback = None
 
         # Internal flag tracking state of quads 'enable all' command
         self.__all_enabled = False
 
         self.deferred_executor = DeferredExecutor()
 
+        # Sequencer of the quad output enables, limiting the total inrush current
+        self.enable_sequencer = EnableSequencer(self, quad_enable_budget, quad_enable_inrush)
+
+        # Number of TCA channel switches made in the most recent poll cycle
+        self.__poll_mux_switches = 0
+
+        # Schedule the sensor poll groups at their individual intervals and priorities
+        self.poll_scheduler = PollScheduler()
+        self.__add_poll_groups(poll_intervals, poll_priorities)
+
+        # Enable interrupt-driven detection of interlock trip and latch state changes if an
+        # interrupt pin is specified
+        if self.interlock_interrupt_pin is not None:
+            self.__setup_interlock_interrupts()
+
+    def __setup_interlock_interrupts(self):
+        """Set up interrupt-driven detection of interlock state changes.
+
+        This internal method enables interrupt-on-change on all input pins of the interlock MCPs,
+        with open-drain interrupt outputs wired together onto a single GPIO pin, and enables
+        falling edge detection with a callback on that pin.
+        """
+        for mcp in self.mcp_temp_mon + self.mcp_misc:
+            mcp.configure_interrupt_output(open_drain=True)
+
+        for mcp in self.mcp_temp_mon + self.mcp_misc[1:]:
+            mcp.setup_interrupts(self.ALL_PINS)
+
+        # The arm and disarm pins of the first misc MCP are outputs
+        self.mcp_misc[0].setup_interrupts(self.ALL_PINS[2:])
+
+        GPIO.setup(self.interlock_interrupt_pin, GPIO.IN)
+        GPIO.add_event_detect(
+            self.interlock_interrupt_pin, GPIO.FALLING, callback=self.__handle_interlock_interrupt
+        )
+
+    def __handle_interlock_interrupt(self, pin):
+        """Handle an interrupt from the interlock MCPs.
+
+        This internal method is called from the GPIO edge detection thread when an interlock MCP
+        signals a change of input state. The interlock poll group is marked as due and the
+        interrupt callback, if any, called to wake the update loop, so that the change is
+        captured without waiting for the next scheduled interlock poll.
+
+        :param pin: GPIO pin on which the interrupt occurred
+        """
+        self.interlock_interrupt_count += 1
+        self.poll_scheduler.mark_due('interlock')
+
+        if self.__interrupt_callback is not None:
+            self.__interrupt_callback()
+
+    def set_interrupt_callback(self, callback):
+        """Set the callback called on an interlock interrupt.
+
+        This method sets a callback, called from the GPIO edge detection thread when an interlock
+        MCP interrupt occurs, allowing e.g. a background update loop to be woken to poll the
+        interlock group immediately.
+
+        :param callback: callable taking no arguments, or None to clear the callback
+        """
+        self.__interrupt_callback = callback
+
+    def get_interlock_interrupt_count(self):
+        """Get the number of interlock interrupts handled.
+
+        :returns: number of interlock interrupts handled
+        """
+        return self.interlock_interrupt_count
+
     def handle_deferred(self):
         """Handle deferred commands.
 
         This method handles any deferred PSCU commands currently queued in the deferred
-        executor. This is intended to be called periodically by e.g. an update loop that is
-        updating the PSCU status.
+        executor that are due. This is intended to be called periodically by e.g. an update loop
+        that is updating the PSCU status, unless the timer thread of the executor is running.
         """
         self.deferred_executor.process()
 
+    def get_state(self):
+        """Get the current sensor state snapshot.
+
+        This method returns the current immutable sensor state snapshot of the PSCU, allowing
+        a client to read a consistent set of sensor values from a single poll cycle.
+
+        :returns: current PSCUState snapshot
+        """
+        return self.__state
+
+    def get_generation(self):
+        """Get the poll generation number of the current sensor state.
+
+        This method returns the generation number of the current sensor state snapshot, which
+        is incremented on completion of each poll of all sensors.
+
+        :returns: poll generation number
+        """
+        return self.__state.generation
+
     def get_temperature(self, sensor):
         """Get the value of a PSCU temperature sensor.
 
@@ -252,7 +426,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_values[sensor]
+        return self.__state.temperature_values[sensor]
 
     def get_temperature_volts(self, sensor):
         """Get the raw value of a PSCU temperature sensor.
@@ -265,7 +439,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_values_raw[sensor] * PSCU.TEMP_VREF
+        return self.__state.temperature_values_raw[sensor] * PSCU.TEMP_VREF
 
     def get_temperature_set_point(self, sensor):
         """Get the set point of a PSCU temperature sensor.
@@ -278,7 +452,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_set_points[sensor]
+        return self.__state.temperature_set_points[sensor]
 
     def get_temperature_set_point_volts(self, sensor):
         """Get the raw set point of a PSCU temperature sensor.
@@ -291,7 +465,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_set_points_raw[sensor] * PSCU.TEMP_VREF
+        return self.__state.temperature_set_points_raw[sensor] * PSCU.TEMP_VREF
 
     def get_temperature_tripped(self, sensor):
         """Get the trip status of a PSCU temperature sensor.
@@ -304,7 +478,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_trips[sensor]
+        return self.__state.temperature_trips[sensor]
 
     def get_temperature_trace(self, sensor):
         """Get the trace status of a PSCU temperature sensor.
@@ -317,7 +491,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_traces[sensor]
+        return self.__state.temperature_traces[sensor]
 
     def get_temperature_disabled(self, sensor):
         """Get the disabled status of a PSCU temperature sensor.
@@ -330,7 +504,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_temperatures or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__temperature_disabled[sensor]
+        return self.__state.temperature_disabled[sensor]
 
     def get_temperature_name(self, sensor):
         """Get the name of a PSCU temperature sensor.
@@ -370,7 +544,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_values[sensor]
+        return self.__state.humidity_values[sensor]
 
     def get_humidity_volts(self, sensor):
         """Get the raw value of a PSCU humidity sensor.
@@ -383,7 +557,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_values_raw[sensor] * PSCU.HUMIDITY_VREF
+        return self.__state.humidity_values_raw[sensor] * PSCU.HUMIDITY_VREF
 
     def get_humidity_set_point(self, sensor):
         """Get the set point of a PSCU humidity sensor.
@@ -396,7 +570,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_set_points[sensor]
+        return self.__state.humidity_set_points[sensor]
 
     def get_humidity_set_point_volts(self, sensor):
         """Get the raw set point of a PSCU humidity sensor.
@@ -409,7 +583,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_set_points_raw[sensor] * PSCU.HUMIDITY_VREF
+        return self.__state.humidity_set_points_raw[sensor] * PSCU.HUMIDITY_VREF
 
     def get_humidity_tripped(self, sensor):
         """Get the trip status of a PSCU humidity sensor.
@@ -422,7 +596,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_trips[sensor]
+        return self.__state.humidity_trips[sensor]
 
     def get_humidity_trace(self, sensor):
         """Get the trip status of a PSCU humidity sensor.
@@ -435,7 +609,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_traces[sensor]
+        return self.__state.humidity_traces[sensor]
 
     def get_humidity_disabled(self, sensor):
         """Get the disabled status of a PSCU humidity sensor.
@@ -448,7 +622,7 @@ class PSCU(I2CContainer):
         if sensor >= self. num_humidities or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__humidity_disabled[sensor]
+        return self.__state.humidity_disabled[sensor]
 
     def get_humidity_name(self, sensor):
         """Get the name of a PSCU humidity sensor.
@@ -488,7 +662,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_values[sensor]
+        return self.__state.leak_values[sensor]
 
     def get_leak_volts(self, sensor):
         """Get the raw value of a PSCU leak sensor.
@@ -501,7 +675,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_values_raw[sensor] * PSCU.LEAK_VREF
+        return self.__state.leak_values_raw[sensor] * PSCU.LEAK_VREF
 
     def get_leak_set_point(self, sensor):
         """Get the set point of a PSCU leak sensor.
@@ -514,7 +688,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_set_points[sensor]
+        return self.__state.leak_set_points[sensor]
 
     def get_leak_set_point_volts(self, sensor):
         """Get the raw set point of a PSCU leak sensor.
@@ -527,7 +701,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_set_points_raw[sensor] * PSCU.LEAK_VREF
+        return self.__state.leak_set_points_raw[sensor] * PSCU.LEAK_VREF
 
     def get_leak_tripped(self, sensor):
         """Get the trip status of a PSCU leak sensor.
@@ -540,7 +714,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_trips[sensor]
+        return self.__state.leak_trips[sensor]
 
     def get_leak_trace(self, sensor):
         """Get the trip status of a PSCU leak sensor.
@@ -553,7 +727,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_traces[sensor]
+        return self.__state.leak_traces[sensor]
 
     def get_leak_disabled(self, sensor):
         """Get the disabled status of a PSCU leak sensor.
@@ -566,7 +740,7 @@ class PSCU(I2CContainer):
         if sensor >= self.num_leak_sensors or sensor < 0:
             raise I2CException('Illegal sensor index {} specified'.format(sensor))
 
-        return self.__leak_disabled[sensor]
+        return self.__state.leak_disabled[sensor]
 
     def get_leak_name(self, sensor):
         """Get the name of a PSCU leak sensor.
@@ -602,7 +776,7 @@ class PSCU(I2CContainer):
 
         :returns: pump flow in l/min
         """
-        return self.__pump_flow
+        return self.__state.pump_flow
 
     def get_pump_flow_volts(self):
         """Get the raw value of the PSCU pump flow sensor.
@@ -611,7 +785,7 @@ class PSCU(I2CContainer):
 
         :returns: raw pump flow in volts
         """
-        return self.__pump_flow_raw * PSCU.PUMP_VREF
+        return self.__state.pump_flow_raw * PSCU.PUMP_VREF
 
     def get_pump_set_point(self):
         """Get the value of the PSCU pump flow set point.
@@ -620,7 +794,7 @@ class PSCU(I2CContainer):
 
         :returns: pump flow set point in l/min
         """
-        return self.__pump_set_point
+        return self.__state.pump_set_point
 
     def get_pump_set_point_volts(self):
         """Get the raw value of the PSCU pump flow set point.
@@ -629,7 +803,7 @@ class PSCU(I2CContainer):
 
         :returns: raw pump flow set point in volts
         """
-        return self.__pump_set_point_raw * PSCU.PUMP_VREF
+        return self.__state.pump_set_point_raw * PSCU.PUMP_VREF
 
     def get_pump_tripped(self):
         """Get the trip status of the PSCU pump flow meter.
@@ -638,7 +812,7 @@ class PSCU(I2CContainer):
 
         :returns: pump flow sensor trip status
         """
-        return self.__pump_trip
+        return self.__state.pump_trip
 
     def get_pump_mode(self):
         """Get the mode of the PSCU pumpsensor.
@@ -657,7 +831,7 @@ class PSCU(I2CContainer):
 
         :returns: fan speed in RPM
         """
-        return self.__fan_speed
+        return self.__state.fan_speed
 
     def get_fan_speed_volts(self):
         """Get the current raw fan speed.
@@ -666,7 +840,7 @@ class PSCU(I2CContainer):
 
         :returns: raw fan speed in volts
         """
-        return self.__fan_speed_raw * PSCU.FAN_VREF
+        return self.__state.fan_speed_raw * PSCU.FAN_VREF
 
     def get_fan_set_point(self):
         """Get the current fan speed set point.
@@ -675,7 +849,7 @@ class PSCU(I2CContainer):
 
         :returns: fan speed set point in RPM
         """
-        return self.__fan_set_point
+        return self.__state.fan_set_point
 
     def get_fan_set_point_volts(self):
         """Get the current raw fan speed set point.
@@ -684,7 +858,7 @@ class PSCU(I2CContainer):
 
         :returns: raw fan speed set point in volts
         """
-        return self.__fan_set_point_raw * PSCU.FAN_VREF
+        return self.__state.fan_set_point_raw * PSCU.FAN_VREF
 
     def get_fan_target(self):
         """Get the current fan target speed.
@@ -702,7 +876,7 @@ class PSCU(I2CContainer):
 
         :returns: fan speed trip status
         """
-        return self.__fan_trip
+        return self.__state.fan_trip
 
     def get_fan_mode(self):
         """Get the mode of the PSCU fan sensor.
@@ -725,7 +899,7 @@ class PSCU(I2CContainer):
         if quad_idx >= self.num_quads or quad_idx < 0:
             raise I2CException("Illegal quad index {} specified".format(quad_idx))
 
-        return self.__quad_traces[quad_idx]
+        return self.__state.quad_traces[quad_idx]
 
     def get_position(self):
         """Get the value of the detector position sensor.
@@ -737,7 +911,7 @@ class PSCU(I2CContainer):
 
         :returns: transverse position in mm
         """
-        return self.__position
+        return self.__state.position
 
     def get_position_volts(self):
         """Get the value of the detector position sensor.
@@ -747,7 +921,7 @@ class PSCU(I2CContainer):
 
         :returns: raw poisition in volts
         """
-        return self.__position_raw * PSCU.POSITION_VREF
+        return self.__state.position_raw * PSCU.POSITION_VREF
 
     def get_armed(self):
         """Get the PSCU interlock armed state.
@@ -757,7 +931,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU interlock armed state as bool
         """
-        return self.__armed
+        return self.__state.armed
 
     def get_all_enabled(self):
         """Get the status indicating all outputs are enabled.
@@ -778,7 +952,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU health state as bool
         """
-        return self.__healthy
+        return self.__state.healthy
 
     def get_temperature_state(self):
         """Get the status of the PSCU temperature interlock.
@@ -788,7 +962,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU overall temperature status as bool
         """
-        return self.__sensor_states[0]
+        return self.__state.sensor_states[0]
 
     def get_temperature_latched(self):
         """Get the status of the PSCU temperature latch.
@@ -799,7 +973,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU temperature latch state as bool
         """
-        return self.__latched_states[0]
+        return self.__state.latched_states[0]
 
     def get_trace_state(self):
         """Get the status of the PSCU trace interlock.
@@ -809,7 +983,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU overall trace status as bool
         """
-        return self.__sensor_states[4]
+        return self.__state.sensor_states[4]
 
     def get_trace_latched(self):
         """Get the status of the PSCU trace latch.
@@ -820,7 +994,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU trace latch state as bool
         """
-        return self.__latched_states[3]
+        return self.__state.latched_states[3]
 
     def get_fan_state(self):
         """Get the status of the PSCU fan speed interlock.
@@ -830,7 +1004,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU fan speed status as bool
         """
-        return self.__sensor_states[1]
+        return self.__state.sensor_states[1]
 
     def get_fan_latched(self):
         """Get the status of the PSCU fan speed latch.
@@ -841,7 +1015,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU fan speed latch state as bool
         """
-        return self.__latched_states[1]
+        return self.__state.latched_states[1]
 
     def get_pump_state(self):
         """Get the status of the PSCU pump flow rate interlock.
@@ -851,7 +1025,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU pump flow rate status as bool
         """
-        return self.__sensor_states[2]
+        return self.__state.sensor_states[2]
 
     def get_pump_latched(self):
         """Get the status of the PSCU pump flow rate latch.
@@ -862,7 +1036,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU pump flow rate latch state as bool
         """
-        return self.__latched_states[2]
+        return self.__state.latched_states[2]
 
     def get_humidity_state(self):
         """Get the status of the PSCU humidity interlock.
@@ -872,7 +1046,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU overall humidity status as bool
         """
-        return self.__sensor_states[3]
+        return self.__state.sensor_states[3]
 
     def get_humidity_latched(self):
         """Get the status of the PSCU humidity latch.
@@ -883,7 +1057,7 @@ class PSCU(I2CContainer):
 
         :returns: PSCU humidity latch state as bool
         """
-        return self.__latched_states[4]
+        return self.__state.latched_states[4]
 
     def get_all_latched(self):
         """Get the state of all latch conditions.
@@ -893,19 +1067,27 @@ class PSCU(I2CContainer):
 
         :returns: PSCU latch states as a list of bools
         """
-        return self.__latched_states
+        return list(self.__state.latched_states)
 
     def get_enable_interval(self):
         """Get the quad output enable interval.
 
-        This method returns the quad output enable interval, which is used to sequence
-        quad outputs on at a fixed rate to avoid inrush. The enable interval is set
-        as an argument at initialisation, i.e. passed in as an option.
+        This method returns the quad output enable interval, which is the maximum time a
+        sequenced quad output enable waits for the inrush current of previously enabled outputs
+        to settle. The enable interval is set as an argument at initialisation, i.e. passed in
+        as an option.
 
         :returns: enable interval in seconds
         """
         return self.quad_enable_interval
 
+    def get_enable_sequence_status(self):
+        """Get the status of the quad output enable sequence.
+
+        :returns: dictionary of enable sequence status, as returned by the enable sequencer
+        """
+        return self.enable_sequencer.get_status()
+
     def quad_enable_channel(self, quad_idx, channel_idx):
         """Enable a quad output channel.
 
@@ -915,62 +1097,103 @@ class PSCU(I2CContainer):
         :param quad_idx: index of quad to control
         :param channel_idx: index of the channel to turn on
         """
-        if quad_idx >= self.num_quads or quad_idx < 0:
-            raise I2CException("Illegal quad index {} specified".format(quad_idx))
+        logging.debug("Enabling quad {} channel {} output".format(quad_idx, channel_idx))
+        self.set_quad_enables([(quad_idx, channel_idx)], True)
 
-        if channel_idx >= Quad.NUM_CHANNELS or channel_idx < 0:
-            raise I2CException("Illegal channel index {} specified".format(channel_idx))
+    def set_quad_enables(self, channels, enable):
+        """Enable or disable a set of quad output channels.
 
-        logging.debug("Enabling quad {} channel {} output".format(quad_idx, channel_idx))
-        self.quad[quad_idx].set_enable(channel_idx, True)
+        This method enables or disables the specified quad output channels with the minimum
+        number of MCP transactions. The channels are grouped by quad, and on each quad the
+        current enable states are read and all channels not already in the requested state
+        toggled together, i.e. one read and a single enable toggle per quad. If the enable
+        states of a quad cannot be read, its channels are left unchanged, the remaining quads
+        are still set, and an exception is then raised.
+
+        :param channels: iterable of (quad index, channel index) pairs
+        :param enable: bool flag indicating requested enable or disable state
+        """
+        quad_channels = {}
+        for (quad_idx, channel_idx) in channels:
+            if quad_idx >= self.num_quads or quad_idx < 0:
+                raise I2CException("Illegal quad index {} specified".format(quad_idx))
+
+            if channel_idx >= Quad.NUM_CHANNELS or channel_idx < 0:
+                raise I2CException("Illegal channel index {} specified".format(channel_idx))
+
+            quad_channels.setdefault(quad_idx, {})[channel_idx] = enable
+
+        # The bus is held across the read and toggle of each quad, so that the enables cannot
+        # be changed by another thread between them
+        failed = []
+        for (quad_idx, quad_enables) in sorted(quad_channels.items()):
+            try:
+                with self.bus_manager:
+                    self.quad[quad_idx].set_enables(quad_enables, refresh=True)
+            except I2CException as e:
+                logging.error("Failed to set quad {} enables: {}".format(quad_idx, e))
+                failed.append(quad_idx)
+
+        if failed:
+            raise I2CException("Failed to set enables of quads {}".format(failed))
 
     def enable_all(self, enable):
         """Enable or disable all quad output channels.
 
         This method enables or disables all quad output channels. To avoid excessive inrush
-        current, an enable command launches a sequence of deferred calls to enable the channels
-        at the interval specified as an initialisation argument. A disable command clears any
-        queued enables and turns off all channels at once.
+        current, an enable command starts the enable sequencer, which enables groups of channels
+        within the inrush budget as the current of previously enabled channels settles, or at
+        the latest at the enable interval. A disable command cancels the sequence and any queued
+        deferred commands and turns off all channels at once, holding the I2C bus at safety
+        priority so that the disable is not delayed by polling.
 
         :param enable: bool flag indicating requested enable or disable state
         """
         logging.debug("Called enable_all with value {}".format(enable))
 
         if enable:
-            # Loop over all quads and channels in system, adding enable command to deferred
-            # executor queue
-            for quad_idx in range(len(self.quad)):
-                for channel in range(Quad.NUM_CHANNELS):
-                    self.deferred_executor.enqueue(
-                        self.quad_enable_channel, self.quad_enable_interval, quad_idx, channel
-                    )
+            # Start the sequenced enable of all quads and channels in the system
+            self.enable_sequencer.start(self.__all_quad_channels())
             self.__all_enabled = True
         else:
-            # Clear any pending turn-on command from the queue first, then turn off all channels
-            # immediately.
+            # Cancel any enable sequence and clear any pending command from the queue first,
+            # then turn off all channels immediately.
+            self.enable_sequencer.cancel()
             num_enables_pending = self.deferred_executor.pending()
             if num_enables_pending > 0:
                 logging.debug("Clearing {} pending quad enable commands from queue".format(
                     num_enables_pending
                 ))
                 self.deferred_executor.clear()
-            for quad_idx in range(len(self.quad)):
-                for channel in range(Quad.NUM_CHANNELS):
-                    self.quad[quad_idx].set_enable(channel, False)
-            self.__all_enabled = False
+            # All quads are disabled even if one of them fails, and the all-enabled state is
+            # cleared before any failure is reported
+            try:
+                with self.bus_manager.hold(I2CBusManager.PRIORITY_SAFETY):
+                    self.set_quad_enables(self.__all_quad_channels(), False)
+            finally:
+                self.__all_enabled = False
+
+    def __all_quad_channels(self):
+        """Return the (quad index, channel index) pairs of all quad output channels."""
+        return [
+            (quad_idx, channel)
+            for quad_idx in range(len(self.quad)) for channel in range(Quad.NUM_CHANNELS)
+        ]
 
     def set_armed(self, arm):
         """Arm or disarm the PSCU interlock.
 
         This method arms or disarms the PSCU interlock by toggling the appropriate arm/disarm
-        output pin with a low-high-low transition.
+        output pin with a low-high-low transition. The I2C bus is held at safety priority for
+        the transition, so that it is neither delayed nor interleaved with polling.
 
         :param value: bool flag indicating arm or disarm
         """
         pin = 0 if arm else 1
-        self.mcp_misc[0].output(pin, MCP23008.LOW)
-        self.mcp_misc[0].output(pin, MCP23008.HIGH)
-        self.mcp_misc[0].output(pin, MCP23008.LOW)
+        with self.bus_manager.hold(I2CBusManager.PRIORITY_SAFETY):
+            self.mcp_misc[0].output(pin, MCP23008.LOW)
+            self.mcp_misc[0].output(pin, MCP23008.HIGH)
+            self.mcp_misc[0].output(pin, MCP23008.LOW)
 
     def set_fan_target(self, target_percent):
         """Set the fan speed target value.
@@ -1005,13 +1228,14 @@ class PSCU(I2CContainer):
             return
 
         # Detect front-panel button presses to cycle through the LCD pages
-        if GPIO.event_detected("P9_11"):
-            self.lcd.previous_page()
-        elif GPIO.event_detected("P9_12"):
-            self.lcd.next_page()
+        if GPIO is not None:
+            if GPIO.event_detected("P9_11"):
+                self.lcd.previous_page()
+            elif GPIO.event_detected("P9_12"):
+                self.lcd.next_page()
 
         # Set the LCD backlight colour depending on the overall system health
-        if self.__healthy:
+        if self.__state.healthy:
             self.lcd.set_colour(LcdDisplay.GREEN)
         else:
             self.lcd.set_colour(LcdDisplay.RED)
@@ -1019,6 +1243,41 @@ class PSCU(I2CContainer):
         # Update the LCD content
         self.lcd.update()
 
+    def get_converters(self):
+        """Get the ADC code converters of all PSCU and Quad sensor channels.
+
+        :returns: dictionary of converter path, e.g. temperature or quad/0/channel_current:
+        ChannelConverter instance
+        """
+        converters = dict(self.converters)
+        for (quad_idx, quad) in enumerate(self.quad):
+            for (name, converter) in quad.converters.items():
+                converters['quad/{}/{}'.format(quad_idx, name)] = converter
+
+        return converters
+
+    def set_calibrations(self, calibrations):
+        """Set the calibrations of sensor channels.
+
+        This method sets the calibrations of the sensor channels specified in a dictionary
+        keyed by the converter path, with elements separated by underscores, and channel index,
+        e.g. temperature_3 or quad_0_channel_current_2. Each calibration is a tuple of gain,
+        offset and curve coefficients, as parsed from a configuration option by
+        parse_calibration(). Calibrations of unknown channels are ignored with a warning.
+
+        :param calibrations: dictionary of channel key: calibration tuple
+        """
+        calibrations = dict(calibrations)
+
+        for (path, converter) in self.get_converters().items():
+            for channel in range(converter.num_channels):
+                key = '{}_{}'.format(path.replace('/', '_'), channel)
+                if key in calibrations:
+                    converter.set_calibration(channel, *calibrations.pop(key))
+
+        for key in sorted(calibrations):
+            logging.warning("Ignoring calibration of unknown sensor channel {}".format(key))
+
     def convert_ad7998_temp(self, scaled_adc_val):
         """Convert a scaled ADC reading into temperature.
 
@@ -1028,10 +1287,7 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full-scale
         :returns: temperature value in Celsius.
         """
-        temp_scale_v_kelvin = 0.005
-        temp_celsius = ((scaled_adc_val * PSCU.TEMP_VREF) / temp_scale_v_kelvin) - 273.15
-
-        return temp_celsius
+        return PSCU.TEMP_CONVERSION.convert(scaled_adc_val)
 
     def convert_ad7998_humidity(self, scaled_adc_val):
         """Convert a scaled ADC reading into humidity.
@@ -1042,12 +1298,7 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full-scale
         :returns: humidity value in percent.
         """
-        humidity_scale = 0.031
-        humidity_offset = 0.8
-
-        humidity_percent = ((scaled_adc_val * PSCU.HUMIDITY_VREF) - humidity_offset) / humidity_scale
-
-        return humidity_percent
+        return PSCU.HUMIDITY_CONVERSION.convert(scaled_adc_val)
 
     def convert_ad7998_leak_impedance(self, scaled_adc_val):
         """Convert a scaled ADC reading into leak sensor impedance.
@@ -1058,17 +1309,7 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full-scale
         :returns: leak impedance value in megaohms.
         """
-        leak_max_voltage = 2.5 
-        leak_sense_current = 150e-9
-
-        leak_sensor_voltage = scaled_adc_val * PSCU.LEAK_VREF
-        leak_impedance = (
-            (leak_max_voltage - (leak_sensor_voltage / leak_max_voltage)) / leak_sense_current
-        )
-
-        leak_impedance_megaohm = leak_impedance / 1.0e6
-
-        return leak_impedance_megaohm
+        return PSCU.LEAK_CONVERSION.convert(scaled_adc_val)
 
     def convert_ad7998_fan(self, scaled_adc_val):
         """Convert a scaled ADC reading into fan speed.
@@ -1079,12 +1320,7 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full-scale
         :returns: fan speed value in RPM.
         """
-        fan_scale = 4.5
-        fan_max = 3000.0
-
-        fan_rpm = ((scaled_adc_val * PSCU.FAN_VREF) / fan_scale) * fan_max
-
-        return fan_rpm
+        return PSCU.FAN_CONVERSION.convert(scaled_adc_val)
 
     def convert_ad7998_pump(self, scaled_adc_val):
         """Convert a scaled ADC reading into pump flow rate.
@@ -1095,12 +1331,7 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full-scale
         :returns: pump flow rate in litre/min
         """
-        pump_scale = 4.32
-        pump_max = 35.0
-
-        pump_lpermin = ((scaled_adc_val * PSCU.PUMP_VREF) / pump_scale) * pump_max
-
-        return pump_lpermin
+        return PSCU.PUMP_CONVERSION.convert(scaled_adc_val)
 
     def convert_ad7998_position(self, scaled_adc_val):
         """Convert a scaled ADC reading into a transverse detector position.
@@ -1112,169 +1343,367 @@ class PSCU(I2CContainer):
         :input scaled_adc_val ADC channel reading as fraction of full scale
         :returns: transverse detector position in mm.
         """
-        position_scale = 0.1
+        return self.position_conversion.convert(scaled_adc_val)
 
-        linear_position = ((scaled_adc_val * PSCU.POSITION_VREF) / position_scale)
-        transverse_position = ((2.0 * linear_position) / sqrt(2.0)) - self.detector_position_offset
+    def poll_all_sensors(self):
+        """Poll all sensor channels and update the sensor state snapshot.
+
+        This method polls all PSCU sensor channels, converts to the appropriate values and builds
+        a new sensor state snapshot, which is swapped in once all sensors, including those of the
+        quads, have been polled. The snapshot is then used for future access by the appropriate
+        get_xxxx methods, which therefore always see a consistent state from a single poll cycle.
+        All poll groups in the scheduler are marked as polled.
+
+        The device reads of all sensor groups and quads are planned and then executed grouped
+        by TCA channel, so that a poll cycle makes at most one TCA channel switch per channel.
+        """
+        switch_count = self.tca.switch_count
+
+        # Plan the reads of all groups, including polling the sensors of all quads, then execute
+        # them in TCA channel order
+        planner = TransactionPlanner(self.tca)
+        updates = [
+            self.__plan_interlock(planner),
+            self.__plan_temperatures(planner),
+            self.__plan_misc(planner),
+        ]
+        for quad in self.quad:
+            planner.add(quad, quad.poll_all_sensors)
+        planner.execute()
 
-        return transverse_position
+        # Update a mutable draft of the next sensor state from the values read, updating the
+        # interlock states first, since the disabled states they contain determine which
+        # analogue sensor values are updated
+        draft = self.__state.draft()
+        for update in updates:
+            update(draft)
 
-    def poll_all_sensors(self):
-        """Poll all sensor channels and update their values in the internal buffers.
+        # Swap in the new sensor state snapshot
+        self.__state = self.__state.next_state(draft, time.time())
+
+        self.poll_scheduler.mark_all_polled()
+        self.__poll_mux_switches = self.tca.switch_count - switch_count
+
+    def poll_sensors(self):
+        """Poll the sensor groups which are due to be polled.
+
+        This method polls each sensor group whose poll interval has elapsed, in priority order,
+        swapping in a new sensor state snapshot after each group is polled. This is intended
+        to be called periodically by an update loop, at an interval no longer than the
+        shortest poll group interval, and avoids a client access dependent load being placed
+        on the hardware.
+
+        :returns: list of names of the sensor groups polled
+        """
+        switch_count = self.tca.switch_count
+        polled = self.poll_scheduler.poll_due()
+        if polled:
+            self.__poll_mux_switches = self.tca.switch_count - switch_count
+        return polled
+
+    def get_poll_status(self):
+        """Get the status of the sensor poll groups.
+
+        :returns: dictionary of poll group name: status, i.e. interval, priority and statistics
+        """
+        return self.poll_scheduler.get_status()
+
+    def get_bus_status(self):
+        """Get the status of the I2C bus manager.
+
+        :returns: dictionary of bus manager status, as returned by the bus manager
+        """
+        return self.bus_manager.get_status()
+
+    def get_poll_mux_switches(self):
+        """Get the number of TCA channel switches made in the most recent poll cycle.
+
+        :returns: number of TCA channel switches
+        """
+        return self.__poll_mux_switches
+
+    def __add_poll_groups(self, poll_intervals, poll_priorities):
+        """Add the sensor poll groups to the poll scheduler.
+
+        This internal method adds the interlock, temperature, miscellaneous and quad sensor
+        groups to the poll scheduler, with intervals and priorities overriding the defaults
+        for any group types specified. The interlock group is polled less often by default if
+        interlock interrupts are enabled. The polls of the quads are staggered across the quad
+        poll interval to spread the load on the bus.
+
+        :param poll_intervals: dictionary of group type: poll interval overrides
+        :param poll_priorities: dictionary of group type: priority overrides
+        """
+        intervals = dict(self.DEFAULT_POLL_INTERVALS)
+        if self.interlock_interrupt_pin is not None:
+            intervals['interlock'] = self.DEFAULT_INTERRUPT_INTERLOCK_POLL_INTERVAL
+        intervals.update(poll_intervals or {})
+        priorities = dict(self.DEFAULT_POLL_PRIORITIES)
+        priorities.update(poll_priorities or {})
+
+        for (name, plan_func) in (
+            ('interlock', self.__plan_interlock),
+            ('temperature', self.__plan_temperatures),
+            ('misc', self.__plan_misc),
+        ):
+            self.poll_scheduler.add_group(
+                name, partial(self.__poll_group, plan_func), intervals[name], priorities[name]
+            )
+
+        for (idx, quad) in enumerate(self.quad):
+            self.poll_scheduler.add_group(
+                'quad{}'.format(idx), partial(self.__poll_quad, quad),
+                intervals['quad'], priorities['quad'],
+                offset=(idx * intervals['quad']) / self.num_quads
+            )
+
+    def __poll_group(self, plan_func):
+        """Poll a sensor group and swap in a new sensor state snapshot.
+
+        :param plan_func: function planning the reads of the group, returning a function to
+        update a draft of the next sensor state from the values read
+        """
+        planner = TransactionPlanner(self.tca)
+        update = plan_func(planner)
+        planner.execute()
+
+        draft = self.__state.draft()
+        update(draft)
+        self.__state = self.__state.next_state(draft, time.time())
+
+    def __poll_quad(self, quad):
+        """Poll the sensors of a quad and swap in a new sensor state snapshot.
+
+        The PSCU snapshot is renewed so that its generation reflects the change in quad state.
+
+        :param quad: quad to poll
+        """
+        quad.poll_all_sensors()
+        self.__state = self.__state.next_state(self.__state.draft(), time.time())
+
+    def __plan_interlock(self, planner):
+        """Plan the reads of the interlock MCP trip, trace, disabled, armed and latch states.
+
+        The GPIO registers of all the monitor and misc MCPs are read as bitmasks in a single
+        planned pass. If interlock interrupts are enabled, the interrupt state of the MCPs is
+        read, so that the captured state of pins which caused an interrupt is seen and the
+        interrupt cleared.
 
-        This method polls all PSCU sensor channels, converts to the appropriate values and stores
-        them in the internal buffer variables for future access by the appropriate get_xxxx methods.
-        This is intended to be called periodically by an update loop and avoids a client access
-        dependent load being placed on the hardware.
+        :param planner: transaction planner to add the reads to
+        :returns: function updating a draft of the next sensor state from the values read
         """
-        # Read input pin state of the monitor MCPs
-        mcp_mon_0 = self.mcp_temp_mon[0].input_pins([0, 1, 2, 3, 4, 5, 7])
-        mcp_mon_1 = self.mcp_temp_mon[1].input_pins(self.ALL_PINS)
-        mcp_mon_2 = self.mcp_temp_mon[2].input_pins(self.ALL_PINS)
-        mcp_mon_3 = self.mcp_temp_mon[3].input_pins([0, 1, 2, 3, 4, 5])
+        mcps = self.mcp_temp_mon + self.mcp_misc
+        if self.interlock_interrupt_pin is not None:
+            reads = [planner.add(mcp, mcp.read_captured_gpio) for mcp in mcps]
+        else:
+            reads = [planner.add(mcp, mcp.read_gpio) for mcp in mcps]
+        return partial(self.__update_interlock, reads)
+
+    def __update_interlock(self, reads, draft):
+        """Update the interlock states in a draft of the next sensor state.
 
-        # Read input pin state of the misc MPCs
-        mcp_misc_0 = self.mcp_misc[0].input_pins([2, 3, 4, 5, 6, 7])
-        mcp_misc_1 = self.mcp_misc[1].input_pins([0, 1, 2, 3])
-        mcp_misc_2 = self.mcp_misc[2].input_pins([1, 2, 4, 5, 6, 7])
-        mcp_misc_3 = self.mcp_misc[3].input_pins([0, 1, 2, 3, 4])
+        The states are decoded directly from the GPIO register bitmasks read from the MCPs.
 
-        # Read, convert and store all temperature values and setpoints from the ADCs and
-        # extract and store all trip, trace and disabled states from the MCPs
+        :param reads: executed planned reads of the interlock MCPs
+        :param draft: draft of the next sensor state to update
+        """
+        (mcp_mon_0, mcp_mon_1, mcp_mon_2, mcp_mon_3,
+         mcp_misc_0, mcp_misc_1, mcp_misc_2, mcp_misc_3) = [read.result for read in reads]
 
+        # Extract and store all temperature trip, trace and disabled states
         for i in range(4):
-            self.__temperature_disabled[i + 4] = mcp_mon_0[i]
+            draft.temperature_disabled[i + 4] = bool(mcp_mon_0 & (1 << i))
 
-        self.__temperature_disabled[10] = mcp_mon_0[4]
+        draft.temperature_disabled[10] = bool(mcp_mon_0 & (1 << 4))
 
         for i in range(8):
-            self.__temperature_set_points_raw[i] = self.adc_temp_mon[0].read_input_scaled(i)
-            self.__temperature_set_points[i] = self.convert_ad7998_temp(
-                self.__temperature_set_points_raw[i]
-            )
-            self.__temperature_values_raw[i] = self.adc_temp_mon[1].read_input_scaled(i)
-            if not self.__temperature_disabled[i]:
-                self.__temperature_values[i] = self.convert_ad7998_temp(
-                    self.__temperature_values_raw[i]
-                )
-            self.__temperature_trips[i] = not bool(mcp_mon_1[i])
-            self.__temperature_traces[i] = bool(mcp_mon_2[i])
+            draft.temperature_trips[i] = not (mcp_mon_1 & (1 << i))
+            draft.temperature_traces[i] = bool(mcp_mon_2 & (1 << i))
 
         for i in range(3):
-            self.__temperature_values_raw[i + 8] = self.adc_temp_mon[2].read_input_scaled(i)
-            if not self.__temperature_disabled[i + 8]:
-                self.__temperature_values[i + 8] = self.convert_ad7998_temp(
-                    self.__temperature_values_raw[i + 8]
-                )
-            self.__temperature_set_points_raw[i + 8] = self.adc_temp_mon[2].read_input_scaled(i+4)
-            self.__temperature_set_points[i + 8] = self.convert_ad7998_temp(
-                self.__temperature_set_points_raw[i + 8]
-            )
-            self.__temperature_trips[i + 8] = not bool(mcp_mon_3[i])
-            self.__temperature_traces[i + 8] = bool(mcp_mon_3[i+3])
+            draft.temperature_trips[i + 8] = not (mcp_mon_3 & (1 << i))
+            draft.temperature_traces[i + 8] = bool(mcp_mon_3 & (1 << (i + 3)))
 
-        # Read, convert and store all humidity values and setpoints from the ADCs and
-        # extract and store all trip, trace and disabled states from the MCPs
+        # Extract and store all humidity trip and trace states
 
-        #self.__humidity_disabled[1] = mcp_mon_0[5]
+        #draft.humidity_disabled[1] = bool(mcp_mon_0 & (1 << 5))
 
         for i in range(self.num_humidities):
-
-            self.__humidity_set_points_raw[i] = self.adc_misc[0].read_input_scaled(
-                i + self.__humidity_adc_chan_offset
-            )
-            self.__humidity_set_points[i] = self.convert_ad7998_humidity(
-                self.__humidity_set_points_raw[i]
+            draft.humidity_trips[i] = not (
+                mcp_misc_1 & (1 << (i + self.__humidity_trip_chan_offset))
             )
-            self.__humidity_values_raw[i] = self.adc_misc[1].read_input_scaled(
-                i + self.__humidity_adc_chan_offset
+            draft.humidity_traces[i] = bool(
+                mcp_misc_2 & (1 << (i + self.__humidity_trace_chan_offset))
             )
-            if not self.__humidity_disabled[i]:
-                self.__humidity_values[i] = self.convert_ad7998_humidity(
-                    self.__humidity_values_raw[i]
-                )
 
-            self.__humidity_trips[i] = not bool(mcp_misc_1[i + self.__humidity_trip_chan_offset])
-            self.__humidity_traces[i] = bool(mcp_misc_2[i + self.__humidity_trace_chan_offset])
+        # Extract and store all leak sensor trip, trace and disabled states
 
-        # Read, convert and store all leak sensor values and setpoints from the ADCs and
-        # extract and store all trip, trace and disabled states from the MCPs
-
-        self.__leak_disabled[0] = mcp_mon_0[5]
+        draft.leak_disabled[0] = bool(mcp_mon_0 & (1 << 5))
 
         for i in range(self.num_leak_sensors):
+            draft.leak_trips[i] = not (mcp_misc_1 & (1 << (i + self.__leak_trip_chan_offset)))
+            draft.leak_traces[i] = bool(mcp_misc_2 & (1 << (i + self.__leak_trace_chan_offset)))
 
-            self.__leak_set_points_raw[i] = self.adc_misc[0].read_input_scaled(
-                i + self.__leak_adc_chan_offset
-            )
-            self.__leak_set_points[i] = self.convert_ad7998_leak_impedance(
-                self.__leak_set_points_raw[i]
-            )
-            self.__leak_values_raw[i] = self.adc_misc[1].read_input_scaled(
-                i + self.__leak_adc_chan_offset
-            )
-            if not self.__leak_disabled[i]:
-                self.__leak_values[i] = self.convert_ad7998_leak_impedance(
-                    self.__leak_values_raw[i]
-                )
-
-            self.__leak_trips[i] = not bool(mcp_misc_1[i + self.__leak_trip_chan_offset])
-            self.__leak_traces[i] = bool(mcp_misc_2[i + self.__leak_trace_chan_offset])
-
-        # Read, convert and store fan speed and setpoint ADC values and extract and store
-        # the fan trip status
-        self.__fan_speed_raw = self.adc_misc[1].read_input_scaled(0)
-        self.__fan_speed = self.convert_ad7998_fan(self.__fan_speed_raw)
-        self.__fan_set_point_raw = self.adc_misc[0].read_input_scaled(0)
-        self.__fan_set_point = self.convert_ad7998_fan(self.__fan_set_point_raw)
-        self.__fan_trip = not bool(mcp_misc_1[0])
-
-        # Read, convert and store pump flow speed and setpoint ADC values and extract and store
-        # the pump trip status
-        self.__pump_flow_raw = self.adc_misc[1].read_input_scaled(3)
-        self.__pump_flow = self.convert_ad7998_pump(self.__pump_flow_raw)
-        self.__pump_set_point_raw = self.adc_misc[0].read_input_scaled(3)
-        self.__pump_set_point = self.convert_ad7998_pump(self.__pump_set_point_raw)
-        self.__pump_trip = not bool(mcp_misc_1[3])
-
-        # Read, convert and save the detector position
-        self.__position_raw = self.adc_misc[1].read_input_scaled(4)
-        self.__position = self.convert_ad7998_position(self.__position_raw)
+        # Extract and store the fan and pump trip status
+        draft.fan_trip = not (mcp_misc_1 & (1 << 0))
+        draft.pump_trip = not (mcp_misc_1 & (1 << 3))
 
         # Extract and save global armed and health states
-        self.__armed = bool(mcp_misc_0[0])
-        self.__healthy = bool(mcp_misc_0[5])
+        draft.armed = bool(mcp_misc_0 & (1 << 2))
+        draft.healthy = bool(mcp_misc_0 & (1 << 7))
 
         # Extract and save the quad trace states
-        for i in range(2, 6):
-            self.__quad_traces[i - 2] = bool(mcp_misc_2[i])
+        for i in range(4):
+            draft.quad_traces[i] = bool(mcp_misc_2 & (1 << (i + 4)))
 
         # Extract and save the global sensor channel states
-        self.__sensor_states[0] = mcp_mon_0[6]
+        draft.sensor_states[0] = bool(mcp_mon_0 & (1 << 7))
         for i in range(1, 5):
-            self.__sensor_states[i] = bool(mcp_misc_0[i])
+            draft.sensor_states[i] = bool(mcp_misc_0 & (1 << (i + 2)))
 
         # Extract and save the global latch states
-        self.__latched_states = [bool(i) for i in mcp_misc_3]
+        draft.latched_states = [bool(mcp_misc_3 & (1 << i)) for i in range(5)]
 
         # Update internal all_enabled state based on current armed state since being disarmed
         # automatically turns off all quad outputs
-        if not self.__armed:
+        if not draft.armed:
             self.__all_enabled = False
 
-        # Poll sensors for all quads also
-        for quad in self.quad:
-            quad.poll_all_sensors()
+    def __plan_temperatures(self, planner):
+        """Plan the reads of the temperature monitor ADCs.
+
+        :param planner: transaction planner to add the reads to
+        :returns: function updating a draft of the next sensor state from the values read
+        """
+        # Read all required ADC channels in bulk sequence-mode conversions
+        reads = [
+            planner.add(adc, adc.read_inputs_codes, range(num_inputs))
+            for (adc, num_inputs) in zip(self.adc_temp_mon, (8, 8, 7))
+        ]
+        return partial(self.__update_temperatures, reads)
+
+    def __update_temperatures(self, reads, draft):
+        """Update the temperature values and set points in a draft of the next sensor state.
+
+        :param reads: executed planned reads of the temperature monitor ADCs
+        :param draft: draft of the next sensor state to update
+        """
+        (adc_temp_mon_0, adc_temp_mon_1, adc_temp_mon_2) = [read.result for read in reads]
+
+        # Gather the codes of all temperature values, on inputs 0-7 of the second ADC and 0-2
+        # of the third, and setpoints, on inputs 0-7 of the first ADC and 4-6 of the third
+        value_codes = adc_temp_mon_1[0:8] + adc_temp_mon_2[0:3]
+        set_point_codes = adc_temp_mon_0[0:8] + adc_temp_mon_2[4:7]
+
+        # Convert and store all temperature values and setpoints, retaining the previous value
+        # of any disabled sensors
+        draft.temperature_set_points_raw = scale_codes(set_point_codes)
+        draft.temperature_set_points = self.converters['temperature_set_point'].convert_codes(
+            set_point_codes
+        )
+        draft.temperature_values_raw = scale_codes(value_codes)
+        draft.temperature_values = self.__merge_enabled(
+            draft.temperature_values, draft.temperature_disabled,
+            self.converters['temperature'].convert_codes(value_codes)
+        )
+
+    def __plan_misc(self, planner):
+        """Plan the reads of the miscellaneous sensor ADCs.
+
+        :param planner: transaction planner to add the reads to
+        :returns: function updating a draft of the next sensor state from the values read
+        """
+        # Read all required ADC channels in bulk sequence-mode conversions
+        reads = [
+            planner.add(adc, adc.read_inputs_codes, range(num_inputs))
+            for (adc, num_inputs) in zip(self.adc_misc, (4, 5))
+        ]
+        return partial(self.__update_misc, reads)
+
+    def __update_misc(self, reads, draft):
+        """Update the miscellaneous sensor values in a draft of the next sensor state.
+
+        This updates the humidity, leak, fan, pump and position sensor values and setpoints.
+
+        :param reads: executed planned reads of the miscellaneous sensor ADCs
+        :param draft: draft of the next sensor state to update
+        """
+        (adc_misc_0, adc_misc_1) = [read.result for read in reads]
+
+        # Convert and store all humidity values and setpoints
+        humidity_inputs = slice(
+            self.__humidity_adc_chan_offset, self.__humidity_adc_chan_offset + self.num_humidities
+        )
+        draft.humidity_set_points_raw = scale_codes(adc_misc_0[humidity_inputs])
+        draft.humidity_set_points = self.converters['humidity_set_point'].convert_codes(
+            adc_misc_0[humidity_inputs]
+        )
+        draft.humidity_values_raw = scale_codes(adc_misc_1[humidity_inputs])
+        draft.humidity_values = self.__merge_enabled(
+            draft.humidity_values, draft.humidity_disabled,
+            self.converters['humidity'].convert_codes(adc_misc_1[humidity_inputs])
+        )
+
+        # Convert and store all leak sensor values and setpoints
+        leak_inputs = slice(
+            self.__leak_adc_chan_offset, self.__leak_adc_chan_offset + self.num_leak_sensors
+        )
+        draft.leak_set_points_raw = scale_codes(adc_misc_0[leak_inputs])
+        draft.leak_set_points = self.converters['leak_set_point'].convert_codes(
+            adc_misc_0[leak_inputs]
+        )
+        draft.leak_values_raw = scale_codes(adc_misc_1[leak_inputs])
+        draft.leak_values = self.__merge_enabled(
+            draft.leak_values, draft.leak_disabled,
+            self.converters['leak'].convert_codes(adc_misc_1[leak_inputs])
+        )
+
+        # Convert and store fan speed, pump flow and detector position values and the fan and
+        # pump setpoints, which are on inputs 0, 3 and 4 respectively
+        (draft.fan_speed_raw, draft.pump_flow_raw, draft.position_raw) = scale_codes(
+            [adc_misc_1[0], adc_misc_1[3], adc_misc_1[4]]
+        )
+        (draft.fan_set_point_raw, draft.pump_set_point_raw) = scale_codes(
+            [adc_misc_0[0], adc_misc_0[3]]
+        )
+        (draft.fan_speed,) = self.converters['fan'].convert_codes(adc_misc_1[0:1])
+        (draft.fan_set_point,) = self.converters['fan_set_point'].convert_codes(adc_misc_0[0:1])
+        (draft.pump_flow,) = self.converters['pump'].convert_codes(adc_misc_1[3:4])
+        (draft.pump_set_point,) = self.converters['pump_set_point'].convert_codes(
+            adc_misc_0[3:4]
+        )
+        (draft.position,) = self.converters['position'].convert_codes(adc_misc_1[4:5])
+
+    @staticmethod
+    def __merge_enabled(previous_values, disabled, values):
+        """Merge newly converted sensor values with the previous values of disabled sensors.
+
+        :param previous_values: list of previous sensor values
+        :param disabled: list of sensor disabled states
+        :param values: list of newly converted sensor values
+        :returns: list of new values of enabled sensors and previous values of disabled sensors
+        """
+        return [
+            previous if is_disabled else value
+            for (previous, is_disabled, value) in zip(previous_values, disabled, values)
+        ]
 
     def cleanup(self):
         """Clean up the PSCU server state.
 
         This method cleans up the state of the PSCU at shutdown, when called by the adapter.
         This is simply a case of setting an appropriate message on the PSCU LCD to indicate
-        that the server is no longer running.
+        that the server is no longer running and closing the display once it is written. The
+        worker thread of the I2C bus manager is also stopped.
         """
         logging.debug("PSCU cleanup: setting display message")
 
+        self.bus_manager.stop()
+
+        if self.interlock_interrupt_pin is not None:
+            GPIO.remove_event_detect(self.interlock_interrupt_pin)
+
         if not self.lcd_display_error:
             self.lcd.set_colour(LcdDisplay.YELLOW)
             self.lcd.set_content('\r   PSCU server is\r    NOT running\r\r')
+            self.lcd.close()
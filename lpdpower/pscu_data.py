@@ -4,15 +4,31 @@ This module implements PSCUData and associated classes needed to represent the
 parameter data from the LPD power supply control unit. PSCUData acts as a bridge
 between the API adapter and the underlying PSCU object instance. Other classes
 provide data containers for sensors on the PSCU, such as temperature and humidity.
+Rendered and JSON-encoded responses are cached per poll generation, so that any number of
+clients reading the same path between polls costs only a single render of the tree. The poll
+generation at which each parameter last changed is tracked, allowing clients to request only
+the parameters changed since a given generation. A read-only diagnostics subtree exposes the
+I2C transaction statistics of all devices and the status of the sensor poll groups. The
+calibrations of the sensor channels can be adjusted in the calibration subtree. The recent
+history of the sensor values is recorded in memory and served from the history subtree.
 
 James Hogge, STFC Application Engineering Group.
 """
+import json
+import threading
+from functools import partial
+
 from odin.adapters.parameter_tree import ParameterTree, ParameterTreeError
 from lpdpower.temp_data import TempData
 from lpdpower.humidity_data import HumidityData
 from lpdpower.leak_data import LeakData
 from lpdpower.quad_data import QuadData
+from lpdpower.calibration_data import CalibrationData
 from lpdpower.pscu import PSCU
+from lpdpower.i2c_device import I2CException
+from lpdpower.i2c_stats import I2CStats
+from lpdpower.history import PSCUHistory
+
 
 class PSCUDataError(Exception):
     """Simple exception class for PSCUData to wrap lower-level exceptions."""
@@ -20,6 +36,30 @@ class PSCUDataError(Exception):
     pass
 
 
+def flatten(tree, prefix=''):
+    """Flatten a parameter tree into a dictionary of parameter path: value.
+
+    Dictionaries and non-empty lists are flattened recursively, list elements being indexed by
+    position, all other values being treated as leaf parameters.
+
+    :param tree: parameter tree to flatten
+    :param prefix: path prefix of the tree
+    :returns: dictionary of parameter path: value
+    """
+    if isinstance(tree, dict) and tree:
+        items = tree.items()
+    elif isinstance(tree, list) and tree:
+        items = enumerate(tree)
+    else:
+        return {prefix: tree}
+
+    values = {}
+    for (key, value) in items:
+        path = '{}/{}'.format(prefix, key) if prefix else str(key)
+        values.update(flatten(value, path))
+    return values
+
+
 class PSCUData(object):
     """Data container for a PSCU and associated quads.
 
@@ -29,6 +69,20 @@ class PSCUData(object):
     and data model for, the adapter and the underlying devices.
     """
 
+    # Maximum number of attempts to render a response consistent with a single poll generation
+    MAX_RENDER_ATTEMPTS = 3
+
+    # Path of the history data, which is served from the history rather than the parameter tree
+    HISTORY_DATA_PATH = 'history/data'
+
+    # Top-level subtrees not tracked for changes between poll generations, since they are not
+    # polled sensor or control parameters, or, as for the I2C statistics, change on every poll
+    UNTRACKED_PATHS = ('calibration', 'diagnostics', 'history')
+
+    # Top-level subtrees whose values can change without a new poll generation, which are
+    # rendered on every request rather than served from the cache of encoded responses
+    VOLATILE_PATHS = UNTRACKED_PATHS + ('allEnabled', 'enableSequence', 'displayError')
+
     def __init__(self, *args, **kwargs):
         """Initialise the PSCUData instance.
 
@@ -38,8 +92,12 @@ class PSCUData(object):
 
         :param args: positional arguments to be passed if creating a new PSCU
         :param kwargs: keyword arguments to be passed if creating a new PSCU, or if
-        a pscu key is present, that is used as an existing PSCU object instance
+        a pscu key is present, that is used as an existing PSCU object instance. The
+        history_interval and history_capacity keys, if present, configure the sensor history.
         """
+        history_interval = kwargs.pop('history_interval', PSCUHistory.DEFAULT_INTERVAL)
+        history_capacity = kwargs.pop('history_capacity', PSCUHistory.DEFAULT_CAPACITY)
+
         # If a PSCU has been passed in keyword arguments use that, otherwise create a new one
         if 'pscu' in kwargs:
             self.pscu = kwargs['pscu']
@@ -60,8 +118,17 @@ class PSCUData(object):
             LeakData(self.pscu, i) for i in range(self.pscu.num_leak_sensors)
         ]
 
+        # Create the in-memory history of the sensor values
+        self.history = PSCUHistory(self.pscu, history_interval, history_capacity)
+
+        # Get the calibration data container of the PSCU and Quad sensor channels
+        self.calibration_data = CalibrationData(self.pscu.get_converters())
+
+        # Port of the server-push stream of the PSCU state, zero if not enabled
+        self.stream_port = 0
+
         # Build the parameter tree of the PSCU
-        self.param_tree = ParameterTree({
+        tree = {
             "quad": {
                 "quads": [q.param_tree for q in self.quad_data],
                 'trace': (self.get_quad_traces, None),
@@ -109,36 +176,326 @@ class PSCUData(object):
             "armed": (self.pscu.get_armed, self.pscu.set_armed),
             "allEnabled": (self.pscu.get_all_enabled, self.pscu.enable_all),
             "enableInterval": (self.pscu.get_enable_interval, None),
+            "enableSequence": (self.pscu.get_enable_sequence_status, None),
             "displayError": (self.pscu.get_display_error, None),
-        })
+            "streamPort": (self.get_stream_port, None),
+            "calibration": self.calibration_data.param_tree,
+            "history": {
+                "interval": (self.history.get_interval, None),
+                "capacity": (self.history.get_capacity, None),
+                "samples": (self.history.get_samples, None),
+                "channels": (self.history.get_channels, None),
+                "rollups": (self.history.get_rollups, None),
+            },
+            "diagnostics": self.__build_diagnostics_tree(),
+        }
+        self.param_tree = ParameterTree(tree)
+
+        # Parameter trees of each top-level subtree, allowing a subtree to be rendered alone,
+        # and the paths of the subtrees tracked for changes between poll generations
+        self.__subtrees = {
+            path: ParameterTree({path: subtree}) for (path, subtree) in tree.items()
+        }
+        self.tracked_paths = sorted(path for path in tree if path not in self.UNTRACKED_PATHS)
 
-    def get(self, path):
+        # Cache of encoded responses, keyed by path, of ((generation, set count), encoded
+        # response) tuples, counting set() calls so that responses rendered during a set are not
+        # cached
+        self.__response_cache = {}
+        self.__set_count = 0
+
+        # Values of all parameters, keyed by path, and the poll generation at which each last
+        # changed, updated at most once per poll generation
+        self.__change_lock = threading.Lock()
+        self.__change_tracked_generation = None
+        self.__change_values = {}
+        self.__change_generations = {}
+
+    def __build_diagnostics_tree(self):
+        """Build the diagnostics subtree of the PSCU parameter tree.
+
+        This internal method builds a read-only tree of the I2C transaction statistics for the
+        TCA multiplexer and each device on each TCA channel, keyed by device address, together
+        with totals for each channel and for the whole bus, the status of the sensor poll
+        groups, the number of TCA channel switches made in the most recent poll cycle, the
+        number of interlock interrupts handled, the status of the deferred command executor and
+        the status of the I2C bus manager.
+
+        :returns: dictionary of the diagnostics subtree
+        """
+        self.i2c_devices = [self.pscu.tca]
+
+        channels = {}
+        for (channel, devices) in sorted(self.pscu.tca.get_channel_devices().items()):
+            devices = sorted(devices, key=lambda device: device.address)
+            self.i2c_devices.extend(devices)
+            channels[str(channel)] = {
+                'total': (partial(self.get_i2c_stats, devices), None),
+                'devices': {
+                    '{:#04x}'.format(device.address): (device.stats.as_dict, None)
+                    for device in devices
+                },
+            }
+
+        return {
+            'total': (partial(self.get_i2c_stats, self.i2c_devices), None),
+            'mux': (self.pscu.tca.stats.as_dict, None),
+            'channels': channels,
+            'polling': (self.pscu.get_poll_status, None),
+            'mux_switches_per_poll': (self.pscu.get_poll_mux_switches, None),
+            'interlock_interrupts': (self.pscu.get_interlock_interrupt_count, None),
+            'deferred': (self.pscu.deferred_executor.get_status, None),
+            'bus': (self.pscu.get_bus_status, None),
+        }
+
+    def get(self, path, since=None):
         """Get parameters from the underlying parameter tree.
 
         This method simply wraps underlying ParameterTree method so that an exceptions can be
-        re-raised with an appropriate PSCUDataError.
+        re-raised with an appropriate PSCUDataError. If a poll generation is specified, only the
+        parameters changed since that generation are returned, as described in get_changed().
+        Paths in the history data subtree return the full recorded history, as get_history().
 
         :param path: path of parameter tree to get
+        :param since: optional poll generation to return changed parameters since
         :returns: parameter tree at that path as a dictionary
         """
+        if since is not None:
+            return self.get_changed(path, since)
+
+        if self.is_history_path(path):
+            return self.get_history(path)
+
         try:
             return self.param_tree.get(path)
         except ParameterTreeError as e:
             raise PSCUDataError(e)
 
+    def get_encoded(self, path):
+        """Get parameters from the underlying parameter tree as an encoded JSON response.
+
+        This method returns the parameter tree at the specified path, encoded as JSON bytes.
+        Encoded responses are cached and keyed by the poll generation of the PSCU, so the tree is
+        only rendered and encoded once per poll cycle for each path requested, regardless of the
+        number of clients. If the PSCU is polled or parameters set while the tree is being
+        rendered, the render is retried so that the cached response is consistent with a single
+        poll generation. Volatile subtrees, whose values can change between polls, are rendered
+        on every request, the full tree being assembled from the cached encoded responses of
+        the other subtrees and freshly encoded volatile subtrees.
+
+        :param path: path of parameter tree to get
+        :returns: parameter tree at that path as encoded JSON bytes
+        """
+        path = path.strip('/')
+
+        if not path:
+            return b'{' + b', '.join(
+                json.dumps(subtree_path).encode('utf-8') + b': ' + self.__get_encoded_subtree(
+                    subtree_path
+                ) for subtree_path in sorted(self.__subtrees)
+            ) + b'}'
+
+        if path.split('/')[0] in self.VOLATILE_PATHS:
+            return json.dumps(self.get(path)).encode('utf-8')
+
+        return self.__get_encoded_cached(path, partial(self.get, path))
+
+    def __get_encoded_subtree(self, path):
+        """Get a top-level subtree of the parameter tree as encoded JSON bytes.
+
+        :param path: path of the top-level subtree
+        :returns: subtree contents as encoded JSON bytes
+        """
+        def render():
+            return self.get_subtree(path)[path]
+
+        if path in self.VOLATILE_PATHS:
+            return json.dumps(render()).encode('utf-8')
+
+        return self.__get_encoded_cached(('', path), render)
+
+    def __get_encoded_cached(self, key, render):
+        """Get an encoded response from the cache, rendering and caching it if necessary.
+
+        :param key: key of the response in the cache
+        :param render: function rendering the response
+        :returns: response as encoded JSON bytes
+        """
+        state = (self.pscu.get_generation(), self.__set_count)
+
+        cached = self.__response_cache.get(key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        consistent = False
+        for _ in range(self.MAX_RENDER_ATTEMPTS):
+            response = render()
+            rendered_state = (self.pscu.get_generation(), self.__set_count)
+            if rendered_state == state:
+                consistent = True
+                break
+            state = rendered_state
+
+        encoded = json.dumps(response).encode('utf-8')
+
+        if consistent:
+            self.__response_cache[key] = (state, encoded)
+
+        return encoded
+
+    def get_changed(self, path, since):
+        """Get the parameters changed since a poll generation.
+
+        This method returns the parameters at or below the specified path whose values have
+        changed since the specified poll generation, as a dictionary of parameter path: value,
+        together with the current generation, which the client can pass in its next request.
+        The tree is rendered and compared with the previous values at most once per poll
+        generation, regardless of the number of clients. If the generation specified is newer
+        than the current generation, e.g. after a restart of the server, all parameters are
+        returned. Parameters changed by a set() are reported with the next poll generation.
+        Only the polled sensor and control subtrees are tracked for changes, a request for a
+        path in an untracked subtree, e.g. diagnostics, returning all its parameters.
+
+        :param path: path of parameter tree to get
+        :param since: poll generation to return changed parameters since
+        :returns: dictionary of current generation and changed parameter path: value
+        """
+        path = path.strip('/')
+
+        subtree_path = path.split('/')[0]
+        if subtree_path in self.UNTRACKED_PATHS:
+            generation = self.pscu.get_generation()
+            changed = {
+                param_path: value
+                for (param_path, value) in flatten(self.get_subtree(subtree_path)).items()
+                if param_path == path or param_path.startswith(path + '/')
+            }
+            if not changed:
+                raise PSCUDataError('Invalid path: {}'.format(path))
+            return {'generation': generation, 'changed': changed}
+
+        with self.__change_lock:
+            self.__track_changes()
+            generation = self.__change_tracked_generation
+
+            if since > generation:
+                since = None
+
+            changed = {}
+            path_found = not path
+            for (param_path, value) in self.__change_values.items():
+                if path and param_path != path and not param_path.startswith(path + '/'):
+                    continue
+                path_found = True
+                if since is None or self.__change_generations[param_path] > since:
+                    changed[param_path] = value
+
+        if not path_found:
+            raise PSCUDataError('Invalid path: {}'.format(path))
+
+        return {'generation': generation, 'changed': changed}
+
+    def __track_changes(self):
+        """Update the poll generation at which each parameter last changed.
+
+        This internal method renders the tracked subtrees of the parameter tree if the poll
+        generation has changed since it was last called, recording the generation as the change
+        generation of any parameter whose value differs from that previously rendered. It must be
+        called with the change lock held.
+        """
+        generation = self.pscu.get_generation()
+        if generation == self.__change_tracked_generation:
+            return
+
+        values = {}
+        for tracked_path in self.tracked_paths:
+            values.update(flatten(self.get_subtree(tracked_path)))
+        for (param_path, value) in values.items():
+            if param_path not in self.__change_values or self.__change_values[param_path] != value:
+                self.__change_generations[param_path] = generation
+
+        for param_path in set(self.__change_generations) - set(values):
+            del self.__change_generations[param_path]
+
+        self.__change_values = values
+        self.__change_tracked_generation = generation
+
+    def get_subtree(self, path):
+        """Render a top-level subtree of the parameter tree.
+
+        :param path: path of the top-level subtree
+        :returns: dictionary containing the rendered subtree keyed by its path
+        """
+        try:
+            return self.__subtrees[path].get('')
+        except ParameterTreeError as e:
+            raise PSCUDataError(e)
+
+    def is_history_path(self, path):
+        """Return True if a path is in the history data subtree.
+
+        :param path: path of parameter tree
+        :returns: True if the path is in the history data subtree
+        """
+        path = path.strip('/')
+        return path == self.HISTORY_DATA_PATH or path.startswith(self.HISTORY_DATA_PATH + '/')
+
+    def get_history(self, path, start=None, end=None, decimation=1, resolution=None):
+        """Get the recorded history of sensor values.
+
+        This method returns the recorded history of the sensor channels below the specified
+        path in the history data subtree, e.g. history/data/quad/0 for all channels of the
+        first quad. The history is kept out of the parameter tree, so that it is not rendered
+        in full tree reads, and is returned as a list of sample timestamps and a dictionary of
+        channel path: values, optionally restricted to a time range and decimated. The history
+        is returned at the specified resolution, either raw samples or a rollup of the minimum,
+        maximum and mean over a period, or if none is specified, at the finest resolution
+        reaching back to the start time.
+
+        :param path: path in the history data subtree
+        :param start: optional earliest sample timestamp to return
+        :param end: optional latest sample timestamp to return
+        :param decimation: interval between returned samples
+        :param resolution: optional resolution of the history, e.g. raw or 1m
+        :returns: dictionary of resolution, timestamp list and a dictionary of channel values
+        """
+        if not self.is_history_path(path):
+            raise PSCUDataError('Invalid path: {}'.format(path))
+
+        try:
+            return self.history.get(
+                path.strip('/')[len(self.HISTORY_DATA_PATH):], start, end, decimation,
+                resolution
+            )
+        except ValueError as e:
+            raise PSCUDataError(e)
+
     def set(self, path, data):
         """Set parameters in underlying parameter tree.
 
         This method simply wraps underlying ParameterTree method so that an exceptions can be
-        re-raised with an appropriate PSCUDataError.
+        re-raised with an appropriate PSCUDataError, including any I2C error raised by the PSCU
+        while setting the values. Since setting parameters can change values outside of a poll
+        cycle, the cache of encoded responses is cleared.
 
         :param path: path of parameter tree to set values for
         :param data: dictionary of new data values to set in the parameter tree
         """
+        self.__set_count += 1
+        self.__response_cache.clear()
         try:
             self.param_tree.set(path, data)
-        except ParameterTreeError as e:
+        except (ParameterTreeError, I2CException) as e:
             raise PSCUDataError(e)
+        finally:
+            self.__set_count += 1
+
+    def get_stream_port(self):
+        """Return the port of the server-push stream of the PSCU state.
+
+        :returns: stream port, or zero if streaming is not enabled
+        """
+        return self.stream_port
 
     def get_all_latched(self):
         """Return the global latch status of the PSCU.
@@ -150,6 +507,14 @@ class PSCUData(object):
         """
         return all(self.pscu.get_all_latched())
 
+    def get_i2c_stats(self, devices):
+        """Return the combined I2C transaction statistics of a list of devices.
+
+        :param devices: list of I2CDevice instances
+        :returns: dictionary of combined statistics
+        """
+        return I2CStats.combine(device.stats for device in devices).as_dict()
+
     def get_quad_traces(self):
         """Return the trace status for the quads in the PSCU.
 
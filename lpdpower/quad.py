@@ -10,8 +10,11 @@ from lpdpower.i2c_device import I2CException
 from lpdpower.i2c_container import I2CContainer
 from lpdpower.mcp23008 import MCP23008
 from lpdpower.ad7998 import AD7998
+from lpdpower.sensor_state import QuadState
+from lpdpower.conversion import LinearConversion, ChannelConverter
 
 import logging
+import time
 
 class Quad(I2CContainer):
     """Quad class.
@@ -31,12 +34,16 @@ class Quad(I2CContainer):
     # Output FET failed voltage detection threshold
     FET_FAILED_DELTA = 5.0
 
+    # Linear conversions of scaled ADC readings to voltage and current
+    VOLTAGE_CONVERSION = LinearConversion(5 * 16)
+    CURRENT_CONVERSION = LinearConversion(5 * 4)
+
     def __init__(self):
         """Initialise the Quad device.
 
         This method initialises the Quad device, setting up the internal
-        I2C devices into the appropriate modes and creating internal buffer variables
-        for all sensor channels.
+        I2C devices into the appropriate modes and creating the initial sensor state
+        snapshot for all sensor channels.
         """
         I2CContainer.__init__(self)
 
@@ -56,14 +63,34 @@ class Quad(I2CContainer):
         self.adc_power = self.attach_device(AD7998, 0x22)
         self.adc_fuse = self.attach_device(AD7998, 0x21)
 
-        # Create internal buffers for all sensor channels
-        self.__channel_voltage = [0.0] * self.num_channels
-        self.__channel_current = [0.0] * self.num_channels
-        self.__fuse_voltage = [0.0] * self.num_channels
-        self.__fuse_blown = [False] * self.num_channels
-        self.__fet_failed = [False] * self.num_channels
-        self.__channel_enable = [False] * self.num_channels
-        self.__supply_voltage = 0.0
+        # Create the batched converters of ADC codes to channel voltages and currents, fuse
+        # voltages and supply voltage, with per-channel calibrations
+        self.converters = {
+            'channel_voltage': ChannelConverter(Quad.VOLTAGE_CONVERSION, self.num_channels),
+            'channel_current': ChannelConverter(Quad.CURRENT_CONVERSION, self.num_channels),
+            'fuse_voltage': ChannelConverter(Quad.VOLTAGE_CONVERSION, self.num_channels),
+            'supply_voltage': ChannelConverter(Quad.VOLTAGE_CONVERSION, 1),
+        }
+
+        # Create the initial sensor state snapshot for all sensor channels
+        self.__state = QuadState(
+            channel_voltage=[0.0] * self.num_channels,
+            channel_current=[0.0] * self.num_channels,
+            fuse_voltage=[0.0] * self.num_channels,
+            fuse_blown=[False] * self.num_channels,
+            fet_failed=[False] * self.num_channels,
+            channel_enable=[False] * self.num_channels,
+            supply_voltage=0.0,
+        )
+
+    def get_state(self):
+        """Get the current sensor state snapshot.
+
+        This method returns the current immutable sensor state snapshot of the Quad.
+
+        :return current QuadState snapshot
+        """
+        return self.__state
 
     def get_channel_voltage(self, channel):
         """Get output channel voltage.
@@ -77,7 +104,7 @@ class Quad(I2CContainer):
             raise I2CException(
                 "%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__channel_voltage[channel]
+        return self.__state.channel_voltage[channel]
 
     def get_channel_current(self, channel):
         """Get output channel current.
@@ -91,7 +118,7 @@ class Quad(I2CContainer):
             raise I2CException(
                 "%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__channel_current[channel]
+        return self.__state.channel_current[channel]
 
     def get_fuse_voltage(self, channel):
         """Get output channel fuse voltage.
@@ -104,7 +131,7 @@ class Quad(I2CContainer):
         if channel > 3 or channel < 0:
             raise I2CException("%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__fuse_voltage[channel]
+        return self.__state.fuse_voltage[channel]
 
     def get_fuse_blown(self, channel):
         """Get output channel fuse blown status.
@@ -117,7 +144,7 @@ class Quad(I2CContainer):
         if channel > 3 or channel < 0:
             raise I2CException("%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__fuse_blown[channel]
+        return self.__state.fuse_blown[channel]
 
     def get_fet_failed(self, channel):
         """Get output channel FET failure status.
@@ -130,7 +157,7 @@ class Quad(I2CContainer):
         if channel > 3 or channel < 0:
             raise I2CException("%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__fet_failed[channel]
+        return self.__state.fet_failed[channel]
 
     def get_enable(self, channel):
         """Get output channel enable.
@@ -143,7 +170,7 @@ class Quad(I2CContainer):
         if channel > 3 or channel < 0:
             raise I2CException("%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
-        return self.__channel_enable[channel]
+        return self.__state.channel_enable[channel]
 
     def get_supply_voltage(self):
         """Get the Quad box supply voltage.
@@ -152,7 +179,7 @@ class Quad(I2CContainer):
 
         :return supply voltage in volts
         """
-        return self.__supply_voltage
+        return self.__state.supply_voltage
 
     def set_enable(self, channel, enabled):
         """Set the output enable for a given channel.
@@ -165,14 +192,31 @@ class Quad(I2CContainer):
         self.set_enables({channel: enabled})
 
     # Sets multiple channels on or off
-    def set_enables(self, channels):
+    def set_enables(self, channels, refresh=False):
         """Set the output enable for multiple channels.
 
         This method sets the output enable state of multiple channels specified in a
-        dict of channel: enabled pairs, e.g. {0: True, 1: False, ...}.
+        dict of channel: enabled pairs, e.g. {0: True, 1: False, ...}. All channels not already
+        in the requested state are toggled together with a single enable toggle. The current
+        enable states are taken from the sensor state snapshot, or if refresh is set, read from
+        the MCP, so that channels changed since the last poll are not toggled in error. If the
+        read fails, no channels are toggled, since toggling on the basis of an unknown state
+        could enable channels that are off.
 
         :param channels: dict of channel enables to set
+        :param refresh: read the current enable states from the MCP rather than the snapshot
         """
+        if refresh:
+            gpio = self.mcp.read_gpio()
+            if gpio == self.mcp.ERROR:
+                raise I2CException("Unable to read output enable states of the Quad")
+            enables = [
+                bool(gpio & (1 << pin))
+                for pin in range(self.num_channels, self.num_channels * 2)
+            ]
+        else:
+            enables = self.__state.channel_enable
+
         data = {}
 
         for channel in channels:
@@ -181,7 +225,7 @@ class Quad(I2CContainer):
                     "%s is not a channel on the Quad. Must be between 0 & 3" % channel)
 
             # If the channel is not currently in the desired state (on/off)
-            if self.get_enable(channel) != channels[channel]:
+            if enables[channel] != channels[channel]:
                 data[channel] = True
 
         # No channels to toggle
@@ -190,45 +234,62 @@ class Quad(I2CContainer):
 
         # Toggle the output enable of the Quad to set the appropriate enable state.
         # A 0-1-0 transition is required by the control circuit to enable a channel.
-        self.mcp.disable_outputs()
-        self.mcp.output_pins(data)
-        self.mcp.disable_outputs()
+        self.mcp.pulse_outputs(data)
 
     def poll_all_sensors(self):
-        """Poll all sensor channels into buffer variables.
+        """Poll all sensor channels into a new sensor state snapshot.
 
-        This method polls all sensor channels into the internal buffer variables. This mechanism
-        allows the polling rate to be controlled independently of any get_xxx calls being made
-        by client software.
+        This method polls all sensor channels into a new sensor state snapshot, which replaces
+        the current one once complete. This mechanism allows the polling rate to be controlled
+        independently of any get_xxx calls being made by client software, which always see a
+        consistent state from a single poll.
         """
+        # Create a mutable draft of the next sensor state from the current snapshot
+        draft = self.__state.draft()
+
         # Read and udpate the output enable states
         enable_pins = range(4, 4 + self.NUM_CHANNELS)
-        self.__channel_enable = self.mcp.input_pins(enable_pins)
-
-        # For each channel read an dupate the voltage and current values
-        for channel in range(self.NUM_CHANNELS):
-            self.__channel_voltage[channel] = self.adc_power.read_input_scaled(channel) * 5 * 16
-            self.__channel_current[channel] = self.adc_power.read_input_scaled(channel + 4) * 5 * 4
-            self.__fuse_voltage[channel] = self.adc_fuse.read_input_scaled(channel) * 5 * 16
-
-        # Read and update the supply voltage
-        self.__supply_voltage = self.adc_fuse.read_input_scaled(4) * 5 * 16
-
-        if self.__supply_voltage > (self.SUPPLY_VOLTAGE_NOMINAL / 2.0):
+        draft.channel_enable = self.mcp.input_pins(enable_pins)
+
+        # Read all power and fuse ADC channels in bulk. The power ADC has channel voltages on
+        # inputs 0-3 and currents on inputs 4-7, the fuse ADC has fuse voltages on inputs 0-3
+        # and the supply voltage on input 4
+        power_codes = self.adc_power.read_inputs_codes(range(self.NUM_CHANNELS * 2))
+        fuse_codes = self.adc_fuse.read_inputs_codes(range(self.NUM_CHANNELS + 1))
+
+        # Convert the voltage and current values of all channels
+        draft.channel_voltage = self.converters['channel_voltage'].convert_codes(
+            power_codes[:self.NUM_CHANNELS]
+        )
+        draft.channel_current = self.converters['channel_current'].convert_codes(
+            power_codes[self.NUM_CHANNELS:]
+        )
+        draft.fuse_voltage = self.converters['fuse_voltage'].convert_codes(
+            fuse_codes[:self.NUM_CHANNELS]
+        )
+
+        # Update the supply voltage
+        (draft.supply_voltage,) = self.converters['supply_voltage'].convert_codes(
+            fuse_codes[self.NUM_CHANNELS:]
+        )
+
+        if draft.supply_voltage > (self.SUPPLY_VOLTAGE_NOMINAL / 2.0):
             for channel in range(self.NUM_CHANNELS):
 
                 # Check if the fuse is blown for each channel - if the supply voltage is present
                 # (i.e. above 24V), determine if there is a significant difference between the
                 # fuse and supply voltage.
-                fuse_delta_volts = abs(self.__fuse_voltage[channel] - self.__supply_voltage)
-                self.__fuse_blown[channel] = (fuse_delta_volts > self.FUSE_BLOWN_DELTA)
+                fuse_delta_volts = abs(draft.fuse_voltage[channel] - draft.supply_voltage)
+                draft.fuse_blown[channel] = (fuse_delta_volts > self.FUSE_BLOWN_DELTA)
 
                 # Check if the output FET has failed closed for each channel. If the supply voltage
                 # is present (i.e. above 24V), determine if there is a significant ouput voltage
                 # when a channel is disabled.
-                if not self.__channel_enable[channel]:
-                    fet_delta_volts = abs(self.__channel_voltage[channel] - self.__supply_voltage)
-                    self.__fet_failed[channel] = (fet_delta_volts < self.FET_FAILED_DELTA)
+                if not draft.channel_enable[channel]:
+                    fet_delta_volts = abs(draft.channel_voltage[channel] - draft.supply_voltage)
+                    draft.fet_failed[channel] = (fet_delta_volts < self.FET_FAILED_DELTA)
                 else:
-                    self.__fet_failed[channel] = False
- 
+                    draft.fet_failed[channel] = False
+
+        # Swap in the new sensor state snapshot
+        self.__state = self.__state.next_state(draft, time.time())
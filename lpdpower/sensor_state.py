@@ -0,0 +1,118 @@
+"""sensor_state - immutable sensor state snapshot classes.
+
+This module implements the immutable snapshot classes used to hold the polled sensor state
+of the PSCU and Quad devices. Each poll cycle builds a new snapshot from a mutable draft of
+the previous one and swaps it in with a single reference assignment, so that readers always
+see a complete and consistent set of values from one poll cycle without needing any locking.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+
+
+class SensorStateDraft(object):
+    """Mutable draft of a sensor state snapshot.
+
+    This class provides a simple mutable container of state field values, allowing the next
+    snapshot to be built up field by field during a poll cycle.
+    """
+
+    def __init__(self, **values):
+        """Initialise the draft with the specified field values.
+
+        :param values: keyword arguments of field names and values
+        """
+        self.__dict__.update(values)
+
+
+class SensorState(object):
+    """Immutable sensor state snapshot.
+
+    This class implements the base of an immutable, slotted sensor state snapshot. Derived
+    classes define the names of their state fields in the FIELDS attribute, which must also
+    be used as their __slots__. Sequence field values are stored as tuples.
+    """
+
+    __slots__ = ('generation', 'timestamp')
+    FIELDS = ()
+
+    def __init__(self, generation=0, timestamp=0.0, **values):
+        """Initialise the snapshot.
+
+        :param generation: poll generation number of the snapshot
+        :param timestamp: time at which the snapshot was completed
+        :param values: keyword arguments of values for all state fields
+        """
+        object.__setattr__(self, 'generation', generation)
+        object.__setattr__(self, 'timestamp', timestamp)
+
+        for field in self.FIELDS:
+            value = values[field]
+            if isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        """Prevent modification of the snapshot."""
+        raise AttributeError("{} is immutable".format(type(self).__name__))
+
+    def values(self):
+        """Return the field values of the snapshot.
+
+        :returns: dictionary of field values, with sequence fields returned as lists
+        """
+        values = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            values[field] = list(value) if isinstance(value, tuple) else value
+        return values
+
+    def draft(self):
+        """Return a mutable draft copy of the snapshot.
+
+        :returns: SensorStateDraft populated with the field values of the snapshot
+        """
+        return SensorStateDraft(**self.values())
+
+    def next_state(self, draft, timestamp):
+        """Build the next snapshot from a draft.
+
+        This method returns a new snapshot of the same type built from the values in a draft,
+        with the generation number incremented.
+
+        :param draft: SensorStateDraft containing the values of the new snapshot
+        :param timestamp: time at which the new snapshot was completed
+        :returns: new snapshot instance
+        """
+        return type(self)(self.generation + 1, timestamp, **vars(draft))
+
+
+class PSCUState(SensorState):
+    """Immutable snapshot of the polled PSCU sensor state."""
+
+    FIELDS = (
+        'temperature_values', 'temperature_values_raw',
+        'temperature_set_points', 'temperature_set_points_raw',
+        'temperature_trips', 'temperature_traces', 'temperature_disabled',
+        'humidity_values', 'humidity_values_raw',
+        'humidity_set_points', 'humidity_set_points_raw',
+        'humidity_trips', 'humidity_traces', 'humidity_disabled',
+        'leak_values', 'leak_values_raw',
+        'leak_set_points', 'leak_set_points_raw',
+        'leak_trips', 'leak_traces', 'leak_disabled',
+        'pump_flow', 'pump_flow_raw', 'pump_set_point', 'pump_set_point_raw', 'pump_trip',
+        'fan_speed', 'fan_speed_raw', 'fan_set_point', 'fan_set_point_raw', 'fan_trip',
+        'position', 'position_raw',
+        'quad_traces',
+        'armed', 'healthy', 'sensor_states', 'latched_states',
+    )
+    __slots__ = FIELDS
+
+
+class QuadState(SensorState):
+    """Immutable snapshot of the polled Quad sensor state."""
+
+    FIELDS = (
+        'channel_voltage', 'channel_current', 'fuse_voltage',
+        'fuse_blown', 'fet_failed', 'channel_enable', 'supply_voltage',
+    )
+    __slots__ = FIELDS
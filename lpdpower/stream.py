@@ -0,0 +1,205 @@
+"""stream.py - server-push streaming of PSCU state over WebSocket.
+
+This module implements the PSCUStream class, which pushes the PSCU parameter tree to connected
+WebSocket clients. On connection, a client is sent a snapshot of the full tree. Thereafter, after
+each poll cycle, the parameters changed since the previously published generation are obtained
+from PSCUData and a single encoded delta is sent to all clients. The cost of serving N clients
+is therefore one render and serialisation per poll cycle, rather than N full-tree reads.
+
+Messages are JSON objects with a generation field and either a tree field, containing the full
+parameter tree, or a delta field, containing a dictionary of parameter path: changed value, with
+path elements separated by '/'.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+import json
+import logging
+import threading
+
+try:
+    from urllib.parse import urlparse
+except ImportError:  # pragma: no cover
+    from urlparse import urlparse
+
+from tornado.ioloop import IOLoop
+from tornado.web import Application
+from tornado.websocket import WebSocketHandler, WebSocketClosedError
+
+
+class PSCUStreamHandler(WebSocketHandler):
+    """PSCUStreamHandler - WebSocket handler for PSCU stream clients.
+
+    This class registers each connected WebSocket client with the PSCUStream instance, which
+    sends it the full parameter tree and subsequent deltas.
+    """
+
+    def initialize(self, stream):
+        """Initialise the handler.
+
+        :param stream: PSCUStream instance to register the client with
+        """
+        self.stream = stream
+
+    def check_origin(self, origin):
+        """Check the origin of a connection is allowed by the stream.
+
+        Since the UI is served from the ODIN server port, connections from a page served by the
+        same host on any port are allowed, as are those from any other origin allowed by the
+        stream.
+
+        :param origin: origin of the connection
+        :returns: True if the origin is allowed
+        """
+        return self.stream.is_origin_allowed(origin, self.request.host)
+
+    def open(self):
+        """Register the client with the stream when the connection is opened."""
+        self.stream.add_client(self)
+
+    def on_close(self):
+        """Remove the client from the stream when the connection is closed."""
+        self.stream.remove_client(self)
+
+
+class PSCUStream(object):
+    """PSCUStream - server-push stream of PSCU parameter tree deltas.
+
+    This class publishes deltas of the parameters of the PSCU parameter tree changed since the
+    previously published poll generation to connected WebSocket clients when the poll
+    generation of the PSCU changes. The update() method is intended to be called from the
+    background poller thread after each update; messages are sent to clients on the IOLoop the
+    stream is listening on.
+    """
+
+    def __init__(self, pscu_data, allowed_origins=None):
+        """Initialise the PSCUStream instance.
+
+        :param pscu_data: PSCUData instance providing the parameter tree and PSCU
+        :param allowed_origins: optional list of origins, e.g. 'https://host:8888', allowed to
+        connect in addition to pages served by the same host as the stream
+        """
+        self.pscu_data = pscu_data
+        self.allowed_origins = set(
+            origin.rstrip('/').lower() for origin in (allowed_origins or [])
+        )
+
+        self.clients = set()
+        self.generation = None
+        self.publish_count = 0
+
+        self.ioloop = None
+        self.server = None
+
+        self.__lock = threading.Lock()
+
+    def listen(self, port, address='', ssl_options=None):
+        """Start listening for WebSocket client connections.
+
+        :param port: port to listen on
+        :param address: optional address to listen on, defaulting to all interfaces
+        :param ssl_options: optional TLS options, e.g. a dict of certfile and keyfile, allowing
+        clients to connect securely when the UI is served over HTTPS
+        """
+        self.ioloop = IOLoop.current()
+        app = Application([(r'/', PSCUStreamHandler, {'stream': self})])
+        self.server = app.listen(port, address, ssl_options=ssl_options)
+        logging.debug("PSCU stream listening on port {}".format(port))
+
+    def stop(self):
+        """Stop listening for client connections and close all connected clients."""
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+
+        for client in list(self.clients):
+            client.close()
+        self.clients.clear()
+
+    def is_origin_allowed(self, origin, host):
+        """Return True if a client connection from an origin is allowed.
+
+        A connection is allowed if the origin is in the allowed origins, or has the same
+        hostname as the host the client connected to, ignoring the port.
+
+        :param origin: origin of the connection, e.g. 'http://host:8888'
+        :param host: host the client connected to, e.g. 'host:8889'
+        :returns: True if the origin is allowed
+        """
+        origin = origin.rstrip('/').lower()
+        if origin in self.allowed_origins:
+            return True
+
+        origin_hostname = urlparse(origin).hostname
+        host_hostname = urlparse('//' + host).hostname
+        return origin_hostname is not None and origin_hostname == host_hostname
+
+    def add_client(self, client):
+        """Add a client to the stream, sending it the full parameter tree.
+
+        :param client: client with a write_message method, e.g. a PSCUStreamHandler
+        """
+        generation = self.pscu_data.pscu.get_generation()
+        snapshot = json.dumps({'generation': generation, 'tree': self.pscu_data.get('')})
+
+        with self.__lock:
+            self.clients.add(client)
+
+        self.__send(client, snapshot)
+
+    def remove_client(self, client):
+        """Remove a client from the stream.
+
+        :param client: client to remove
+        """
+        with self.__lock:
+            self.clients.discard(client)
+
+    def update(self):
+        """Publish a delta of changed parameters if the PSCU poll generation has changed.
+
+        This method obtains the parameters changed since the previously published generation,
+        at most once per poll generation, and sends a single encoded delta to all clients.
+
+        :returns: encoded delta message sent, or None if no parameters changed
+        """
+        if self.pscu_data.pscu.get_generation() == self.generation:
+            return None
+
+        since = self.generation if self.generation is not None else -1
+        changes = self.pscu_data.get_changed('', since)
+        self.generation = changes['generation']
+
+        if not changes['changed']:
+            return None
+
+        message = json.dumps({'generation': self.generation, 'delta': changes['changed']})
+        self.publish_count += 1
+
+        if self.ioloop is not None:
+            self.ioloop.add_callback(self.__broadcast, message)
+        else:
+            self.__broadcast(message)
+
+        return message
+
+    def __broadcast(self, message):
+        """Send a message to all connected clients.
+
+        :param message: encoded message to send
+        """
+        with self.__lock:
+            clients = list(self.clients)
+
+        for client in clients:
+            self.__send(client, message)
+
+    def __send(self, client, message):
+        """Send a message to a client, removing the client if the connection has closed.
+
+        :param client: client to send the message to
+        :param message: encoded message to send
+        """
+        try:
+            client.write_message(message)
+        except WebSocketClosedError:
+            self.remove_client(client)
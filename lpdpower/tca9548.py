@@ -33,6 +33,9 @@ class TCA9548(I2CDevice):
         self._attached_devices = {}
         self._selected_channel = None
 
+        # Count of writes made to the TCA to switch the selected channel
+        self.switch_count = 0
+
         # Disable any already enabled devices by clearing output bus selection
         self.write8(0, 0)
 
@@ -41,7 +44,9 @@ class TCA9548(I2CDevice):
 
         This method is called internally to allow attached devices to transparently
         select the appropriate TCA multiplexer channel. The TCA is accessed only if the
-        device being accessed is not on the currently selected channel.
+        device being accessed is not on the currently selected channel. The channel selection
+        cannot be combined with the device access in a single I2C_RDWR transaction, since the
+        TCA9548 only switches channel on the STOP condition ending the selection write.
 
         :param device: the device for which the callback is being called.
         """
@@ -61,6 +66,7 @@ class TCA9548(I2CDevice):
 
         # Write to the TCA to select the correct channel
         self.write8(0, 1 << self._attached_devices[device])
+        self.switch_count += 1
 
     def attach_device(self, channel, device, *args, **kwargs):
         """Attach an I2C device to the TCA multiplexer.
@@ -80,6 +86,7 @@ class TCA9548(I2CDevice):
         if callable(device):
             self.write8(0, 1 << channel)
             self._selected_channel = channel
+            self.switch_count += 1
             device = device(*args, **kwargs)
 
         # Raise an exception if the device is not and I2CDevice or I2CContainer instance
@@ -92,6 +99,41 @@ class TCA9548(I2CDevice):
         device.pre_access = self.__device_callback
         return device
 
+    def get_channel(self, device):
+        """Get the TCA multiplexer channel an attached device is present on.
+
+        :param device: attached I2CDevice or I2CContainer instance
+        :return: TCA channel of the device
+        """
+        if device not in self._attached_devices:
+            raise I2CException('Device %s is not attached to this TCA' % device)
+
+        return self._attached_devices[device]
+
+    def get_selected_channel(self):
+        """Get the currently selected TCA multiplexer channel.
+
+        :return: selected TCA channel, or None if no channel has been selected
+        """
+        return self._selected_channel
+
+    def get_channel_devices(self):
+        """Get the I2C devices attached to each TCA multiplexer channel.
+
+        This method returns a dictionary of the I2CDevice instances attached on each channel,
+        including those contained in any I2CContainer instances attached to the TCA.
+
+        :return: dictionary of channel: list of I2CDevice instances
+        """
+        channel_devices = {}
+        for device, channel in self._attached_devices.items():
+            if isinstance(device, I2CContainer):
+                devices = device.get_devices()
+            else:
+                devices = [device]
+            channel_devices.setdefault(channel, []).extend(devices)
+        return channel_devices
+
     def remove_device(self, device):
         """Remove an I2C device from the TCA multiplexer.
 
@@ -26,7 +26,7 @@ class TestAD7998():
         
     def set_read_return_value(self, value):
         
-        self.ad7998.bus.read_word_data.return_value = value
+        self.ad7998.bus.read_i2c_block_data.return_value = [value >> 8, value & 0xff]
         
     def test_init_sets_cycle_register(self):
     
@@ -35,10 +35,20 @@ class TestAD7998():
     def test_read_raw(self):
         
         channel = 1
-        self.set_read_return_value(0x3412)
+        self.set_read_return_value(0x1234)
         
         val = self.ad7998.read_input_raw(channel)
         assert_equal(val, 0x1234)
+        self.ad7998.bus.read_i2c_block_data.assert_called_with(self.address, 0x90, 2)
+
+    def test_read_raw_error(self):
+
+        self.ad7998.bus.read_i2c_block_data.side_effect = IOError('mocked error')
+        try:
+            val = self.ad7998.read_input_raw(0)
+        finally:
+            self.ad7998.bus.read_i2c_block_data.side_effect = None
+        assert_equal(val, AD7998.ERROR)
         
     def test_read_raw_illegal_channel(self):
         
@@ -50,7 +60,7 @@ class TestAD7998():
     def test_read_input_scaled_fs(self):
         
         channel = 1
-        self.set_read_return_value(0xff1f)
+        self.set_read_return_value(0x1fff)
         
         val = self.ad7998.read_input_scaled(channel)
         assert_equal(val, 1.0)
@@ -58,7 +68,7 @@ class TestAD7998():
     def test_read_input_scaled_zero(self):
         
         channel = 2
-        self.set_read_return_value(0x0020)
+        self.set_read_return_value(0x2000)
         
         val = self.ad7998.read_input_scaled(channel)
         assert_equal(val, 0.0)
@@ -66,7 +76,72 @@ class TestAD7998():
     def test_read_input_scaled_midscale(self):
         
         channel = 7
-        self.set_read_return_value(0x0078)
+        self.set_read_return_value(0x7800)
         
         val = self.ad7998.read_input_scaled(channel)
-        assert_equal(val, 2048.0/4095.0)
\ No newline at end of file
+        assert_equal(val, 2048.0/4095.0)
+
+    def test_read_inputs_raw(self):
+
+        channels = [0, 1, 3]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x01, 0x23, 0x14, 0x56, 0x3f, 0xff]
+
+        vals = self.ad7998.read_inputs_raw(channels)
+        assert_equal(vals, [0x0123, 0x1456, 0x3fff])
+        self.ad7998.bus.read_i2c_block_data.assert_called_with(
+            self.address, AD7998.CMD_CONVERT_SEQUENCE, len(channels) * 2
+        )
+
+    def test_read_inputs_raw_programs_config(self):
+
+        channels = [2, 5]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x20, 0x00, 0x50, 0x00]
+
+        self.ad7998.read_inputs_raw(channels)
+        self.ad7998.bus.write_word_data.assert_called_with(self.address, AD7998.CONFIG_REG, 0x4802)
+
+        self.ad7998.bus.write_word_data.reset_mock()
+        self.ad7998.read_inputs_raw(channels)
+        self.ad7998.bus.write_word_data.assert_not_called()
+
+    def test_read_inputs_raw_reordered(self):
+
+        channels = [4, 2]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x21, 0x11, 0x42, 0x22]
+
+        vals = self.ad7998.read_inputs_raw(channels)
+        assert_equal(vals, [0x4222, 0x2111])
+
+    def test_read_inputs_raw_short_read(self):
+
+        channels = [0, 1]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x01]
+
+        vals = self.ad7998.read_inputs_raw(channels)
+        assert_equal(vals, [AD7998.ERROR] * len(channels))
+
+    def test_read_inputs_raw_no_channels(self):
+
+        assert_equal(self.ad7998.read_inputs_raw([]), [])
+
+    def test_read_inputs_raw_illegal_channel(self):
+
+        channel = 9
+        with assert_raises_regexp(I2CException, "Illegal channel {} requested".format(channel)):
+            self.ad7998.read_inputs_raw([0, channel])
+
+    def test_read_inputs_scaled(self):
+
+        channels = [6, 7]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x60, 0x00, 0x7f, 0xff]
+
+        vals = self.ad7998.read_inputs_scaled(channels)
+        assert_equal(vals, [0.0, 1.0])
+
+    def test_read_inputs_codes(self):
+
+        channels = [6, 7]
+        self.ad7998.bus.read_i2c_block_data.return_value = [0x60, 0x00, 0x78, 0x00]
+
+        vals = self.ad7998.read_inputs_codes(channels)
+        assert_equal(vals, [0x000, 0x800])
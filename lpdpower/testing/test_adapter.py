@@ -17,6 +17,9 @@ sys.modules['serial'] = Mock()
 sys.modules['Adafruit_BBIO'] = Mock()
 sys.modules['Adafruit_BBIO.GPIO'] = Mock()
 from lpdpower.adapter import LPDPowerAdapter
+from lpdpower.pscu import PSCU
+from lpdpower.i2c_stats import I2CStats
+from lpdpower.i2c_device import I2CDevice
 
 class TestLPDPowerAdapter():
 
@@ -25,22 +28,179 @@ class TestLPDPowerAdapter():
     def setup_class(cls, mock_pscu):
 
         cls.pscu = mock_pscu
+        cls.pscu.return_value.tca.stats = I2CStats()
         cls.adapter = LPDPowerAdapter()
 
+        # Set all mocked PSCU getters to return JSON-encodable values
+        for name in dir(PSCU):
+            if name.startswith('get_'):
+                getattr(cls.adapter.pscuData.pscu, name).return_value = 0
+        cls.adapter.pscuData.pscu.get_all_latched.return_value = [True] * 4
+        cls.adapter.pscuData.pscu.deferred_executor.get_status.return_value = {}
+
         cls.request = Mock()
+        cls.request.query_arguments = {}
         cls.request.headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
 
+    def test_interrupt_callback_wakes_poller(self):
+
+        self.adapter.pscuData.pscu.set_interrupt_callback.assert_called_with(
+            self.adapter.poller.wake
+        )
+
+    def test_stream_disabled(self):
+
+        assert_equal(self.adapter.stream, None)
+        assert_equal(self.adapter.pscuData.stream_port, 0)
+
+    @patch('lpdpower.adapter.PSCUStream')
+    @patch('lpdpower.pscu_data.PSCU')
+    def test_stream_enabled(self, mock_pscu, mock_stream):
+
+        mock_pscu.return_value.tca.stats = I2CStats()
+        adapter = LPDPowerAdapter(stream_port='8889')
+        try:
+            mock_stream.assert_called_with(adapter.pscuData, [])
+            mock_stream.return_value.listen.assert_called_with(8889, ssl_options=None)
+            assert_equal(adapter.pscuData.stream_port, 8889)
+            assert_true(mock_stream.return_value.update in adapter.poller.update_callbacks)
+        finally:
+            adapter.cleanup()
+        mock_stream.return_value.stop.assert_called_with()
+
+    @patch('lpdpower.adapter.PSCUStream')
+    @patch('lpdpower.pscu_data.PSCU')
+    def test_stream_options(self, mock_pscu, mock_stream):
+
+        mock_pscu.return_value.tca.stats = I2CStats()
+        adapter = LPDPowerAdapter(**{
+            'stream_port': '8889',
+            'stream_origins': 'https://control:8888, https://backup:8888',
+            'stream_certfile': 'server.crt',
+            'stream_keyfile': 'server.key',
+        })
+        try:
+            mock_stream.assert_called_with(
+                adapter.pscuData, ['https://control:8888', 'https://backup:8888']
+            )
+            mock_stream.return_value.listen.assert_called_with(8889, ssl_options={
+                'certfile': 'server.crt', 'keyfile': 'server.key'
+            })
+        finally:
+            adapter.cleanup()
+
+    @patch('lpdpower.pscu_data.PSCU')
+    def test_calibration_options(self, mock_pscu):
+
+        mock_pscu.return_value.tca.stats = I2CStats()
+        adapter = LPDPowerAdapter(**{
+            'calibration_temperature_3': '1.02, -0.5',
+            'calibration_quad_0_channel_current_1': '1.0, 0.0, 0.0, 1.0, 0.01',
+        })
+        try:
+            assert_equal(mock_pscu.call_args[1]['calibrations'], {
+                'temperature_3': (1.02, -0.5, []),
+                'quad_0_channel_current_1': (1.0, 0.0, [0.0, 1.0, 0.01]),
+            })
+        finally:
+            adapter.cleanup()
+
+    @patch('lpdpower.pscu_data.PSCU')
+    def test_smbus2_backend(self, mock_pscu):
+
+        class RdwrBus(object):
+            def __init__(self, busnum):
+                self.busnum = busnum
+                self.msgs = None
+
+            def i2c_rdwr(self, *msgs):
+                self.msgs = msgs
+
+        mock_smbus2 = Mock()
+        mock_smbus2.SMBus.side_effect = RdwrBus
+        mock_i2c_msg = Mock()
+        mock_i2c_msg.read.return_value = [0x56, 0x78]
+
+        mock_pscu.return_value.tca.stats = I2CStats()
+        with patch('lpdpower.i2c_device.smbus2', mock_smbus2), \
+                patch('lpdpower.i2c_device.i2c_msg', mock_i2c_msg):
+            adapter = LPDPowerAdapter(i2c_backend='smbus2')
+            try:
+                device = I2CDevice(0x20, 7)
+                assert_true(device.supports_rdwr())
+                assert_equal(device.write_read([0x80], 2), [0x56, 0x78])
+            finally:
+                adapter.cleanup()
+                I2CDevice.set_bus_factory(None)
+
+        assert_equal(adapter.i2c_backend, 'smbus2')
+        mock_smbus2.SMBus.assert_called_with(7)
+        assert_equal(device.bus.msgs,
+                     (mock_i2c_msg.write.return_value, mock_i2c_msg.read.return_value))
+
     def test_get_toplevel(self):
 
         response = self.adapter.get('', self.request)
         assert_equal(response.status_code, 200)
-        assert_equal(type(response.data), dict)
+        assert_equal(response.content_type, 'application/json')
+        assert_equal(type(json.loads(response.data)), dict)
 
     def test_get_param(self):
 
         response = self.adapter.get('position', self.request)
         assert_equal(response.status_code, 200)
-        assert_true('position' in response.data)
+        assert_true('position' in json.loads(response.data))
+
+    def test_get_since(self):
+
+        request = Mock(headers=self.request.headers, query_arguments={'since': [b'3']})
+        changes = {'generation': 5, 'changed': {'armed': True}}
+        with patch.object(self.adapter.pscuData, 'get', return_value=changes) as mock_get:
+            response = self.adapter.get('', request)
+            mock_get.assert_called_with('', since=3)
+        assert_equal(response.status_code, 200)
+        assert_equal(response.data, changes)
+
+    def test_get_since_invalid(self):
+
+        request = Mock(headers=self.request.headers, query_arguments={'since': [b'latest']})
+        response = self.adapter.get('', request)
+        assert_equal(response.status_code, 400)
+        assert_true('Invalid query argument' in response.data['error'])
+
+    def test_get_history(self):
+
+        request = Mock(headers=self.request.headers, query_arguments={
+            'start': [b'10.5'], 'end': [b'20'], 'decimation': [b'5'], 'since': [b'3'],
+            'resolution': [b'1m'],
+        })
+        history = {'timestamp': [11.0], 'values': {'position': [1.0]}}
+        with patch.object(self.adapter.pscuData, 'get_history', return_value=history) as mock_get:
+            response = self.adapter.get('history/data/position', request)
+            mock_get.assert_called_with(
+                'history/data/position', start=10.5, end=20.0, decimation=5, resolution='1m'
+            )
+        assert_equal(response.status_code, 200)
+        assert_equal(response.data, history)
+
+    def test_get_history_defaults(self):
+
+        with patch.object(self.adapter.pscuData, 'get_history', return_value={}) as mock_get:
+            self.adapter.get('history/data', self.request)
+            mock_get.assert_called_with(
+                'history/data', start=None, end=None, decimation=1, resolution=None
+            )
+
+    def test_get_history_invalid(self):
+
+        request = Mock(headers=self.request.headers, query_arguments={'decimation': [b'0']})
+        response = self.adapter.get('history/data', request)
+        assert_equal(response.status_code, 400)
+        assert_true('Illegal decimation 0' in response.data['error'])
+
+    def test_history_update_callback(self):
+
+        assert_true(self.adapter.pscuData.history.update in self.adapter.poller.update_callbacks)
 
     def test_get_bad_path(self):
 
@@ -78,7 +238,12 @@ class TestLPDPowerAdapter():
         assert_true('error' in response.data)
         assert_true(response.data['error'], 'Failed to decode PUT request body: No JSON object could be decoded')
 
+    def test_deferred_executor_started(self):
+
+        self.adapter.pscuData.pscu.deferred_executor.start.assert_called_with()
+
     def test_adapter_cleanup(self):
 
         self.adapter.cleanup()
         self.pscu.assert_has_calls([call().cleanup()])
+        self.adapter.pscuData.pscu.deferred_executor.stop.assert_called_with()
@@ -0,0 +1,113 @@
+"""Test cases for the benchmark harness from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+import json
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock, patch
+    from io import StringIO
+else:                         # pragma: no cover
+    from mock import Mock, patch
+    from StringIO import StringIO
+
+from nose.tools import *
+
+sys.modules['smbus'] = Mock()
+sys.modules['serial'] = Mock()
+sys.modules['Adafruit_BBIO'] = Mock()
+sys.modules['Adafruit_BBIO.GPIO'] = Mock()
+
+from lpdpower.benchmark import PSCUBenchmark, percentiles, format_stats, print_report, main
+from lpdpower.i2c_device import I2CDevice
+
+
+class TestPercentiles():
+
+    def test_percentiles(self):
+
+        stats = percentiles(list(range(1, 101)))
+        assert_equal(stats['min'], 1)
+        assert_equal(stats['max'], 100)
+        assert_equal(stats['mean'], 50.5)
+        assert_equal(stats['p50'], 50)
+        assert_equal(stats['p90'], 90)
+        assert_equal(stats['p99'], 99)
+
+    def test_percentiles_single_sample(self):
+
+        stats = percentiles([3.0])
+        assert_equal(stats['p50'], 3.0)
+        assert_equal(stats['p99'], 3.0)
+
+    def test_percentiles_empty(self):
+
+        assert_equal(percentiles([]), {})
+
+    def test_format_stats(self):
+
+        stats = {'mean': 0.002, 'min': 0.001, 'p50': 0.002, 'max': 0.003}
+        formatted = format_stats(stats, 1e3, 'ms')
+        assert_equal(formatted, 'mean=2.000ms min=1.000ms p50=2.000ms max=3.000ms')
+
+
+class TestPSCUBenchmark():
+
+    @classmethod
+    def setup_class(cls):
+
+        cls.benchmark = PSCUBenchmark(update_interval=0.01)
+
+    @classmethod
+    def teardown_class(cls):
+
+        cls.benchmark.cleanup()
+        I2CDevice.set_bus_factory(None)
+
+    def test_bench_poll(self):
+
+        result = self.benchmark.bench_poll(self.benchmark.pscu.quad[0].poll_all_sensors, 3)
+        assert_equal(result['cycles'], 3)
+        assert_true(result['transactions_per_poll'] >= 3)
+        assert_equal(len(result['wall_time']), 6)
+
+    def test_bench_poll_mux_switches(self):
+
+        result = self.benchmark.bench_poll(self.benchmark.pscu.poll_all_sensors, 3)
+        assert_true(result['mux_switches_per_poll'] <= 6)
+
+    def test_bench_requests(self):
+
+        result = self.benchmark.bench_requests('get', '', 2, 5)
+        assert_equal(result['requests'], 10)
+        assert_equal(result['errors'], 0)
+
+    def test_run(self):
+
+        results = self.benchmark.run(cycles=2, clients=2, requests=2)
+        for name in ('pscu_poll', 'quad_poll', 'pscu_poll_allocations', 'pscu_data_get',
+                     'adapter_get', 'adapter_put'):
+            assert_true(name in results)
+        assert_false(self.benchmark.adapter.poller.is_running())
+
+        stream = StringIO()
+        print_report(results, stream)
+        assert_true('pscu_poll' in stream.getvalue())
+
+
+class TestBenchmarkMain():
+
+    def teardown(self):
+
+        I2CDevice.set_bus_factory(None)
+
+    def test_main_json(self):
+
+        with patch('sys.stdout', new_callable=StringIO) as mock_stdout:
+            rc = main(['--cycles', '2', '--clients', '1', '--requests', '2', '--json'])
+
+        assert_equal(rc, 0)
+        results = json.loads(mock_stdout.getvalue())
+        assert_equal(results['pscu_poll']['cycles'], 2)
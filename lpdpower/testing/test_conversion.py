@@ -0,0 +1,87 @@
+"""Test cases for the ADC conversion classes from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+from nose.tools import *
+
+from lpdpower.conversion import (
+    LinearConversion, ChannelConverter, scale_codes, parse_calibration, ADC_FULL_SCALE
+)
+
+
+class TestConversion():
+
+    def setup(self):
+
+        self.conversion = LinearConversion(100.0, -10.0)
+        self.converter = ChannelConverter(self.conversion, 3)
+
+    def test_scale_codes(self):
+
+        assert_equal(scale_codes([0, 4095]), [0.0, 1.0])
+        assert_almost_equal(scale_codes([2048])[0], 0.50012, places=5)
+
+    def test_linear_conversion(self):
+
+        assert_equal(self.conversion.convert(0.0), -10.0)
+        assert_equal(self.conversion.convert(0.5), 40.0)
+
+    def test_convert_codes(self):
+
+        codes = [0, 2048, 4095]
+        values = self.converter.convert_codes(codes)
+        for (code, value) in zip(codes, values):
+            assert_almost_equal(value, self.conversion.convert(code / ADC_FULL_SCALE))
+
+    def test_calibration(self):
+
+        self.converter.set_calibration(1, gain=2.0, offset=1.5)
+        assert_equal(self.converter.get_calibration(1), (2.0, 1.5, []))
+        assert_equal(self.converter.get_calibration(0), (1.0, 0.0, []))
+
+        values = self.converter.convert_codes([4095, 4095, 4095])
+        assert_almost_equal(values[0], 90.0)
+        assert_almost_equal(values[1], 181.5)
+        assert_almost_equal(values[2], 90.0)
+
+    def test_calibration_bad_channel(self):
+
+        with assert_raises_regexp(ValueError, 'Illegal channel index 3 specified'):
+            self.converter.set_calibration(3, gain=2.0)
+
+    def test_calibration_curve(self):
+
+        self.converter.set_calibration(2, offset=10.0, curve=[1.0, 0.0, 0.5])
+        values = self.converter.convert_codes([0, 0, 0])
+        assert_almost_equal(values[0], -10.0)
+        assert_almost_equal(values[2], 1.0)
+
+    def test_calibration_accessors(self):
+
+        self.converter.set_gain(0, 3.0)
+        self.converter.set_offset(0, 2.0)
+        self.converter.set_curve(0, [0.0, 2.0])
+        assert_equal(self.converter.get_gain(0), 3.0)
+        assert_equal(self.converter.get_offset(0), 2.0)
+        assert_equal(self.converter.get_curve(0), [0.0, 2.0])
+        assert_almost_equal(self.converter.convert_codes([0])[0], 2.0 * (3.0 * -10.0 + 2.0))
+
+    def test_convert_all_codes(self):
+
+        self.converter.set_calibration(0, gain=0.5, offset=1.0)
+        for code in range(ChannelConverter.NUM_CODES):
+            expected = 0.5 * self.conversion.convert(code / ADC_FULL_SCALE) + 1.0
+            assert_almost_equal(self.converter.convert_codes([code])[0], expected)
+
+    def test_parse_calibration(self):
+
+        assert_equal(parse_calibration('1.02, -0.5'), (1.02, -0.5, []))
+        assert_equal(parse_calibration('1, 0, 0.1, 1.0, 0.002'), (1.0, 0.0, [0.1, 1.0, 0.002]))
+
+    def test_parse_calibration_bad(self):
+
+        with assert_raises_regexp(ValueError, 'must specify a gain and offset'):
+            parse_calibration('1.02')
+        with assert_raises(ValueError):
+            parse_calibration('gain, offset')
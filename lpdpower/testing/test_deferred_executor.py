@@ -1,6 +1,7 @@
 """Unit test cases for DeferredExecutor."""
 
 import sys
+import threading
 if sys.version_info[0] == 3:  # pragma: no cover
     from unittest.mock import Mock, call
 else:                         # pragma: no cover
@@ -78,3 +79,81 @@ class TestDeferredExecutor():
         assert_equal(self.deferred_executor.pending(), num_commands)
         self.deferred_executor.clear()
         assert_equal(self.deferred_executor.pending(), 0)
+
+    def test_executor_process_all_due(self):
+
+        now = DeferredExecutor.clock()
+        for i in range(5):
+            self.deferred_executor.schedule_at(now - 1.0 + i * 0.1, self.command, i)
+        self.deferred_executor.schedule_at(now + 10.0, self.command, 5)
+
+        assert_equal(self.deferred_executor.process(now), 5)
+        assert_equal(self.command.call_args_list, [call(i) for i in range(5)])
+        assert_equal(self.deferred_executor.pending(), 1)
+
+    def test_executor_deadline_order(self):
+
+        now = DeferredExecutor.clock()
+        for (i, offset) in enumerate([0.3, 0.1, 0.2]):
+            self.deferred_executor.schedule_at(now - offset, self.command, i)
+
+        self.deferred_executor.process()
+        assert_equal(self.command.call_args_list, [call(0), call(2), call(1)])
+
+    def test_executor_enqueue_deadlines(self):
+
+        commands = [self.deferred_executor.enqueue(self.command, 1.0) for i in range(3)]
+        assert_equal(commands[1].deadline - commands[0].deadline, 1.0)
+        assert_equal(commands[2].deadline - commands[1].deadline, 1.0)
+        assert_true(self.deferred_executor.time_to_next() <= 0.0 + 1e-6)
+
+    def test_executor_cancel(self):
+
+        now = DeferredExecutor.clock()
+        handles = [self.deferred_executor.schedule_at(now, self.command, i) for i in range(3)]
+
+        assert_true(self.deferred_executor.cancel(handles[1]))
+        assert_false(self.deferred_executor.cancel(handles[1]))
+        assert_equal(self.deferred_executor.pending(), 2)
+
+        self.deferred_executor.process()
+        assert_equal(self.command.call_args_list, [call(0), call(2)])
+        assert_false(self.deferred_executor.cancel(handles[0]))
+
+    def test_executor_command_error(self):
+
+        self.command.side_effect = [RuntimeError('command failed'), None]
+        self.deferred_executor.enqueue(self.command, 0.0)
+        self.deferred_executor.enqueue(self.command, 0.0)
+
+        assert_equal(self.deferred_executor.process(), 2)
+        assert_equal(self.deferred_executor.pending(), 0)
+
+    def test_executor_jitter_status(self):
+
+        now = DeferredExecutor.clock()
+        self.deferred_executor.schedule_at(now - 0.5, self.command)
+        self.deferred_executor.process()
+
+        status = self.deferred_executor.get_status()
+        assert_equal(status['pending'], 0)
+        assert_equal(status['executed'], 1)
+        assert_true(status['last_jitter'] >= 0.5)
+        assert_equal(status['max_jitter'], status['last_jitter'])
+        assert_equal(status['mean_jitter'], status['last_jitter'])
+
+    def test_executor_timer_thread(self):
+
+        done = threading.Event()
+        self.deferred_executor.start()
+        try:
+            assert_true(self.deferred_executor.is_running())
+            self.deferred_executor.enqueue(self.command, 0.0, 1)
+            self.deferred_executor.enqueue(done.set, 0.01)
+            assert_true(done.wait(1.0))
+        finally:
+            self.deferred_executor.stop(1.0)
+
+        assert_false(self.deferred_executor.is_running())
+        self.command.assert_called_with(1)
+        assert_equal(self.deferred_executor.pending(), 0)
@@ -0,0 +1,134 @@
+"""Test cases for the EnableSequencer class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+from lpdpower.deferred_executor import DeferredExecutor
+from lpdpower.enable_sequencer import EnableSequencer
+
+
+class TestEnableSequencer():
+
+    def setup(self):
+
+        self.now = 100.0
+        self.executor = DeferredExecutor()
+        self.executor.clock = lambda: self.now
+
+        self.quads = [Mock(), Mock()]
+        for quad in self.quads:
+            quad.get_state.return_value = Mock(generation=0, channel_current=(0.0,) * 4)
+
+        self.pscu = Mock(quad=self.quads, deferred_executor=self.executor)
+        self.pscu.quad_enable_interval = 1.0
+
+        self.channels = [(quad, chan) for quad in range(2) for chan in range(4)]
+
+    def run_until(self, now):
+
+        self.now = now
+        self.executor.process(now)
+
+    def poll(self, quad, currents):
+
+        state = self.quads[quad].get_state.return_value
+        self.quads[quad].get_state.return_value = Mock(
+            generation=state.generation + 1, channel_current=currents
+        )
+
+    def enabled(self):
+
+        return [
+            channel
+            for (args, _) in self.pscu.set_quad_enables.call_args_list
+            for channel in args[0]
+        ]
+
+    def test_serial_sequence_at_interval(self):
+
+        sequencer = EnableSequencer(self.pscu, inrush=10.0)
+        sequencer.start(self.channels)
+
+        self.run_until(100.0)
+        assert_equal(self.enabled(), [(0, 0)])
+        self.run_until(100.5)
+        assert_equal(self.enabled(), [(0, 0)])
+        self.run_until(101.0)
+        assert_equal(self.enabled(), [(0, 0), (0, 1)])
+
+        for step in range(2, 9):
+            self.run_until(100.0 + step)
+        assert_equal(self.enabled(), self.channels)
+        assert_false(sequencer.is_active())
+        assert_equal(sequencer.get_status()['groups'], 8)
+
+    def test_parallel_groups_within_budget(self):
+
+        sequencer = EnableSequencer(self.pscu, budget=40.0, inrush=10.0)
+        sequencer.start(self.channels)
+
+        self.run_until(100.0)
+        self.pscu.set_quad_enables.assert_called_once_with(self.channels[:4], True)
+
+        self.run_until(101.0)
+        self.pscu.set_quad_enables.assert_called_with(self.channels[4:], True)
+
+    def test_next_group_when_current_settles(self):
+
+        sequencer = EnableSequencer(self.pscu, budget=20.0, inrush=10.0)
+        sequencer.start(self.channels)
+        self.run_until(100.0)
+        assert_equal(self.enabled(), [(0, 0), (0, 1)])
+
+        # The first poll after the enable may predate it, so is ignored
+        self.poll(0, (0.0, 0.0, 0.0, 0.0))
+        self.run_until(100.1)
+        self.poll(0, (9.5, 9.5, 0.0, 0.0))
+        self.run_until(100.2)
+        assert_equal(self.enabled(), [(0, 0), (0, 1)])
+
+        # Currents have settled, so the next group starts before the enable interval
+        self.poll(0, (9.6, 9.4, 0.0, 0.0))
+        self.run_until(100.3)
+        assert_equal(self.enabled(), [(0, 0), (0, 1), (0, 2), (0, 3)])
+
+    def test_measured_current_frees_budget(self):
+
+        sequencer = EnableSequencer(self.pscu, budget=20.0, inrush=10.0)
+        sequencer.start(self.channels[:3])
+        self.run_until(100.0)
+
+        self.poll(0, (0.0, 0.0, 0.0, 0.0))
+        self.poll(0, (4.0, 4.0, 0.0, 0.0))
+        self.run_until(100.1)
+        assert_equal(self.enabled(), [(0, 0), (0, 1), (0, 2)])
+
+    def test_cancel(self):
+
+        sequencer = EnableSequencer(self.pscu)
+        sequencer.start(self.channels)
+        self.run_until(100.0)
+
+        sequencer.cancel()
+        assert_false(sequencer.is_active())
+        assert_equal(self.executor.pending(), 0)
+        self.run_until(110.0)
+        assert_equal(self.enabled(), [(0, 0)])
+
+    def test_step_after_cancel(self):
+
+        sequencer = EnableSequencer(self.pscu)
+        sequencer.start(self.channels)
+        sequencer.cancel()
+
+        sequencer.step()
+        assert_equal(self.executor.pending(), 0)
+        assert_equal(self.enabled(), [])
@@ -0,0 +1,290 @@
+"""Test cases for the HistoryBuffer and PSCUHistory classes from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock, patch
+else:                         # pragma: no cover
+    from mock import Mock, patch
+
+from nose.tools import *
+
+from lpdpower.history import HistoryBuffer, HistoryRollup, PSCUHistory
+
+
+class TestHistoryBuffer():
+
+    def setup(self):
+
+        self.buffer = HistoryBuffer(['a', 'b'], 4)
+
+    def record(self, timestamps):
+
+        for timestamp in timestamps:
+            self.buffer.record(timestamp, [timestamp * 10, timestamp * 100])
+
+    def test_empty(self):
+
+        assert_equal(len(self.buffer), 0)
+        assert_equal(self.buffer.get(), {'timestamp': [], 'values': {'a': [], 'b': []}})
+
+    def test_record(self):
+
+        self.record([1.0, 2.0])
+        assert_equal(len(self.buffer), 2)
+        assert_equal(self.buffer.get(), {
+            'timestamp': [1.0, 2.0], 'values': {'a': [10.0, 20.0], 'b': [100.0, 200.0]}
+        })
+
+    def test_wraps(self):
+
+        self.record([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+        assert_equal(len(self.buffer), 4)
+        assert_equal(self.buffer.count, 6)
+        assert_equal(self.buffer.get(['a']), {
+            'timestamp': [3.0, 4.0, 5.0, 6.0], 'values': {'a': [30.0, 40.0, 50.0, 60.0]}
+        })
+
+    def test_time_range(self):
+
+        self.record([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+        assert_equal(self.buffer.get(start=4.0, end=5.0)['timestamp'], [4.0, 5.0])
+        assert_equal(self.buffer.get(start=4.5)['timestamp'], [5.0, 6.0])
+        assert_equal(self.buffer.get(end=3.5)['timestamp'], [3.0])
+        assert_equal(self.buffer.get(start=7.0)['timestamp'], [])
+
+    def test_decimation(self):
+
+        self.record([1.0, 2.0, 3.0, 4.0, 5.0])
+        assert_equal(self.buffer.get(decimation=2)['timestamp'], [2.0, 4.0])
+        assert_equal(self.buffer.get(decimation=3)['values']['a'], [20.0, 50.0])
+
+    def test_bad_decimation(self):
+
+        with assert_raises_regexp(ValueError, 'Illegal decimation 0'):
+            self.buffer.get(decimation=0)
+
+    def test_bad_capacity(self):
+
+        with assert_raises_regexp(ValueError, 'Illegal history capacity 0'):
+            HistoryBuffer(['a'], 0)
+
+    def test_bad_sample(self):
+
+        with assert_raises_regexp(ValueError, 'Sample has 1 values for 2 channels'):
+            self.buffer.record(1.0, [1.0])
+
+    def test_oldest(self):
+
+        assert_equal(self.buffer.get_oldest(), None)
+        self.record([1.0, 2.0, 3.0, 4.0, 5.0])
+        assert_equal(self.buffer.get_oldest(), 2.0)
+
+    def test_labels(self):
+
+        for timestamp in [1.0, 2.0, 3.0]:
+            self.buffer.record(timestamp, [0.0, 0.0], 1000.0 - timestamp)
+
+        assert_equal(self.buffer.get(start=2.0)['timestamp'], [998.0, 997.0])
+        assert_equal(self.buffer.get_oldest(), 1.0)
+
+    def test_fields(self):
+
+        buffer = HistoryBuffer(['a'], 2, ('min', 'max'))
+        buffer.record(1.0, [(1.0, 2.0)])
+        buffer.record(2.0, [(3.0, 4.0)])
+        buffer.record(3.0, [(5.0, 6.0)])
+        assert_equal(buffer.get(), {
+            'timestamp': [2.0, 3.0], 'values': {'a': {'min': [3.0, 5.0], 'max': [4.0, 6.0]}}
+        })
+
+
+class TestHistoryRollup():
+
+    def setup(self):
+
+        self.rollup = HistoryRollup(['a', 'b'], 10.0, 4)
+
+    def add(self, timestamp, values):
+
+        return self.rollup.add(timestamp, values, values, values, 1)
+
+    def test_aggregate(self):
+
+        assert_equal(self.add(11.0, [1.0, -1.0]), None)
+        assert_equal(self.add(15.0, [3.0, -5.0]), None)
+        assert_equal(self.add(19.0, [2.0, -3.0]), None)
+        assert_equal(len(self.rollup.buffer), 0)
+
+        completed = self.add(21.0, [0.0, 0.0])
+        assert_equal(completed, (10.0, [1.0, -5.0], [3.0, -1.0], [6.0, -9.0], 3, 10.0))
+        assert_equal(self.rollup.buffer.get(), {
+            'timestamp': [10.0],
+            'values': {
+                'a': {'min': [1.0], 'max': [3.0], 'mean': [2.0]},
+                'b': {'min': [-5.0], 'max': [-1.0], 'mean': [-3.0]},
+            },
+        })
+
+    def test_label(self):
+
+        self.rollup.add(11.0, [1.0, 1.0], [1.0, 1.0], [1.0, 1.0], 1, 1011.5)
+        completed = self.rollup.add(21.0, [0.0, 0.0], [0.0, 0.0], [0.0, 0.0], 1, 1021.5)
+
+        assert_equal(completed[5], 1010.5)
+        assert_equal(self.rollup.buffer.get()['timestamp'], [1010.5])
+
+    def test_cascade(self):
+
+        upper = HistoryRollup(['a', 'b'], 30.0, 4)
+        for (timestamp, value) in [(1.0, 1.0), (11.0, 2.0), (12.0, 3.0), (21.0, 4.0), (31.0, 5.0)]:
+            completed = self.add(timestamp, [value, value])
+            if completed is not None:
+                upper.add(*completed)
+        upper.add(*self.add(41.0, [0.0, 0.0]))
+        upper.add(*self.add(61.0, [0.0, 0.0]))
+
+        values = upper.buffer.get(['a'])['values']['a']
+        assert_equal(values, {'min': [1.0], 'max': [4.0], 'mean': [2.5]})
+
+
+class TestPSCUHistory():
+
+    def setup(self):
+
+        quad = Mock(num_channels=2)
+        quad.get_state.return_value = Mock(
+            channel_voltage=(1.0, 2.0), channel_current=(0.1, 0.2), supply_voltage=48.0
+        )
+
+        self.pscu = Mock(num_temperatures=2, num_humidities=1, num_leak_sensors=1, quad=[quad])
+        self.pscu.get_state.side_effect = self.get_state
+        self.generation = 0
+        self.position = 10.0
+
+        self.history = PSCUHistory(self.pscu, interval=1.0, capacity=10)
+
+    def get_state(self):
+
+        self.generation += 1
+        return Mock(
+            generation=self.generation,
+            temperature_values=(20.0, 21.0), humidity_values=(40.0,), leak_values=(1.0,),
+            fan_speed=1200.0, pump_flow=3.0, position=self.position,
+        )
+
+    def test_channels(self):
+
+        assert_equal(self.history.get_channels(), [
+            'temperature/0', 'temperature/1', 'humidity/0', 'leak/0',
+            'fan/currentspeed', 'pump/flow', 'position',
+            'quad/0/channel/0/voltage', 'quad/0/channel/0/current',
+            'quad/0/channel/1/voltage', 'quad/0/channel/1/current', 'quad/0/supply',
+        ])
+        assert_equal(self.history.get_interval(), 1.0)
+        assert_equal(self.history.get_capacity(), 10)
+        assert_equal(self.history.get_rollups()['1m'], {
+            'period': 60.0, 'capacity': 1440, 'samples': 0
+        })
+
+    def set_time(self, mock_clock, mock_time, wall_time, clock_offset=1000.0):
+
+        # Run the monotonic clock at an offset from the wall clock
+        mock_time.return_value = wall_time
+        mock_clock.return_value = wall_time + clock_offset
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_update_interval(self, mock_clock, mock_time):
+
+        for (wall_time, recorded) in [(100.0, True), (100.5, False), (101.0, True)]:
+            self.set_time(mock_clock, mock_time, wall_time)
+            assert_equal(self.history.update(), recorded)
+        assert_equal(self.history.get_samples(), 2)
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_update_new_generation(self, mock_clock, mock_time):
+
+        self.set_time(mock_clock, mock_time, 100.0)
+        self.pscu.get_state.side_effect = None
+        self.pscu.get_state.return_value = self.get_state()
+        assert_true(self.history.update())
+        self.set_time(mock_clock, mock_time, 102.0)
+        assert_false(self.history.update())
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_update_rollups(self, mock_clock, mock_time):
+
+        for (timestamp, position) in [(100.2, 1.0), (100.4, 2.0), (100.8, 6.0), (101.1, 0.0)]:
+            self.set_time(mock_clock, mock_time, timestamp)
+            self.position = position
+            self.history.update()
+
+        history = self.history.get('position', resolution='1s')
+        assert_equal(history, {
+            'resolution': '1s',
+            'timestamp': [100.0],
+            'values': {'position': {'min': [1.0], 'max': [6.0], 'mean': [3.0]}},
+        })
+        assert_equal(self.history.get_rollups()['1s']['samples'], 1)
+        assert_equal(self.history.get_rollups()['1m']['samples'], 0)
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_update_wall_clock_step(self, mock_clock, mock_time):
+
+        self.history = PSCUHistory(self.pscu, interval=0.0, capacity=10)
+
+        # Step the wall clock back by 50s between the second and third samples
+        for (clock_time, wall_time) in [(1000.5, 100.5), (1001.5, 101.5), (1002.5, 52.5)]:
+            mock_clock.return_value = clock_time
+            mock_time.return_value = wall_time
+            self.history.update()
+
+        assert_equal(self.history.get('position')['timestamp'], [100.5, 101.5, 52.5])
+        assert_equal(self.history.get('position', start=51.0)['timestamp'], [101.5, 52.5])
+        assert_equal(self.history.get('position', resolution='1s')['timestamp'], [100.0, 101.0])
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_get_resolution_by_start(self, mock_clock, mock_time):
+
+        self.history = PSCUHistory(self.pscu, interval=0.0, capacity=2)
+        for timestamp in [100.5, 101.5, 102.5, 103.5]:
+            self.set_time(mock_clock, mock_time, timestamp)
+            self.history.update()
+
+        assert_equal(self.history.get('position')['resolution'], 'raw')
+        assert_equal(self.history.get('position', start=102.5)['resolution'], 'raw')
+        assert_equal(self.history.get('position', start=101.0)['resolution'], '1s')
+        assert_equal(self.history.get('position', start=50.0)['resolution'], '1s')
+
+    def test_get_bad_resolution(self):
+
+        with assert_raises_regexp(ValueError, 'Invalid history resolution: 1d'):
+            self.history.get('position', resolution='1d')
+
+    @patch('lpdpower.history.time.time')
+    @patch('lpdpower.history._clock')
+    def test_get_path(self, mock_clock, mock_time):
+
+        self.set_time(mock_clock, mock_time, 100.0)
+        self.history.update()
+
+        assert_equal(self.history.get('quad/0/channel/1'), {
+            'resolution': 'raw',
+            'timestamp': [100.0],
+            'values': {'quad/0/channel/1/voltage': [2.0], 'quad/0/channel/1/current': [0.2]},
+        })
+        assert_equal(self.history.get('/position')['values'], {'position': [10.0]})
+        assert_equal(len(self.history.get()['values']), 12)
+
+    def test_get_bad_path(self):
+
+        with assert_raises_regexp(ValueError, 'Invalid history path: quad/1'):
+            self.history.get('quad/1')
@@ -0,0 +1,175 @@
+"""Test cases for the I2CBusManager class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+import threading
+import time
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+from lpdpower.i2c_bus_manager import I2CBusManager
+
+
+class TestI2CBusManager():
+
+    def setup(self):
+
+        self.manager = I2CBusManager(1)
+
+    def teardown(self):
+
+        self.manager.stop()
+
+    def wait_for_waiters(self, num_waiters):
+
+        for _ in range(200):
+            if len(self.manager._I2CBusManager__waiters) >= num_waiters:
+                return
+            time.sleep(0.005)
+
+    def test_get_bus_shared(self):
+
+        create = Mock(side_effect=lambda: Mock())
+        key = object()
+
+        bus = self.manager.get_bus(key, create)
+        assert_equal(self.manager.get_bus(key, create), bus)
+        assert_equal(create.call_count, 1)
+
+    def test_get_bus_new_key(self):
+
+        create = Mock(side_effect=lambda: Mock())
+
+        bus = self.manager.get_bus(object(), create)
+        assert_not_equal(self.manager.get_bus(object(), create), bus)
+        assert_equal(create.call_count, 2)
+
+    def test_reentrant(self):
+
+        with self.manager:
+            with self.manager:
+                pass
+
+        status = self.manager.get_status()
+        assert_equal(status['priorities']['control']['grants'], 1)
+        assert_equal(status['priorities']['control']['contended'], 0)
+
+    def test_release_not_held(self):
+
+        assert_raises(RuntimeError, self.manager.release)
+
+    def test_thread_priority(self):
+
+        assert_equal(I2CBusManager.get_thread_priority(), I2CBusManager.PRIORITY_CONTROL)
+
+        previous = I2CBusManager.set_thread_priority(I2CBusManager.PRIORITY_POLL)
+        try:
+            with self.manager:
+                pass
+        finally:
+            I2CBusManager.set_thread_priority(previous)
+
+        assert_equal(I2CBusManager.get_thread_priority(), I2CBusManager.PRIORITY_CONTROL)
+        assert_equal(self.manager.get_status()['priorities']['poll']['grants'], 1)
+
+    def test_hold_sets_priority(self):
+
+        with self.manager.hold(I2CBusManager.PRIORITY_SAFETY):
+            assert_equal(I2CBusManager.get_thread_priority(), I2CBusManager.PRIORITY_SAFETY)
+            with self.manager:
+                pass
+
+        assert_equal(I2CBusManager.get_thread_priority(), I2CBusManager.PRIORITY_CONTROL)
+        assert_equal(self.manager.get_status()['priorities']['safety']['grants'], 1)
+
+    def test_priority_order(self):
+
+        granted = []
+
+        def access(name, priority):
+            self.manager.acquire(priority)
+            granted.append(name)
+            self.manager.release()
+
+        self.manager.acquire()
+        threads = []
+        for (name, priority) in (
+            ('poll', I2CBusManager.PRIORITY_POLL),
+            ('control', I2CBusManager.PRIORITY_CONTROL),
+            ('safety', I2CBusManager.PRIORITY_SAFETY),
+        ):
+            thread = threading.Thread(target=access, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            self.wait_for_waiters(len(threads))
+        self.manager.release()
+
+        for thread in threads:
+            thread.join(1.0)
+
+        assert_equal(granted, ['safety', 'control', 'poll'])
+        status = self.manager.get_status()
+        assert_equal(status['priorities']['safety']['contended'], 1)
+        assert_true(status['priorities']['poll']['max_wait'] > 0.0)
+
+    def test_submit(self):
+
+        access = Mock(return_value=0x55)
+
+        future = self.manager.submit(I2CBusManager.PRIORITY_POLL, access, 1, reg=2)
+
+        assert_equal(future.result(1.0), 0x55)
+        access.assert_called_with(1, reg=2)
+        assert_true(self.manager.is_running())
+        assert_equal(self.manager.get_status()['priorities']['poll']['grants'], 1)
+
+    def test_submit_exception(self):
+
+        access = Mock(side_effect=IOError('bus error'))
+
+        future = self.manager.submit(I2CBusManager.PRIORITY_CONTROL, access)
+
+        assert_raises(IOError, future.result, 1.0)
+
+    def test_submit_priority_order(self):
+
+        executed = []
+
+        self.manager.acquire()
+        futures = [self.manager.submit(I2CBusManager.PRIORITY_POLL, executed.append, 'poll')]
+        self.wait_for_waiters(1)
+        for (name, priority) in (
+            ('control', I2CBusManager.PRIORITY_CONTROL),
+            ('safety', I2CBusManager.PRIORITY_SAFETY),
+        ):
+            futures.append(self.manager.submit(priority, executed.append, name))
+        self.manager.release()
+
+        for future in futures:
+            future.result(1.0)
+
+        assert_equal(executed, ['poll', 'safety', 'control'])
+
+    def test_stop_cancels_queued(self):
+
+        self.manager.acquire()
+        first = self.manager.submit(I2CBusManager.PRIORITY_POLL, Mock())
+        self.wait_for_waiters(1)
+        second = self.manager.submit(I2CBusManager.PRIORITY_POLL, Mock())
+
+        stopper = threading.Thread(target=self.manager.stop, args=(1.0,))
+        stopper.start()
+        time.sleep(0.01)
+        self.manager.release()
+        stopper.join(1.0)
+
+        assert_true(first.done())
+        assert_true(second.cancelled())
+        assert_false(self.manager.is_running())
@@ -66,3 +66,12 @@ class TestI2CContainer():
             I2CException, 'Device %s was not attached to this I2CContainer' % device
         ):
             self.container.remove_device(device)
+
+    def test_get_devices(self):
+
+        container = I2CContainer()
+        device = container.attach_device(I2CDevice, 0x20)
+        nested = container.attach_device(I2CContainer)
+        nested_device = nested.attach_device(I2CDevice, 0x21)
+
+        assert_equal(container.get_devices(), [device, nested_device])
@@ -6,9 +6,9 @@ Tim Nicholls, STFC Application Engineering Group
 import sys
 
 if sys.version_info[0] == 3:  # pragma: no cover
-    from unittest.mock import Mock, MagicMock, call
+    from unittest.mock import Mock, MagicMock, call, patch
 else:                         # pragma: no cover
-    from mock import Mock, MagicMock, call
+    from mock import Mock, MagicMock, call, patch
 
 from nose.tools import *
 from functools import partial
@@ -17,6 +17,7 @@ smbus_mock = MagicMock()
 sys.modules['smbus'] = smbus_mock
 
 from lpdpower.i2c_device import I2CDevice, I2CException
+from lpdpower.i2c_bus_manager import I2CBusManager
 
 class dummy_cm():
     def __enter__(self):
@@ -53,6 +54,128 @@ class TestI2CDevice(object):
         new_device = I2CDevice(self.device_address, debug=self.device_debug)
         assert_equal(default_i2c_bus, new_device.busnum)
 
+    def test_bus_factory(self):
+
+        mock_bus = Mock()
+        mock_factory = Mock(return_value=mock_bus)
+
+        I2CDevice.set_bus_factory(mock_factory)
+        try:
+            new_device = I2CDevice(self.device_address, 3)
+        finally:
+            I2CDevice.set_bus_factory(None)
+
+        mock_factory.assert_called_with(3)
+        assert_equal(new_device.bus, mock_bus)
+
+        default_device = I2CDevice(self.device_address, 3)
+        assert_not_equal(default_device.bus, mock_bus)
+
+    def test_bus_shared(self):
+
+        mock_factory = Mock(side_effect=lambda busnum: Mock())
+
+        I2CDevice.set_bus_factory(mock_factory)
+        try:
+            first_device = I2CDevice(self.device_address, 4)
+            second_device = I2CDevice(self.device_address + 1, 4)
+        finally:
+            I2CDevice.set_bus_factory(None)
+
+        assert_equal(mock_factory.call_count, 1)
+        assert_equal(first_device.bus, second_device.bus)
+        assert_equal(first_device.bus_manager, second_device.bus_manager)
+        assert_equal(I2CDevice.get_bus_lock(4), first_device.bus_manager)
+
+    def test_submit(self):
+
+        I2CDevice.set_bus_factory(Mock(side_effect=lambda busnum: Mock()))
+        try:
+            device = I2CDevice(self.device_address, 5)
+        finally:
+            I2CDevice.set_bus_factory(None)
+        device.bus.read_byte_data.return_value = 0x12
+
+        future = device.submit(I2CBusManager.PRIORITY_POLL, 'readU8', 3)
+        try:
+            assert_equal(future.result(1.0), 0x12)
+        finally:
+            device.bus_manager.stop()
+
+        device.bus.read_byte_data.assert_called_with(self.device_address, 3)
+        assert_equal(device.stats.transactions, 1)
+
+    def test_stats_recorded(self):
+
+        device = I2CDevice(self.device_address, self.device_busnum)
+        device.bus.read_i2c_block_data.return_value = [0] * 4
+
+        device.write8(1, 2)
+        device.readU16(3)
+        device.writeList(4, [1, 2, 3])
+        device.readList(5, 4)
+
+        assert_equal(device.stats.transactions, 4)
+        assert_equal(device.stats.bytes, 2 + 3 + 4 + 5)
+        assert_equal(sum(device.stats.histogram), 4)
+
+    def test_stats_error_recorded(self):
+
+        device = I2CDevice(self.device_address, self.device_busnum)
+        device.disable_exceptions()
+
+        with patch.object(device.bus, 'read_byte_data', side_effect=IOError('mocked error')):
+            device.readU8(1)
+        assert_equal(device.stats.transactions, 1)
+        assert_equal(device.stats.errors, 1)
+
+    def test_write_read_multiple_bytes(self):
+
+        device = I2CDevice(self.device_address, self.device_busnum)
+        device.bus.read_byte.side_effect = [0x12, 0x34]
+
+        rc = device.write_read([1, 2, 3], 2)
+
+        device.bus.write_i2c_block_data.assert_called_with(self.device_address, 1, [2, 3])
+        assert_equal(rc, [0x12, 0x34])
+        assert_equal(device.stats.bytes, 5)
+        device.bus.read_byte.side_effect = None
+
+    def test_write_read_rdwr(self):
+
+        class RdwrBus(object):
+            def __init__(self):
+                self.msgs = None
+
+            def i2c_rdwr(self, *msgs):
+                self.msgs = msgs
+
+        mock_i2c_msg = Mock()
+        mock_i2c_msg.read.return_value = [0x56, 0x78]
+
+        I2CDevice.set_bus_factory(lambda busnum: RdwrBus())
+        try:
+            device = I2CDevice(self.device_address, 6)
+        finally:
+            I2CDevice.set_bus_factory(None)
+
+        assert_false(device.supports_rdwr())
+        with patch('lpdpower.i2c_device.i2c_msg', mock_i2c_msg):
+            assert_true(device.supports_rdwr())
+            rc = device.write_read([0x80], 2)
+
+        mock_i2c_msg.write.assert_called_with(self.device_address, [0x80])
+        mock_i2c_msg.read.assert_called_with(self.device_address, 2)
+        assert_equal(device.bus.msgs,
+                     (mock_i2c_msg.write.return_value, mock_i2c_msg.read.return_value))
+        assert_equal(rc, [0x56, 0x78])
+
+    def test_create_smbus2_bus_unavailable(self):
+
+        with patch('lpdpower.i2c_device.smbus2', None):
+            with assert_raises_regexp(I2CException, 'smbus2 module not available'):
+                I2CDevice.create_smbus2_bus(1)
+
     def test_pre_access_called(self):
 
         self.device.write8(1, 20)
@@ -78,7 +201,8 @@ class TestI2CDevice(object):
             ('readS8', 'read_byte_data', (5,), -127),
             ('readU16', 'read_word_data', (6,), 0x1234),
             ('readS16', 'read_word_data', (7,), 0x4567),
-            ('readList', 'read_i2c_block_data', (8, 4), [1000, 1001, 1002, 1003])
+            ('readList', 'read_i2c_block_data', (8, 4), [1000, 1001, 1002, 1003]),
+            ('write_read', 'read_i2c_block_data', ([9], 2), [0x12, 0x34]),
         ]:
             for exc_mode in self.EXC_MODES:
                 test_func = partial(self._test_device_access, method, smbus_method, exc_mode, args, rc)
@@ -0,0 +1,243 @@
+"""Test cases for the I2C simulator classes from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+import time
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+sys.modules['smbus'] = Mock()
+sys.modules['serial'] = Mock()
+sys.modules['Adafruit_BBIO'] = Mock()
+sys.modules['Adafruit_BBIO.GPIO'] = Mock()
+
+from lpdpower.i2c_simulator import (
+    SimulatedBus, SimTCA9548, SimAD7998, SimMCP23008, SimAD5321, PSCUSimulator
+)
+from lpdpower.i2c_device import I2CDevice
+from lpdpower.tca9548 import TCA9548
+from lpdpower.ad7998 import AD7998
+from lpdpower.mcp23008 import MCP23008
+from lpdpower.ad5321 import AD5321
+
+
+class TestSimulatedBus():
+
+    def setup(self):
+
+        self.bus = SimulatedBus()
+        self.tca = self.bus.add_device(SimTCA9548(0x70))
+        self.adc = self.bus.add_device(SimAD7998(0x21), 1)
+        self.mcp = self.bus.add_device(SimMCP23008(0x21), 2)
+
+    def test_mux_routing(self):
+
+        self.adc.set_input(0, 0x123)
+
+        assert_raises(IOError, self.bus.read_byte_data, 0x21, 0)
+
+        self.bus.write_byte_data(0x70, 0, 1 << 1)
+        self.bus.write_byte_data(0x21, 0x80, 0)
+        assert_equal(self.bus.read_word_data(0x21, 0), 0x2301)
+
+        self.bus.write_byte_data(0x70, 0, 1 << 2)
+        assert_equal(self.bus.read_byte_data(0x21, MCP23008.IODIR), 0xff)
+
+    def test_address_conflict(self):
+
+        self.bus.write_byte_data(0x70, 0, (1 << 1) | (1 << 2))
+        assert_raises(IOError, self.bus.read_byte_data, 0x21, 0)
+
+    def test_stats(self):
+
+        self.bus.reset_stats()
+        self.bus.write_byte_data(0x70, 0, 1 << 1)
+        self.bus.read_i2c_block_data(0x21, 0x70, 4)
+
+        assert_equal(self.bus.transaction_count, 2)
+        assert_equal(self.bus.byte_count, 3 + 6)
+
+    def test_latency(self):
+
+        self.bus.latency = 0.01
+        start_time = time.time()
+        for _ in range(5):
+            self.bus.read_byte_data(0x70, 0)
+        assert_true(time.time() - start_time >= 0.05)
+
+    def test_fault_rate(self):
+
+        bus = SimulatedBus(fault_rate=1.0)
+        bus.add_device(SimTCA9548(0x70))
+        assert_raises(IOError, bus.read_byte_data, 0x70, 0)
+        assert_equal(bus.fault_count, 1)
+
+    def test_address_fault_rate(self):
+
+        self.bus.set_fault_rate(0x70, 1.0)
+        assert_raises(IOError, self.bus.write_byte_data, 0x70, 0, 1)
+
+        self.bus.set_fault_rate(0x70, None)
+        self.bus.write_byte_data(0x70, 0, 1)
+        assert_equal(self.tca.control, 1)
+
+
+class TestSimulatedDevices():
+
+    def setup(self):
+
+        self.bus = SimulatedBus(busnum=7)
+        I2CDevice.set_bus_factory(lambda busnum: self.bus)
+
+    def teardown(self):
+
+        I2CDevice.set_bus_factory(None)
+
+    def test_ad7998_single_read(self):
+
+        sim_adc = self.bus.add_device(SimAD7998(0x22))
+        sim_adc.set_input(5, 0xabc)
+
+        adc = AD7998(0x22, busnum=7)
+        assert_equal(sim_adc.cycle, 1)
+
+        self.bus.reset_stats()
+        assert_equal(adc.read_input_raw(5), 0x5abc)
+        assert_equal(self.bus.transaction_count, 1)
+
+    def test_ad7998_sequence_read(self):
+
+        sim_adc = self.bus.add_device(SimAD7998(0x22))
+        for channel in range(8):
+            sim_adc.set_input(channel, channel * 0x100)
+
+        adc = AD7998(0x22, busnum=7)
+        assert_equal(adc.read_inputs_raw([6, 1, 3]), [0x6600, 0x1100, 0x3300])
+        assert_equal(sim_adc.channel_mask(), 0x4a)
+
+    def test_mcp23008_gpio(self):
+
+        sim_mcp = self.bus.add_device(SimMCP23008(0x24, inputs=0xa5))
+
+        mcp = MCP23008(0x24, busnum=7)
+        assert_equal(mcp.input_pins(range(8)), [bool(0xa5 & (1 << pin)) for pin in range(8)])
+
+        mcp.setup(0, MCP23008.OUT)
+        mcp.output(0, MCP23008.LOW)
+        assert_false(mcp.input(0))
+        mcp.output(0, MCP23008.HIGH)
+        assert_true(mcp.input(0))
+        assert_equal(sim_mcp.registers[SimMCP23008.OLAT] & 0x01, 0x01)
+        assert_equal(sim_mcp.registers[SimMCP23008.IODIR] & 0x01, 0x00)
+
+    def test_mcp23008_interrupt_capture(self):
+
+        sim_mcp = SimMCP23008(0x24, inputs=0x00)
+        sim_mcp.write_bytes(SimMCP23008.GPINTEN, [0x03])
+
+        sim_mcp.set_input(1, True)
+        assert_true(sim_mcp.interrupt_pending())
+        assert_equal(sim_mcp.read_bytes(SimMCP23008.INTF, 2), [0x02, 0x02])
+        assert_false(sim_mcp.interrupt_pending())
+
+    def test_mcp23008_read_interrupt_state(self):
+
+        sim_mcp = self.bus.add_device(SimMCP23008(0x24, inputs=0x00))
+        sim_mcp.write_bytes(SimMCP23008.GPINTEN, [0x01])
+
+        mcp = MCP23008(0x24, busnum=7)
+        sim_mcp.set_input(0, True)
+        assert_equal(mcp.read_interrupt_state(), (0x01, 0x01, 0x01))
+        assert_false(sim_mcp.interrupt_pending())
+        assert_equal(mcp.read_gpio(), 0x01)
+
+    def test_mcp23008_transient_capture(self):
+
+        sim_mcp = self.bus.add_device(SimMCP23008(0x24, inputs=0xff))
+
+        mcp = MCP23008(0x24, busnum=7)
+        mcp.setup_interrupts([0, 1])
+
+        sim_mcp.set_input(1, False)
+        sim_mcp.set_input(1, True)
+        assert_true(sim_mcp.interrupt_pending())
+        assert_equal(mcp.read_captured_gpio(), 0xfd)
+        assert_false(sim_mcp.interrupt_pending())
+        assert_equal(mcp.read_captured_gpio(), 0xff)
+
+    def test_ad5321_output(self):
+
+        sim_dac = self.bus.add_device(SimAD5321(0x0c))
+
+        dac = AD5321(0x0c, busnum=7)
+        dac.set_output_scaled(0.5)
+        assert_equal(sim_dac.value, 2048)
+        assert_equal(dac.read_value_scaled(), 0.5)
+
+    def test_tca9548_attached_device(self):
+
+        self.bus.add_device(SimTCA9548(0x70))
+        sim_mcp = self.bus.add_device(SimMCP23008(0x20, inputs=0x0f), 3)
+
+        tca = TCA9548(0x70, busnum=7)
+        mcp = tca.attach_device(3, MCP23008, 0x20, busnum=7)
+        assert_equal(mcp.input_pins([0, 4]), [True, False])
+
+        sim_mcp.set_inputs(0x10)
+        assert_equal(mcp.input_pins([0, 4]), [False, True])
+
+
+class TestPSCUSimulator():
+
+    @classmethod
+    def setup_class(cls):
+
+        from lpdpower.pscu import PSCU
+
+        cls.simulator = PSCUSimulator()
+        I2CDevice.set_bus_factory(cls.simulator.bus_factory)
+        try:
+            cls.pscu = PSCU()
+        finally:
+            I2CDevice.set_bus_factory(None)
+
+    def test_poll_healthy_state(self):
+
+        self.pscu.poll_all_sensors()
+
+        assert_almost_equal(self.pscu.get_temperature(0), 25.0, places=0)
+        assert_almost_equal(self.pscu.get_temperature_set_point(0), 35.0, places=0)
+        assert_false(any(self.pscu.get_temperature_tripped(i) for i in range(11)))
+        assert_almost_equal(self.pscu.quad[0].get_supply_voltage(), 48.0, places=0)
+        assert_false(self.pscu.quad[0].get_fuse_blown(0))
+
+    def test_quad_enable(self):
+
+        quad = self.pscu.quad[1]
+        quad.set_enable(2, True)
+        self.pscu.poll_all_sensors()
+
+        assert_true(quad.get_enable(2))
+        assert_almost_equal(quad.get_channel_voltage(2), 48.0, places=0)
+        assert_almost_equal(quad.get_channel_current(2), PSCUSimulator.QUAD_CHANNEL_AMPS, places=1)
+
+        quad.set_enable(2, False)
+        self.pscu.poll_all_sensors()
+        assert_false(quad.get_enable(2))
+
+    def test_arm(self):
+
+        self.pscu.set_armed(True)
+        self.pscu.poll_all_sensors()
+        assert_true(self.pscu.get_armed())
+
+        self.pscu.set_armed(False)
+        self.pscu.poll_all_sensors()
+        assert_false(self.pscu.get_armed())
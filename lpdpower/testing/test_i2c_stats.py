@@ -0,0 +1,82 @@
+"""Test cases for the I2CStats class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+from nose.tools import *
+
+from lpdpower.i2c_stats import I2CStats
+
+
+class TestI2CStats():
+
+    def setup(self):
+
+        self.stats = I2CStats()
+
+    def test_init(self):
+
+        assert_equal(self.stats.transactions, 0)
+        assert_equal(self.stats.bytes, 0)
+        assert_equal(self.stats.errors, 0)
+        assert_equal(sum(self.stats.histogram), 0)
+        assert_equal(len(self.stats.histogram), len(I2CStats.LATENCY_BOUNDS) + 1)
+
+    def test_record(self):
+
+        self.stats.record(2, 40e-6)
+        self.stats.record(3, 150e-6)
+        self.stats.record(17, 0.5)
+
+        assert_equal(self.stats.transactions, 3)
+        assert_equal(self.stats.bytes, 22)
+        assert_equal(self.stats.max_time, 0.5)
+        assert_equal(self.stats.histogram[0], 1)
+        assert_equal(self.stats.histogram[2], 1)
+        assert_equal(self.stats.histogram[-1], 1)
+
+    def test_record_error(self):
+
+        self.stats.record_error()
+        assert_equal(self.stats.errors, 1)
+
+    def test_reset(self):
+
+        self.stats.record(2, 1e-3)
+        self.stats.record_error()
+        self.stats.reset()
+        assert_equal(self.stats.transactions, 0)
+        assert_equal(self.stats.errors, 0)
+        assert_equal(sum(self.stats.histogram), 0)
+
+    def test_combine(self):
+
+        other = I2CStats()
+        self.stats.record(2, 1e-3)
+        other.record(3, 2e-3)
+        other.record_error()
+
+        combined = I2CStats.combine([self.stats, other])
+        assert_equal(combined.transactions, 2)
+        assert_equal(combined.bytes, 5)
+        assert_equal(combined.errors, 1)
+        assert_equal(combined.max_time, 2e-3)
+        assert_equal(sum(combined.histogram), 2)
+        assert_equal(self.stats.transactions, 1)
+
+    def test_as_dict(self):
+
+        self.stats.record(2, 100e-6)
+        self.stats.record(2, 300e-6)
+
+        stats = self.stats.as_dict()
+        assert_equal(stats['transactions'], 2)
+        assert_equal(stats['bytes'], 4)
+        assert_almost_equal(stats['mean_latency_us'], 200.0)
+        assert_almost_equal(stats['max_latency_us'], 300.0)
+        assert_equal(stats['latency_bounds_us'][0], 50)
+        assert_equal(len(stats['latency_histogram']), len(stats['latency_bounds_us']) + 1)
+
+    def test_as_dict_empty(self):
+
+        assert_equal(self.stats.as_dict()['mean_latency_us'], 0.0)
@@ -15,6 +15,7 @@ from nose.tools import *
 
 sys.modules['serial'] = Mock()
 from lpdpower.lcd_display import LcdDisplay, LcdDisplayError
+from lpdpower.lcd_writer import render_frame
 
 
 class TestLcdDisplay():
@@ -57,7 +58,9 @@ class TestLcdDisplay():
         cls.baud = 57600
         cls.rows = 4
         cls.cols = 20
-        cls.display = LcdDisplay(cls.pscu, cls.serial_dev, baud=cls.baud, rows=cls.rows, cols=cls.cols)
+        cls.display = LcdDisplay(
+            cls.pscu, cls.serial_dev, baud=cls.baud, rows=cls.rows, cols=cls.cols, background=False
+        )
 
     @classmethod
     def fuse_voltage(cls, quad_chan):
@@ -127,10 +130,64 @@ class TestLcdDisplay():
     def test_update(self):
 
         self.display.update()
-        buffer = self.display.lcd_buffer
-        if PY3:
-            buffer = buffer.encode()
-        self.display.lcd.ser.write.assert_any_call(buffer)
+        assert_equal(
+            self.display.writer.displayed,
+            render_frame(self.display.lcd_buffer, self.rows, self.cols)
+        )
+
+    @patch('lpdpower.lcd_display.time.time')
+    def test_update_renders_on_change(self, mock_time):
+
+        self.display.current_page = self.display.registered_pages.index(
+            self.display.position_page
+        )
+        mock_time.return_value = 1000.2
+        with patch.object(self.pscu, 'get_state', return_value=Mock(position=10.0)) as mock_state:
+            self.display.update()
+            render_count = self.display.render_count
+
+            mock_time.return_value = 1000.7
+            self.display.update()
+            assert_equal(self.display.render_count, render_count)
+
+            mock_state.return_value = Mock(position=10.5)
+            self.display.update()
+            assert_equal(self.display.render_count, render_count + 1)
+
+            mock_time.return_value = 1001.0
+            self.display.update()
+            assert_equal(self.display.render_count, render_count + 2)
+
+    @patch('lpdpower.lcd_display.time.time')
+    def test_update_quad_page_renders_on_change(self, mock_time):
+
+        self.display.current_page = len(self.display.registered_pages) - 1
+        mock_time.return_value = 1000.0
+        quad = self.pscu.quad[3]
+        quad_state = Mock(channel_current=(1.0, 1.0, 1.0, 1.0))
+        with patch.object(quad, 'get_state', return_value=quad_state), \
+                patch.object(quad, 'get_fet_failed', return_value=False), \
+                patch.object(quad, 'get_fuse_blown', return_value=False):
+            self.display.update()
+            render_count = self.display.render_count
+            self.display.update()
+            assert_equal(self.display.render_count, render_count)
+
+            quad.get_state.return_value = Mock(channel_current=(1.0, 1.0, 1.0, 2.0))
+            self.display.update()
+            assert_equal(self.display.render_count, render_count + 1)
+
+    def test_background_writer(self):
+
+        display = LcdDisplay(self.pscu, self.serial_dev, rows=self.rows, cols=self.cols)
+        try:
+            assert_true(display.writer.is_running())
+            display.set_content('Background')
+        finally:
+            display.close()
+        assert_false(display.writer.is_running())
+        assert_equal(''.join(display.writer.displayed[:10]), 'Background')
+        display.lcd.ser.close.assert_called_with()
 
     def test_format_state_str(self):
 
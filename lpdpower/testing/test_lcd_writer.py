@@ -0,0 +1,131 @@
+"""Test cases for the LcdWriter class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock, call
+else:                         # pragma: no cover
+    from mock import Mock, call
+
+from nose.tools import *
+
+from lpdpower.lcd_writer import LcdWriter, render_frame, diff_frames
+
+
+class TestRenderFrame():
+
+    def test_render_rows(self):
+
+        frame = render_frame('abc\rdefg\r', 3, 4)
+        assert_equal(''.join(frame), 'abc defg    ')
+
+    def test_render_wraps(self):
+
+        frame = render_frame('abcdef\rg', 3, 4)
+        assert_equal(''.join(frame), 'abcdef  g   ')
+
+    def test_render_truncates(self):
+
+        frame = render_frame('abcdefghijklm', 2, 4)
+        assert_equal(''.join(frame), 'abcdefgh')
+
+
+class TestDiffFrames():
+
+    def test_no_change(self):
+
+        frame = render_frame('abcd', 2, 4)
+        assert_equal(diff_frames(frame, list(frame), 2, 4), [])
+
+    def test_changed_runs(self):
+
+        old_frame = list('aaaaaaaaaa' + 'bbbbbbbbbb')
+        new_frame = list('xaaaaaaaxa' + 'bbxxbbbbbb')
+        assert_equal(diff_frames(old_frame, new_frame, 2, 10), [
+            (0, 0, 'x'), (0, 8, 'x'), (1, 2, 'xx'),
+        ])
+
+    def test_merge_gap(self):
+
+        old_frame = list('aaaaaaaaaa')
+        new_frame = list('xaaxaaaaax')
+        assert_equal(diff_frames(old_frame, new_frame, 1, 10, max_gap=2), [
+            (0, 0, 'xaax'), (0, 9, 'x'),
+        ])
+
+
+class TestLcdWriter():
+
+    def setup(self):
+
+        self.lcd = Mock()
+        self.writer = LcdWriter(self.lcd, 2, 10)
+
+    def test_submit_writes_changes(self):
+
+        self.writer.submit('Temp 20.0C')
+        self.lcd.reset_mock()
+
+        self.writer.submit('Temp 21.5C')
+        assert_equal(self.lcd.mock_calls, [
+            call.begin_buffer(), call.set_cursor(7, 1), call.write('1.5'), call.flush(),
+            call.discard_buffer(),
+        ])
+        assert_equal(self.writer.frames_written, 2)
+        assert_equal(self.writer.chars_written, 13)
+
+    def test_submit_unchanged(self):
+
+        self.writer.submit('Temp 20.0C')
+        self.lcd.reset_mock()
+
+        self.writer.submit('Temp 20.0C\r')
+        self.lcd.set_cursor.assert_not_called()
+        self.lcd.write.assert_not_called()
+
+    def test_set_colour(self):
+
+        self.writer.set_colour((0x00, 0xFF, 0x00))
+        self.lcd.set_backlight_colour.assert_called_with((0x00, 0xFF, 0x00))
+
+    def test_write_error(self):
+
+        self.lcd.flush.side_effect = IOError('serial write failed')
+        self.writer.submit('Temp 20.0C')
+        self.lcd.flush.side_effect = None
+        self.lcd.reset_mock()
+
+        self.writer.submit('Temp 20.0C')
+        assert_equal(self.lcd.set_cursor.mock_calls, [call(1, 1), call(1, 2)])
+        assert_equal(self.lcd.write.mock_calls, [call('Temp 20.0C'), call(' ' * 10)])
+
+    def test_write_error_mid_frame(self):
+
+        self.writer.submit('Temp 20.0C')
+        self.lcd.reset_mock()
+        self.lcd.write.side_effect = [None, IOError('serial write failed')]
+        self.writer.submit('Temp 21.5\rFan  OK')
+        self.lcd.write.side_effect = None
+
+        self.lcd.flush.assert_not_called()
+        self.lcd.discard_buffer.assert_called_once_with()
+        assert_equal(self.writer.displayed, [None] * 20)
+
+        self.lcd.reset_mock()
+        self.writer.submit('Temp 21.5\rFan  OK')
+        assert_equal(self.lcd.write.mock_calls, [call('Temp 21.5 '), call('Fan  OK   ')])
+
+    def test_background_thread(self):
+
+        self.writer.start()
+        assert_true(self.writer.is_running())
+        self.writer.set_colour((0xFF, 0x00, 0x00))
+        self.writer.submit('First')
+        self.writer.submit('Second')
+        self.writer.stop(1.0)
+
+        assert_false(self.writer.is_running())
+        assert_equal(''.join(self.writer.displayed[:6]), 'Second')
+        self.lcd.set_backlight_colour.assert_called_with((0xFF, 0x00, 0x00))
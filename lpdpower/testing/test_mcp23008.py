@@ -6,14 +6,15 @@ Tim Nicholls, STFC Application Engineering
 import sys
 
 if sys.version_info[0] == 3:  # pragma: no cover
-    from unittest.mock import Mock
+    from unittest.mock import Mock, patch, call
 else:                         # pragma: no cover
-    from mock import Mock
+    from mock import Mock, patch, call
 
 from nose.tools import *
 
 sys.modules['smbus'] = Mock()
 from lpdpower.mcp23008 import MCP23008
+from lpdpower.i2c_device import I2CException
 
 class TestMCP23008():
     
@@ -30,6 +31,10 @@ class TestMCP23008():
         cls.mcp23008._MCP23008__gppu = 0
         cls.mcp23008._MCP23008__gpio = 0
         
+        cls.mcp23008._MCP23008__gpinten = 0
+        cls.mcp23008._MCP23008__defval = 0
+        cls.mcp23008._MCP23008__intcon = 0
+
         # Explictly mock underlying I2C byte read (called by I2CDevice.readU8) to return value
         cls.mcp23008.bus.read_byte_data.return_value = 0
         
@@ -123,6 +128,94 @@ class TestMCP23008():
             self.address, MCP23008.GPIO
         )
         
+    def test_read_gpio(self):
+
+        with patch.object(self.mcp23008.bus, 'read_byte_data', return_value=0xa5) as mock_read:
+            assert_equal(self.mcp23008.read_gpio(), 0xa5)
+            mock_read.assert_called_with(self.address, MCP23008.GPIO)
+
+    def test_read_interrupt_state(self):
+
+        with patch.object(self.mcp23008.bus, 'read_i2c_block_data',
+                          return_value=[0x01, 0x03, 0x02]) as mock_read:
+            assert_equal(self.mcp23008.read_interrupt_state(), (0x01, 0x03, 0x02))
+            mock_read.assert_called_with(self.address, MCP23008.INTF, 3)
+
+    def test_read_interrupt_state_error(self):
+
+        with patch.object(self.mcp23008.bus, 'read_i2c_block_data', return_value=[0x01]):
+            assert_equal(self.mcp23008.read_interrupt_state(), (MCP23008.ERROR,) * 3)
+
+    def test_setup_interrupts_on_change(self):
+
+        self.mcp23008.setup_interrupts([0, 3])
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.GPINTEN, 0x09
+        )
+        self.mcp23008.bus.write_byte_data.assert_any_call(self.address, MCP23008.INTCON, 0x00)
+
+        self.mcp23008.setup_interrupts([3], enabled=False)
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.GPINTEN, 0x01
+        )
+
+    def test_setup_interrupts_default(self):
+
+        self.mcp23008.setup_interrupts([1, 2], default=MCP23008.HIGH)
+        self.mcp23008.bus.write_byte_data.assert_any_call(self.address, MCP23008.DEFVAL, 0x06)
+        self.mcp23008.bus.write_byte_data.assert_any_call(self.address, MCP23008.INTCON, 0x06)
+
+        self.mcp23008.setup_interrupts([1, 2], enabled=False)
+        self.mcp23008.bus.write_byte_data.assert_any_call(self.address, MCP23008.INTCON, 0x00)
+
+    def test_configure_interrupt_output(self):
+
+        with patch.object(self.mcp23008.bus, 'read_byte_data', return_value=0):
+            self.mcp23008.configure_interrupt_output(open_drain=True)
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.IOCON, MCP23008.IOCON_ODR
+        )
+
+        with patch.object(self.mcp23008.bus, 'read_byte_data', return_value=0):
+            self.mcp23008.configure_interrupt_output(active_high=True)
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.IOCON, MCP23008.IOCON_INTPOL
+        )
+
+    def test_configure_interrupt_output_preserves_iocon(self):
+
+        seqop = 1 << 5
+        with patch.object(self.mcp23008.bus, 'read_byte_data',
+                          return_value=seqop | MCP23008.IOCON_INTPOL):
+            self.mcp23008.configure_interrupt_output(open_drain=True)
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.IOCON, seqop | MCP23008.IOCON_ODR
+        )
+
+        with patch.object(self.mcp23008.bus, 'read_byte_data',
+                          return_value=seqop | MCP23008.IOCON_ODR):
+            self.mcp23008.configure_interrupt_output()
+        self.mcp23008.bus.write_byte_data.assert_called_with(
+            self.address, MCP23008.IOCON, seqop
+        )
+
+    def test_configure_interrupt_output_read_error(self):
+
+        num_writes = len(self.mcp23008.bus.write_byte_data.call_args_list)
+        with patch.object(self.mcp23008.bus, 'read_byte_data', side_effect=IOError('error')):
+            with assert_raises_regexp(I2CException, 'Unable to read IOCON register'):
+                self.mcp23008.configure_interrupt_output(open_drain=True)
+        assert_equal(len(self.mcp23008.bus.write_byte_data.call_args_list), num_writes)
+
+    def test_read_captured_gpio(self):
+
+        with patch.object(self.mcp23008.bus, 'read_i2c_block_data',
+                          return_value=[0x03, 0x01, 0xf2]):
+            assert_equal(self.mcp23008.read_captured_gpio(), 0xf1)
+
+        with patch.object(self.mcp23008.bus, 'read_i2c_block_data', return_value=[]):
+            assert_equal(self.mcp23008.read_captured_gpio(), MCP23008.ERROR)
+
     def test_output_high(self):
         
         pin = 3
@@ -168,5 +261,24 @@ class TestMCP23008():
         self.mcp23008.bus.write_byte_data.assert_called_with(
             self.address, MCP23008.GPIO, expected_gpio
         )
-        
-        
\ No newline at end of file
+
+    def test_pulse_outputs(self):
+
+        writes = self.mcp23008.bus.write_byte_data.call_args_list
+        self.mcp23008.output_pins({0: 1})
+
+        num_writes = len(writes)
+        self.mcp23008.pulse_outputs([1, 3])
+        assert_equal(writes[num_writes:], [
+            call(self.address, MCP23008.GPIO, 0),
+            call(self.address, MCP23008.GPIO, 0x0a),
+            call(self.address, MCP23008.GPIO, 0),
+        ])
+
+        # The leading write is skipped when the outputs are already low
+        num_writes = len(writes)
+        self.mcp23008.pulse_outputs([2])
+        assert_equal(writes[num_writes:], [
+            call(self.address, MCP23008.GPIO, 0x04),
+            call(self.address, MCP23008.GPIO, 0),
+        ])
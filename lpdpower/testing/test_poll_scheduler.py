@@ -0,0 +1,167 @@
+"""Test cases for the PollScheduler and PollGroup classes from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock, patch
+else:                         # pragma: no cover
+    from mock import Mock, patch
+
+from nose.tools import *
+
+from lpdpower.poll_scheduler import PollScheduler, PollGroup
+
+
+class TestPollGroup():
+
+    def setup(self):
+
+        self.poll_func = Mock()
+        self.group = PollGroup('group', self.poll_func, 1.0, priority=2, next_due=10.0)
+
+    def test_poll(self):
+
+        self.group.poll(10.0)
+
+        self.poll_func.assert_called_with()
+        assert_equal(self.group.generation, 1)
+        assert_equal(self.group.poll_count, 1)
+        assert_equal(self.group.next_due, 11.0)
+
+    def test_poll_late_does_not_drift(self):
+
+        self.group.poll(10.4)
+        assert_equal(self.group.next_due, 11.0)
+
+    def test_poll_missed_reschedules_from_now(self):
+
+        self.group.poll(13.5)
+        assert_equal(self.group.next_due, 14.5)
+
+    def test_mark_due_during_poll(self):
+
+        self.poll_func.side_effect = lambda: self.group.mark_due(10.0)
+        self.group.poll(10.0)
+
+        assert_equal(self.group.next_due, 10.0)
+        assert_false(self.group.due_pending)
+
+    def test_mark_due_before_poll(self):
+
+        self.group.mark_due(9.5)
+        assert_equal(self.group.next_due, 9.5)
+
+        self.group.poll(9.5)
+        assert_equal(self.group.next_due, 10.5)
+
+    def test_poll_exception(self):
+
+        self.poll_func.side_effect = Exception('poll failed')
+        self.group.poll(10.0)
+
+        assert_equal(self.group.generation, 0)
+        assert_equal(self.group.error_count, 1)
+        assert_equal(self.group.poll_count, 1)
+        assert_equal(self.group.next_due, 11.0)
+
+    def test_get_status(self):
+
+        status = self.group.get_status()
+        assert_equal(status['interval'], 1.0)
+        assert_equal(status['priority'], 2)
+        assert_equal(status['poll_count'], 0)
+
+
+class TestPollScheduler():
+
+    def setup(self):
+
+        self.calls = []
+        self.scheduler = PollScheduler()
+        with patch('lpdpower.poll_scheduler._clock', return_value=100.0):
+            self.scheduler.add_group('slow', lambda: self.calls.append('slow'), 1.0, priority=3)
+            self.scheduler.add_group('fast', lambda: self.calls.append('fast'), 0.1, priority=0)
+            self.scheduler.add_group(
+                'offset', lambda: self.calls.append('offset'), 0.1, priority=1, offset=0.05
+            )
+
+    def test_add_duplicate_group(self):
+
+        with assert_raises_regexp(ValueError, 'already exists'):
+            self.scheduler.add_group('fast', Mock(), 1.0)
+
+    def test_get_missing_group(self):
+
+        with assert_raises_regexp(ValueError, 'does not exist'):
+            self.scheduler.get_group('missing')
+
+    def test_poll_due_priority_order(self):
+
+        polled = self.scheduler.poll_due(100.0)
+        assert_equal(polled, ['fast', 'slow'])
+        assert_equal(self.calls, ['fast', 'slow'])
+
+    def test_poll_due_rates(self):
+
+        for tick in range(20):
+            self.scheduler.poll_due(100.0 + tick * 0.05)
+
+        assert_equal(self.calls.count('fast'), 10)
+        assert_equal(self.calls.count('offset'), 10)
+        assert_equal(self.calls.count('slow'), 1)
+
+    def test_set_interval(self):
+
+        self.scheduler.poll_due(100.0)
+        self.scheduler.set_interval('slow', 2.0)
+
+        assert_equal(self.scheduler.get_group('slow').interval, 2.0)
+        assert_equal(self.scheduler.get_group('slow').next_due, 102.0)
+
+    def test_mark_all_polled(self):
+
+        self.scheduler.mark_all_polled(100.0)
+
+        assert_equal(self.scheduler.poll_due(100.0), [])
+        for group in self.scheduler.groups:
+            assert_equal(group.generation, 1)
+        assert_almost_equal(self.scheduler.get_group('slow').next_due, 101.0)
+        assert_almost_equal(self.scheduler.get_group('fast').next_due, 100.1)
+        assert_almost_equal(self.scheduler.get_group('offset').next_due, 100.15)
+
+    def test_mark_all_polled_keeps_stagger(self):
+
+        self.scheduler.mark_all_polled(100.32)
+
+        assert_almost_equal(self.scheduler.get_group('fast').next_due, 100.5)
+        assert_almost_equal(self.scheduler.get_group('offset').next_due, 100.45)
+
+    def test_mark_due(self):
+
+        self.scheduler.mark_all_polled()
+        assert_false('slow' in self.scheduler.poll_due())
+
+        self.scheduler.mark_due('slow')
+        assert_equal(self.scheduler.poll_due(), ['slow'])
+
+    def test_mark_due_during_all_polled(self):
+
+        self.scheduler.mark_due('slow')
+        self.scheduler.mark_all_polled(100.0)
+
+        assert_equal(self.scheduler.poll_due(100.0), ['slow'])
+
+    def test_time_to_next_poll(self):
+
+        self.scheduler.poll_due(100.0)
+        assert_almost_equal(self.scheduler.time_to_next_poll(100.0), 0.05)
+        assert_equal(self.scheduler.time_to_next_poll(200.0), 0.0)
+        assert_equal(PollScheduler().time_to_next_poll(), None)
+
+    def test_get_status(self):
+
+        status = self.scheduler.get_status()
+        assert_equal(set(status.keys()), set(['slow', 'fast', 'offset']))
@@ -0,0 +1,108 @@
+"""Test cases for the PSCUPoller class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+import time
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+from lpdpower.poller import PSCUPoller
+
+
+class TestPSCUPoller():
+
+    def setup(self):
+
+        self.pscu = Mock()
+        self.update_interval = 0.01
+        self.poller = PSCUPoller(self.pscu, self.update_interval)
+
+    def teardown(self):
+
+        self.poller.stop()
+
+    def _wait_for_updates(self, num_updates, timeout=2.0):
+
+        end_time = time.time() + timeout
+        while self.poller.update_count < num_updates and time.time() < end_time:
+            time.sleep(self.update_interval)
+
+    def test_update_calls_pscu_tasks(self):
+
+        self.poller.update()
+
+        self.pscu.handle_deferred.assert_called_with()
+        self.pscu.update_lcd.assert_called_with()
+        self.pscu.poll_sensors.assert_called_with()
+        assert_equal(self.poller.update_count, 1)
+
+    def test_update_callbacks(self):
+
+        callback = Mock()
+        self.poller.add_update_callback(callback)
+        self.poller.update()
+        callback.assert_called_once_with()
+
+    def test_update_callback_exception(self):
+
+        callbacks = [Mock(side_effect=Exception('LCD failed')), Mock()]
+        for callback in callbacks:
+            self.poller.add_update_callback(callback)
+
+        self.poller.update()
+        for callback in callbacks:
+            callback.assert_called_once_with()
+        assert_equal(self.poller.update_count, 1)
+
+    def test_update_handles_exception(self):
+
+        self.pscu.poll_sensors.side_effect = Exception('poll failed')
+        self.poller.update()
+        assert_equal(self.poller.update_count, 1)
+
+    def test_start_stop(self):
+
+        assert_false(self.poller.is_running())
+
+        self.poller.start()
+        assert_true(self.poller.is_running())
+
+        self._wait_for_updates(3)
+        assert_true(self.poller.update_count >= 3)
+        assert_true(self.pscu.poll_sensors.call_count >= 3)
+
+        self.poller.stop()
+        assert_false(self.poller.is_running())
+
+    def test_start_twice(self):
+
+        self.poller.start()
+        thread = self.poller._thread
+        self.poller.start()
+        assert_equal(self.poller._thread, thread)
+
+    def test_thread_survives_exception(self):
+
+        self.pscu.poll_sensors.side_effect = Exception('poll failed')
+        self.poller.start()
+        self._wait_for_updates(3)
+        assert_true(self.poller.is_running())
+        assert_true(self.poller.update_count >= 3)
+
+    def test_wake(self):
+
+        self.poller.update_interval = 10.0
+        self.poller.start()
+        self._wait_for_updates(1)
+        assert_equal(self.poller.update_count, 1)
+
+        self.poller.wake()
+        self._wait_for_updates(2)
+        assert_equal(self.poller.update_count, 2)
@@ -4,6 +4,8 @@ Tim Nicholls, STFC Application Engineering
 """
 
 import sys
+import threading
+import time
 
 if sys.version_info[0] == 3:  # pragma: no cover
     from unittest.mock import Mock, patch, call
@@ -19,6 +21,8 @@ sys.modules['Adafruit_BBIO'] = Mock()
 sys.modules['Adafruit_BBIO.GPIO'] = Mock()
 from lpdpower.pscu import PSCU
 from lpdpower.i2c_device import I2CException
+from lpdpower.i2c_bus_manager import I2CBusManager
+from lpdpower.enable_sequencer import EnableSequencer
 
 class TestPSCU():
 
@@ -185,9 +189,37 @@ class TestPSCU():
 
     def test_quad_enable_channel(self):
 
-        with patch('lpdpower.pscu.Quad.set_enable') as mock_enable:
+        with patch('lpdpower.pscu.Quad.set_enables') as mock_enable:
             self.pscu.quad_enable_channel(2, 3)
-            mock_enable.assert_called_with(3, True)
+            mock_enable.assert_called_with({3: True}, refresh=True)
+
+    def test_set_quad_enables(self):
+
+        with patch('lpdpower.pscu.Quad.set_enables', autospec=True) as mock_enables:
+            self.pscu.set_quad_enables([(3, 1), (0, 2), (3, 0), (0, 3)], False)
+            assert_equal(mock_enables.call_args_list, [
+                call(self.pscu.quad[0], {2: False, 3: False}, refresh=True),
+                call(self.pscu.quad[3], {1: False, 0: False}, refresh=True),
+            ])
+
+    def test_set_quad_enables_read_error(self):
+
+        def set_enables(quad, channels, refresh):
+            if quad is self.pscu.quad[1]:
+                raise I2CException('read failed')
+
+        with patch('lpdpower.pscu.Quad.set_enables', autospec=True,
+                   side_effect=set_enables) as mock_enables:
+            with assert_raises_regexp(I2CException, r'Failed to set enables of quads \[1\]'):
+                self.pscu.set_quad_enables([(0, 0), (1, 0), (2, 0)], False)
+            assert_equal(mock_enables.call_count, 3)
+
+    def test_set_quad_enables_illegal_channel(self):
+
+        with patch('lpdpower.pscu.Quad.set_enables') as mock_enables:
+            with assert_raises_regexp(I2CException, 'Illegal channel index 4 specified'):
+                self.pscu.set_quad_enables([(0, 1), (1, 4)], True)
+            assert_false(mock_enables.called)
 
     def test_quad_enable_channel_illegal_quad(self):
 
@@ -209,9 +241,9 @@ class TestPSCU():
         enable_calls = []
         for _ in range(4):
             for chan in range(4):
-                enable_calls.append(call(chan, True))
+                enable_calls.append(call({chan: True}, refresh=True))
 
-        with patch('lpdpower.pscu.Quad.set_enable') as mock_enable:
+        with patch('lpdpower.pscu.Quad.set_enables') as mock_enable:
             self.pscu.enable_all(True)
             while self.pscu.deferred_executor.pending():
                 self.pscu.handle_deferred()
@@ -225,12 +257,9 @@ class TestPSCU():
         enable_interval = self.pscu.get_enable_interval()
         self.pscu.quad_enable_interval = 0.0
 
-        enable_calls = []
-        for _ in range(4):
-            for chan in range(4):
-                enable_calls.append(call(chan, False))
+        enable_calls = [call({0: False, 1: False, 2: False, 3: False}, refresh=True)] * 4
 
-        with patch('lpdpower.pscu.Quad.set_enable') as mock_enable:
+        with patch('lpdpower.pscu.Quad.set_enables') as mock_enable:
             # Enable all to push pending enables onto deferred executor queue
             self.pscu.enable_all(True)
             self.pscu.enable_all(False)
@@ -241,6 +270,88 @@ class TestPSCU():
 
         self.pscu.quad_enable_interval = enable_interval
 
+    def test_disable_all_read_error(self):
+
+        # Read the enables of quad 1 as failed and of all other quads as all channels enabled
+        def read_gpio(mcp):
+            return mcp.ERROR if mcp is self.pscu.quad[1].mcp else 0xf0
+
+        with patch('lpdpower.quad.MCP23008.read_gpio', autospec=True, side_effect=read_gpio):
+            with patch('lpdpower.quad.MCP23008.pulse_outputs', autospec=True) as mock_pulse:
+                self.pscu.enable_all(True)
+                with assert_raises_regexp(I2CException, r'Failed to set enables of quads \[1\]'):
+                    self.pscu.enable_all(False)
+
+        pulsed = [self.pscu.quad.index(
+            [quad for quad in self.pscu.quad if quad.mcp is args[0]][0]
+        ) for (args, _) in mock_pulse.call_args_list]
+        assert_equal(pulsed, [0, 2, 3])
+        for (args, _) in mock_pulse.call_args_list:
+            assert_equal(sorted(args[1]), [0, 1, 2, 3])
+        assert_false(self.pscu.get_all_enabled())
+        assert_false(self.pscu.enable_sequencer.is_active())
+
+    def test_enable_sequence_status(self):
+
+        status = self.pscu.get_enable_sequence_status()
+        assert_false(status['active'])
+        assert_equal(status['budget'], EnableSequencer.DEFAULT_INRUSH)
+
+    def run_during_enable_step(self, func):
+
+        enable_interval = self.pscu.get_enable_interval()
+        enable_budget = self.pscu.enable_sequencer.budget
+        self.pscu.quad_enable_interval = 0.5
+        self.pscu.enable_sequencer.budget = 8 * self.pscu.enable_sequencer.inrush
+
+        calls = []
+        in_step = threading.Event()
+        release_step = threading.Event()
+
+        # Block the step enabling a group spanning two quads after the first quad is enabled
+        def set_enables(quad, channels, refresh):
+            enable = any(channels.values())
+            calls.append((self.pscu.quad.index(quad), enable))
+            if enable and not in_step.is_set():
+                in_step.set()
+                release_step.wait(1.0)
+
+        thread = threading.Thread(target=func)
+        with patch('lpdpower.pscu.Quad.set_enables', autospec=True, side_effect=set_enables):
+            self.pscu.deferred_executor.start()
+            try:
+                self.pscu.enable_all(True)
+                assert_true(in_step.wait(1.0))
+
+                thread.start()
+                thread.join(0.05)
+                blocked = thread.is_alive()
+                release_step.set()
+                thread.join(1.0)
+                assert_false(thread.is_alive())
+                time.sleep(0.05)
+            finally:
+                release_step.set()
+                self.pscu.deferred_executor.stop(1.0)
+                self.pscu.quad_enable_interval = enable_interval
+                self.pscu.enable_sequencer.budget = enable_budget
+
+        assert_true(blocked)
+        assert_false(self.pscu.enable_sequencer.is_active())
+        assert_equal(self.pscu.deferred_executor.pending(), 0)
+
+        return calls
+
+    def test_disable_all_during_enable_step(self):
+
+        calls = self.run_during_enable_step(lambda: self.pscu.enable_all(False))
+        assert_equal(calls, [(0, True), (1, True), (0, False), (1, False), (2, False), (3, False)])
+
+    def test_cancel_enable_sequence_during_step(self):
+
+        calls = self.run_during_enable_step(self.pscu.enable_sequencer.cancel)
+        assert_equal(calls, [(0, True), (1, True)])
+
     def test_set_armed(self):
 
         arm_pin = 0
@@ -251,6 +362,20 @@ class TestPSCU():
             mock_output.assert_has_calls(arm_calls)
             assert_equal(len(mock_output.mock_calls), len(arm_calls))
 
+    def test_set_armed_safety_priority(self):
+
+        grants = self.pscu.bus_manager.grants[I2CBusManager.PRIORITY_SAFETY]
+
+        with patch('lpdpower.pscu.MCP23008.output'):
+            self.pscu.set_armed(False)
+
+        assert_equal(self.pscu.bus_manager.grants[I2CBusManager.PRIORITY_SAFETY], grants + 1)
+
+    def test_bus_status(self):
+
+        status = self.pscu.get_bus_status()
+        assert_equal(sorted(status['priorities'].keys()), ['control', 'poll', 'safety'])
+
     def test_set_fan_target(self):
 
         with patch('lpdpower.pscu.AD5321.set_output_scaled') as mock_output:
@@ -289,21 +414,27 @@ class TestPSCU():
             self.pscu.update_lcd()
             assert_equal(self.pscu.lcd.current_page, expected_page)
 
+    def _set_healthy_state(self, healthy):
+
+        state = self.pscu.get_state()
+        draft = state.draft()
+        draft.healthy = healthy
+        self.pscu._PSCU__state = state.next_state(draft, state.timestamp)
+        return state
+
     def test_update_lcd_healthy(self):
 
-        current_health = self.pscu._PSCU__healthy
-        self.pscu._PSCU__healthy = True
+        current_state = self._set_healthy_state(True)
         self.pscu.update_lcd()
         assert_equal(self.pscu.lcd.lcd_colour, self.pscu.lcd.GREEN)
-        self.pscu._PSCU__healthy = current_health
+        self.pscu._PSCU__state = current_state
 
     def test_update_lcd_unhealthy(self):
 
-        current_health = self.pscu._PSCU__healthy
-        self.pscu._PSCU__healthy = False
+        current_state = self._set_healthy_state(False)
         self.pscu.update_lcd()
         assert_equal(self.pscu.lcd.lcd_colour, self.pscu.lcd.RED)
-        self.pscu._PSCU__healthy = current_health
+        self.pscu._PSCU__state = current_state
 
     def test_update_lcd_with_error(self):
 
@@ -390,8 +521,11 @@ class TestPSCU():
 
     def test_poll_all_sensors(self):
 
-        self.bus.reset_mock()
+        # Poll once to ensure the ADC channel selections are programmed, then check the
+        # transactions of a subsequent poll
         self.bus.read_byte_data.return_value = 0
+        self.pscu.poll_all_sensors()
+        self.bus.reset_mock()
 
         self.pscu.poll_all_sensors()
 
@@ -403,19 +537,257 @@ class TestPSCU():
             if len(args):
                 i2c_addrs_called.add(args[0])
 
-        expected_i2c_methods = set(['read_word_data', 'read_byte_data', 'write_byte_data'])
+        expected_i2c_methods = set(['read_i2c_block_data', 'read_byte_data', 'write_byte_data'])
         expected_i2c_addrs = set([0x20, 0x21, 0x22, 0x23, 0x24, 0x25, 0x26, 0x27, 0x70])
         assert_equal(i2c_methods_called, expected_i2c_methods)
         assert_equal(i2c_addrs_called, expected_i2c_addrs)
 
+    def test_poll_all_sensors_mux_switches(self):
+
+        self.pscu.poll_all_sensors()
+        self.bus.reset_mock()
+
+        self.pscu.poll_all_sensors()
+
+        mux_writes = [
+            args[2] for (name, args, _) in self.bus.mock_calls
+            if name == 'write_byte_data' and args[0] == 0x70
+        ]
+        assert_equal(len(mux_writes), len(set(mux_writes)))
+        assert_equal(self.pscu.get_poll_mux_switches(), len(mux_writes))
+        assert_true(self.pscu.get_poll_mux_switches() <= 6)
+
+    def test_poll_all_sensors_increments_generation(self):
+
+        generation = self.pscu.get_generation()
+        state = self.pscu.get_state()
+
+        self.pscu.poll_all_sensors()
+
+        assert_equal(self.pscu.get_generation(), generation + 1)
+        assert_true(self.pscu.get_state() is not state)
+        assert_equal(state.generation, generation)
+
+    def test_poll_all_sensors_marks_groups_polled(self):
+
+        generations = {
+            name: status['generation'] for (name, status) in self.pscu.get_poll_status().items()
+        }
+        self.pscu.poll_all_sensors()
+
+        for (name, status) in self.pscu.get_poll_status().items():
+            assert_equal(status['generation'], generations[name] + 1)
+        assert_equal(self.pscu.poll_sensors(), [])
+
+    def test_poll_groups(self):
+
+        groups = self.pscu.get_poll_status()
+        assert_equal(
+            set(groups.keys()),
+            set(['interlock', 'temperature', 'misc', 'quad0', 'quad1', 'quad2', 'quad3'])
+        )
+        for (name, interval) in PSCU.DEFAULT_POLL_INTERVALS.items():
+            if name == 'quad':
+                name = 'quad0'
+            assert_equal(groups[name]['interval'], interval)
+
+    @patch('lpdpower.i2c_device.smbus.SMBus')
+    def test_poll_group_overrides(self, mock_bus):
+
+        pscu = PSCU(poll_intervals={'temperature': 5.0}, poll_priorities={'quad': 7})
+        groups = pscu.get_poll_status()
+        assert_equal(groups['temperature']['interval'], 5.0)
+        assert_equal(groups['quad2']['priority'], 7)
+        assert_equal(groups['misc']['interval'], PSCU.DEFAULT_POLL_INTERVALS['misc'])
+
+    def test_poll_sensors_group(self):
+
+        group = self.pscu.poll_scheduler.get_group('temperature')
+        group.next_due = 0.0
+        generation = self.pscu.get_generation()
+
+        with patch('lpdpower.pscu.AD7998.read_inputs_codes', return_value=[2048] * 8):
+            polled = self.pscu.poll_sensors()
+
+        assert_true('temperature' in polled)
+        assert_true(self.pscu.get_generation() > generation)
+        assert_almost_equal(self.pscu.get_temperature(0), 26.92, places=2)
+
+    def test_poll_all_sensors_converts_codes(self):
+
+        codes = {
+            self.pscu.adc_misc[0]: [100, 200, 300, 400],
+            self.pscu.adc_misc[1]: [500, 600, 700, 800, 900],
+        }
+        self.pscu.converters['pump'].set_calibration(0, gain=2.0, offset=1.0)
+        try:
+            with patch('lpdpower.pscu.AD7998.read_inputs_codes', autospec=True,
+                       side_effect=lambda adc, channels: codes.get(adc, [0] * len(channels))):
+                self.pscu.poll_all_sensors()
+        finally:
+            self.pscu.converters['pump'].set_calibration(0)
+
+        assert_almost_equal(self.pscu.get_fan_speed(), self.pscu.convert_ad7998_fan(500 / 4095.0))
+        assert_almost_equal(
+            self.pscu.get_fan_set_point(), self.pscu.convert_ad7998_fan(100 / 4095.0)
+        )
+        assert_almost_equal(
+            self.pscu.get_pump_flow(), 2.0 * self.pscu.convert_ad7998_pump(800 / 4095.0) + 1.0
+        )
+        assert_almost_equal(
+            self.pscu.get_position(), self.pscu.convert_ad7998_position(900 / 4095.0)
+        )
+        assert_almost_equal(
+            self.pscu.get_humidity(0), self.pscu.convert_ad7998_humidity(700 / 4095.0)
+        )
+        assert_almost_equal(
+            self.pscu.get_leak_impedance(0), self.pscu.convert_ad7998_leak_impedance(600 / 4095.0)
+        )
+        assert_almost_equal(self.pscu.get_temperature(0), self.pscu.convert_ad7998_temp(0.0))
+
+    def test_get_converters(self):
+
+        converters = self.pscu.get_converters()
+        assert_true(converters['temperature'] is self.pscu.converters['temperature'])
+        assert_true(
+            converters['quad/2/supply_voltage'] is self.pscu.quad[2].converters['supply_voltage']
+        )
+        assert_equal(converters['temperature'].num_channels, self.pscu.num_temperatures)
+
+    def test_set_calibrations(self):
+
+        converters = self.pscu.get_converters()
+        with patch('lpdpower.pscu.logging.warning') as mock_warning:
+            self.pscu.set_calibrations({
+                'temperature_3': (1.02, -0.5, []),
+                'quad_1_channel_current_2': (1.0, 0.0, [0.0, 1.0, 0.01]),
+                'temperature_11': (2.0, 0.0, []),
+            })
+            mock_warning.assert_called_with(
+                'Ignoring calibration of unknown sensor channel temperature_11'
+            )
+        try:
+            assert_equal(converters['temperature'].get_calibration(3), (1.02, -0.5, []))
+            assert_equal(
+                converters['quad/1/channel_current'].get_calibration(2),
+                (1.0, 0.0, [0.0, 1.0, 0.01])
+            )
+        finally:
+            converters['temperature'].set_calibration(3)
+            converters['quad/1/channel_current'].set_calibration(2)
+
+    def test_poll_sensors_quad_renews_state(self):
+
+        group = self.pscu.poll_scheduler.get_group('quad1')
+        group.next_due = 0.0
+        generation = self.pscu.get_generation()
+
+        with patch.object(self.pscu.quad[1], 'poll_all_sensors') as mock_poll:
+            polled = self.pscu.poll_sensors()
+            mock_poll.assert_called_with()
+
+        assert_true('quad1' in polled)
+        assert_true(self.pscu.get_generation() > generation)
+
+    def test_poll_all_sensors_decodes_interlock_masks(self):
+
+        masks = dict(zip(
+            self.pscu.mcp_temp_mon + self.pscu.mcp_misc,
+            [0x31, 0xfe, 0x01, 0x3e, 0x84, 0x0d, 0x16, 0x05],
+        ))
+        with patch('lpdpower.pscu.MCP23008.read_gpio', autospec=True,
+                   side_effect=lambda mcp: masks[mcp]):
+            self.pscu.poll_all_sensors()
+
+        assert_equal(self.pscu.get_temperature_disabled(4), True)
+        assert_equal(self.pscu.get_temperature_disabled(10), True)
+        assert_equal(self.pscu.get_leak_disabled(0), True)
+        assert_true(self.pscu.get_temperature_tripped(0))
+        assert_false(self.pscu.get_temperature_tripped(1))
+        assert_true(self.pscu.get_temperature_trace(0))
+        assert_false(self.pscu.get_temperature_trace(1))
+        assert_true(self.pscu.get_temperature_tripped(8))
+        assert_true(self.pscu.get_temperature_trace(8))
+        assert_false(self.pscu.get_fan_tripped())
+        assert_false(self.pscu.get_humidity_tripped(0))
+        assert_true(self.pscu.get_leak_tripped(0))
+        assert_false(self.pscu.get_pump_tripped())
+        assert_true(self.pscu.get_humidity_trace(0))
+        assert_true(self.pscu.get_leak_trace(0))
+        assert_equal([self.pscu.get_quad_trace(i) for i in range(4)],
+                     [True, False, False, False])
+        assert_true(self.pscu.get_armed())
+        assert_true(self.pscu.get_health())
+        assert_equal(self.pscu.get_all_latched(), [True, False, True, False, False])
+
+    def test_poll_all_sensors_trace_pins(self):
+
+        # Each trace state is decoded from a single pin of misc MCP 2: leak on pin 1, humidity
+        # on pin 2 and the quads on pins 4 to 7
+        expected_traces = {
+            0: [], 1: ['leak'], 2: ['humidity'], 3: [],
+            4: ['quad0'], 5: ['quad1'], 6: ['quad2'], 7: ['quad3'],
+        }
+        for (pin, expected) in expected_traces.items():
+            masks = dict((mcp, 0) for mcp in self.pscu.mcp_temp_mon + self.pscu.mcp_misc)
+            masks[self.pscu.mcp_misc[2]] = 1 << pin
+            with patch('lpdpower.pscu.MCP23008.read_gpio', autospec=True,
+                       side_effect=lambda mcp: masks[mcp]):
+                self.pscu.poll_all_sensors()
+
+            traces = [name for (name, trace) in [
+                ('humidity', self.pscu.get_humidity_trace(0)),
+                ('leak', self.pscu.get_leak_trace(0)),
+            ] + [('quad{}'.format(i), self.pscu.get_quad_trace(i)) for i in range(4)] if trace]
+            assert_equal(traces, expected)
+
     def test_poll_all_sensors_disables_when_not_armed(self):
 
-        with patch('lpdpower.pscu.MCP23008.input_pins', return_value=[0]*8) as mock_mcp:
+        with patch('lpdpower.pscu.MCP23008.read_gpio', return_value=0) as mock_mcp:
             self.pscu.enable_all(True)
             self.pscu.set_armed(False)
             self.pscu.poll_all_sensors()
             assert_equal(self.pscu.get_all_enabled(), False)
 
+    @patch('lpdpower.pscu.GPIO')
+    @patch('lpdpower.i2c_device.smbus.SMBus')
+    def test_interlock_interrupts(self, mock_bus, gpio):
+
+        pscu = PSCU(interlock_interrupt_pin='P9_15')
+        assert_equal(pscu.interlock_interrupt_pin, 'P9_15')
+        assert_equal(
+            pscu.get_poll_status()['interlock']['interval'],
+            PSCU.DEFAULT_INTERRUPT_INTERLOCK_POLL_INTERVAL
+        )
+
+        (args, kwargs) = gpio.add_event_detect.call_args
+        assert_equal(args, ('P9_15', gpio.FALLING))
+        interrupt_handler = kwargs['callback']
+
+        interrupt_callback = Mock()
+        pscu.set_interrupt_callback(interrupt_callback)
+        pscu.poll_all_sensors()
+        assert_false('interlock' in pscu.poll_sensors())
+
+        interrupt_handler('P9_15')
+        interrupt_callback.assert_called_with()
+        assert_equal(pscu.get_interlock_interrupt_count(), 1)
+
+        with patch('lpdpower.pscu.MCP23008.read_captured_gpio', return_value=0) as mock_read:
+            assert_true('interlock' in pscu.poll_sensors())
+            assert_equal(mock_read.call_count, len(pscu.mcp_temp_mon + pscu.mcp_misc))
+
+        pscu.cleanup()
+        gpio.remove_event_detect.assert_called_with('P9_15')
+
+    def test_interlock_interrupts_disabled(self):
+
+        assert_equal(self.pscu.interlock_interrupt_pin, None)
+        assert_equal(
+            self.pscu.get_poll_status()['interlock']['interval'],
+            PSCU.DEFAULT_POLL_INTERVALS['interlock']
+        )
+
     def test_cleanup(self):
 
         with patch('lpdpower.pscu.LcdDisplay.set_content') as mock_set_content:
@@ -10,13 +10,17 @@ else:                         # pragma: no cover
     from mock import Mock, call, patch
 
 from nose.tools import *
+import json
 
 sys.modules['smbus'] = Mock()
 sys.modules['serial'] = Mock()
 sys.modules['Adafruit_BBIO'] = Mock()
 sys.modules['Adafruit_BBIO.GPIO'] = Mock()
 from odin.adapters.parameter_tree import ParameterAccessor
-from lpdpower.pscu_data import PSCUData, PSCUDataError
+from lpdpower.pscu_data import PSCUData, PSCUDataError, flatten
+from lpdpower.i2c_stats import I2CStats
+from lpdpower.i2c_device import I2CException
+from lpdpower.conversion import LinearConversion, ChannelConverter
 
 
 class TestPscuData():
@@ -32,10 +36,19 @@ class TestPscuData():
         for quad in cls.pscu.quad:
             quad.num_channels = 4
         cls.pscu.get_all_latched.return_value = [True]*4
+        cls.pscu.get_poll_mux_switches.return_value = 6
+        cls.pscu.get_interlock_interrupt_count.return_value = 2
+        cls.pscu.deferred_executor.get_status.return_value = {'pending': 3, 'executed': 13}
+        cls.pscu.tca.stats = I2CStats()
+        cls.i2c_devices = [Mock(address=addr, stats=I2CStats()) for addr in (0x22, 0x21)]
+        cls.pscu.tca.get_channel_devices.return_value = {4: cls.i2c_devices}
+        cls.converter = ChannelConverter(LinearConversion(10.0), 2)
+        cls.pscu.get_converters.return_value = {'quad/1/channel_current': cls.converter}
         cls.pscu_data = PSCUData(pscu=cls.pscu)
 
     @patch('lpdpower.pscu_data.PSCU')
     def test_pscu_data_no_pscu_arg(self, mock_pscu):
+        mock_pscu.return_value.tca.stats = I2CStats()
         pd = PSCUData()
         assert(pd.pscu is not None)
 
@@ -63,6 +76,16 @@ class TestPscuData():
         with assert_raises_regexp(PSCUDataError, 'Invalid path: {}'.format(missing_param)):
             self.pscu_data.set(missing_param, 0)
 
+    def test_set_param_i2c_error(self):
+
+        self.pscu_data.param_tree._tree['allEnabled']._type = bool
+        self.pscu.enable_all.side_effect = I2CException('Failed to set enables of quads [1]')
+        try:
+            with assert_raises_regexp(PSCUDataError, r'Failed to set enables of quads \[1\]'):
+                self.pscu_data.set('allEnabled', False)
+        finally:
+            self.pscu.enable_all.side_effect = None
+
     def test_get_all_latched(self):
 
         self.pscu_data.get_all_latched()
@@ -73,3 +96,245 @@ class TestPscuData():
         traces = self.pscu_data.get_quad_traces()
         assert_equal(len(traces), self.pscu.num_quads)
         self.pscu.get_quad_trace.assert_has_calls([call(i) for i in range(self.pscu.num_quads)])
+
+    def test_get_encoded(self):
+
+        response = {'position': 1.234}
+        with patch.object(self.pscu_data, 'get', return_value=response) as mock_get:
+            encoded = self.pscu_data.get_encoded('position')
+            assert_equal(json.loads(encoded), response)
+            mock_get.assert_called_with('position')
+
+    def test_get_encoded_cached_per_generation(self):
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 10
+        with patch.object(self.pscu_data, 'get', return_value={'value': 1}) as mock_get:
+            first = self.pscu_data.get_encoded('cached')
+            second = self.pscu_data.get_encoded('cached')
+            assert_equal(first, second)
+            assert_equal(mock_get.call_count, 1)
+
+            self.pscu.get_generation.return_value = 11
+            self.pscu_data.get_encoded('cached')
+            assert_equal(mock_get.call_count, 2)
+
+    def test_get_encoded_cache_cleared_by_set(self):
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 20
+        self.pscu_data.param_tree._tree['allEnabled']._type = bool
+        with patch.object(self.pscu_data, 'get', return_value={'value': 1}) as mock_get:
+            self.pscu_data.get_encoded('cleared')
+            self.pscu_data.set('allEnabled', True)
+            self.pscu_data.get_encoded('cleared')
+            assert_equal(mock_get.call_count, 2)
+
+    def test_get_encoded_rerenders_on_generation_change(self):
+
+        self.pscu.get_generation.side_effect = [30, 31, 31]
+        with patch.object(self.pscu_data, 'get', side_effect=[{'value': 1}, {'value': 2}]):
+            encoded = self.pscu_data.get_encoded('changed')
+            assert_equal(json.loads(encoded), {'value': 2})
+        self.pscu.get_generation.side_effect = None
+
+    def test_get_encoded_normalised_bytes(self):
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 32
+        with patch.object(self.pscu_data, 'get', return_value={'value': 1}) as mock_get:
+            encoded = self.pscu_data.get_encoded('/normalised/')
+            assert_equal(self.pscu_data.get_encoded('normalised'), encoded)
+            assert_true(isinstance(encoded, bytes))
+            assert_equal(mock_get.call_count, 1)
+            mock_get.assert_called_with('normalised')
+
+    def test_get_encoded_volatile_not_cached(self):
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 34
+        with patch.object(self.pscu_data, 'get', side_effect=[{'pending': 1}, {'pending': 2}]):
+            self.pscu_data.get_encoded('diagnostics/deferred')
+            encoded = self.pscu_data.get_encoded('diagnostics/deferred')
+            assert_equal(json.loads(encoded.decode('utf-8')), {'pending': 2})
+
+    def test_get_encoded_full_tree(self):
+
+        renders = {}
+
+        def get_subtree(path):
+            renders[path] = renders.get(path, 0) + 1
+            return {path: renders[path]}
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 36
+        with patch.object(pscu_data, 'get_subtree', side_effect=get_subtree):
+            pscu_data.get_encoded('')
+            tree = json.loads(pscu_data.get_encoded('').decode('utf-8'))
+
+        assert_equal(set(tree), set(pscu_data.tracked_paths) | set(PSCUData.UNTRACKED_PATHS))
+        for (path, value) in tree.items():
+            assert_equal(value, 2 if path in PSCUData.VOLATILE_PATHS else 1)
+
+    def test_get_changed(self):
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        tree = {'armed': False, 'fan': {'target': 50.0, 'latched': [True, True]}}
+        pscu_data.tracked_paths = ['armed', 'fan']
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 40
+        with patch.object(pscu_data, 'get_subtree', side_effect=lambda path: json.loads(
+            json.dumps({path: tree[path]})
+        )):
+            changes = pscu_data.get_changed('', 0)
+            assert_equal(changes['generation'], 40)
+            assert_equal(changes['changed'], flatten(tree))
+
+            assert_equal(pscu_data.get_changed('', 40), {'generation': 40, 'changed': {}})
+
+            tree['fan']['latched'][1] = False
+            self.pscu.get_generation.return_value = 41
+            assert_equal(pscu_data.get_changed('', 40)['changed'], {'fan/latched/1': False})
+            assert_equal(pscu_data.get_changed('fan', 39)['changed'], {
+                'fan/target': 50.0, 'fan/latched/0': True, 'fan/latched/1': False
+            })
+            assert_equal(pscu_data.get_changed('armed', 40)['changed'], {})
+
+    def test_get_changed_once_per_generation(self):
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        pscu_data.tracked_paths = ['value']
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 50
+        with patch.object(pscu_data, 'get_subtree', return_value={'value': 1}) as mock_get:
+            pscu_data.get_changed('', 0)
+            pscu_data.get_changed('value', 49)
+            assert_equal(mock_get.call_count, 1)
+
+    def test_get_changed_newer_generation(self):
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        pscu_data.tracked_paths = ['value']
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 60
+        with patch.object(pscu_data, 'get_subtree', return_value={'value': 1}):
+            pscu_data.get_changed('', 0)
+            assert_equal(pscu_data.get_changed('', 100)['changed'], {'value': 1})
+
+    def test_get_changed_bad_path(self):
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        pscu_data.tracked_paths = ['value']
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 70
+        with patch.object(pscu_data, 'get_subtree', return_value={'value': 1}):
+            with assert_raises_regexp(PSCUDataError, 'Invalid path: missing'):
+                pscu_data.get_changed('missing', 0)
+
+    def test_get_changed_ignores_diagnostics(self):
+
+        pscu_data = PSCUData(pscu=self.pscu)
+        assert_false('diagnostics' in pscu_data.tracked_paths)
+
+        self.pscu.get_generation.side_effect = None
+        self.pscu.get_generation.return_value = 80
+        pscu_data.get_changed('', 0)
+
+        self.pscu.get_generation.return_value = 81
+        self.pscu.deferred_executor.get_status.return_value = {'pending': 4, 'executed': 14}
+        self.pscu.tca.stats.record(2, 1e-4)
+        try:
+            assert_equal(pscu_data.get_changed('', 80)['changed'], {})
+            assert_equal(
+                pscu_data.get_changed('diagnostics/deferred', 80)['changed'],
+                {'diagnostics/deferred/pending': 4, 'diagnostics/deferred/executed': 14}
+            )
+        finally:
+            self.pscu.deferred_executor.get_status.return_value = {
+                'pending': 3, 'executed': 13
+            }
+            self.pscu.tca.stats.reset()
+
+    def test_get_since(self):
+
+        with patch.object(self.pscu_data, 'get_changed', return_value={}) as mock_get_changed:
+            self.pscu_data.get('fan', since=12)
+            mock_get_changed.assert_called_with('fan', 12)
+
+    def test_flatten(self):
+
+        tree = {'a': 1, 'b': {'c': 2, 'd': [3, {'e': 4}]}, 'f': [], 'g': {}}
+        assert_equal(flatten(tree), {
+            'a': 1, 'b/c': 2, 'b/d/0': 3, 'b/d/1/e': 4, 'f': [], 'g': {}
+        })
+        assert_equal(flatten(1.5, 'value'), {'value': 1.5})
+
+    def test_get_calibration(self):
+
+        calibration = self.pscu_data.get('')['calibration']
+        assert_equal(calibration['quad']['1']['channel_current']['1'], {
+            'gain': 1.0, 'offset': 0.0, 'curve': []
+        })
+
+    def test_set_calibration(self):
+
+        self.pscu_data.set('calibration/quad/1/channel_current/0', {'gain': 2.0, 'offset': 0.5})
+        assert_equal(self.converter.get_calibration(0), (2.0, 0.5, []))
+        assert_equal(self.converter.convert_codes([4095])[0], 20.5)
+        self.converter.set_calibration(0)
+
+    def test_get_history(self):
+
+        history = {'timestamp': [1.0], 'values': {'position': [2.0]}}
+        with patch.object(self.pscu_data.history, 'get', return_value=history) as mock_get:
+            assert_equal(
+                self.pscu_data.get_history('history/data/position', 0.5, 1.5, 2, '1m'), history
+            )
+            mock_get.assert_called_with('/position', 0.5, 1.5, 2, '1m')
+
+            self.pscu_data.get('history/data')
+            mock_get.assert_called_with('', None, None, 1, None)
+
+    def test_get_history_info(self):
+
+        history = self.pscu_data.get('')['history']
+        assert_equal(history['samples'], 0)
+        assert_equal(history['capacity'], self.pscu_data.history.get_capacity())
+        assert_true('quad/3/supply' in history['channels'])
+        assert_equal(history['rollups']['1h']['period'], 3600.0)
+
+    def test_get_history_bad_path(self):
+
+        with assert_raises_regexp(PSCUDataError, 'Invalid path: history/info'):
+            self.pscu_data.get_history('history/info')
+        with assert_raises_regexp(PSCUDataError, 'Invalid history path: missing'):
+            self.pscu_data.get_history('history/data/missing')
+        with assert_raises_regexp(PSCUDataError, 'Illegal decimation 0'):
+            self.pscu_data.get_history('history/data', decimation=0)
+
+    def test_get_diagnostics(self):
+
+        self.pscu.tca.stats.record(2, 100e-6)
+        self.i2c_devices[0].stats.record(17, 1e-3)
+        self.i2c_devices[1].stats.record(3, 200e-6)
+        self.i2c_devices[1].stats.record_error()
+
+        diagnostics = self.pscu_data.get('')['diagnostics']
+        assert_equal(diagnostics['mux']['transactions'], 1)
+        assert_equal(diagnostics['total']['transactions'], 3)
+        assert_equal(diagnostics['total']['bytes'], 22)
+        assert_equal(diagnostics['channels']['4']['total']['errors'], 1)
+        assert_equal(diagnostics['channels']['4']['devices']['0x22']['bytes'], 17)
+        assert_equal(diagnostics['mux_switches_per_poll'], 6)
+        assert_equal(diagnostics['interlock_interrupts'], 2)
+        assert_equal(diagnostics['deferred']['pending'], 3)
+
+    def test_get_diagnostics_read_only(self):
+
+        with assert_raises(PSCUDataError):
+            self.pscu_data.set('diagnostics/mux', {'transactions': 0})
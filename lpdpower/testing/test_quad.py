@@ -35,6 +35,9 @@ class TestQuad():
 
     def test_poll(self):
 
+        # Poll once to ensure the ADC channel selections are programmed, then check the
+        # transactions of a subsequent poll
+        self.quad.poll_all_sensors()
         self.mock_bus.reset_mock()
 
         self.quad.poll_all_sensors()
@@ -45,24 +48,24 @@ class TestQuad():
         # Check reads channel enables from GPIO register of MCP
         method_calls.append(call.read_byte_data(0x20, 0x9))
 
-        # Check for each channel, the voltage, current and fuse voltages are read
-        for channel in range(self.quad.NUM_CHANNELS):
+        # Check all voltage and current channels are read in one sequence conversion from
+        # the power ADC, and all fuse and supply voltages in one from the fuse ADC
+        method_calls.append(call.read_i2c_block_data(0x22, 0x70, self.quad.NUM_CHANNELS * 2 * 2))
+        method_calls.append(call.read_i2c_block_data(0x21, 0x70, (self.quad.NUM_CHANNELS + 1) * 2))
 
-            method_calls.append(call.write_byte_data(0x22, (0x70 + ((channel + 1) << 4)), 0))
-            method_calls.append(call.read_word_data(0x22, 0))
+        # Test method calls equal
+        assert_equal(self.bus.method_calls, method_calls)
 
-            method_calls.append(call.write_byte_data(0x22, (0x70 + ((channel + 4 + 1) << 4)), 0))
-            method_calls.append(call.read_word_data(0x22, 0))
+    def test_poll_programs_adc_channels(self):
 
-            method_calls.append(call.write_byte_data(0x21, (0x70 + ((channel + 1) << 4)), 0))
-            method_calls.append(call.read_word_data(0x21, 0))
+        quad = Quad()
+        bus = quad.mcp.bus
+        bus.reset_mock()
 
-        # Check correct calls to read supply voltage ADC channel made
-        method_calls.append(call.write_byte_data(0x21, 192, 0))
-        method_calls.append(call.read_word_data(0x21, 0))
+        quad.poll_all_sensors()
 
-        # Test method calls equal
-        assert_equal(self.bus.method_calls, method_calls)
+        bus.write_word_data.assert_any_call(0x22, 0x2, 0xf80f)
+        bus.write_word_data.assert_any_call(0x21, 0x2, 0xf801)
 
     def test_get_channel_voltage(self):
 
@@ -140,17 +143,46 @@ class TestQuad():
         enabled = not self.quad.get_enable(channel)
 
         self.mock_bus.reset_mock()
+        self.quad.mcp._MCP23008__gpio = 0
         self.quad.set_enable(channel, enabled)
 
         method_calls = []
 
-        # Check MCP has appropriate enable toggled low-high-low
-        method_calls.append(call.write_byte_data(0x20, 9, 0))
+        # Check MCP has appropriate enable toggled high-low from the low output state
         method_calls.append(call.write_byte_data(0x20, 9, 1 << channel))
         method_calls.append(call.write_byte_data(0x20, 9, 0))
 
         assert_equal(self.bus.method_calls, method_calls)
 
+    def test_set_enables_refresh(self):
+
+        # Read the enable state of the channel as the opposite of that in the snapshot
+        enabled = self.quad.get_enable(1)
+        read_value = self.bus.read_byte_data.return_value
+        self.mock_bus.reset_mock()
+        self.bus.read_byte_data.return_value = 0x00 if enabled else (1 << 5)
+        self.quad.mcp._MCP23008__gpio = 0
+        try:
+            self.quad.set_enables({1: enabled}, refresh=True)
+        finally:
+            self.bus.read_byte_data.return_value = read_value
+
+        method_calls = []
+        method_calls.append(call.read_byte_data(0x20, 9))
+        method_calls.append(call.write_byte_data(0x20, 9, 1 << 1))
+        method_calls.append(call.write_byte_data(0x20, 9, 0))
+
+        assert_equal(self.bus.method_calls, method_calls)
+
+    def test_set_enables_refresh_error(self):
+
+        self.mock_bus.reset_mock()
+        with patch('lpdpower.quad.MCP23008.read_gpio', return_value=self.quad.mcp.ERROR):
+            with assert_raises_regexp(I2CException, 'Unable to read output enable states'):
+                self.quad.set_enables({0: False, 1: False}, refresh=True)
+
+        assert_equal(self.bus.method_calls, [])
+
     def test_set_enable_no_change(self):
 
         channel = 2
@@ -170,18 +202,24 @@ class TestQuad():
 
     def test_fuse_blown(self):
 
-        read_scaled_inputs = [0.0, 0.0, 0.0125] * self.quad.NUM_CHANNELS + [0.6]
-        fuse_blown = self._read_fuse_blown(read_scaled_inputs)
+        power_inputs = [0.0] * self.quad.NUM_CHANNELS * 2
+        fuse_inputs = [0.0125] * self.quad.NUM_CHANNELS + [0.6]
+        fuse_blown = self._read_fuse_blown(power_inputs, fuse_inputs)
         assert_equal(fuse_blown, [True] * self.quad.NUM_CHANNELS)
 
     def test_fuse_not_blown(self):
 
-        read_scaled_inputs = [0.0, 0.0, 0.576] * self.quad.NUM_CHANNELS + [0.6]
-        fuse_blown = self._read_fuse_blown(read_scaled_inputs)
+        power_inputs = [0.0] * self.quad.NUM_CHANNELS * 2
+        fuse_inputs = [0.576] * self.quad.NUM_CHANNELS + [0.6]
+        fuse_blown = self._read_fuse_blown(power_inputs, fuse_inputs)
         assert_equal(fuse_blown, [False] * self.quad.NUM_CHANNELS)
 
-    def _read_fuse_blown(self, read_scaled_inputs):
-        with patch('lpdpower.quad.AD7998.read_input_scaled', side_effect=read_scaled_inputs):
+    def _input_codes(self, inputs):
+        return [int(round(value * 4095)) for value in inputs]
+
+    def _read_fuse_blown(self, power_inputs, fuse_inputs):
+        with patch('lpdpower.quad.AD7998.read_inputs_codes',
+                   side_effect=[self._input_codes(power_inputs), self._input_codes(fuse_inputs)]):
             self.quad.poll_all_sensors()
             fuse_blown = [
                 self.quad.get_fuse_blown(chan) for chan in range(self.quad.NUM_CHANNELS)
@@ -190,21 +228,24 @@ class TestQuad():
 
     def test_fet_failed(self):
 
-        read_scaled_inputs = [0.6, 0.0, 0.576] * self.quad.NUM_CHANNELS + [0.6]
+        power_inputs = [0.6] * self.quad.NUM_CHANNELS + [0.0] * self.quad.NUM_CHANNELS
+        fuse_inputs = [0.576] * self.quad.NUM_CHANNELS + [0.6]
         channel_enables = [True, False, True, False]
-        fet_failed = self._read_fet_failed(read_scaled_inputs, channel_enables)
+        fet_failed = self._read_fet_failed(power_inputs, fuse_inputs, channel_enables)
         assert_equal(fet_failed, [not enable for enable in channel_enables])
 
     def test_fet_not_failed(self):
 
-        read_scaled_inputs = [0.05625, 0.0, 0.6] + [0.6, 0.0, 0.6]*3 + [0.6]
+        power_inputs = [0.05625, 0.6, 0.6, 0.6] + [0.0] * self.quad.NUM_CHANNELS
+        fuse_inputs = [0.6] * self.quad.NUM_CHANNELS + [0.6]
         channel_enables = [False, True, True, True]
-        fet_failed = self._read_fet_failed(read_scaled_inputs, channel_enables)
+        fet_failed = self._read_fet_failed(power_inputs, fuse_inputs, channel_enables)
         assert_equal(fet_failed, [False]*self.quad.NUM_CHANNELS)
 
-    def _read_fet_failed(self, read_scaled_inputs, channel_enables):
+    def _read_fet_failed(self, power_inputs, fuse_inputs, channel_enables):
 
-        with patch('lpdpower.quad.AD7998.read_input_scaled', side_effect=read_scaled_inputs):
+        with patch('lpdpower.quad.AD7998.read_inputs_codes',
+                   side_effect=[self._input_codes(power_inputs), self._input_codes(fuse_inputs)]):
             with patch('lpdpower.quad.MCP23008.input_pins',  return_value=channel_enables):
                 self.quad.poll_all_sensors()
                 fet_failed = [
@@ -0,0 +1,79 @@
+"""Test cases for the sensor state snapshot classes from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+from nose.tools import *
+
+from lpdpower.sensor_state import SensorState, PSCUState, QuadState
+
+
+class TestQuadState():
+
+    def setup(self):
+
+        self.values = {
+            'channel_voltage': [1.0, 2.0, 3.0, 4.0],
+            'channel_current': [0.1, 0.2, 0.3, 0.4],
+            'fuse_voltage': [48.0] * 4,
+            'fuse_blown': [False] * 4,
+            'fet_failed': [False] * 4,
+            'channel_enable': [True, False, True, False],
+            'supply_voltage': 48.0,
+        }
+        self.state = QuadState(**self.values)
+
+    def test_initial_generation(self):
+
+        assert_equal(self.state.generation, 0)
+        assert_equal(self.state.timestamp, 0.0)
+
+    def test_sequences_stored_as_tuples(self):
+
+        assert_equal(self.state.channel_voltage, (1.0, 2.0, 3.0, 4.0))
+        assert_equal(self.state.supply_voltage, 48.0)
+
+    def test_state_is_immutable(self):
+
+        with assert_raises_regexp(AttributeError, 'QuadState is immutable'):
+            self.state.supply_voltage = 0.0
+
+    def test_state_has_no_dict(self):
+
+        with assert_raises(AttributeError):
+            self.state.new_field = 1
+
+    def test_values(self):
+
+        assert_equal(self.state.values(), self.values)
+
+    def test_next_state(self):
+
+        draft = self.state.draft()
+        draft.channel_voltage[2] = 10.0
+        draft.supply_voltage = 47.5
+
+        next_state = self.state.next_state(draft, 1234.5)
+
+        assert_true(isinstance(next_state, QuadState))
+        assert_equal(next_state.generation, self.state.generation + 1)
+        assert_equal(next_state.timestamp, 1234.5)
+        assert_equal(next_state.channel_voltage, (1.0, 2.0, 10.0, 4.0))
+        assert_equal(next_state.supply_voltage, 47.5)
+        assert_equal(self.state.channel_voltage, (1.0, 2.0, 3.0, 4.0))
+        assert_equal(self.state.supply_voltage, 48.0)
+
+    def test_missing_field(self):
+
+        del self.values['supply_voltage']
+        with assert_raises(KeyError):
+            QuadState(**self.values)
+
+
+class TestPSCUState():
+
+    def test_fields_are_slots(self):
+
+        assert_equal(PSCUState.__slots__, PSCUState.FIELDS)
+        assert_equal(QuadState.__slots__, QuadState.FIELDS)
+        assert_equal(SensorState.FIELDS, ())
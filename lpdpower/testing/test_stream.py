@@ -0,0 +1,179 @@
+"""Test cases for the PSCUStream class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+import json
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+from tornado.httpclient import HTTPRequest, HTTPClientError
+from tornado.testing import AsyncHTTPTestCase, gen_test
+from tornado.web import Application
+from tornado.websocket import websocket_connect, WebSocketClosedError
+
+from lpdpower.stream import PSCUStream, PSCUStreamHandler
+
+
+class TestPSCUStream():
+
+    def setup(self):
+
+        self.pscu_data = Mock()
+        self.pscu_data.pscu.get_generation.return_value = 1
+        self.pscu_data.get.return_value = {'armed': False}
+        self.pscu_data.get_changed.side_effect = self.get_changed
+        self.changed = {'armed': False}
+
+        self.stream = PSCUStream(self.pscu_data)
+        self.client = Mock()
+
+    def get_changed(self, path, since):
+
+        return {
+            'generation': self.pscu_data.pscu.get_generation.return_value,
+            'changed': self.changed,
+        }
+
+    def messages(self, client):
+
+        return [json.loads(args[0]) for (args, _) in client.write_message.call_args_list]
+
+    def test_add_client_sends_snapshot(self):
+
+        self.stream.add_client(self.client)
+        assert_true(self.client in self.stream.clients)
+        assert_equal(self.messages(self.client), [{'generation': 1, 'tree': {'armed': False}}])
+
+    def test_update_sends_delta(self):
+
+        self.stream.update()
+        self.pscu_data.get_changed.assert_called_with('', -1)
+        self.stream.add_client(self.client)
+
+        self.changed = {'armed': True}
+        self.pscu_data.pscu.get_generation.return_value = 2
+        self.stream.update()
+
+        self.pscu_data.get_changed.assert_called_with('', 1)
+        assert_equal(self.messages(self.client)[1], {'generation': 2, 'delta': {'armed': True}})
+
+    def test_update_once_per_generation(self):
+
+        self.stream.add_client(self.client)
+        self.stream.update()
+        self.stream.update()
+
+        assert_equal(self.pscu_data.get_changed.call_count, 1)
+        assert_equal(self.client.write_message.call_count, 2)
+        assert_equal(self.stream.publish_count, 1)
+
+    def test_update_unchanged(self):
+
+        self.stream.update()
+        self.stream.add_client(self.client)
+        self.changed = {}
+        self.pscu_data.pscu.get_generation.return_value = 2
+
+        assert_equal(self.stream.update(), None)
+        assert_equal(self.client.write_message.call_count, 1)
+        assert_equal(self.stream.generation, 2)
+
+    def test_update_encodes_once(self):
+
+        clients = [Mock() for _ in range(3)]
+        for client in clients:
+            self.stream.add_client(client)
+
+        message = self.stream.update()
+        for client in clients:
+            client.write_message.assert_called_with(message)
+
+    def test_closed_client_removed(self):
+
+        self.client.write_message.side_effect = WebSocketClosedError()
+        self.stream.add_client(self.client)
+
+        assert_false(self.client in self.stream.clients)
+
+    def test_remove_client(self):
+
+        self.stream.add_client(self.client)
+        self.stream.remove_client(self.client)
+        self.stream.update()
+
+        assert_false(self.client in self.stream.clients)
+        assert_equal(self.client.write_message.call_count, 1)
+
+    def test_is_origin_allowed(self):
+
+        assert_true(self.stream.is_origin_allowed('http://pscu:8888', 'pscu:8889'))
+        assert_true(self.stream.is_origin_allowed('https://PSCU', 'pscu:8889'))
+        assert_false(self.stream.is_origin_allowed('http://evil.example.com', 'pscu:8889'))
+        assert_false(self.stream.is_origin_allowed('null', 'pscu:8889'))
+
+        stream = PSCUStream(self.pscu_data, ['https://Control.example.org:8888/'])
+        assert_true(stream.is_origin_allowed('https://control.example.org:8888', 'pscu:8889'))
+        assert_false(stream.is_origin_allowed('https://control.example.org:9999', 'pscu:8889'))
+
+
+class TestPSCUStreamHandler(AsyncHTTPTestCase):
+
+    def get_app(self):
+
+        self.pscu_data = Mock()
+        self.pscu_data.pscu.get_generation.return_value = 1
+        self.pscu_data.get.return_value = {'armed': False}
+
+        self.stream = PSCUStream(self.pscu_data)
+        return Application([(r'/', PSCUStreamHandler, {'stream': self.stream})])
+
+    @gen_test
+    def test_stream_client(self):
+
+        url = 'ws://127.0.0.1:{}/'.format(self.get_http_port())
+        client = yield websocket_connect(url)
+
+        message = yield client.read_message()
+        assert_equal(json.loads(message), {'generation': 1, 'tree': {'armed': False}})
+
+        self.pscu_data.pscu.get_generation.return_value = 2
+        self.pscu_data.get_changed.return_value = {'generation': 2, 'changed': {'armed': True}}
+        self.stream.update()
+
+        message = yield client.read_message()
+        assert_equal(json.loads(message), {'generation': 2, 'delta': {'armed': True}})
+
+        client.close()
+
+    @gen_test
+    def test_stream_client_cross_origin(self):
+
+        request = HTTPRequest(
+            'ws://127.0.0.1:{}/'.format(self.get_http_port()),
+            headers={'Origin': 'http://evil.example.com'}
+        )
+        with assert_raises(HTTPClientError) as cm:
+            yield websocket_connect(request)
+        assert_equal(cm.exception.code, 403)
+        assert_equal(self.stream.clients, set())
+
+    @gen_test
+    def test_stream_client_same_host(self):
+
+        request = HTTPRequest(
+            'ws://127.0.0.1:{}/'.format(self.get_http_port()),
+            headers={'Origin': 'http://127.0.0.1:8888'}
+        )
+        client = yield websocket_connect(request)
+
+        message = yield client.read_message()
+        assert_equal(json.loads(message), {'generation': 1, 'tree': {'armed': False}})
+
+        client.close()
@@ -15,6 +15,7 @@ from nose.tools import *
 sys.modules['smbus'] = Mock()
 from lpdpower.tca9548 import TCA9548
 from lpdpower.i2c_device import I2CDevice, I2CException
+from lpdpower.i2c_container import I2CContainer
 
 
 class TestTCA9548():
@@ -51,6 +52,16 @@ class TestTCA9548():
             I2CException, 'must be a type or an instance of I2CDevice or I2CContainer'):
             device = self.tca.attach_device(line, DummyDevice, address)
 
+    def test_get_channel_devices(self):
+
+        tca = TCA9548()
+        device = tca.attach_device(2, I2CDevice, 0x20)
+        container = tca.attach_device(3, I2CContainer)
+        contained_device = container.attach_device(I2CDevice, 0x21)
+
+        channel_devices = tca.get_channel_devices()
+        assert_equal(channel_devices, {2: [device], 3: [contained_device]})
+
     def test_remove_device(self):
 
         device = self.tca.attach_device(1, I2CDevice, 0x20)
@@ -105,3 +116,35 @@ class TestTCA9548():
 
         device2.write8(1, 2)
         assert_equal(self.tca._selected_channel, device2_line)
+
+    def test_get_channel(self):
+
+        tca = TCA9548()
+        device = tca.attach_device(3, I2CDevice, 0x20)
+
+        assert_equal(tca.get_channel(device), 3)
+        assert_equal(tca.get_selected_channel(), 3)
+
+    def test_get_channel_missing_device(self):
+
+        device_not_attached = I2CDevice(0x20)
+
+        with assert_raises_regexp(
+            I2CException, 'Device %s is not attached to this TCA' % device_not_attached
+        ):
+            self.tca.get_channel(device_not_attached)
+
+    def test_switch_count(self):
+
+        tca = TCA9548()
+        device1 = tca.attach_device(1, I2CDevice, 0x20)
+        device2 = tca.attach_device(2, I2CDevice, 0x21)
+        switch_count = tca.switch_count
+
+        device2.write8(0, 1)
+        device2.write8(0, 2)
+        assert_equal(tca.switch_count, switch_count)
+
+        device1.write8(0, 1)
+        device2.write8(0, 1)
+        assert_equal(tca.switch_count, switch_count + 2)
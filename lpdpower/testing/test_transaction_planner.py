@@ -0,0 +1,82 @@
+"""Test TransactionPlanner class from lpdpower.
+
+Tim Nicholls, STFC Application Engineering Group
+"""
+
+import sys
+
+if sys.version_info[0] == 3:  # pragma: no cover
+    from unittest.mock import Mock
+else:                         # pragma: no cover
+    from mock import Mock
+
+from nose.tools import *
+
+sys.modules['smbus'] = Mock()
+from lpdpower.transaction_planner import TransactionPlanner
+from lpdpower.tca9548 import TCA9548
+from lpdpower.i2c_device import I2CDevice, I2CException
+
+
+class TestTransactionPlanner():
+
+    def setup(self):
+
+        self.tca = TCA9548()
+        self.devices = [
+            self.tca.attach_device(channel, I2CDevice, 0x20 + idx)
+            for (idx, channel) in enumerate([4, 5, 4, 5, 0])
+        ]
+        self.accesses = []
+
+    def access(self, device, value):
+
+        self.accesses.append(self.tca.get_channel(device))
+        device.write8(0, value)
+        return value
+
+    def test_execute_in_channel_order(self):
+
+        planner = TransactionPlanner(self.tca)
+        for (idx, device) in enumerate(self.devices):
+            planner.add(device, self.access, device, idx)
+
+        switch_count = self.tca.switch_count
+        results = planner.execute()
+
+        assert_equal(results, [0, 1, 2, 3, 4])
+        assert_equal(self.accesses, sorted(self.accesses))
+        assert_equal(self.tca.switch_count - switch_count, 2)
+
+    def test_execute_selected_channel_first(self):
+
+        self.devices[1].write8(0, 1)
+        assert_equal(self.tca.get_selected_channel(), 5)
+
+        planner = TransactionPlanner(self.tca)
+        for (idx, device) in enumerate(self.devices):
+            planner.add(device, self.access, device, idx)
+
+        switch_count = self.tca.switch_count
+        planner.execute()
+
+        assert_equal(self.accesses, [5, 5, 0, 4, 4])
+        assert_equal(self.tca.switch_count - switch_count, 2)
+
+    def test_planned_transaction_result(self):
+
+        planner = TransactionPlanner(self.tca)
+        transaction = planner.add(self.devices[0], self.access, self.devices[0], 42)
+
+        assert_equal(transaction.channel, 4)
+        assert_equal(transaction.result, None)
+        planner.execute()
+        assert_equal(transaction.result, 42)
+
+    def test_add_unattached_device(self):
+
+        planner = TransactionPlanner(self.tca)
+        device = I2CDevice(0x30)
+
+        with assert_raises(I2CException):
+            planner.add(device, device.readU8, 0)
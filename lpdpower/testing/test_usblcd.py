@@ -42,11 +42,7 @@ class TestUsbLcd():
 
         cmds.insert(0, UsbLcd.CMD_START)
 
-        if PY3:
-            calls = [call(bytes(cmds))]
-        else:
-            calls = [call(chr(cmd)) for cmd in cmds]
-        return calls
+        return [call(bytes(bytearray(cmds)))]
 
     def test_00_init(self):
 
@@ -61,6 +57,12 @@ class TestUsbLcd():
         home_calls = self.make_call_list([UsbLcd.CMD_HOME])
         self.serial.write.assert_has_calls(home_calls)
 
+    def test_set_cursor(self):
+
+        self.lcd.set_cursor(5, 3)
+        cursor_calls = self.make_call_list([UsbLcd.CMD_SET_CURSOR, 5, 3])
+        self.serial.write.assert_has_calls(cursor_calls)
+
     def test_clear(self):
 
         self.lcd.clear()
@@ -75,6 +77,43 @@ class TestUsbLcd():
             write_cmd = write_cmd.encode()
         self.serial.write.assert_called_with(write_cmd)
 
+    def test_buffered_writes(self):
+
+        self.lcd.begin_buffer()
+        self.lcd.set_cursor(1, 2)
+        self.lcd.write('text')
+        self.lcd.set_backlight_colour(UsbLcd.GREEN)
+        self.serial.write.assert_not_called()
+
+        write_stats = self.lcd.get_write_stats()
+        self.lcd.flush()
+        data = bytearray([UsbLcd.CMD_START, UsbLcd.CMD_SET_CURSOR, 1, 2])
+        data.extend(b'text')
+        data.extend([UsbLcd.CMD_START, UsbLcd.CMD_RGB_BACKLIGHT] + list(UsbLcd.GREEN))
+        self.serial.write.assert_called_once_with(bytes(data))
+        assert_equal(self.lcd.get_write_stats(), {
+            'writes': write_stats['writes'] + 1, 'bytes': write_stats['bytes'] + len(data)
+        })
+
+        self.lcd.write('more')
+        assert_equal(self.serial.write.call_count, 2)
+
+    def test_discard_buffer(self):
+
+        self.lcd.begin_buffer()
+        self.lcd.write('partial')
+        self.lcd.discard_buffer()
+        assert_equal(self.lcd.buffer, None)
+
+        self.lcd.write('text')
+        self.serial.write.assert_called_once_with(b'text')
+
+    def test_flush_empty(self):
+
+        self.lcd.begin_buffer()
+        self.lcd.flush()
+        self.serial.write.assert_not_called()
+
     def test_set_splash_text(self):
 
         splash_text = 'This is a test'
@@ -0,0 +1,79 @@
+"""TransactionPlanner - planner ordering device transactions by TCA9548 channel.
+
+This class allows the device transactions of a poll cycle to be planned in advance and then
+executed grouped by the TCA9548 multiplexer channel of each device, rather than in the order
+they were planned. This minimises the number of multiplexer channel switches, so that a cycle
+needs at most one multiplexer write per channel used.
+
+Tim Nicholls, STFC Application Engineering Group.
+"""
+
+
+class PlannedTransaction(object):
+    """PlannedTransaction - a device transaction planned for later execution.
+
+    This class holds a device access function and its arguments, together with the result of
+    the access once executed.
+    """
+
+    def __init__(self, channel, func, args):
+        """Initialise the planned transaction.
+
+        :param channel: TCA channel of the device accessed
+        :param func: access function to call
+        :param args: arguments to pass to the access function
+        """
+        self.channel = channel
+        self.func = func
+        self.args = args
+        self.result = None
+
+    def execute(self):
+        """Execute the transaction, storing and returning the result."""
+        self.result = self.func(*self.args)
+        return self.result
+
+
+class TransactionPlanner(object):
+    """TransactionPlanner class.
+
+    This class collects planned transactions on devices attached to a TCA9548 multiplexer,
+    executing them grouped by channel. The currently selected channel is executed first, and
+    subsequent channels in ascending order. Within a channel, transactions are executed in the
+    order planned.
+    """
+
+    def __init__(self, tca):
+        """Initialise the transaction planner.
+
+        :param tca: TCA9548 multiplexer the planned devices are attached to
+        """
+        self.tca = tca
+        self.transactions = []
+
+    def add(self, device, func, *args):
+        """Plan a transaction on a device.
+
+        :param device: device or container attached to the TCA accessed by the transaction
+        :param func: access function to call
+        :param args: arguments to pass to the access function
+        :returns: PlannedTransaction, whose result attribute is set once executed
+        """
+        transaction = PlannedTransaction(self.tca.get_channel(device), func, args)
+        self.transactions.append(transaction)
+        return transaction
+
+    def execute(self):
+        """Execute all planned transactions grouped by TCA channel.
+
+        :returns: list of results of the transactions, in the order planned
+        """
+        selected = self.tca.get_selected_channel()
+        ordered = sorted(
+            self.transactions, key=lambda transaction: (transaction.channel != selected,
+                                                        transaction.channel)
+        )
+        for transaction in ordered:
+            transaction.execute()
+
+        return [transaction.result for transaction in self.transactions]
@@ -7,9 +7,18 @@ https://learn.adafruit.com/usb-plus-serial-backpack
 
 This class requires the python serial module to communicate with the USB
 serial device created by the host operating system,
+
+Commands and text may be accumulated in a buffer and sent with a single serial write, e.g.
+to write a complete frame of display updates, reducing the number of system calls and USB
+packets needed.
 """
-import serial
 import sys
+
+try:
+    import serial
+except ImportError:  # pragma: no cover
+    serial = None
+
 PY3 = sys.version_info >= (3,)
 
 class UsbLcd(object):
@@ -30,6 +39,7 @@ class UsbLcd(object):
     CMD_START = 0xFE
     CMD_LCD_SIZE = 0xD1
     CMD_HOME = 0x48
+    CMD_SET_CURSOR = 0x47
     CMD_CLEAR = 0x58
     CMD_SET_SPLASH = 0x40
     CMD_RGB_BACKLIGHT = 0xD0
@@ -49,28 +59,78 @@ class UsbLcd(object):
         :param rows: number of LCD rows
         :param cols: number of LCD columns
         """
+        if serial is None:
+            raise IOError("Unable to open {}: serial module not available".format(serial_dev))
+
         self.ser = serial.Serial(serial_dev, baud)
         self.rows = rows
         self.cols = cols
 
+        # Command buffer, which is None unless buffering, and write throughput counters
+        self.buffer = None
+        self.write_count = 0
+        self.bytes_written = 0
+
         self.write_cmd([UsbLcd.CMD_LCD_SIZE, self.cols, self.rows])
 
     def write_cmd(self, cmd_list):
         """Write a command to the display.
 
         This method writes a variable length command to the display, prefixing the
-        command with a START byte and converting the command to the appropriate character
-        list.
+        command with a START byte and converting the command to bytes.
 
         :param cmd_list list of commands to send
         """
-        cmd_list.insert(0, UsbLcd.CMD_START)
+        data = bytearray([UsbLcd.CMD_START])
+        data.extend(cmd_list)
 
-        if PY3:
-            self.ser.write(bytes(cmd_list))
+        self.__send(data)
+
+    def begin_buffer(self):
+        """Start buffering commands and text written to the display.
+
+        Subsequent commands and text are accumulated in the buffer rather than written, until
+        flush() is called to send the buffer with a single serial write.
+        """
+        if self.buffer is None:
+            self.buffer = bytearray()
+
+    def flush(self):
+        """Send any buffered commands and text to the display and stop buffering.
+
+        This method writes the contents of the buffer, if not empty, to the display in a single
+        serial write.
+        """
+        (data, self.buffer) = (self.buffer, None)
+        if data:
+            self.__send(data)
+
+    def discard_buffer(self):
+        """Discard any buffered commands and text and stop buffering.
+
+        This method allows a partially buffered write, e.g. one interrupted by an error, to be
+        abandoned, so that it is not sent with subsequent writes.
+        """
+        self.buffer = None
+
+    def get_write_stats(self):
+        """Get the serial write throughput counters.
+
+        :returns: dictionary of number of serial writes and bytes written
+        """
+        return {'writes': self.write_count, 'bytes': self.bytes_written}
+
+    def __send(self, data):
+        """Send data to the display, or append it to the buffer if buffering.
+
+        :param data: bytearray of data to send
+        """
+        if self.buffer is not None:
+            self.buffer.extend(data)
         else:
-            for i in range(0, len(cmd_list)):
-                self.ser.write(chr(cmd_list[i]))
+            self.ser.write(bytes(data))
+            self.write_count += 1
+            self.bytes_written += len(data)
 
     def home(self):
         """Set the display cursor to the home position.
@@ -79,6 +139,17 @@ class UsbLcd(object):
         """
         self.write_cmd([UsbLcd.CMD_HOME])
 
+    def set_cursor(self, col, row):
+        """Set the display cursor position.
+
+        This method sets the position of the display cursor, at which subsequently written
+        text will appear. Positions are numbered from 1, i.e. the home position is (1, 1).
+
+        :param col: cursor column
+        :param row: cursor row
+        """
+        self.write_cmd([UsbLcd.CMD_SET_CURSOR, col, row])
+
     def clear(self):
         """Clear the display.
 
@@ -94,9 +165,9 @@ class UsbLcd(object):
         :param text: text string to write to the display
         """
         if PY3:
-            self.ser.write(text.encode())
-        else:
-            self.ser.write(text)
+            text = text.encode()
+
+        self.__send(bytearray(text))
 
     def set_splash_text(self, text):
         """Set the splash text for the display.
@@ -599,10 +599,67 @@ $(document).ready(function() {
     global_elems.set("arm", document.querySelector("#button-arm"));
     global_elems.set("enable", document.querySelector("#button-enable"));
 
-    //Start update function
-    setInterval(updateAll, 200);
+    //Start updates, streamed from the server if available, otherwise polled
+    startUpdates();
 });
 
+var pollTimer = null;
+var streamState = null;
+
+function startUpdates()
+{
+    $.getJSON('/api/0.1/lpdpower/', function(response) {
+        render(response);
+        if(response.streamPort && window.WebSocket)
+            startStream(response.streamPort);
+        else
+            startPolling();
+    }).fail(function() {
+        //Poll if the initial request fails, so that the page still updates
+        startPolling();
+    });
+}
+
+function startPolling()
+{
+    if(pollTimer === null)
+        pollTimer = setInterval(updateAll, 200);
+}
+
+function startStream(port)
+{
+    var scheme = (window.location.protocol === 'https:') ? 'wss' : 'ws';
+    var stream = new WebSocket(`${scheme}://${window.location.hostname}:${port}/`);
+
+    stream.onmessage = function(event) {
+        var message = JSON.parse(event.data);
+        if(message.tree)
+            streamState = message.tree;
+        else if(streamState !== null && message.delta)
+        {
+            for(var path in message.delta)
+                setPath(streamState, path, message.delta[path]);
+        }
+        if(streamState !== null)
+            render(streamState);
+    };
+
+    //Fall back to polling if the stream is unavailable or closed
+    stream.onclose = function() {
+        streamState = null;
+        startPolling();
+    };
+}
+
+function setPath(tree, path, value)
+{
+    var keys = path.split('/');
+    var last = keys.pop();
+    for(var i = 0; i < keys.length; ++i)
+        tree = tree[keys[i]];
+    tree[last] = value;
+}
+
 function update_status_box(el, value, text_true, text_false)
 {
     el.style.backgroundColor = value ? colorOk : colorFail;
@@ -618,58 +675,59 @@ function update_button_state(el, value, text_true, text_false)
 
 function updateAll()
 {
-    $.getJSON('/api/0.1/lpdpower/', function(response) {
-
-        //Handle quads
-        for(var i = 0; i < quads.length; ++i)
-        {
-            quads[i].update(response.quad.quads[i]);
-            quads[i].updateTrace(response.quad.trace[i]);
-        }
-
-        //Handle temp sensors
-        for(var i = 0; i < temp_sensors.length; ++i)
-            temp_sensors[i].update(response.temperature.sensors[i]);
-
-        //Handle humidity sensors
-        for(var i = 0; i < humidity_sensors.length; ++i)
-            humidity_sensors[i].update(response.humidity.sensors[i]);
-
-        var leak_sensor_offset = humidity_sensors.length;
-        for(var i = 0; i < leak_sensors.length; ++i)
-             leak_sensors[i].update(response.humidity.sensors[i + leak_sensor_offset]);
-
-        //Handle pump sensor
-        pump_sensor.update(response.pump);
-
-        //Handle fan sensor
-        fan_sensor.update(response.fan);
-
-        //Handle overall status
-        update_status_box(global_elems.get("overall-status"), response.overall, 'Healthy', 'Error')
-        update_status_box(global_elems.get("overall-latched"), response.latched, 'No', 'Yes')
-        update_status_box(global_elems.get("overall-armed"), response.armed, 'Yes', 'No')
-        update_status_box(global_elems.get("trace-status"), response.trace.overall, 'OK', 'Error')
-        update_status_box(global_elems.get("trace-latched"), response.trace.latched, 'No', 'Yes')
-        global_elems.get("position").innerHTML = round2dp(response.position).toString() + 'mm'
-
-        // Handle health states
-        update_status_box(global_elems.get("tmp-health"), response.temperature.overall, 'Healthy', 'Error');
-        update_status_box(global_elems.get("h-health"), response.humidity.overall, 'Healthy', 'Error');
-        update_status_box(global_elems.get("p-health"), response.pump.overall, 'Healthy', 'Error');
-        update_status_box(global_elems.get("f-health"), response.fan.overall, 'Healthy', 'Error');
-
-        // Handle latched states
-        update_status_box(global_elems.get("tmp-latched"), response.temperature.latched, 'No', 'Yes')
-        update_status_box(global_elems.get("h-latched"), response.humidity.latched, 'No', 'Yes')
-        update_status_box(global_elems.get("p-latched"), response.pump.latched, 'No', 'Yes')
-        update_status_box(global_elems.get("f-latched"), response.fan.latched, 'No', 'Yes')
+    $.getJSON('/api/0.1/lpdpower/', render);
+}
 
-        // Handle button states
-        update_button_state(global_elems.get("arm"), response.armed, 'Disarm Interlock', 'Arm Interlock');
-        update_button_state(global_elems.get("enable"), response.allEnabled, 'Disable Quads', 'Enable Quads');
+function render(response)
+{
+    //Handle quads
+    for(var i = 0; i < quads.length; ++i)
+    {
+        quads[i].update(response.quad.quads[i]);
+        quads[i].updateTrace(response.quad.trace[i]);
+    }
 
-    });
+    //Handle temp sensors
+    for(var i = 0; i < temp_sensors.length; ++i)
+        temp_sensors[i].update(response.temperature.sensors[i]);
+
+    //Handle humidity sensors
+    for(var i = 0; i < humidity_sensors.length; ++i)
+        humidity_sensors[i].update(response.humidity.sensors[i]);
+
+    var leak_sensor_offset = humidity_sensors.length;
+    for(var i = 0; i < leak_sensors.length; ++i)
+         leak_sensors[i].update(response.humidity.sensors[i + leak_sensor_offset]);
+
+    //Handle pump sensor
+    pump_sensor.update(response.pump);
+
+    //Handle fan sensor
+    fan_sensor.update(response.fan);
+
+    //Handle overall status
+    update_status_box(global_elems.get("overall-status"), response.overall, 'Healthy', 'Error')
+    update_status_box(global_elems.get("overall-latched"), response.latched, 'No', 'Yes')
+    update_status_box(global_elems.get("overall-armed"), response.armed, 'Yes', 'No')
+    update_status_box(global_elems.get("trace-status"), response.trace.overall, 'OK', 'Error')
+    update_status_box(global_elems.get("trace-latched"), response.trace.latched, 'No', 'Yes')
+    global_elems.get("position").innerHTML = round2dp(response.position).toString() + 'mm'
+
+    // Handle health states
+    update_status_box(global_elems.get("tmp-health"), response.temperature.overall, 'Healthy', 'Error');
+    update_status_box(global_elems.get("h-health"), response.humidity.overall, 'Healthy', 'Error');
+    update_status_box(global_elems.get("p-health"), response.pump.overall, 'Healthy', 'Error');
+    update_status_box(global_elems.get("f-health"), response.fan.overall, 'Healthy', 'Error');
+
+    // Handle latched states
+    update_status_box(global_elems.get("tmp-latched"), response.temperature.latched, 'No', 'Yes')
+    update_status_box(global_elems.get("h-latched"), response.humidity.latched, 'No', 'Yes')
+    update_status_box(global_elems.get("p-latched"), response.pump.latched, 'No', 'Yes')
+    update_status_box(global_elems.get("f-latched"), response.fan.latched, 'No', 'Yes')
+
+    // Handle button states
+    update_button_state(global_elems.get("arm"), response.armed, 'Disarm Interlock', 'Arm Interlock');
+    update_button_state(global_elems.get("enable"), response.allEnabled, 'Disable Quads', 'Enable Quads');
 }
 
 function quadEnable(qid, bid)